@@ -1,74 +1,58 @@
 import json
 import re
+import sys
+
+# The bus packages are imported where they are used, so the plain JSON
+# export runs without ifc_databus and compas_eve installed
+
+# Same dump format as ifc_databus.core.composites.iter_composites
+COMPOSITE = re.compile(r"Composite\b[^:]*: (.*)")
+LAYER = re.compile(r"Layer\b.*Thickness = ([\d.]+)")
+MATERIAL = re.compile(r"Material (.*): Density = (\d+)")
 
-import re
 
 def parse_composite_file(file_path):
-    composites = []
-    current_composite = None
-    
+    """Yield the composites of a dump one at a time, reading it line by line."""
+    composite = None
+    thickness = None
     with open(file_path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-        
-    for line in lines:
-        # Remove leading and trailing whitespace from the line
-        line = line.strip()
-        
-        # Skip empty lines
-        if not line:
-            continue
-            
-        # Skip the first line with number of composites
-        if line.startswith("Number of composites:"):
-            continue
-            
-        # New composite
-        if line.startswith("Composite"):
-            if current_composite:
-                composites.append(current_composite)
-            
-            # Extract composite name
-            composite_name = line.split(": ")[1]
-            current_composite = {
-                "name": composite_name,
-                "layers": []
-            }
-            
-        # Layer information
-        elif line.startswith("  Layer"):
-            thickness = float(re.search(r"Thickness = ([\d.]+)", line).group(1))
-            
-        # Material information
-        elif line.startswith("    Material"):
-            material_info = re.match(r"    Material (.*): Density = (\d+)", line)
-            material_name = material_info.group(1)
-            density = int(material_info.group(2))
-            
-            # Add layer to current composite
-            current_composite["layers"].append({
-                "thickness": thickness,
-                "material": material_name,
-                "density": density
-            })
-    
-    # Add the last composite
-    if current_composite:
-        composites.append(current_composite)
-  
-    return composites
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("Number of composites:"):
+                continue
+            match = COMPOSITE.match(line)
+            if match:
+                if composite:
+                    yield composite
+                composite = {"name": match.group(1), "layers": []}
+                continue
+            match = LAYER.match(line)
+            if match:
+                thickness = float(match.group(1))
+                continue
+            match = MATERIAL.match(line)
+            if match and composite is not None and thickness is not None:
+                composite["layers"].append({
+                    "thickness": thickness,
+                    "material": match.group(1),
+                    "density": int(match.group(2)),
+                })
+    if composite:
+        yield composite
 
 
-def generate_ifc_json(composites):
-    ifc_json = {
-        "type": "ifcJSON",
-        "version": "0.0.1",
-        "schemaIdentifier": "IFC4",
-        "originatingSystem": "Custom Encoder",
-        "preprocessorVersion": "1.0.0",
-        "timeStamp": "2023-10-31T12:00:00",
-        "data": []
-    }
+IFC_JSON_HEADER = {
+    "type": "ifcJSON",
+    "version": "0.0.1",
+    "schemaIdentifier": "IFC4",
+    "originatingSystem": "Custom Encoder",
+    "preprocessorVersion": "1.0.0",
+    "timeStamp": "2023-10-31T12:00:00",
+}
 
+
+def generate_ifc_json(composites):
+    """Yield one IfcMaterialLayerSet per composite."""
     for composite in composites:
         material_layers = []
         for layer in composite["layers"]:
@@ -86,32 +70,55 @@ def generate_ifc_json(composites):
             material_layers.append(material_layer)
 
         # Create material layer set
-        material_layer_set = {
+        yield {
             "type": "IfcMaterialLayerSet",
             "materialLayers": material_layers,
             "layerSetName": composite["name"]
         }
 
-        # Add to the main data array
-        ifc_json["data"].append(material_layer_set)
-
-    return ifc_json
-
 # Main execution
-def main(input_file_path, output_file_path):
+def main(input_file_path, output_file_path, indent=4):
     # Parse the input file
     composites = parse_composite_file(input_file_path)
-    print(composites)
     
-    # Generate IFC JSON
-    ifc_json = generate_ifc_json(composites)
+    try:
+        from ifc_databus.core.ifcjson import IfcJsonWriter
+    except ImportError:
+        # Without the bus package the file is written in one go
+        with open(output_file_path, 'w', encoding='utf-8') as f:
+            json.dump({**IFC_JSON_HEADER, "data": list(generate_ifc_json(composites))}, f, indent=indent)
+        return
+
+    # Write the IFC JSON entity by entity; a .gz output path is compressed
+    with IfcJsonWriter(output_file_path, IFC_JSON_HEADER, indent=indent) as writer:
+        writer.write_all(generate_ifc_json(composites))
+
+
+def publish(input_file_path, mqtt_host="localhost", mqtt_port=1883, batch_size=1000):
+    """Publish the composites straight onto the bus, without an intermediate file."""
+    from compas_eve import set_default_transport
+    from compas_eve.mqtt import MqttTransport
+    from ifc_databus.core.bus import IfcBus
+    from ifc_databus.core.composites import import_composites
 
-    # Save to file
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        json.dump(ifc_json, f, indent=4)
+    set_default_transport(MqttTransport(mqtt_host, mqtt_port))
+    bus = IfcBus("archicad_composites")
+    bus.connect()
+    try:
+        report = import_composites(bus, input_file_path, batch_size=batch_size)
+    finally:
+        bus.disconnect()
+    for error in report.errors:
+        print(f"Rejected {error}")
+    print(report)
+    return report
 
 
-# Example usage
-input_file = "/Users/matteodopudi/Downloads/sample_test_file.txt"
-output_file = "/Users/matteodopudi/Desktop/composite_materials.json"
-main(input_file, output_file)
\ No newline at end of file
+if __name__ == "__main__":
+    # Example usage: json encoder.py [input] [output]; without an output
+    # file the composites are published onto the bus
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "/Users/matteodopudi/Downloads/sample_test_file.txt"
+    if len(sys.argv) > 2:
+        main(input_file, sys.argv[2])
+    else:
+        publish(input_file)
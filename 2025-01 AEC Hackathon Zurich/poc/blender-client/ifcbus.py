@@ -7,19 +7,26 @@ from bpy_extras import object_utils
 from time import sleep
 from uuid import uuid4
 from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.ifcjson import IfcJsonReader
 
 from compas_eve import set_default_transport
 from compas_eve.mqtt import MqttTransport
 
-import json 
 import copy
 
 Bus = None
 timer_freq = 1
 
+# Ids of walls that changed since the last timer tick, filled by a bus watch
+Changed = set()
+
+def on_walls_changed(delta):
+    Changed.update(delta.entered)
+    Changed.update(delta.updated)
+
 p = "../message/example_message_wall_mesh.json"
-f = open(p)
-d = json.load(f)
+# Entities of the example file, decoded one at a time when iterated
+d = IfcJsonReader(p)
 
 def scaledown(verts):
     for v in verts:
@@ -35,7 +42,9 @@ def read_json_stream(jsondata):
     print(item['type'])
     if item['type'] == "IfcWall":
         reps = item["representation"]
-        reps = ast.literal_eval(reps)
+        if isinstance(reps, str):
+            # Registers written before nested CRDT mapping hold str() values
+            reps = ast.literal_eval(reps)
         for r in reps["representations"]:
             for i in r["items"]:
                 if i["type"] == "IfcTriangulatedFaceSet":
@@ -48,7 +57,7 @@ def read_json_stream(jsondata):
         return None
 
 def read_json_data(jsondata):
-    for item in jsondata['data']:
+    for item in jsondata:
         if item['type'] == "IfcWall":
             for data in item:
                 print("DATA:")
@@ -138,11 +147,12 @@ class IfcBusConnect(bpy.types.Operator,AddObjectHelper):
         print(event.type)
         if event.type == 'TIMER':
             if Bus != None:
-                cp = copy.copy(Bus._registers) 
-                for i in cp:
-                    reg = Bus._registers[i]
-                    t = reg.entity_type
-                    self.update_object(context,reg)
+                changed = list(Changed)
+                Changed.clear()
+                for i in changed:
+                    reg = Bus.get_entity(i)
+                    if reg != None:
+                        self.update_object(context,reg)
 
         return {'PASS_THROUGH'}
 
@@ -158,6 +168,7 @@ class IfcBusConnect(bpy.types.Operator,AddObjectHelper):
 
         Bus = IfcBus("mainbus")
         Bus.connect()
+        Bus.watch(Bus.query("IfcWall"), on_walls_changed)
 
         return {'RUNNING_MODAL'}
 
@@ -0,0 +1,66 @@
+"""Benchmark republishing an edited ifcJSON file through the change detector.
+
+Writes a file of meshed walls, publishes it, edits the name of one wall
+and republishes. Reports the time to read and diff the file, the time to
+apply the changes and the messages sent, against a full republish.
+
+Usage: python bench_change_detection.py [entities]
+"""
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench_ifcjson_stream import wall
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.changes import ChangeDetector, apply_changes
+from ifc_databus.core.ifcjson import ifcjson_registers, iter_ifcjson
+
+
+def write_file(path, walls):
+    with open(path, "w") as f:
+        json.dump({"type": "ifcJSON", "schemaIdentifier": "IFC4", "data": walls}, f)
+
+
+def sent_messages(bus):
+    with open(bus.log_file) as f:
+        return [line for line in f]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    random.seed(1)
+    walls = [wall() for _ in range(count)]
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull):
+        path = os.path.join(tmp, "model.json")
+        write_file(path, walls)
+        bus = IfcBus(replica_id="bench_changes")
+        bus.log_file = os.path.join(tmp, "messages.log")
+        detector = ChangeDetector()
+
+        start = time.perf_counter()
+        apply_changes(bus, detector.diff(ifcjson_registers(iter_ifcjson(path))))
+        initial = time.perf_counter() - start
+        sent = len(sent_messages(bus))
+
+        walls[count // 2]["name"] = "Edited wall"
+        write_file(path, walls)
+        start = time.perf_counter()
+        changes = detector.diff(ifcjson_registers(iter_ifcjson(path)))
+        diffed = time.perf_counter() - start
+        start = time.perf_counter()
+        apply_changes(bus, changes)
+        applied = time.perf_counter() - start
+        messages = sent_messages(bus)[sent:]
+
+    print(f"initial publish of {count} entities: {initial:.2f} s, {sent} messages")
+    print(f"after one edit: read and diff {diffed:.2f} s, apply {applied * 1000:.1f} ms, "
+          f"{changes}, {len(messages)} message(s) of {sum(len(m) for m in messages)} bytes")
+
+
+if __name__ == "__main__":
+    main()
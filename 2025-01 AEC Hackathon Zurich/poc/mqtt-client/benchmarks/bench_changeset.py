@@ -0,0 +1,63 @@
+"""Benchmark multi-entity edits published one by one and as changesets.
+
+Each edit publishes a wall with its openings and links them. It is sent
+once as separate messages and once inside ``bus.changeset()``, with a
+second replica receiving over the in-memory transport. Reports the time,
+the messages and bytes sent and how many change notifications (partial
+states) the receiver saw per edit.
+
+Usage: python bench_changeset.py [edits] [openings]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+from compas_eve import InMemoryTransport, set_default_transport
+
+from ifc_databus.core.bus import IfcBus
+
+
+def edit(bus, openings):
+    wall = bus.publish_entity("IfcWall", {"name": "Wall", "height": 3.0, "width": 0.3})
+    for i in range(openings):
+        window = bus.publish_entity("IfcWindow", {"name": f"Window {i}", "height": 1.2, "width": 0.8})
+        bus.add_relationship(wall, "HasOpenings", window)
+
+
+def run(edits, openings, grouped, tmp):
+    set_default_transport(InMemoryTransport())
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        sender = IfcBus(replica_id=f"bench_sender_{grouped}")
+        sender.log_file = os.path.join(tmp, f"sent_{grouped}.log")
+        receiver = IfcBus(replica_id=f"bench_receiver_{grouped}")
+        receiver.log_file = os.devnull
+        notifications = []
+        receiver.on_change(notifications.append)
+        start = time.perf_counter()
+        for _ in range(edits):
+            if grouped:
+                with sender.changeset():
+                    edit(sender, openings)
+            else:
+                edit(sender, openings)
+        seconds = time.perf_counter() - start
+    with open(sender.log_file) as f:
+        lines = f.readlines()
+    return seconds, len(lines), sum(len(line) for line in lines), len(notifications) / edits
+
+
+def main():
+    edits = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    openings = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        for grouped in (False, True):
+            seconds, messages, size, notifications = run(edits, openings, grouped, tmp)
+            name = "changesets" if grouped else "separate"
+            print(f"{name:>10}: {edits} edits of {openings + 1} entities in {seconds:.2f} s, "
+                  f"{messages} messages, {size / 2**20:.1f} MB, {notifications:.0f} notifications per edit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark the streaming ingest of Archicad composite dumps.
+
+Writes dumps of growing size, with materials drawn from a shared pool.
+Each dump is converted without a bus and then published onto one, each
+in a fresh process. Reports the throughput and the peak RSS: the
+conversion stays flat as the dump grows, while the bus keeps a register
+per entity.
+
+Usage: python bench_composites.py [composites]
+"""
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+MATERIALS = 500
+
+
+def write_dump(path, composites):
+    random.seed(1)
+    with open(path, "w") as f:
+        f.write(f"Number of composites: {composites}\n")
+        for c in range(composites):
+            f.write(f"Composite {c + 1}: Composite {c}\n")
+            for l in range(random.randint(1, 6)):
+                f.write(f"  Layer {l + 1}: Thickness = {random.uniform(0.01, 0.3):.3f}\n")
+                f.write(f"    Material Material {random.randrange(MATERIALS)}: Density = {random.randint(20, 2500)}\n")
+
+
+def run(mode, path):
+    """Convert or import the dump in this process and print the report as JSON."""
+    from ifc_databus.core.bus import IfcBus
+    from ifc_databus.core.composites import composite_registers, import_composites, iter_composites
+    from ifc_databus.core.ingest import peak_rss
+
+    if mode == "convert":
+        start = time.perf_counter()
+        with open(path) as f:
+            entities = sum(1 for _ in composite_registers(iter_composites(f)))
+        seconds = time.perf_counter() - start
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            bus = IfcBus(replica_id="bench_composites")
+            bus.log_file = os.devnull
+            report = import_composites(bus, path)
+        entities, seconds = report.entities, report.seconds
+    print(json.dumps({"entities": entities, "seconds": seconds, "peak_rss": peak_rss()}))
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.TemporaryDirectory() as tmp:
+        for composites in (largest // 10, largest // 2, largest):
+            path = os.path.join(tmp, f"composites_{composites}.txt")
+            write_dump(path, composites)
+            for mode in ("convert", "publish"):
+                output = subprocess.run([sys.executable, __file__, "--run", mode, path],
+                                        check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{composites:>7} composites, {mode:>7}: {result['entities']} entities in "
+                      f"{result['seconds']:6.2f} s ({result['entities'] / result['seconds']:,.0f} entities/s), "
+                      f"peak RSS {result['peak_rss'] / 2**20:.0f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--run":
+        run(sys.argv[2], sys.argv[3])
+    else:
+        main()
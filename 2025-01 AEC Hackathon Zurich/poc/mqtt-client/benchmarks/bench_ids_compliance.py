@@ -0,0 +1,97 @@
+"""Benchmark live IDS compliance against a full re-check.
+
+Builds a model of walls with inline property sets, half of them
+classified, checks it once in full and then times re-evaluating only the
+entities touched by a batch of changes.
+
+Usage: python bench_ids_compliance.py [entities] [changed]
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+from ifc_databus.core.compliance import ComplianceChecker, Ids
+
+IDS = """<ids xmlns="http://standards.buildingsmart.org/IDS" xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <specifications>
+    <specification name="Wall U-value">
+      <applicability><entity><name><simpleValue>IFCWALL</simpleValue></name></entity></applicability>
+      <requirements>
+        <attribute><name><simpleValue>Name</simpleValue></name></attribute>
+        <property>
+          <propertySet><simpleValue>Pset_WallCommon</simpleValue></propertySet>
+          <baseName><simpleValue>ThermalTransmittance</simpleValue></baseName>
+          <value><xs:restriction base="xs:double"><xs:maxInclusive value="0.25"/></xs:restriction></value>
+        </property>
+      </requirements>
+    </specification>
+    <specification name="Classified walls are external">
+      <applicability><classification><system><simpleValue>eBKB-H</simpleValue></system></classification></applicability>
+      <requirements>
+        <property>
+          <propertySet><simpleValue>Pset_WallCommon</simpleValue></propertySet>
+          <baseName><simpleValue>IsExternal</simpleValue></baseName>
+          <value><simpleValue>TRUE</simpleValue></value>
+        </property>
+      </requirements>
+    </specification>
+    <specification name="Doors have a fire rating">
+      <applicability><entity><name><simpleValue>IFCDOOR</simpleValue></name></entity></applicability>
+      <requirements>
+        <property>
+          <propertySet><simpleValue>Pset_DoorCommon</simpleValue></propertySet>
+          <baseName><simpleValue>FireRating</simpleValue></baseName>
+        </property>
+      </requirements>
+    </specification>
+  </specifications>
+</ids>"""
+
+
+def make_wall(i):
+    data = {
+        "name": f"Wall {i}",
+        "isDefinedBy": [{"type": "IfcRelDefinesByProperties", "relatingPropertyDefinition": {
+            "type": "IfcPropertySet", "name": "Pset_WallCommon", "hasProperties": [
+                {"type": "IfcPropertySingleValue", "name": "ThermalTransmittance",
+                 "nominalValue": {"type": "IfcThermalTransmittanceMeasure", "value": random.uniform(0.1, 0.3)}},
+                {"type": "IfcPropertySingleValue", "name": "IsExternal",
+                 "nominalValue": {"type": "IfcBoolean", "value": i % 3 != 0}},
+            ]}}],
+    }
+    if i % 2:
+        data["hasAssociations"] = [{"type": "IfcRelAssociatesClassification", "relatingClassification": {
+            "type": "IfcClassificationReference", "identification": "C02.01",
+            "referencedSource": {"type": "IfcClassification", "name": "eBKB-H"}}}]
+    return SimpleNamespace(entity_type="IfcWall", data=data, relationships={})
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    changed = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    random.seed(1)
+    entities = {uuid4(): make_wall(i) for i in range(count)}
+    ids = Ids.from_string(IDS)
+
+    start = time.perf_counter()
+    checker = ComplianceChecker(ids, entities.get)
+    checker.update(entities)
+    full = time.perf_counter() - start
+    print(f"{count} walls, full check:        {full * 1000:9.1f} ms")
+    for report in checker.report():
+        print(f"  {report.name:32} {report.applicable:7d} applicable {report.failed:7d} failed")
+
+    touched = random.sample(list(entities), changed)
+    for entity_id in touched:
+        prop = entities[entity_id].data["isDefinedBy"][0]["relatingPropertyDefinition"]["hasProperties"][0]
+        prop["nominalValue"]["value"] = random.uniform(0.1, 0.3)
+    start = time.perf_counter()
+    checker.update(touched)
+    incremental = time.perf_counter() - start
+    print(f"{changed} changed walls, incremental: {incremental * 1000:9.3f} ms ({full / incremental:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark the streaming ifcJSON reader against json.load.
+
+Writes an ifcJSON file of meshed walls of about the given size, then, each
+in a fresh process, reads it with ``json.load`` and with ``IfcJsonReader``,
+publishes the first entity onto a bus and decodes the rest. Reports the
+time to the first publish, the total time and the peak RSS.
+
+Usage: python bench_ifcjson_stream.py [megabytes]
+"""
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+
+def wall():
+    x, y = random.uniform(0, 1e5), random.uniform(0, 1e5)
+    coords = [[x + dx, y + dy, z] for dx in (0, 5000) for dy in (0, 200) for z in (0, 3000)]
+    return {
+        "type": "IfcWall", "globalId": str(uuid4()), "name": "Wall", "description": "Generated wall",
+        "representation": {"type": "IfcProductDefinitionShape", "representations": [{
+            "type": "IfcShapeRepresentation", "representationIdentifier": "Body", "representationType": "Tessellation",
+            "items": [{"type": "IfcTriangulatedFaceSet", "closed": True,
+                       "coordinates": {"type": "IfcCartesianPointList3D", "coordList": coords},
+                       "coordIndex": [[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                                      [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]]}],
+        }]},
+    }
+
+
+def write_model(path, megabytes):
+    random.seed(1)
+    with open(path, "w") as f:
+        f.write('{"type": "ifcJSON", "version": "0.0.1", "schemaIdentifier": "IFC4", "data": [\n')
+        first = True
+        while f.tell() < megabytes * 2**20:
+            f.write(("" if first else ",\n") + json.dumps(wall(), indent=4))
+            first = False
+        f.write("\n]}\n")
+
+
+def run(mode, path):
+    """Read the file in this process and print the measurements as JSON."""
+    from ifc_databus.core.bus import IfcBus
+    from ifc_databus.core.guid import global_id_to_uuid
+    from ifc_databus.core.ifcjson import iter_ifcjson
+    from ifc_databus.core.ingest import peak_rss
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        bus = IfcBus(replica_id=f"bench_{mode}")
+        bus.log_file = os.devnull
+    start = time.perf_counter()
+    if mode == "json.load":
+        with open(path) as f:
+            entities = iter(json.load(f)["data"])
+    else:
+        entities = iter_ifcjson(path)
+    first = next(entities)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        bus.publish_entity_with_id(global_id_to_uuid(first["globalId"]), first["type"], first)
+    first_publish = time.perf_counter() - start
+    count = 1 + sum(1 for _ in entities)
+    print(json.dumps({"first_publish": first_publish, "seconds": time.perf_counter() - start,
+                      "entities": count, "peak_rss": peak_rss()}))
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.json")
+        write_model(path, megabytes)
+        print(f"{path}: {os.path.getsize(path) / 2**20:.0f} MB")
+        for mode in ("json.load", "IfcJsonReader"):
+            output = subprocess.run([sys.executable, __file__, "--run", mode, path],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>16}  first publish {result['first_publish'] * 1000:9.1f} ms  "
+                  f"all {result['entities']} entities {result['seconds']:6.2f} s  "
+                  f"peak RSS {result['peak_rss'] / 2**20:6.0f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--run":
+        run(sys.argv[2], sys.argv[3])
+    else:
+        main()
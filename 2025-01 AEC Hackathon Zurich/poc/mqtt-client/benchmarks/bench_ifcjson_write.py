@@ -0,0 +1,59 @@
+"""Benchmark the streaming ifcJSON writer against json.dump.
+
+Writes the given number of meshed walls, each in a fresh process, once by
+building the whole document and calling ``json.dump(..., indent=4)`` and
+once with ``IfcJsonWriter`` over a generator: compact, pretty and
+compact gzipped.
+Reports the time, the file size and the peak RSS.
+
+Usage: python bench_ifcjson_write.py [entities]
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_ifcjson_stream import wall
+
+MODES = ("json.dump", "compact", "pretty", "gzip")
+
+
+def run(mode, count, path):
+    """Write the file in this process and print the measurements as JSON."""
+    from ifc_databus.core.ifcjson import IFCJSON_HEADER, IfcJsonWriter
+    from ifc_databus.core.ingest import peak_rss
+
+    random.seed(1)
+    start = time.perf_counter()
+    entities = (wall() for _ in range(count))
+    if mode == "json.dump":
+        with open(path, "w") as f:
+            json.dump(dict(IFCJSON_HEADER, data=list(entities)), f, indent=4)
+    else:
+        path += ".gz" if mode == "gzip" else ""
+        with IfcJsonWriter(path, indent=4 if mode == "pretty" else None) as writer:
+            writer.write_all(entities)
+    print(json.dumps({"seconds": time.perf_counter() - start, "bytes": os.path.getsize(path),
+                      "peak_rss": peak_rss()}))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            path = os.path.join(tmp, f"{mode}.json")
+            output = subprocess.run([sys.executable, __file__, "--run", mode, str(count), path],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>10}  {count} entities {result['seconds']:6.2f} s  "
+                  f"{result['bytes'] / 2**20:7.1f} MB  peak RSS {result['peak_rss'] / 2**20:6.0f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "--run":
+        run(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    else:
+        main()
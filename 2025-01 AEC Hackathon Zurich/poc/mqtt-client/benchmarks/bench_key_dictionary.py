@@ -0,0 +1,62 @@
+"""Benchmark payload sizes with and without key dictionary encoding.
+
+The entities of the ``message/`` examples are repeated (with fresh
+globalIds) up to the requested count. For each representation the JSON
+``data`` copy of the wire message and the automerge snapshot are measured.
+
+Usage: python bench_key_dictionary.py [entities]
+"""
+import json
+import sys
+from itertools import cycle, islice
+from pathlib import Path
+
+from ifc_databus.core.crdt_automerge import IfcRegister
+from ifc_databus.core.keydict import DEFAULT_KEY_DICTIONARY
+
+MESSAGE_DIR = Path(__file__).parent.parent.parent / "message"
+
+
+def example_entities():
+    entities = []
+    for path in sorted(MESSAGE_DIR.glob("example_message*.json")):
+        with open(path) as f:
+            entities.extend(json.load(f)["data"])
+    return entities
+
+
+def scaled(count: int):
+    for i, entity in enumerate(islice(cycle(example_entities()), count)):
+        entity = dict(entity)
+        entity["globalId"] = f"{entity.get('globalId', 'entity')}_{i}"
+        yield entity
+
+
+def measure(entities, dictionary):
+    json_bytes = 0
+    snapshot_bytes = 0
+    for entity in entities:
+        data = {k: v for k, v in entity.items() if k != "type"}
+        wire = dictionary.encode(data) if dictionary else data
+        json_bytes += len(json.dumps(wire, separators=(",", ":")))
+        register = IfcRegister.create(entity["type"], "bench", data, key_dictionary=dictionary)
+        snapshot_bytes += len(register.to_binary())
+    return json_bytes, snapshot_bytes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    entities = list(scaled(count))
+    print(f"{count} entities from message/ examples")
+    print(f"{'':>18} {'JSON data':>12} {'snapshots':>12}")
+    results = {}
+    for name, dictionary in (("plain keys", None), (f"dictionary v{DEFAULT_KEY_DICTIONARY.version}", DEFAULT_KEY_DICTIONARY)):
+        results[name] = measure(entities, dictionary)
+        json_bytes, snapshot_bytes = results[name]
+        print(f"{name:>18} {json_bytes:12d} {snapshot_bytes:12d}")
+    (plain_json, plain_snap), (enc_json, enc_snap) = results.values()
+    print(f"{'saving':>18} {1 - enc_json / plain_json:11.1%} {1 - enc_snap / plain_snap:11.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark the size of a single material-layer edit.
+
+Compares the legacy flat representation, where nested ifcJSON values were
+stored as ``str()`` scalars, with the nested automerge Map/List mapping.
+The change size is what an incremental sync has to transmit; the document
+size is what a full snapshot publish transmits.
+
+Usage: python bench_nested_crdt.py [edits]
+"""
+import copy
+import json
+import sys
+from pathlib import Path
+
+from ifc_databus.core.crdt_automerge import IfcRegister
+
+MESSAGE_DIR = Path(__file__).parent.parent.parent / "message"
+
+
+def load_layer_set():
+    with open(MESSAGE_DIR / "example_message.json") as f:
+        entity = json.load(f)["data"][0]
+    data = dict(entity)
+    del data["type"]
+    return data
+
+
+def flatten(data):
+    """The legacy representation: nested values stringified."""
+    return {k: str(v) if isinstance(v, (dict, list)) else v for k, v in data.items()}
+
+
+def measure(data, edits: int, legacy: bool):
+    register = IfcRegister.create("IfcMaterialLayerSet", "bench", flatten(data) if legacy else data)
+    layers = copy.deepcopy(data["materialLayers"])
+    change_sizes = []
+    for i in range(edits):
+        heads = register.doc.get_heads()
+        layers[i % len(layers)]["layerThickness"] += 1.0
+        value = str(layers) if legacy else layers
+        register.update({"materialLayers": value})
+        change_sizes.append(sum(len(c.bytes) for c in register.doc.get_changes(heads)))
+    return sum(change_sizes) / len(change_sizes), len(register.to_binary())
+
+
+def main():
+    edits = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    data = load_layer_set()
+    print(f"{edits} single-layer thickness edits on IfcMaterialLayerSet")
+    for name, legacy in (("flat str()", True), ("nested CRDT", False)):
+        change, doc = measure(data, edits, legacy)
+        print(f"{name:>12}: {change:8.1f} bytes per edit, document after edits {doc:8d} bytes")
+
+
+if __name__ == "__main__":
+    main()
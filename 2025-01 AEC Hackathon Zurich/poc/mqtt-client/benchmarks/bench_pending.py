@@ -0,0 +1,58 @@
+"""Benchmark publishing entities and relationships in random order.
+
+Publishes walls, windows and one HasOpenings relationship per pair, once
+in dependency order and once shuffled, so that most relationships arrive
+before their source or target and wait in ``bus.pending``. Reports the
+time, the largest pending depth and whether every relationship landed.
+
+Usage: python bench_pending.py [pairs]
+"""
+import contextlib
+import os
+import random
+import sys
+import time
+from uuid import uuid4
+
+from ifc_databus.core.bus import IfcBus
+
+
+def operations(pairs):
+    ops = []
+    for _ in range(pairs):
+        wall, window = uuid4(), uuid4()
+        ops.append(("entity", wall, "IfcWall", {"name": "Wall"}))
+        ops.append(("entity", window, "IfcWindow", {"name": "Window", "height": 1.2, "width": 0.8}))
+        ops.append(("relationship", wall, "HasOpenings", window))
+    return ops
+
+
+def run(ops):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        bus = IfcBus(replica_id="bench_pending")
+        bus.log_file = os.devnull
+        depth = 0
+        start = time.perf_counter()
+        for kind, *args in ops:
+            if kind == "entity":
+                bus.publish_entity_with_id(*args)
+            else:
+                bus.add_relationship(*args)
+            depth = max(depth, len(bus.pending))
+        seconds = time.perf_counter() - start
+    return seconds, depth, len(bus.graph), bus.pending.report()
+
+
+def main():
+    pairs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    random.seed(1)
+    ops = operations(pairs)
+    shuffled = random.sample(ops, len(ops))
+    for name, order in (("in order", ops), ("shuffled", shuffled)):
+        seconds, depth, edges, report = run(order)
+        print(f"{name:>9}: {len(order)} operations in {seconds:.2f} s, peak pending depth {depth}, "
+              f"{edges}/{pairs} relationships, {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark property-update latency during a large geometry import.
+
+The link is simulated in virtual time: sending a message occupies the link
+for ``size / bandwidth`` seconds. Geometry messages of 5 MB and property
+updates of 200 bytes are offered at a fixed rate, once through a single
+FIFO queue and once through the priority lanes.
+
+Usage: python bench_priority_lanes.py [meshes] [updates]
+"""
+import sys
+from collections import deque
+
+from ifc_databus.core.lanes import LaneScheduler, Priority
+
+BANDWIDTH = 10 * 1024 * 1024  # bytes per second
+MESH_SIZE = 5 * 1024 * 1024
+UPDATE_SIZE = 200
+
+
+def offered_load(meshes: int, updates: int):
+    """Arrival times of the import and of the property updates."""
+    events = [(0.0, Priority.BULK, MESH_SIZE) for _ in range(meshes)]
+    duration = meshes * MESH_SIZE / BANDWIDTH
+    events += [(duration * i / updates, Priority.SEMANTIC, UPDATE_SIZE) for i in range(updates)]
+    return sorted(events, key=lambda e: e[0])
+
+
+def simulate(events, use_lanes: bool):
+    """Return the latencies of the semantic messages."""
+    clock = 0.0
+    latencies = []
+    sent = []
+
+    def send(topic_name, msg):
+        sent.append(msg)
+
+    scheduler = LaneScheduler(send)
+    fifo = deque()
+    pending = deque(events)
+
+    while pending or fifo or scheduler.pending():
+        # Admit everything that arrived while the link was busy
+        while pending and pending[0][0] <= clock:
+            arrival, priority, size = pending.popleft()
+            msg = {"arrival": arrival, "priority": priority, "size": size}
+            if use_lanes:
+                scheduler.enqueue(priority, "ifc/bench", msg, size)
+            else:
+                fifo.append(msg)
+        if not fifo and not scheduler.pending():
+            clock = pending[0][0]
+            continue
+
+        # Put one message on the wire
+        if use_lanes:
+            scheduler.drain(max_messages=1)
+            msg = sent.pop()
+        else:
+            msg = fifo.popleft()
+        clock += msg["size"] / BANDWIDTH
+        if msg["priority"] == Priority.SEMANTIC:
+            latencies.append(clock - msg["arrival"])
+
+    return latencies
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    meshes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    events = offered_load(meshes, updates)
+
+    print(f"{meshes} x 5 MB meshes, {updates} x 200 B property updates, link {BANDWIDTH // 2**20} MB/s")
+    for name, use_lanes in (("single queue", False), ("priority lanes", True)):
+        latencies = simulate(events, use_lanes)
+        print(
+            f"{name:>15}: p50 {percentile(latencies, 50) * 1000:10.2f} ms"
+            f"  p99 {percentile(latencies, 99) * 1000:10.2f} ms"
+            f"  max {max(latencies) * 1000:10.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark incremental quantity take-off against re-aggregating everything.
+
+Builds walls with inline material layers, fills the views once, then
+times a stream of single-wall edits applied as deltas, and snapshot reads
+taken between the edits.
+
+Usage: python bench_qto.py [walls] [edits]
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+from ifc_databus.core.qto import QuantityTakeOff, TakeOff, volume_by_material
+
+MATERIALS = ["Brick", "Concrete", "Mineral wool", "Gypsum", "Timber", "Render", "EPS", "Air"]
+TYPES = ["Exterior", "Interior", "Partition", "Shaft"]
+
+
+def wall():
+    layers = [{"type": "IfcMaterialLayer", "material": {"type": "IfcMaterial", "name": random.choice(MATERIALS)},
+               "layerThickness": random.uniform(10, 200), "isVentilated": False, "name": "Layer"}
+              for _ in range(random.randint(1, 5))]
+    return SimpleNamespace(entity_type="IfcWall", relationships={}, data={
+        "name": "Wall", "objectType": random.choice(TYPES), "length": random.uniform(500, 8000),
+        "height": random.uniform(2500, 4000), "materialLayers": layers,
+    })
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    random.seed(1)
+    walls = {uuid4(): wall() for _ in range(count)}
+
+    start = time.perf_counter()
+    qto = QuantityTakeOff(walls.get)
+    qto.update(walls)
+    print(f"{count} walls taken off in {time.perf_counter() - start:.2f} s")
+
+    def full_pass():
+        totals = {}
+        for entity in walls.values():
+            for key, amount in volume_by_material(TakeOff.of(entity.entity_type, entity.data)):
+                totals[key] = totals.get(key, 0.0) + amount
+        return totals
+
+    start = time.perf_counter()
+    full_pass()
+    full = time.perf_counter() - start
+    print(f"{'full pass':>28} {full * 1000:9.1f} ms")
+
+    ids = list(walls)
+    volumes = qto["volume_by_material"]
+    reads = 0
+    start = time.perf_counter()
+    for i in range(edits):
+        entity_id = random.choice(ids)
+        walls[entity_id].data = {**walls[entity_id].data, "length": random.uniform(500, 8000)}
+        qto.update([entity_id])
+        snapshot = volumes.snapshot()
+        reads += len(snapshot)
+    incremental = (time.perf_counter() - start) / edits
+    print(f"{'delta per edit':>28} {incremental * 1e6:9.1f} us (with a snapshot read after each)")
+    print(f"{full / incremental:,.0f}x faster than a full pass per edit")
+
+    start = time.perf_counter()
+    for _ in range(100_000):
+        volumes.snapshot()
+    print(f"{'snapshot read':>28} {(time.perf_counter() - start) / 100_000 * 1e9:9.0f} ns")
+
+    drift = max(abs(volumes[k] - v) / v for k, v in full_pass().items())
+    print(f"max relative drift after {edits} deltas: {drift:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark indexed queries against a scan over every entity.
+
+Entities are plain dictionaries here, so the scan is a lower bound for
+looping over ``bus._registers``, where every ``data`` access also decodes
+an automerge document.
+
+Usage: python bench_query.py [entities]
+"""
+import random
+import sys
+import time
+from uuid import uuid4
+
+from ifc_databus.core.query import Condition, QueryIndex
+
+TYPES = ["IfcWall", "IfcWindow", "IfcDoor", "IfcSlab"]
+
+
+def timed(label, fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:>34} {elapsed * 1000:9.3f} ms {len(result):7d} results")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    random.seed(1)
+    entities = {
+        uuid4(): (random.choice(TYPES), {
+            "name": f"Element {i}",
+            "thermal_resistance": random.uniform(0, 5),
+            "height": random.uniform(1, 4),
+            "material": random.choice(["Brick", "Concrete", "Timber", "Glass"]),
+        })
+        for i in range(count)
+    }
+
+    start = time.perf_counter()
+    index = QueryIndex()
+    rows = [(entity_id, entity_type, data) for entity_id, (entity_type, data) in entities.items()]
+    index.create_index("thermal_resistance", "sorted", rows)
+    index.create_index("height", "sorted", rows)
+    index.create_index("material", "hash", rows)
+    print(f"{count} entities indexed in {time.perf_counter() - start:.2f} s")
+
+    conditions = [Condition("thermal_resistance", "<", 0.5), Condition("height", "between", (2, 3))]
+    print(index.plan("IfcWall", conditions))
+
+    def scan():
+        return [entity_id for entity_id, (entity_type, data) in entities.items()
+                if entity_type == "IfcWall" and all(c.matches(data[c.field]) for c in conditions)]
+
+    scanned = timed("scan", scan)
+    indexed = timed("indexed", lambda: index.execute("IfcWall", conditions, None))
+    print(f"{scanned / indexed:,.0f}x faster")
+
+    entity_id = next(iter(entities))
+    start = time.perf_counter()
+    for i in range(10_000):
+        index.update(entity_id, "IfcWall", {"thermal_resistance": random.uniform(0, 5), "height": 2.5,
+                                            "material": "Brick"})
+    print(f"incremental update: {(time.perf_counter() - start) / 10_000 * 1e6:.1f} us per entity")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark property-set lookups through ifcJSON refs.
+
+Publishes slabs, property sets and one IfcRelDefinesByProperties register
+per slab linking it to a set by ``{"ref": ...}``. Looks up the sets of
+every slab once by scanning the registers, as consumers did, and once
+with a ``RefResolver``. Then expands every relationship with a cold and
+a warm ``RefView``.
+
+Usage: python bench_refs.py [slabs] [psets]
+"""
+import contextlib
+import os
+import sys
+import time
+from uuid import uuid4
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.refs import RefResolver
+
+
+def scan_property_sets(bus, slab):
+    psets = []
+    for rel_id in bus.entity_ids():
+        rel = bus.get_entity(rel_id)
+        if rel.entity_type != "IfcRelDefinesByProperties":
+            continue
+        if any(obj["ref"] == str(slab) for obj in rel.data["relatedObjects"]):
+            target = rel.data["relatingPropertyDefinition"]["ref"]
+            psets.extend(bus.get_entity(pset_id).data for pset_id in bus.entity_ids() if str(pset_id) == target)
+    return psets
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pset_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        bus = IfcBus(replica_id="bench_refs")
+        bus.log_file = os.devnull
+        start = time.perf_counter()
+        resolver = RefResolver(bus)
+        psets = [bus.publish_entity("IfcPropertySet", {
+            "type": "IfcPropertySet", "name": f"Pset_{i}",
+            "hasProperties": [{"type": "IfcPropertySingleValue", "name": "IsExternal", "nominalValue": i % 2 == 0}],
+        }) for i in range(pset_count)]
+        slabs, rels = [], []
+        for i in range(count):
+            slab = bus.publish_entity("IfcSlab", {"name": f"Slab {i}"})
+            rel = uuid4()
+            bus.publish_entity_with_id(rel, "IfcRelDefinesByProperties", {
+                "relatedObjects": [{"type": "IfcSlab", "ref": str(slab)}],
+                "relatingPropertyDefinition": {"type": "IfcPropertySet", "ref": str(psets[i % pset_count])},
+            })
+            slabs.append(slab)
+            rels.append(rel)
+        publish = time.perf_counter() - start
+
+    sample = slabs[:max(1, count // 20)]
+    start = time.perf_counter()
+    scanned = [scan_property_sets(bus, slab) for slab in sample]
+    scan = (time.perf_counter() - start) / len(sample)
+    start = time.perf_counter()
+    resolved = [resolver.property_sets(slab) for slab in slabs]
+    lookup = (time.perf_counter() - start) / count
+    assert [p["name"] for p in scanned[-1]] == [p["name"] for p in resolved[len(sample) - 1]]
+    print(f"{count} slabs, {pset_count} property sets, {len(bus.entity_ids())} registers "
+          f"published in {publish:.2f} s with the resolver attached")
+    print(f"      scan: {scan * 1e3:.3f} ms per slab")
+    print(f"  resolver: {lookup * 1e3:.3f} ms per slab ({scan / lookup:.0f}x)")
+
+    view = resolver.view(depth=2)
+    for name in ("cold", "warm"):
+        start = time.perf_counter()
+        for rel in rels:
+            view.get(rel)
+        print(f"{name:>10}: expanded {count} relationships in {(time.perf_counter() - start) * 1e3:.1f} ms, "
+              f"{len(view)} cached expansions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark reverse relationship lookups on a large model.
+
+Walls host windows through ``HasOpenings`` and connect to their
+neighbours. Reverse lookups ("which wall hosts this window?") are timed
+on the index and, for comparison, by scanning the relationship maps of
+every source, which is what answering the question over the register
+store requires.
+
+Usage: python bench_relationship_index.py [edges]
+"""
+import random
+import sys
+import time
+from uuid import uuid4
+
+from ifc_databus.core.graph import RelationshipIndex
+
+
+def main():
+    edges = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    walls = [uuid4() for _ in range(edges // 5)]
+    relationships = {wall: {"HasOpenings": {}, "connects": {}} for wall in walls}
+    windows = []
+    for i, wall in enumerate(walls):
+        for _ in range(4):
+            window = uuid4()
+            windows.append(window)
+            relationships[wall]["HasOpenings"][str(window)] = {}
+        relationships[wall]["connects"][str(walls[i - 1])] = {}
+
+    start = time.perf_counter()
+    graph = RelationshipIndex()
+    for wall, rels in relationships.items():
+        graph.set_relationships(wall, rels)
+    build = time.perf_counter() - start
+    print(f"{len(graph)} edges indexed in {build:.2f} s")
+
+    sample = random.sample(windows, 10_000)
+    start = time.perf_counter()
+    for window in sample:
+        graph.incoming(window, "HasOpenings")
+    per_lookup = (time.perf_counter() - start) / len(sample)
+    print(f"index reverse lookup: {per_lookup * 1e6:10.2f} us")
+
+    start = time.perf_counter()
+    for window in sample[:5]:
+        key = str(window)
+        [wall for wall, rels in relationships.items() if key in rels.get("HasOpenings", {})]
+    per_scan = (time.perf_counter() - start) / 5
+    print(f"scan reverse lookup:  {per_scan * 1e6:10.2f} us ({per_scan / per_lookup:,.0f}x slower)")
+
+    start = time.perf_counter()
+    reached = graph.closure(walls[0], "connects", max_depth=1000)
+    print(f"closure over 'connects' to depth 1000: {len(reached)} walls in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark spatial lookups against a scan over every bounding box.
+
+Builds a grid of storeys with random element boxes, then asks for the
+elements of one storey, a small box and a view frustum.
+
+Usage: python bench_spatial.py [entities]
+"""
+import random
+import sys
+import time
+
+from ifc_databus.core.query import Condition
+from ifc_databus.core.spatial import SpatialIndex, box_in_frustum, box_intersects
+
+STOREY_HEIGHT = 3.2
+
+
+def timed(label, fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:>34} {elapsed * 1000:9.3f} ms {len(result):7d} results")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    random.seed(1)
+    boxes = {}
+    for i in range(count):
+        x, y = random.uniform(0, 200), random.uniform(0, 200)
+        z = random.randrange(40) * STOREY_HEIGHT
+        boxes[i] = ((x, y, z), (x + random.uniform(0.1, 6), y + random.uniform(0.1, 6), z + 3.0))
+
+    start = time.perf_counter()
+    index = SpatialIndex("bbox")
+    index.load(boxes.items())
+    print(f"{count} boxes packed in {time.perf_counter() - start:.2f} s")
+
+    queries = {
+        "storey 12": Condition("bbox", "intersects", ((-1e9, -1e9, 12 * STOREY_HEIGHT + 0.1),
+                                                      (1e9, 1e9, 13 * STOREY_HEIGHT - 0.1))),
+        "10 m box": Condition("bbox", "intersects", ((50, 50, 30), (60, 60, 40))),
+        "frustum": Condition("bbox", "in_frustum", [(1, 0, 0, -20), (-1, 0, 0, 60), (0, 1, 0, -20),
+                                                    (0, -1, 0, 60), (0, 0, 1, -10), (0, 0, -1, 20)]),
+    }
+    for label, condition in queries.items():
+        if condition.op == "intersects":
+            test, search = box_intersects, index.intersecting
+        else:
+            test, search = box_in_frustum, index.in_frustum
+        scanned = timed(f"scan {label}", lambda: [i for i, b in boxes.items() if test(b, condition.value)], 3)
+        indexed = timed(f"indexed {label}", lambda: search(condition.value))
+        print(f"{scanned / indexed:,.0f}x faster")
+
+    start = time.perf_counter()
+    for i in range(10_000):
+        x = random.uniform(0, 200)
+        index.add(i, ((x, x, 0.0), (x + 1, x + 1, 3.0)))
+    print(f"incremental update: {(time.perf_counter() - start) / 10_000 * 1e6:.1f} us per entity")
+
+
+if __name__ == "__main__":
+    main()
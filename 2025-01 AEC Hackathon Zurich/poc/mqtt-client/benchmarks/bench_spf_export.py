@@ -0,0 +1,53 @@
+"""Benchmark incremental IFC-SPF export of the bus state.
+
+Imports a synthetic model with the given number of walls, exports it
+once, then edits a few walls and times the re-export, which copies the
+runs of unchanged registers from the previous file.
+
+Usage: python bench_spf_export.py [walls] [edits]
+"""
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench_spf_import import write_model
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.spf_export import SpfExporter
+from ifc_databus.core.spf_import import import_spf
+
+
+def main():
+    walls = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.ifc")
+        write_model(source, walls)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            bus = IfcBus(replica_id="bench_export")
+            bus.log_file = os.devnull
+            start = time.perf_counter()
+            imported = import_spf(bus, source)
+        print(f"imported {imported.entities} entities in {time.perf_counter() - start:.1f} s")
+
+        path = os.path.join(tmp, "export.ifc")
+        exporter = SpfExporter(bus)
+        report = exporter.export(path)
+        print(f"{'full export':>28} {report.seconds * 1000:9.1f} ms  {report}")
+
+        report = exporter.export(path)
+        print(f"{'unchanged re-export':>28} {report.seconds * 1000:9.1f} ms  {report}")
+
+        ids = [id for id in bus.entity_ids() if bus.get_entity(id).entity_type == "IfcWall"]
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for id in random.sample(ids, edits):
+                bus.update_entity(id, {"name": f"Edited {random.random():.6f}"})
+        report = exporter.export(path)
+        print(f"{f're-export after {edits} edits':>28} {report.seconds * 1000:9.1f} ms  {report}")
+
+
+if __name__ == "__main__":
+    main()
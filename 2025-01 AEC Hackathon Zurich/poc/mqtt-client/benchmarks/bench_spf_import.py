@@ -0,0 +1,100 @@
+"""Benchmark importing an IFC-SPF file onto the bus.
+
+Imports the given .ifc file, or writes a synthetic one with the given
+number of extruded walls (each with a placement, a property set and a
+material layer set association), and reports entities per second and the
+peak RSS. Conversion alone is timed separately from the full publish.
+
+Usage: python bench_spf_import.py [model.ifc | walls] [batch size]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import ifcopenshell.guid
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.ingest import peak_rss
+from ifc_databus.core.spf_import import import_spf, read_spf
+
+HEADER = """ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION(('ViewDefinition [DesignTransferView]'),'2;1');
+FILE_NAME('bench.ifc','2025-01-01T00:00:00',(''),(''),'','','');
+FILE_SCHEMA(('IFC4'));
+ENDSEC;
+DATA;
+#1=IFCPROJECT('{project}',$,'Bench',$,$,$,$,(#4),#3);
+#2=IFCSIUNIT(*,.LENGTHUNIT.,.MILLI.,.METRE.);
+#3=IFCUNITASSIGNMENT((#2));
+#4=IFCGEOMETRICREPRESENTATIONCONTEXT($,'Model',3,1.E-05,#6,$);
+#5=IFCCARTESIANPOINT((0.,0.,0.));
+#6=IFCAXIS2PLACEMENT3D(#5,$,$);
+#7=IFCLOCALPLACEMENT($,#6);
+#8=IFCBUILDINGSTOREY('{storey}',$,'Storey',$,$,#7,$,$,.ELEMENT.,0.);
+#9=IFCRELAGGREGATES('{aggregates}',$,$,$,#1,(#8));
+#10=IFCMATERIAL('Brick',$,$);
+#11=IFCMATERIALLAYER(#10,120.,.F.,'Brick',$,$,$);
+#12=IFCMATERIALLAYERSET((#11),'Exterior',$);
+#13=IFCDIRECTION((0.,0.,1.));
+"""
+
+WALL = """#{a}=IFCCARTESIANPOINT(({x}.,0.,0.));
+#{b}=IFCAXIS2PLACEMENT3D(#{a},$,$);
+#{c}=IFCLOCALPLACEMENT(#7,#{b});
+#{d}=IFCRECTANGLEPROFILEDEF(.AREA.,$,$,5000.,200.);
+#{e}=IFCEXTRUDEDAREASOLID(#{d},#6,#13,3000.);
+#{f}=IFCSHAPEREPRESENTATION(#4,'Body','SweptSolid',(#{e}));
+#{g}=IFCPRODUCTDEFINITIONSHAPE($,$,(#{f}));
+#{h}=IFCWALL('{wall}',$,'Wall {i}',$,$,#{c},#{g},$,.STANDARD.);
+#{j}=IFCPROPERTYSINGLEVALUE('IsExternal',$,IFCBOOLEAN(.T.),$);
+#{k}=IFCPROPERTYSET('{pset}',$,'Pset_WallCommon',$,(#{j}));
+#{l}=IFCRELDEFINESBYPROPERTIES('{rel}',$,$,$,(#{h}),#{k});
+"""
+
+
+def write_model(path, walls):
+    new = ifcopenshell.guid.new
+    with open(path, "w") as f:
+        f.write(HEADER.format(project=new(), storey=new(), aggregates=new()))
+        ids = []
+        for i in range(walls):
+            n = 100 + i * 11
+            keys = dict(zip("abcdefghjkl", range(n, n + 11)))
+            ids.append(keys["h"])
+            f.write(WALL.format(x=i * 5000, wall=new(), pset=new(), rel=new(), i=i, **keys))
+        f.write(f"#50=IFCRELCONTAINEDINSPATIALSTRUCTURE('{new()}',$,$,$,({','.join(f'#{i}' for i in ids)}),#8);\n")
+        f.write(f"#51=IFCRELASSOCIATESMATERIAL('{new()}',$,$,$,({','.join(f'#{i}' for i in ids)}),#12);\n")
+        f.write("ENDSEC;\nEND-ISO-10303-21;\n")
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "5000"
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        if source.isdigit():
+            path = os.path.join(tmp, "bench.ifc")
+            write_model(path, int(source))
+        else:
+            path = source
+        print(f"{path}: {os.path.getsize(path) / 2**20:.1f} MB")
+
+        start = time.perf_counter()
+        count = sum(1 for _ in read_spf(path))
+        read = time.perf_counter() - start
+        print(f"{'convert only':>28} {read:9.2f} s  {count / read:12,.0f} entities/s  "
+              f"peak RSS {peak_rss() / 2**20:.0f} MB")
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            bus = IfcBus(replica_id="bench_spf")
+            bus.log_file = os.devnull
+            report = import_spf(bus, path, batch_size=batch_size)
+        print(f"{'convert and publish':>28} {report.seconds:9.2f} s  {report.rate:12,.0f} entities/s  "
+              f"peak RSS {report.peak_rss / 2**20:.0f} MB")
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark tessellating an imported model on 1..N worker processes.
+
+Times ``read_spf`` with product geometry tessellated on each process
+count, against ifcopenshell's geometry iterator in this process alone,
+and reports the speedup per process count.
+
+Usage: python bench_tessellation.py [model.ifc | walls] [max processes]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import ifcopenshell
+import ifcopenshell.geom
+
+from bench_spf_import import write_model
+from ifc_databus.core.spf_import import read_spf
+from ifc_databus.core.tessellation import geometry_settings
+
+
+def iterate_in_process(path):
+    model = ifcopenshell.open(path)
+    iterator = ifcopenshell.geom.iterator(geometry_settings(), model, 1)
+    count = 0
+    if iterator.initialize():
+        while True:
+            iterator.get()
+            count += 1
+            if not iterator.next():
+                break
+    return count
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "2000"
+    most = int(sys.argv[2]) if len(sys.argv) > 2 else multiprocessing.cpu_count()
+    with tempfile.TemporaryDirectory() as tmp:
+        if source.isdigit():
+            path = os.path.join(tmp, "bench.ifc")
+            write_model(path, int(source))
+        else:
+            path = source
+        print(f"{path}: {os.path.getsize(path) / 2**20:.1f} MB, {multiprocessing.cpu_count()} cores")
+
+        start = time.perf_counter()
+        shapes = iterate_in_process(path)
+        baseline = time.perf_counter() - start
+        print(f"{'iterator in process':>28} {baseline:9.2f} s  {shapes / baseline:10,.0f} shapes/s")
+
+        for processes in range(1, most + 1):
+            start = time.perf_counter()
+            count = sum(1 for _ in read_spf(path, processes=processes))
+            seconds = time.perf_counter() - start
+            print(f"{f'import, {processes} processes':>28} {seconds:9.2f} s  {count / seconds:10,.0f} entities/s  "
+                  f"{baseline / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark U-value computation for many layered walls.
+
+Times reading the layers of every wall, the vectorized pass over all of
+them, a conductivity change that touches a share of the walls, and a
+per-wall Python loop for comparison.
+
+Usage: python bench_u_values.py [walls]
+"""
+import random
+import sys
+import time
+from uuid import uuid4
+
+from ifc_databus.core.thermal import R_SE, R_SI, UValueEngine
+
+CONDUCTIVITIES = {"Brick": 0.6, "Concrete": 2.1, "Mineral wool": 0.035, "Gypsum": 0.25, "Timber": 0.13,
+                  "Render": 0.87, "EPS": 0.032, "Clay": 0.5}
+
+
+def wall():
+    return [{"type": "IfcMaterialLayer", "material": {"type": "IfcMaterial", "name": random.choice(list(CONDUCTIVITIES))},
+             "layerThickness": random.uniform(10, 200), "isVentilated": False, "name": "Layer"}
+            for _ in range(random.randint(1, 6))]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    random.seed(1)
+    walls = {uuid4(): wall() for _ in range(count)}
+    engine = UValueEngine()
+    for name, value in CONDUCTIVITIES.items():
+        engine.set_conductivity(name, value)
+
+    start = time.perf_counter()
+    engine.set_layers_many(walls.items())
+    read = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.compute()
+    computed = time.perf_counter() - start
+    print(f"{'read layers':>28} {read * 1000:9.1f} ms  {count / read:12,.0f} walls/s")
+    print(f"{'vectorized pass':>28} {computed * 1000:9.1f} ms  {count / computed:12,.0f} walls/s")
+    print(f"{'total':>28} {(read + computed) * 1000:9.1f} ms  {count / (read + computed):12,.0f} walls/s")
+
+    start = time.perf_counter()
+    engine.set_conductivity("EPS", 0.031)
+    changed = engine.compute()
+    print(f"{'EPS conductivity change':>28} {(time.perf_counter() - start) * 1000:9.1f} ms  "
+          f"{len(changed)} walls recomputed")
+
+    start = time.perf_counter()
+    loop = {}
+    for entity_id, layers in walls.items():
+        resistance = R_SI + R_SE
+        for layer in layers:
+            resistance += layer["layerThickness"] * 0.001 / CONDUCTIVITIES[layer["material"]["name"]]
+        loop[entity_id] = 1 / resistance
+    looped = time.perf_counter() - start
+    print(f"{'plain loop, no tracking':>28} {looped * 1000:9.1f} ms  {count / looped:12,.0f} walls/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Benchmark the compiled batch validator against validate_entity.
+
+The entities of the ``message/`` examples are repeated up to the requested
+count. ``validate_entity`` only checks the top level, so the compiled
+validator is timed both on the same work and with nested and strict
+validation.
+
+Usage: python bench_validation.py [entities]
+"""
+import json
+import sys
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+from ifc_databus.core.validation import IFC_RULES, validate_entity
+from ifc_databus.core.validator import CompiledValidator
+
+MESSAGE_DIR = Path(__file__).parent.parent.parent / "message"
+
+
+def example_entities():
+    entities = []
+    for path in sorted(MESSAGE_DIR.glob("example_message*.json")):
+        with open(path) as f:
+            entities.extend(e for e in json.load(f)["data"] if e.get("type") in IFC_RULES)
+    entities.append({"type": "IfcWindow", "name": "Window", "height": 1.2, "width": 0.8})
+    return entities
+
+
+def timed(name, count, fn):
+    start = time.perf_counter()
+    errors = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:>28} {elapsed * 1000:9.1f} ms {count / elapsed:12,.0f} entities/s {errors:7d} errors")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    entities = list(islice(cycle(example_entities()), count))
+    pairs = [(entity["type"], entity) for entity in entities]
+    print(f"{count} entities from message/ examples")
+
+    timed("validate_entity (top level)", count, lambda: sum(validate_entity(t, d) is not None for t, d in pairs))
+    timed("validate_many (top level)", count, lambda: len(CompiledValidator(nested=False).validate_many(pairs)))
+    timed("validate_many (nested)", count, lambda: len(CompiledValidator().validate_many(pairs)))
+    timed("validate_many (strict)", count, lambda: len(CompiledValidator(strict=True).validate_many(pairs)))
+
+
+if __name__ == "__main__":
+    main()
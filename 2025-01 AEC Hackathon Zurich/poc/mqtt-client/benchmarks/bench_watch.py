@@ -0,0 +1,68 @@
+"""Benchmark many concurrent live queries under an edit stream.
+
+Registers watches spread over a few entity types and storeys, then
+applies random width edits and reports the cost per change and the
+deltas pushed, compared with re-running every query after each change.
+
+Usage: python bench_watch.py [entities] [watches] [changes]
+"""
+import random
+import sys
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+from ifc_databus.core.query import Query, QueryIndex
+from ifc_databus.core.watch import WatchRegistry
+
+TYPES = ["IfcWindow", "IfcDoor", "IfcWall", "IfcSlab"]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    watch_count = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    changes = int(sys.argv[3]) if len(sys.argv) > 3 else 10_000
+    random.seed(1)
+
+    entities = {
+        uuid4(): SimpleNamespace(entity_type=random.choice(TYPES), data={
+            "storey": str(random.randrange(20)), "width": random.uniform(0.4, 2.0)})
+        for _ in range(count)
+    }
+    index = QueryIndex()
+    rows = [(entity_id, e.entity_type, e.data) for entity_id, e in entities.items()]
+    index.create_index("storey", "hash", rows)
+    index.create_index("width", "sorted", rows)
+    registry = WatchRegistry(index, entities.get)
+
+    deltas = [0]
+    queries = []
+    start = time.perf_counter()
+    for i in range(watch_count):
+        query = Query(index, entities.get, random.choice(TYPES)) \
+            .where("storey", "==", str(i % 20)).where("width", ">", random.uniform(0.5, 1.5))
+        queries.append(query)
+        registry.add(query, lambda delta: deltas.__setitem__(0, deltas[0] + 1))
+    print(f"{watch_count} watches over {count} entities registered in {time.perf_counter() - start:.2f} s")
+
+    deltas[0] = 0
+    ids = list(entities)
+    start = time.perf_counter()
+    for _ in range(changes):
+        entity_id = random.choice(ids)
+        entity = entities[entity_id]
+        entity.data["width"] = random.uniform(0.4, 2.0)
+        index.update(entity_id, entity.entity_type, entity.data)
+        registry.update([entity_id])
+    per_change = (time.perf_counter() - start) / changes
+    print(f"{changes} changes: {per_change * 1e6:.1f} us per change, {deltas[0]} deltas pushed")
+
+    start = time.perf_counter()
+    for query in queries[:50]:
+        query.ids()
+    rerun = (time.perf_counter() - start) / 50 * watch_count
+    print(f"re-running all queries per change instead: {rerun * 1e3:.1f} ms ({rerun / per_change:,.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""Report automerge actor counts and the size saved by bound actors for a bus log."""
+import sys
+
+from ifc_databus.core.actors import journal_actor_report
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python actor_report.py <logs/mqtt_messages_*.log>")
+        sys.exit(1)
+
+    print(journal_actor_report(sys.argv[1]))
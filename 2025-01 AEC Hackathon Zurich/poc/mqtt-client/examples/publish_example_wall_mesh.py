@@ -1,31 +1,17 @@
 """Example demonstrating publishing IFC entities from a JSON file."""
 
 import json
-import hashlib
 from time import sleep
 from uuid import UUID
 from pathlib import Path
 from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.guid import global_id_to_uuid
 
 from compas_eve import set_default_transport
 from compas_eve.mqtt import MqttTransport
 from config import MQTT_HOST, MQTT_PORT
 
 
-def global_id_to_uuid(global_id: str) -> UUID:
-    """Convert an IFC globalId to a UUID.
-    
-    If the globalId is already a valid UUID, use it directly.
-    Otherwise, create a UUID by hashing the globalId.
-    """
-    try:
-        return UUID(global_id)
-    except ValueError:
-        # Hash the globalId to create a UUID
-        md5 = hashlib.md5(global_id.encode())
-        return UUID(md5.hexdigest())
-
-
 def run_publish_mesh():
     """Run the mesh publishing example."""
     set_default_transport(MqttTransport(MQTT_HOST, MQTT_PORT))
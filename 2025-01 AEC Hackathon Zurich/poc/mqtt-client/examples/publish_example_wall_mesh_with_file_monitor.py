@@ -1,12 +1,11 @@
 """Example demonstrating publishing IFC entities from a JSON file with file monitoring."""
 
-import json
-import hashlib
 import time
-import base64
-from uuid import UUID
 from pathlib import Path
 from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.changes import ChangeDetector, apply_changes
+from ifc_databus.core.guid import global_id_to_uuid
+from ifc_databus.core.ifcjson import IfcJsonReader
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
@@ -15,95 +14,76 @@ from compas_eve.mqtt import MqttTransport
 from config import MQTT_HOST, MQTT_PORT
 
 
-def global_id_to_uuid(global_id: str) -> UUID:
-    """Convert an IFC globalId to a UUID.
-    
-    If the globalId is already a valid UUID, use it directly.
-    Otherwise, create a UUID by hashing the globalId.
-    """
-    try:
-        return UUID(global_id)
-    except ValueError:
-        # Hash the globalId to create a UUID
-        md5 = hashlib.md5(global_id.encode())
-        return UUID(md5.hexdigest())
-
-
 class JsonFileHandler(FileSystemEventHandler):
     def __init__(self, bus: IfcBus, json_path: Path):
         self.bus = bus
         self.json_path = json_path
         self.last_modified = 0
+        # Field hashes and relationships of the previous read
+        self.detector = ChangeDetector()
+        self.relationships = set()
     
     def on_modified(self, event):
         if event.src_path == str(self.json_path.resolve()):
             # Debounce: avoid multiple events for the same modification
             current_time = time.time()
             if current_time - self.last_modified > 1:
-                print('\nJSON file changed, republishing...')
+                print('\nJSON file changed, publishing changes...')
                 self.publish_entities()
                 self.last_modified = current_time
     
     def publish_entities(self):
         try:
-            # Read JSON file
-            with open(self.json_path) as f:
-                data = json.load(f)
+            start = time.perf_counter()
+            reader = IfcJsonReader(self.json_path)
             
-            print("\nPublishing entities...")
-            # First pass: publish all entities
-            entities = {}
-            for entity_data in data["data"]:
-                try:
-                    # Keep all fields including type
-                    entity_type = entity_data["type"]
-                    entity_id = global_id_to_uuid(entity_data["globalId"])
-                    
-                    # Use the entire entity data
-                    publish_data = entity_data.copy()
-                    del publish_data["type"]  # Remove type as it's passed separately
-                    
-                    print(f"\nPublishing {entity_type} with ID {entity_id}")
-                    print(f"Data: {publish_data}")
-                    
-                    # Publish entity
-                    self.bus.publish_entity_with_id(entity_id, entity_type, publish_data)
-                    entities[entity_id] = entity_type
-                    time.sleep(0.5)  # Small delay between publishes
-                    
-                except Exception as e:
-                    print(f"Error publishing entity {entity_data.get('globalId')}: {e}")
+            # Compare with the previous read, entity by entity
+            changes = self.detector.diff(
+                (global_id_to_uuid(e["globalId"]), e["type"], {k: v for k, v in e.items() if k != "type"})
+                for e in reader
+            )
+            print(f"\nChanges: {changes}")
+            for error in apply_changes(self.bus, changes):
+                print(f"Error publishing entity {error}")
             
-            # Second pass: add relationships
-            print("\nAdding relationships...")
-            for rel_data in data.get("relationships", []):
+            # Add new relationships and remove the ones no longer in the file
+            relationships = {}
+            for rel_data in reader.header.get("relationships", []):
+                try:
+                    key = (
+                        global_id_to_uuid(rel_data["source"]),
+                        rel_data["type"],
+                        global_id_to_uuid(rel_data["target"]),
+                    )
+                    relationships[key] = rel_data.get("data")
+                except KeyError as e:
+                    print(f"Error reading relationship: missing {e}")
+            for source_id, rel_type, target_id in self.relationships - relationships.keys():
+                try:
+                    if self.bus.has_entity(source_id):
+                        print(f"Removing {rel_type} between {source_id} and {target_id}")
+                        self.bus.remove_relationship(source_id, rel_type, target_id)
+                except ValueError as e:
+                    print(f"Error removing relationship: {e}")
+            added = set()
+            for source_id, rel_type, target_id in relationships.keys() - self.relationships:
                 try:
-                    source_id = global_id_to_uuid(rel_data["source"])
-                    target_id = global_id_to_uuid(rel_data["target"])
-                    rel_type = rel_data["type"]
-                    
-                    if source_id in entities and target_id in entities:
-                        print(f"Adding {rel_type} between {source_id} and {target_id}")
-                        self.bus.add_relationship(
-                            source_id,
-                            rel_type,
-                            target_id,
-                            rel_data.get("data")
-                        )
-                        time.sleep(0.5)  # Small delay between relationships
-                    else:
-                        print(f"Cannot add relationship: source or target entity not found")
-                        
-                except Exception as e:
+                    print(f"Adding {rel_type} between {source_id} and {target_id}")
+                    self.bus.add_relationship(
+                        source_id, rel_type, target_id, relationships[source_id, rel_type, target_id]
+                    )
+                    added.add((source_id, rel_type, target_id))
+                except ValueError as e:
                     print(f"Error adding relationship: {e}")
+            self.relationships = (self.relationships & relationships.keys()) | added
             
-            print("\nPublished entities:")
-            for entity_id, entity_type in entities.items():
-                entity = self.bus._registers.get(entity_id)
-                if entity:
-                    print(f"\n{entity_type} ({entity_id}):")
-                    print(f"Data: {entity.data}")
-                    print(f"Relationships: {entity.relationships}")
+            print(f"\nPublished changes in {(time.perf_counter() - start) * 1000:.1f} ms")
+            for entity_id, entity_type, data in changes.added:
+                print(f"Added {entity_type} {entity_id}: {data}")
+            for delta in changes.updated:
+                print(f"Updated {delta.id}: {delta.changed}, removed {delta.removed}")
+            for entity_id, entity_type in changes.deleted:
+                print(f"Deleted {entity_type} {entity_id}")
             
         except Exception as e:
             print(f'Error reading/parsing JSON: {e}')
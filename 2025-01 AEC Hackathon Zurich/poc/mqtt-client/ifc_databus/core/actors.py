@@ -0,0 +1,137 @@
+"""Automerge actor ids bound to replicas, and journal actor reports."""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, Union
+from uuid import UUID
+import base64
+import hashlib
+import json
+
+from automerge.core import Document, SyncState
+from .crdt_automerge import IfcRegister, sync_message
+from .keydict import decode_payload_data, decode_payload_ops, decode_payload_relationships
+
+
+def actor_id_for(replica_id: str, session: str) -> bytes:
+    """Derive the 16 byte automerge actor id of a replica session.
+
+    All documents a replica touches during one session share this actor.
+    A replica must only reuse a session if it also kept the documents it
+    wrote, otherwise automerge sees duplicate sequence numbers.
+    """
+    return hashlib.sha256(f"{replica_id}/{session}".encode("utf-8")).digest()[:16]
+
+
+def document_actors(doc: Document) -> Set[bytes]:
+    """Collect the actors that authored changes in a document."""
+    return {change.actor_id for change in doc.get_changes([])}
+
+
+@dataclass
+class ActorReport:
+    """Actor count and size of a journal, as recorded and with bound actors."""
+    messages: int = 0
+    entities: int = 0
+    actors: int = 0
+    bytes: int = 0
+    bound_actors: int = 0
+    bound_bytes: int = 0
+
+    @property
+    def saving(self) -> float:
+        return 1 - self.bound_bytes / self.bytes if self.bytes else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Messages:          {self.messages}\n"
+            f"Entities:          {self.entities}\n"
+            f"Actors per entity: {self.actors / max(self.entities, 1):.2f} recorded, "
+            f"{self.bound_actors / max(self.entities, 1):.2f} with bound actors\n"
+            f"Document size:     {self.bytes} bytes recorded, {self.bound_bytes} bytes with bound actors "
+            f"({self.saving:.1%} saved)"
+        )
+
+
+def read_journal(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Iterate the messages of a bus log file."""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def journal_entity_messages(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Iterate the entity messages of a bus log file.
+
+    Changeset frames are expanded into their members; deletes carry no
+    document and are skipped.
+    """
+    for payload in read_journal(path):
+        if payload.get("operation_type") == "changeset":
+            members = ({**member, "replica_id": payload["replica_id"]} for member in payload["messages"])
+        else:
+            members = [payload]
+        for member in members:
+            if member.get("operation_type") != "delete":
+                yield member
+
+
+def journal_actor_report(path: Union[str, Path]) -> ActorReport:
+    """Report actor counts and the size saved by binding actors to replicas.
+
+    The recorded state is rebuilt by merging every CRDT payload of the
+    journal per entity. The bound state replays the same sequence of edits
+    with one actor per replica, which is what the bus writes today.
+    """
+    report = ActorReport()
+    recorded: Dict[UUID, Document] = {}
+    bound: Dict[UUID, IfcRegister] = {}
+
+    for payload in journal_entity_messages(path):
+        report.messages += 1
+        entity_id = UUID(payload["id"])
+        actor_id = actor_id_for(payload["replica_id"], "journal")
+
+        # Recorded history, as sent over the wire
+        if "crdt_changes" in payload:
+            if entity_id in recorded:
+                changes = base64.b64decode(payload["crdt_changes"])
+                recorded[entity_id].receive_sync_message(SyncState(), sync_message(changes))
+        else:
+            doc = Document.load(base64.b64decode(payload["crdt_data"]))
+            if entity_id in recorded:
+                recorded[entity_id].merge(doc)
+            else:
+                recorded[entity_id] = doc
+
+        # Same edits replayed with bound actors
+        register = bound.get(entity_id)
+        if register is None:
+            if "crdt_changes" in payload:
+                continue
+            register = IfcRegister.create_with_id(
+                entity_id, payload["entity_type"], payload["replica_id"],
+                decode_payload_data(payload), actor_id=actor_id,
+            )
+            bound[entity_id] = register
+        else:
+            register.doc.set_actor(actor_id)
+            if "ops" in payload:
+                register.apply_fragment(decode_payload_ops(payload, register.data))
+            else:
+                register.update(decode_payload_data(payload))
+        for rel_type, targets in decode_payload_relationships(payload).items():
+            known = register.relationships.get(rel_type, {})
+            for target_id, rel_data in targets.items():
+                if target_id not in known:
+                    register.add_relationship(rel_type, UUID(target_id), rel_data)
+
+    report.entities = len(recorded)
+    for doc in recorded.values():
+        report.actors += len(document_actors(doc))
+        report.bytes += len(doc.save())
+    for register in bound.values():
+        report.bound_actors += len(document_actors(register.doc))
+        report.bound_bytes += len(register.to_binary())
+    return report
@@ -1,28 +1,91 @@
 """Core bus implementation using MQTT."""
-from typing import Any, Callable, Dict, Optional
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
 from uuid import UUID, uuid4
 import json
 import base64
 from datetime import datetime
 from pathlib import Path
 import getpass
+import threading
+import time
 
 from compas_eve import Publisher, Subscriber, Topic, Message
 from .message_automerge import IfcMessage
 from .crdt_automerge import IfcRegister
-from .validation import validate_entity, validate_relationship
+from .fragment import FragmentOp, apply_ops, as_ops
+from .validation import validate_relationship
+from .validator import DEFAULT_VALIDATOR, CompiledValidator
+from .lanes import LANE_ORDER, LaneScheduler, Priority, classify
+from .keydict import KeyDictionary, register_key_dictionary
+from .actors import actor_id_for
+from .graph import RelationshipIndex
+from .query import HASH, Query, QueryIndex
+from .placement import PlacementResolver, placement_ref
+from .spatial import SPATIAL, entity_bounds
+from .watch import Watch, WatchDelta, WatchRegistry
+from .pending import PendingDependencies, data_refs
+from .changeset import Changeset
 
 
 class IfcBus:
     """Main IFC data bus implementation."""
     
-    def __init__(self, replica_id: str = None):
+    def __init__(
+        self,
+        replica_id: str = None,
+        lane_weights: Optional[Dict[Priority, int]] = None,
+        key_dictionary: Optional[KeyDictionary] = None,
+        session: Optional[str] = None,
+    ):
         self.replica_id = replica_id or str(uuid4())
+        
+        # One automerge actor for every document this replica touches. Pass a
+        # stable session only if the documents are persisted across restarts.
+        self.session = session or uuid4().hex
+        self.actor_id = actor_id_for(self.replica_id, self.session)
+        
+        # Encode field names as integer ids on the wire and in snapshots
+        self.key_dictionary = register_key_dictionary(key_dictionary) if key_dictionary else None
         self._publishers: Dict[str, Publisher] = {}
         self._subscribers: Dict[str, Subscriber] = {}
         self._callbacks: Dict[str, list] = {}
         self._registers: Dict[UUID, IfcRegister] = {}
         
+        # Relationships in both directions, mirrored from the registers
+        self.graph = RelationshipIndex()
+        
+        # Entity type and field indexes for queries, updated before any
+        # other change callback runs
+        self.index = QueryIndex()
+        self.on_change(self._update_index)
+        
+        # World matrices of shared placements, referenced as {"ref": id}
+        # from entity placements, and the entities that use each one
+        self.placements = PlacementResolver()
+        self._placement_refs: Dict[UUID, str] = {}
+        self._placement_users: Dict[str, set] = {}
+        
+        # Live queries, re-checked against changed entities only
+        self._watches = WatchRegistry(self.index, self.get_entity)
+        self.on_change(self._watches.update)
+        
+        # Relationships, references and change deltas waiting for entities
+        # (or earlier changes) that have not arrived yet, applied when they do
+        self.pending = PendingDependencies()
+        self.on_change(self._resolve_pending)
+        
+        # Change hashes of deleted entities; a full register made only of
+        # these changes is a late copy and does not bring the entity back
+        self._tombstones: Dict[UUID, set] = {}
+        
+        # The changeset open on each thread, and the last one published
+        self._local = threading.local()
+        self._last_changeset: Optional[UUID] = None
+        
+        # Outbound queues, one per priority lane
+        self._scheduler = LaneScheduler(self._send_message, weights=lane_weights)
+        
         # Create logs directory if it doesn't exist
         self.log_dir = Path("logs")
         self.log_dir.mkdir(exist_ok=True)
@@ -38,65 +101,370 @@ class IfcBus:
         for sub in self._subscribers.values():
             sub.subscribe()
         
+        # Drain the priority lanes from a background sender
+        self._scheduler.start()
+        
     def disconnect(self):
         """Disconnect from the message bus."""
+        self._scheduler.stop()
         for pub in self._publishers.values():
             pub.unadvertise()
         for sub in self._subscribers.values():
             sub.unsubscribe()
         
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued outbound messages have been sent."""
+        return self._scheduler.flush(timeout)
+    
+    def pending_messages(self, priority: Optional[Priority] = None) -> int:
+        """Number of outbound messages still queued, per lane or in total."""
+        return self._scheduler.pending(priority)
+        
     def has_entity(self, entity_id: UUID) -> bool:
         """Check if an entity exists in this replica."""
         return entity_id in self._registers
     
-    def publish_entity(self, entity_type: str, data: Dict[str, Any]) -> UUID:
+    def get_entity(self, entity_id: UUID) -> Optional[IfcRegister]:
+        """Get the register of an entity, if this replica has it."""
+        return self._registers.get(entity_id)
+    
+    def entity_ids(self) -> List[UUID]:
+        """Ids of all entities in this replica."""
+        return list(self._registers)
+    
+    def create_index(self, field: str, kind: str = HASH):
+        """Index a data field for queries.
+        
+        ``hash`` indexes answer equality and ``in`` conditions, ``sorted``
+        indexes answer ranges on numeric values. The field is a top-level
+        key or a JSON pointer such as ``/nominalValue/value``.
+        
+        ``spatial`` indexes store the world bounding box of each entity's
+        geometry under the given name and answer ``intersects`` and
+        ``in_frustum`` conditions, e.g. ``create_index("bbox", "spatial")``.
+        Referenced placements are resolved through ``self.placements``.
+        """
+        def rows():
+            for entity_id, register in self._registers.items():
+                data = register.data
+                self._track_placement(entity_id, data)
+                yield entity_id, register.entity_type, data
+        
+        extractor = (lambda data: entity_bounds(data, self.placements.world)) if kind == SPATIAL else None
+        self.index.create_index(field, kind, rows(), extractor=extractor)
+    
+    def set_placement(self, placement_id: str, placement: Dict[str, Any]) -> List[UUID]:
+        """Set a shared ``IfcLocalPlacement`` that entities reference by id.
+        
+        Cached world matrices below the placement are invalidated, and the
+        entities placed anywhere in that subtree are reindexed and reported
+        to the change callbacks. Returns their ids.
+        """
+        self.placements.set_placement(placement_id, placement)
+        affected = self.placements.descendants(placement_id)
+        affected.add(placement_id)
+        entity_ids = [e for p in affected for e in self._placement_users.get(p, ())]
+        if entity_ids:
+            self._notify_change(entity_ids)
+        return entity_ids
+    
+    def _track_placement(self, entity_id: UUID, data: Dict[str, Any]):
+        """Remember which shared placement an entity references."""
+        ref = placement_ref(data.get("objectPlacement"))
+        old = self._placement_refs.get(entity_id)
+        if old == ref:
+            return
+        if old is not None:
+            self._placement_users[old].discard(entity_id)
+            if not self._placement_users[old]:
+                del self._placement_users[old]
+            del self._placement_refs[entity_id]
+        if ref is not None:
+            self._placement_refs[entity_id] = ref
+            self._placement_users.setdefault(ref, set()).add(entity_id)
+    
+    def query(self, entity_type: Optional[str] = None) -> Query:
+        """Start a query, optionally restricted to one entity type."""
+        return Query(self.index, self.get_entity, entity_type)
+    
+    def watch(self, query: Query, callback: Callable[[WatchDelta], None]) -> Watch:
+        """Keep a query current and push enter, update and leave deltas.
+        
+        The callback first receives the current result as entered
+        entities, then one delta per change that affects the result.
+        Call ``cancel()`` on the returned watch to stop.
+        """
+        return self._watches.add(query, callback)
+    
+    def _update_index(self, entity_ids: List[UUID]):
+        """Reindex changed entities."""
+        for entity_id in entity_ids:
+            register = self._registers.get(entity_id)
+            if register is None:
+                self.index.remove(entity_id)
+                self._track_placement(entity_id, {})
+            elif self.index.indexed_fields:
+                data = register.data
+                self._track_placement(entity_id, data)
+                self.index.update(entity_id, register.entity_type, data)
+            else:
+                self.index.update(entity_id, register.entity_type, {})
+    
+    def on_change(self, callback: Callable[[List[UUID]], None]) -> Callable[[List[UUID]], None]:
+        """Register a callback for entity changes.
+        
+        The callback receives the ids of the entities touched by a local
+        write or an incoming message, after the change has been applied.
+        """
+        self._callbacks.setdefault("change", []).append(callback)
+        return callback
+    
+    def _notify_change(self, entity_ids: List[UUID]):
+        """Call the change callbacks, or hold the ids back until the open changeset closes."""
+        changeset = self._changeset
+        if changeset is not None:
+            changeset.changed.update(dict.fromkeys(entity_ids))
+            return
+        for callback in self._callbacks.get("change", []):
+            try:
+                callback(entity_ids)
+            except Exception as e:
+                print(f"Error in change callback: {e}")
+    
+    def _park_refs(self, entity_id: UUID, data: Any):
+        """Park the references in new data to entities this replica does not have.
+        
+        When a target arrives, the referring entity is reported to the
+        change callbacks again, so views that follow the reference update.
+        """
+        for target in data_refs(data):
+            if target != entity_id and target not in self._registers:
+                self.pending.park(("ref", entity_id, target), [target], lambda: self._ref_arrived(entity_id))
+    
+    def _ref_arrived(self, entity_id: UUID):
+        if entity_id in self._registers:
+            self._notify_change([entity_id])
+    
+    def _resolve_pending(self, entity_ids: List[UUID]):
+        """Apply what was waiting for entities that just arrived."""
+        if not self.pending:
+            return
+        for entity_id in entity_ids:
+            if entity_id in self._registers:
+                self.pending.resolve(entity_id, self.has_entity)
+    
+    @property
+    def _changeset(self) -> Optional[Changeset]:
+        return getattr(self._local, "changeset", None)
+    
+    @contextmanager
+    def changeset(self, priority: Optional[Priority] = None) -> Iterator[Changeset]:
+        """Group operations across entities into one atomic publish.
+        
+        Operations inside the block apply locally right away. Their
+        messages are sent as one frame and the change callbacks run once
+        when the block ends. If it raises, the touched registers are
+        restored and nothing is sent. A nested block joins the outer one.
+        
+        Usage:
+            with bus.changeset():
+                wall = bus.publish_entity("IfcWall", {...})
+                window = bus.publish_entity("IfcWindow", {...})
+                bus.add_relationship(wall, "HasOpenings", window)
+        """
+        changeset = self._changeset
+        if changeset is not None:
+            yield changeset
+            return
+        changeset = Changeset(parent_id=self._last_changeset, priority=priority)
+        self._local.changeset = changeset
+        try:
+            yield changeset
+        except BaseException:
+            self._local.changeset = None
+            self._restore(changeset)
+            raise
+        self._local.changeset = None
+        if changeset.messages:
+            self._last_changeset = changeset.id
+            self._enqueue(*changeset.frame(self.replica_id, getpass.getuser(), time.time()))
+        if changeset.changed:
+            self._notify_change(list(changeset.changed))
+    
+    def _touch(self, entity_id: UUID):
+        """Save a register before the open changeset first changes it."""
+        changeset = self._changeset
+        if changeset is not None and entity_id not in changeset.saved:
+            register = self._registers.get(entity_id)
+            changeset.saved[entity_id] = (register.to_binary(), register.replica_id) if register else None
+    
+    def _restore(self, changeset: Changeset):
+        """Put the registers a failed changeset touched back as they were."""
+        for entity_id, saved in changeset.saved.items():
+            if saved is None:
+                self._registers.pop(entity_id, None)
+                self.graph.remove_entity(entity_id)
+                continue
+            register = IfcRegister.from_binary(saved[0], saved[1], entity_id, actor_id=self.actor_id)
+            self._registers[entity_id] = register
+            self._tombstones.pop(entity_id, None)
+            self.graph.set_relationships(entity_id, register.relationships)
+    
+    def publish_entity(self, entity_type: str, data: Dict[str, Any], priority: Optional[Priority] = None) -> UUID:
         """Publish an IFC entity with a random UUID."""
         # Generate a new UUID
         id = uuid4()
-        return self.publish_entity_with_id(id, entity_type, data)
+        return self.publish_entity_with_id(id, entity_type, data, priority=priority)
     
-    def publish_entity_with_id(self, id: UUID, entity_type: str, data: Dict[str, Any]) -> UUID:
+    def publish_entity_with_id(
+        self, id: UUID, entity_type: str, data: Dict[str, Any], priority: Optional[Priority] = None,
+        validator: Optional[CompiledValidator] = None,
+    ) -> UUID:
         """Publish an IFC entity with a specific UUID.
         
         This is useful when you want to preserve IDs from an existing IFC file.
+        An existing entity gets ``data`` as its new data, so fields missing
+        from it are removed; its type cannot change without deleting it.
+        ``validator`` replaces the bus's default validator, e.g. to check
+        imported entities against the IFC schema only.
         """
         # Validate entity data
-        error = validate_entity(entity_type, data)
+        error = (validator or DEFAULT_VALIDATOR).first_error(entity_type, data)
         if error:
             raise ValueError(error)
-            
-        # Create entity register
-        entity = IfcRegister.create_with_id(id, entity_type, self.replica_id, data)
-        self._registers[entity.id] = entity
+        existing = self._registers.get(id)
+        if existing is not None and existing.entity_type != entity_type:
+            raise ValueError(f"Entity {id} is an {existing.entity_type}, not an {entity_type}; delete it first")
+        
+        self._touch(id)
+        if existing is not None:
+            # Keep the existing history; a second document for the same id
+            # would reuse this replica's actor and sequence numbers
+            entity = existing
+            entity.replace(data)
+        else:
+            # Create entity register; a new document also revives a deleted id
+            self._tombstones.pop(id, None)
+            entity = IfcRegister.create_with_id(
+                id, entity_type, self.replica_id, data,
+                key_dictionary=self.key_dictionary, actor_id=self.actor_id,
+            )
+            self._registers[entity.id] = entity
+        self._park_refs(entity.id, data)
+        self._notify_change([entity.id])
         
         # Publish the register
-        self._publish_message("create", entity)
+        self._publish_message("create", entity, priority or classify("create", entity_type, data))
         
         return entity.id
     
-    def update_entity(self, entity_id: UUID, data: Dict[str, Any]):
+    def update_entity(self, entity_id: UUID, data: Dict[str, Any], priority: Optional[Priority] = None):
         """Update an existing entity."""
         if entity_id not in self._registers:
             raise ValueError(f"Entity {entity_id} not found")
             
         # Validate updated data
         entity = self._registers[entity_id]
-        error = validate_entity(entity.entity_type, {**entity.data, **data})
+        error = DEFAULT_VALIDATOR.first_error(entity.entity_type, {**entity.data, **data})
         if error:
             raise ValueError(error)
             
         # Update entity register
+        self._touch(entity_id)
         entity.update(data)
+        self._park_refs(entity_id, data)
+        self._notify_change([entity_id])
         
-        # Publish the register
-        self._publish_message("update", entity)
+        # The message carries the whole register, so its lane follows the
+        # full data rather than the changed fields
+        self._publish_message("update", entity, priority)
     
-    def add_relationship(self, source_id: UUID, rel_type: str, target_id: UUID, rel_data: Dict[str, Any] = None):
-        """Add a relationship between entities."""
-        if source_id not in self._registers:
-            raise ValueError(f"Source entity {source_id} not found")
-        if target_id not in self._registers:
-            raise ValueError(f"Target entity {target_id} not found")
+    def delete_entity(self, entity_id: UUID, priority: Optional[Priority] = None):
+        """Delete an entity and its relationships on every replica."""
+        if entity_id not in self._registers:
+            raise ValueError(f"Entity {entity_id} not found")
+        entity = self._remove_register(entity_id)
+        history = entity.history()
+        self._tombstones[entity_id] = set(history)
+        
+        # Only the id and the deleted history travel; receivers drop their
+        # copy of the register and ignore late copies of it
+        priority = Priority(priority or classify("delete", entity.entity_type, {}))
+        msg_dict = {
+            "operation_type": "delete",
+            "operation_id": str(uuid4()),
+            "author": getpass.getuser(),
+            "id": str(entity_id),
+            "entity_type": entity.entity_type,
+            "replica_id": self.replica_id,
+            "timestamp": time.time(),
+            "priority": priority.value,
+            "history": [change.hex() for change in history],
+        }
+        self._enqueue(priority, f"ifc/{entity.entity_type}/{priority.topic_suffix}", msg_dict, 0)
+    
+    def _remove_register(self, entity_id: UUID) -> IfcRegister:
+        """Drop a register and its outgoing relationship edges."""
+        self._touch(entity_id)
+        entity = self._registers.pop(entity_id)
+        self.graph.remove_entity(entity_id)
+        self._notify_change([entity_id])
+        return entity
+    
+    def update_fragment(
+        self,
+        entity_id: UUID,
+        ops: Iterable[Union[FragmentOp, Dict[str, Any]]],
+        priority: Optional[Priority] = None,
+    ):
+        """Apply path-level operations to an entity and publish only the resulting CRDT changes.
+        
+        All operations are applied in a single transaction, so the message
+        size is proportional to the change rather than to the entity.
+        """
+        if entity_id not in self._registers:
+            raise ValueError(f"Entity {entity_id} not found")
+        ops = as_ops(ops)
+        
+        # Validate the entity as it will look after the operations
+        entity = self._registers[entity_id]
+        data = entity.data
+        error = DEFAULT_VALIDATOR.first_error(entity.entity_type, apply_ops(data, ops))
+        if error:
+            raise ValueError(error)
+        
+        # Apply the operations and collect the new changes
+        self._touch(entity_id)
+        deps = entity.heads
+        entity.apply_fragment(ops)
+        changes = entity.changes_since(deps)
+        self._park_refs(entity_id, [op.value for op in ops if isinstance(op.value, (dict, list))])
+        self._notify_change([entity_id])
+        
+        self._publish_changes("update_fragment", entity, changes, deps, ops, data, priority or Priority.SEMANTIC)
+    
+    def add_relationship(
+        self,
+        source_id: UUID,
+        rel_type: str,
+        target_id: UUID,
+        rel_data: Dict[str, Any] = None,
+        priority: Optional[Priority] = None,
+    ) -> bool:
+        """Add a relationship between entities.
+        
+        If the source or target has not arrived yet, the relationship is
+        parked in ``self.pending`` and added when both exist. Returns
+        whether it was added right away.
+        """
+        missing = [id for id in (source_id, target_id) if id not in self._registers]
+        if missing:
+            self.pending.park(
+                ("relationship", source_id, rel_type, target_id),
+                missing,
+                lambda: self.add_relationship(source_id, rel_type, target_id, rel_data, priority),
+            )
+            return False
             
         # Validate relationship
         source = self._registers[source_id]
@@ -106,24 +474,45 @@ class IfcBus:
             raise ValueError(error)
         
         # Add relationship
+        self._touch(source_id)
         source.add_relationship(rel_type, target_id, rel_data)
+        self.graph.add(source_id, rel_type, target_id)
+        self._notify_change([source_id])
         
         # Publish the register
-        self._publish_message("add_relationship", source)
+        self._publish_message("add_relationship", source, priority or Priority.CONTROL)
+        return True
     
-    def _publish_message(self, operation_type: str, register: IfcRegister):
-        """Publish an IFC register."""
-        # Get topic for this entity type
-        topic_name = f"ifc/{register.entity_type}"
+    def remove_relationship(
+        self, source_id: UUID, rel_type: str, target_id: UUID, priority: Optional[Priority] = None
+    ):
+        """Remove a relationship between entities, or drop it if it is still pending."""
+        if self.pending.cancel(("relationship", source_id, rel_type, target_id)):
+            return
+        if source_id not in self._registers:
+            raise ValueError(f"Source entity {source_id} not found")
+        source = self._registers[source_id]
+        if str(target_id) not in source.relationships.get(rel_type, {}):
+            raise ValueError(f"Relationship {rel_type} from {source_id} to {target_id} not found")
         
-        # Create publisher if needed
-        if topic_name not in self._publishers:
-            topic = Topic(topic_name)
-            self._publishers[topic_name] = Publisher(topic)
-            self._publishers[topic_name].advertise()
-            print(f"Created new publisher for {topic_name}")
+        self._touch(source_id)
+        source.remove_relationship(rel_type, target_id)
+        self.graph.remove(source_id, rel_type, target_id)
+        self._notify_change([source_id])
+        
+        # Publish the register
+        self._publish_message("remove_relationship", source, priority or Priority.CONTROL)
+    
+    def _publish_message(self, operation_type: str, register: IfcRegister, priority: Optional[Priority] = None):
+        """Queue an IFC register for publishing on its priority lane."""
+        data = register.data
+        priority = Priority(priority or classify(operation_type, register.entity_type, data))
+        
+        # Get topic for this entity type and lane
+        topic_name = f"ifc/{register.entity_type}/{priority.topic_suffix}"
         
         # Convert register to dict for MQTT
+        crdt_data = base64.b64encode(register.to_binary()).decode('utf-8')
         msg_dict = {
             "operation_type": operation_type,
             "operation_id": str(uuid4()),
@@ -132,15 +521,92 @@ class IfcBus:
             "entity_type": register.entity_type,
             "replica_id": self.replica_id,  # Use our replica ID
             "timestamp": register.timestamp,
-            "data": register.data,
+            "priority": priority.value,
+            "data": data,
             "relationships": register.relationships,
-            "crdt_data": base64.b64encode(register.to_binary()).decode('utf-8'),  # Include CRDT data
+            "crdt_data": crdt_data,  # Include CRDT data
+        }
+        if self.key_dictionary:
+            msg_dict["data"] = self.key_dictionary.encode(data)
+            msg_dict["relationships"] = self.key_dictionary.encode_relationships(msg_dict["relationships"])
+            msg_dict["key_dict_version"] = self.key_dictionary.version
+        
+        self._enqueue(priority, topic_name, msg_dict, len(crdt_data))
+    
+    def _publish_changes(
+        self,
+        operation_type: str,
+        register: IfcRegister,
+        changes: bytes,
+        deps: List[bytes],
+        ops: List[FragmentOp],
+        data: Dict[str, Any],
+        priority: Priority,
+    ):
+        """Queue the incremental CRDT changes of a register instead of the full document.
+        
+        ``data`` is the entity before ``ops``, which the encoded op paths
+        are resolved against.
+        """
+        priority = Priority(priority)
+        topic_name = f"ifc/{register.entity_type}/{priority.topic_suffix}"
+        crdt_changes = base64.b64encode(changes).decode('utf-8')
+        msg_dict = {
+            "operation_type": operation_type,
+            "operation_id": str(uuid4()),
+            "author": getpass.getuser(),
+            "id": str(register.id),
+            "entity_type": register.entity_type,
+            "replica_id": self.replica_id,
+            "timestamp": register.timestamp,
+            "priority": priority.value,
+            "ops": [op.to_dict() for op in ops],
+            "deps": [head.hex() for head in deps],
+            "heads": [head.hex() for head in register.heads],
+            "crdt_changes": crdt_changes,
         }
+        if self.key_dictionary:
+            msg_dict["ops"] = self.key_dictionary.encode_ops(ops, data)
+            msg_dict["key_dict_version"] = self.key_dictionary.version
+        self._enqueue(priority, topic_name, msg_dict, len(crdt_changes))
+    
+    def _enqueue(self, priority: Priority, topic_name: str, msg_dict: Dict[str, Any], size: int):
+        """Queue a message on its lane; without a running sender, send right away.
+        
+        Lanes only keep order within themselves, so a message for an entity
+        that still has messages queued on a less urgent lane moves to that
+        lane; otherwise a delta or delete could overtake the snapshot it
+        follows.
+        """
+        changeset = self._changeset
+        if changeset is not None:
+            changeset.add(priority, msg_dict)
+            return
+        members = msg_dict.get("messages", [msg_dict])
+        entity_ids = {member["id"] for member in members if "id" in member}
+        queued = [self._scheduler.queued_lane(entity_id) for entity_id in entity_ids]
+        lane = max([Priority(priority)] + [q for q in queued if q], key=LANE_ORDER.index)
+        if lane != priority:
+            topic_name = f"{topic_name.rsplit('/', 1)[0]}/{lane.topic_suffix}"
+            msg_dict["priority"] = lane.value
+            priority = lane
+        self._scheduler.enqueue(priority, topic_name, msg_dict, size, entity_ids)
+        if not self._scheduler.is_running:
+            self._scheduler.drain()
+    
+    def _send_message(self, topic_name: str, msg_dict: Dict[str, Any]):
+        """Send a message that the lane scheduler picked."""
+        # Create publisher if needed
+        if topic_name not in self._publishers:
+            topic = Topic(topic_name)
+            self._publishers[topic_name] = Publisher(topic)
+            self._publishers[topic_name].advertise()
+            print(f"Created new publisher for {topic_name}")
 
         # Publish message
         msg = Message(msg_dict)
         self._publishers[topic_name].publish(msg)
-        print(f"Published message to {topic_name} with data: {register.data}")
+        print(f"Published message to {topic_name} with data: {msg_dict.get('data', msg_dict.get('ops'))}")
         
         # Log the message
         with open(self.log_file, "a") as f:
@@ -156,45 +622,157 @@ class IfcBus:
             if payload.get("replica_id") == self.replica_id:
                 return
             
-            # Get message ID and CRDT data
-            msg_id = UUID(payload["id"])
-            crdt_data = base64.b64decode(payload["crdt_data"].encode('utf-8'))
-            
-            # Create or update register using CRDT data
-            incoming_register = IfcRegister.from_binary(crdt_data, payload["replica_id"], msg_id)
-            print(f"Received data: {incoming_register.data} from {payload['replica_id']}")
-            
-            if msg_id not in self._registers:
-                # Create new register
-                self._registers[msg_id] = incoming_register
-                print(f"Created new register for {msg_id}")
+            if payload.get("operation_type") == "changeset":
+                self._apply_changeset(payload)
             else:
-                # Get the current register
-                current_register = self._registers[msg_id]
-                print(f"Current data: {current_register.data}")
-                
-                # Always merge CRDT data
-                old_data = current_register.data.copy()
-                current_register.merge(incoming_register)
-                print(f"Merged data: {current_register.data}")
-                
-                # Re-broadcast if data changed
-                if current_register.data != old_data:
-                    print(f"Re-broadcasting changes for {msg_id}")
-                    self._publish_message("broadcast", current_register)
+                self._apply_message(payload)
         except Exception as e:
             print(f"Error handling message: {e}")
+    
+    def _apply_changeset(self, payload: Dict[str, Any]):
+        """Apply a changeset frame all-or-nothing, with one change notification.
+        
+        A frame with changes to entities this replica does not have waits
+        in ``self.pending`` until they arrive.
+        """
+        members = [{**member, "replica_id": payload["replica_id"]} for member in payload["messages"]]
+        known = set(self._registers)
+        missing = set()
+        for member in members:
+            entity_id = UUID(member["id"])
+            if "crdt_changes" in member and entity_id not in known and entity_id not in self._tombstones:
+                missing.add(entity_id)
+            known.add(entity_id)
+        if missing:
+            print(f"Changeset {payload['changeset_id']} waits for {len(missing)} entities")
+            self.pending.park(("changeset", payload["changeset_id"]), missing, lambda: self._apply_changeset(payload))
+            return
+        try:
+            with self.changeset():
+                for member in members:
+                    self._apply_message(member, park=False)
+        except Exception as e:
+            print(f"Rejected changeset {payload['changeset_id']} from {payload['replica_id']}: {e}")
+            return
+        print(f"Applied changeset {payload['changeset_id']} with {len(members)} messages")
+    
+    def _apply_message(self, payload: Dict[str, Any], park: bool = True):
+        """Apply one incoming entity message; raises if it cannot be applied.
         
+        With ``park``, change deltas that arrive before their entity or
+        before the changes they build on wait in ``self.pending``.
+        """
+        # Get message ID and CRDT data
+        msg_id = UUID(payload["id"])
+        if payload.get("operation_type") == "delete":
+            tombstone = self._tombstones.setdefault(msg_id, set())
+            tombstone.update(bytes.fromhex(change) for change in payload.get("history", ()))
+            if msg_id in self._registers:
+                self._remove_register(msg_id)
+                print(f"Deleted register for {msg_id}")
+            return
+        if "crdt_changes" in payload:
+            self._apply_changes(msg_id, payload, park)
+            return
+        crdt_data = base64.b64decode(payload["crdt_data"].encode('utf-8'))
+        
+        # Create or update register using CRDT data
+        incoming_register = IfcRegister.from_binary(crdt_data, payload["replica_id"], msg_id, actor_id=self.actor_id)
+        print(f"Received data: {incoming_register.data} from {payload['replica_id']}")
+        
+        if msg_id not in self._registers:
+            tombstone = self._tombstones.get(msg_id)
+            if tombstone is not None:
+                if set(incoming_register.heads) <= tombstone:
+                    print(f"Ignored late copy of deleted entity {msg_id}")
+                    return
+                # Changes made after the delete was issued revive the entity
+                del self._tombstones[msg_id]
+            
+            # Create new register
+            self._touch(msg_id)
+            self._registers[msg_id] = incoming_register
+            self.graph.set_relationships(msg_id, incoming_register.relationships)
+            print(f"Created new register for {msg_id}")
+            self._park_refs(msg_id, incoming_register.data)
+            self._notify_change([msg_id])
+        else:
+            # Get the current register
+            current_register = self._registers[msg_id]
+            print(f"Current data: {current_register.data}")
+            
+            # Always merge CRDT data
+            self._touch(msg_id)
+            old_data = current_register.data.copy()
+            old_relationships = current_register.relationships
+            current_register.merge(incoming_register)
+            print(f"Merged data: {current_register.data}")
+            if current_register.relationships != old_relationships:
+                self.graph.set_relationships(msg_id, current_register.relationships)
+            if current_register.data != old_data or current_register.relationships != old_relationships:
+                self._park_refs(msg_id, current_register.data)
+                self._notify_change([msg_id])
+            
+            # Re-broadcast if data changed
+            if current_register.data != old_data:
+                print(f"Re-broadcasting changes for {msg_id}")
+                self._publish_message("broadcast", current_register)
+    
+    def _apply_changes(self, msg_id: UUID, payload: Dict[str, Any], park: bool = False):
+        """Apply an incremental change message to the local register.
+        
+        With ``park``, changes to an unknown entity, or with missing
+        dependencies, are retried when the entity arrives or next changes.
+        """
+        if msg_id not in self._registers:
+            if msg_id in self._tombstones:
+                print(f"Ignored changes to deleted entity {msg_id}")
+                return
+            if park:
+                self._park_changes(msg_id, payload)
+                return
+            raise ValueError(f"Cannot apply changes to unknown entity {msg_id}")
+        register = self._registers[msg_id]
+        self._touch(msg_id)
+        register.apply_changes(base64.b64decode(payload["crdt_changes"].encode('utf-8')))
+        if not register.has_heads([bytes.fromhex(head) for head in payload["heads"]]):
+            if park:
+                self._park_changes(msg_id, payload)
+                return
+            raise ValueError(f"Missing dependencies for changes to {msg_id} from {payload['replica_id']}")
+        data = register.data
+        print(f"Applied {payload['operation_type']} to {msg_id}: {data}")
+        self.graph.set_relationships(msg_id, register.relationships)
+        self._park_refs(msg_id, data)
+        self._notify_change([msg_id])
+        
+    def _park_changes(self, msg_id: UUID, payload: Dict[str, Any]):
+        print(f"Changes to {msg_id} from {payload['replica_id']} wait for earlier messages")
+        self.pending.park(
+            ("changes", msg_id, tuple(payload["heads"])),
+            [msg_id],
+            lambda: self._apply_changes(msg_id, payload, park=True),
+        )
+    
     def _subscribe_to_all_entities(self):
         """Subscribe to all IFC entity topics."""
         entity_types = ["IfcWall", "IfcWindow", "IfcDoor"]
         for entity_type in entity_types:
-            topic_name = f"ifc/{entity_type}"
-            if topic_name not in self._subscribers:
-                topic = Topic(topic_name)
-                self._subscribers[topic_name] = Subscriber(
-                    topic,
-                    self._handle_message
-                )
-                self._subscribers[topic_name].subscribe()
-                print(f"Created new subscriber for {topic_name}")
+            # Legacy per-type topic plus one topic per priority lane
+            topic_names = [f"ifc/{entity_type}"]
+            topic_names += [f"ifc/{entity_type}/{priority.topic_suffix}" for priority in LANE_ORDER]
+            for topic_name in topic_names:
+                self._subscribe_topic(topic_name)
+        for priority in LANE_ORDER:
+            self._subscribe_topic(f"ifc/changeset/{priority.topic_suffix}")
+    
+    def _subscribe_topic(self, topic_name: str):
+        """Subscribe to a single topic unless already subscribed."""
+        if topic_name not in self._subscribers:
+            topic = Topic(topic_name)
+            self._subscribers[topic_name] = Subscriber(
+                topic,
+                self._handle_message
+            )
+            self._subscribers[topic_name].subscribe()
+            print(f"Created new subscriber for {topic_name}")
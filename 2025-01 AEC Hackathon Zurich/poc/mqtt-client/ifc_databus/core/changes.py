@@ -0,0 +1,157 @@
+"""Change detection between successive reads of an entity source.
+
+A file watcher that republishes every entity on every save floods the bus
+and, for entities it recreates, throws away their CRDT history.
+``ChangeDetector`` keeps a content hash per top-level field of every
+entity from the previous read, so the next read yields only the entities
+that were added or deleted and, for the others, the fields that changed.
+``apply_changes`` turns those into one fragment update per changed
+register, diffed down to the paths that differ, which carries just the
+new CRDT changes.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from .fragment import FragmentOp, diff_ops
+from .ingest import Register
+
+FieldHashes = Dict[str, bytes]
+
+
+# Canonical encoding, so that key order does not count as a change
+_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"), default=str)
+
+
+def field_hashes(data: Dict[str, Any]) -> FieldHashes:
+    """Hash every top-level field of entity data."""
+    return {
+        key: hashlib.blake2b(_ENCODER.encode(value).encode(), digest_size=16).digest()
+        for key, value in data.items()
+    }
+
+
+@dataclass
+class EntityDelta:
+    """The fields of an entity that changed since the previous read."""
+    id: UUID
+    entity_type: str
+    data: Dict[str, Any]
+    changed: Dict[str, Any] = field(default_factory=dict)
+    removed: List[str] = field(default_factory=list)
+
+    def ops(self, current: Optional[Dict[str, Any]] = None) -> List[FragmentOp]:
+        """The delta as fragment operations.
+
+        Given the ``current`` data of the register, changed fields are
+        diffed down to the paths that differ, and fields that already
+        match produce no operation.
+        """
+        if current is None:
+            ops = [FragmentOp("delete", f"/{_escape(key)}") for key in self.removed]
+            return ops + [FragmentOp("set", f"/{_escape(key)}", value) for key, value in self.changed.items()]
+        ops = [FragmentOp("delete", f"/{_escape(key)}") for key in self.removed if key in current]
+        for key, value in self.changed.items():
+            if key in current:
+                ops += diff_ops(current[key], value, f"/{_escape(key)}")
+            else:
+                ops.append(FragmentOp("set", f"/{_escape(key)}", value))
+        return ops
+
+
+@dataclass
+class ChangeSet:
+    """Adds, field deltas and deletes between two reads."""
+    added: List[Register] = field(default_factory=list)
+    updated: List[EntityDelta] = field(default_factory=list)
+    deleted: List[Tuple[UUID, str]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.deleted)
+
+    def __str__(self) -> str:
+        return f"{len(self.added)} added, {len(self.updated)} updated, {len(self.deleted)} deleted"
+
+
+class ChangeDetector:
+    """Compare each read of a source with the previous one.
+
+    Only hashes are kept between reads, not the entity data.
+    """
+
+    def __init__(self):
+        self._entities: Dict[UUID, Tuple[str, FieldHashes]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def diff(self, registers: Iterable[Register]) -> ChangeSet:
+        """Consume a complete read and return what changed since the last one.
+
+        An entity whose type changed is reported as deleted and added again.
+        """
+        changes = ChangeSet()
+        previous = self._entities
+        current: Dict[UUID, Tuple[str, FieldHashes]] = {}
+        for entity_id, entity_type, data in registers:
+            hashes = field_hashes(data)
+            current[entity_id] = (entity_type, hashes)
+            old = previous.get(entity_id)
+            if old is None or old[0] != entity_type:
+                if old is not None:
+                    changes.deleted.append((entity_id, old[0]))
+                changes.added.append((entity_id, entity_type, data))
+            elif old[1] != hashes:
+                old_hashes = old[1]
+                changes.updated.append(EntityDelta(
+                    entity_id,
+                    entity_type,
+                    data,
+                    {key: data[key] for key, digest in hashes.items() if old_hashes.get(key) != digest},
+                    [key for key in old_hashes if key not in hashes],
+                ))
+        changes.deleted += [
+            (entity_id, entity_type) for entity_id, (entity_type, _) in previous.items() if entity_id not in current
+        ]
+        self._entities = current
+        return changes
+
+
+def apply_changes(bus, changes: ChangeSet) -> List[str]:
+    """Publish a change set onto a bus.
+
+    Deltas on registers the bus already has are sent as fragment updates,
+    so their history is kept; registers the bus does not have yet are
+    published in full. Returns the errors of entities that could not be
+    applied; the others are applied regardless.
+    """
+    errors = []
+    for entity_id, entity_type in changes.deleted:
+        if bus.has_entity(entity_id):
+            try:
+                bus.delete_entity(entity_id)
+            except ValueError as e:
+                errors.append(f"{entity_type} {entity_id}: {e}")
+    for entity_id, entity_type, data in changes.added:
+        try:
+            bus.publish_entity_with_id(entity_id, entity_type, data)
+        except ValueError as e:
+            errors.append(f"{entity_type} {entity_id}: {e}")
+    for delta in changes.updated:
+        try:
+            register = bus.get_entity(delta.id)
+            if register is not None:
+                ops = delta.ops(register.data)
+                if ops:
+                    bus.update_fragment(delta.id, ops)
+            else:
+                bus.publish_entity_with_id(delta.id, delta.entity_type, delta.data)
+        except ValueError as e:
+            errors.append(f"{delta.entity_type} {delta.id}: {e}")
+    return errors
+
+
+def _escape(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
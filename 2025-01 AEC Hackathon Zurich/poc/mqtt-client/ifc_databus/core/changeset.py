@@ -0,0 +1,79 @@
+"""Changesets: edits to several entities published and applied as one.
+
+A wall with its openings, layer set and property sets is one edit, but
+every entity change used to travel as its own message, so subscribers saw
+the wall before its openings. Within ``with bus.changeset() as cs:`` the
+bus applies each operation locally as usual but holds back the outgoing
+messages and change notifications. When the block ends the messages go
+out as one framed message and the change callbacks run once; if the block
+raises, the touched registers are restored and nothing is sent.
+
+The frame carries ``changeset_id`` and the ``parent_id`` of the previous
+changeset of the same replica, as in ``IfcMessage``, so a replica's
+changesets form a chain. Receivers apply a frame all-or-nothing.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from .lanes import LANE_ORDER, Priority
+
+# Fields every member shares with its frame, sent once on the frame
+FRAME_FIELDS = ("operation_id", "author", "replica_id", "priority")
+
+# Member operations that make earlier members for the same entity redundant
+SUPERSEDING_OPERATIONS = {"delete"}
+
+
+@dataclass
+class Changeset:
+    """Operations collected for one framed publish."""
+    parent_id: Optional[UUID] = None
+    priority: Optional[Priority] = None
+    id: UUID = field(default_factory=uuid4)
+    # (priority, message) of every operation, in order
+    messages: List[Tuple[Priority, Dict[str, Any]]] = field(default_factory=list)
+    # Entities to report to the change callbacks, in order of first change
+    changed: Dict[UUID, None] = field(default_factory=dict)
+    # Serialized register and replica of every touched entity before its
+    # first change, None for entities the changeset created
+    saved: Dict[UUID, Optional[Tuple[bytes, str]]] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def add(self, priority: Priority, msg_dict: Dict[str, Any]):
+        """Hold back an outgoing message."""
+        self.messages.append((Priority(priority), msg_dict))
+
+    def frame(self, replica_id: str, author: str, timestamp: float) -> Tuple[Priority, str, Dict[str, Any], int]:
+        """The lane, topic, message and payload size that carry the whole changeset.
+
+        Messages made redundant by a later full register or delete of the
+        same entity are left out. Without an explicit priority the frame
+        takes the least urgent lane of its members, so a large geometry
+        edit does not hold up the control lane.
+        """
+        members = []
+        superseded = set()
+        for priority, msg_dict in reversed(self.messages):
+            entity_id = msg_dict.get("id")
+            if entity_id in superseded:
+                continue
+            if "crdt_data" in msg_dict or msg_dict.get("operation_type") in SUPERSEDING_OPERATIONS:
+                superseded.add(entity_id)
+            members.append({key: value for key, value in msg_dict.items() if key not in FRAME_FIELDS})
+        members.reverse()
+        priority = Priority(self.priority or max((p for p, _ in self.messages), key=LANE_ORDER.index))
+        size = sum(len(m.get("crdt_data") or m.get("crdt_changes") or "") for m in members)
+        return priority, f"ifc/changeset/{priority.topic_suffix}", {
+            "operation_type": "changeset",
+            "operation_id": str(uuid4()),
+            "changeset_id": str(self.id),
+            "parent_id": str(self.parent_id) if self.parent_id else None,
+            "author": author,
+            "replica_id": replica_id,
+            "timestamp": timestamp,
+            "priority": priority.value,
+            "messages": members,
+        }, size
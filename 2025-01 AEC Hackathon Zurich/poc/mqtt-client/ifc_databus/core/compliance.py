@@ -0,0 +1,471 @@
+"""Incremental IDS (Information Delivery Specification) compliance checking."""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+from uuid import UUID
+import re
+import xml.etree.ElementTree as ET
+
+from .refs import RefResolver, object_items
+
+# Facets an IDS specification can use
+FACETS = {"entity", "attribute", "property", "classification", "material"}
+
+# Quantity value attributes of IfcElementQuantity members
+QUANTITY_VALUES = ("lengthValue", "areaValue", "volumeValue", "countValue", "weightValue", "timeValue")
+
+
+def _local(tag: str) -> str:
+    """Strip the XML namespace of a tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child(element: ET.Element, name: str) -> Optional[ET.Element]:
+    for child in element:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+@dataclass(frozen=True)
+class ValueConstraint:
+    """An IDS value: a simple value, or an enumeration, pattern or bounds restriction."""
+    values: Optional[FrozenSet[str]] = None
+    patterns: Tuple[str, ...] = ()
+    bounds: Tuple[Tuple[str, float], ...] = ()
+
+    @classmethod
+    def parse(cls, element: Optional[ET.Element]) -> Optional["ValueConstraint"]:
+        """Parse an IDS ``idsValue`` element."""
+        if element is None:
+            return None
+        simple = _child(element, "simpleValue")
+        if simple is not None:
+            return cls(values=frozenset([(simple.text or "").strip()]))
+        restriction = _child(element, "restriction")
+        if restriction is None:
+            raise ValueError(f"Unsupported IDS value in <{_local(element.tag)}>")
+        values, patterns, bounds = set(), [], []
+        for facet in restriction:
+            kind, value = _local(facet.tag), facet.get("value", "")
+            if kind == "enumeration":
+                values.add(value)
+            elif kind == "pattern":
+                patterns.append(value)
+            elif kind in ("minInclusive", "minExclusive", "maxInclusive", "maxExclusive"):
+                bounds.append((kind, float(value)))
+            else:
+                raise ValueError(f"Unsupported IDS restriction: {kind}")
+        return cls(values=frozenset(values) if values else None, patterns=tuple(patterns), bounds=tuple(bounds))
+
+    @property
+    def simple(self) -> Optional[FrozenSet[str]]:
+        """The exact values this constraint accepts, if it is a plain value list."""
+        return self.values if not (self.patterns or self.bounds) else None
+
+    def matches(self, value: Any) -> bool:
+        if value is None:
+            return False
+        if isinstance(value, bool):
+            text = "TRUE" if value else "FALSE"
+        else:
+            text = str(value)
+        if self.values is not None and not self._in_values(value, text):
+            return False
+        for pattern in self.patterns:
+            if not re.fullmatch(pattern, text):
+                return False
+        if self.bounds:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return False
+            for kind, bound in self.bounds:
+                if (kind == "minInclusive" and value < bound) or (kind == "minExclusive" and value <= bound) \
+                        or (kind == "maxInclusive" and value > bound) or (kind == "maxExclusive" and value >= bound):
+                    return False
+        return True
+
+    def _in_values(self, value: Any, text: str) -> bool:
+        if text in self.values:
+            return True
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            for candidate in self.values:
+                try:
+                    expected = float(candidate)
+                except ValueError:
+                    continue
+                if abs(value - expected) <= 1e-6 * max(1.0, abs(expected)):
+                    return True
+        return False
+
+
+@dataclass(frozen=True)
+class Facet:
+    """One applicability or requirement facet of a specification."""
+    kind: str
+    name: Optional[ValueConstraint] = None
+    value: Optional[ValueConstraint] = None
+    property_set: Optional[ValueConstraint] = None
+    system: Optional[ValueConstraint] = None
+    predefined_type: Optional[ValueConstraint] = None
+    cardinality: str = "required"
+
+    @classmethod
+    def parse(cls, element: ET.Element) -> "Facet":
+        kind = _local(element.tag)
+        if kind not in FACETS:
+            raise ValueError(f"Unsupported IDS facet: {kind}")
+        value = ValueConstraint.parse
+        return cls(
+            kind=kind,
+            name=value(_child(element, "baseName") if kind == "property" else _child(element, "name")),
+            value=value(_child(element, "value")),
+            property_set=value(_child(element, "propertySet")),
+            system=value(_child(element, "system")),
+            predefined_type=value(_child(element, "predefinedType")),
+            cardinality=element.get("cardinality", "required"),
+        )
+
+    def matches(self, view: "EntityView") -> bool:
+        """Check whether the facet holds for an entity."""
+        if self.kind == "entity":
+            return self.name.matches(view.entity_type.upper()) and (
+                self.predefined_type is None or self.predefined_type.matches(view.data.get("predefinedType"))
+            )
+        if self.kind == "attribute":
+            return any(self._value_matches(value) for key, value in view.data.items()
+                       if self.name.matches(key) or self.name.matches(key[:1].upper() + key[1:]))
+        if self.kind == "property":
+            return any(
+                self.name.matches(name) and (self.property_set is None or self.property_set.matches(pset))
+                and self._value_matches(value)
+                for (pset, name), value in view.properties.items()
+            )
+        if self.kind == "classification":
+            return any(
+                (self.system is None or self.system.matches(system)) and self._value_matches(identification)
+                for system, identification in view.classifications
+            )
+        return any(self._value_matches(material) for material in view.materials)
+
+    def _value_matches(self, value: Any) -> bool:
+        if self.value is None:
+            return value is not None and value != ""
+        return self.value.matches(value)
+
+    def describe(self) -> str:
+        parts = [self.kind]
+        for label, constraint in (("set", self.property_set), ("system", self.system), ("name", self.name)):
+            if constraint is not None and constraint.simple:
+                parts.append(f"{label}={'|'.join(sorted(constraint.simple))}")
+        return " ".join(parts)
+
+
+@dataclass(frozen=True)
+class Specification:
+    """An IDS specification: which entities it applies to and what they require."""
+    name: str
+    applicability: Tuple[Facet, ...]
+    requirements: Tuple[Facet, ...]
+    min_occurs: int = 0
+
+    def applies_to(self, view: "EntityView") -> bool:
+        return all(facet.matches(view) for facet in self.applicability)
+
+    def failures(self, view: "EntityView") -> List[str]:
+        """Return the requirement failures of an applicable entity."""
+        failures = []
+        for facet in self.requirements:
+            holds = facet.matches(view)
+            if facet.cardinality == "prohibited" and holds:
+                failures.append(f"Prohibited {facet.describe()} is present")
+            elif facet.cardinality == "required" and not holds:
+                failures.append(f"Required {facet.describe()} is missing or invalid")
+            elif facet.cardinality == "optional" and not holds and _present(facet, view):
+                failures.append(f"Optional {facet.describe()} has an invalid value")
+        return failures
+
+
+def _present(facet: Facet, view: "EntityView") -> bool:
+    """Whether an optional facet is present at all, ignoring its value."""
+    return Facet(facet.kind, facet.name, None, facet.property_set, facet.system, facet.predefined_type).matches(view)
+
+
+@dataclass
+class Ids:
+    """A parsed IDS document."""
+    title: str
+    specifications: List[Specification]
+
+    @classmethod
+    def from_string(cls, xml: Union[str, bytes]) -> "Ids":
+        root = ET.fromstring(xml)
+        info = _child(root, "info")
+        title = _child(info, "title") if info is not None else None
+        specifications = []
+        container = _child(root, "specifications")
+        for element in (container if container is not None else []):
+            applicability = _child(element, "applicability")
+            requirements = _child(element, "requirements")
+            specifications.append(Specification(
+                name=element.get("name", f"Specification {len(specifications) + 1}"),
+                applicability=tuple(Facet.parse(f) for f in (applicability if applicability is not None else [])),
+                requirements=tuple(Facet.parse(f) for f in (requirements if requirements is not None else [])),
+                min_occurs=int(applicability.get("minOccurs", "0")) if applicability is not None else 0,
+            ))
+        return cls(title=(title.text or "").strip() if title is not None else "", specifications=specifications)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "Ids":
+        with open(path, "rb") as f:
+            return cls.from_string(f.read())
+
+
+class EntityView:
+    """Properties, classifications and materials of an entity, read on demand.
+
+    They are collected from inline ifcJSON (``isDefinedBy``,
+    ``hasAssociations``, material fields) and from related registers on the
+    bus: ``relationships`` targets and, given a ``RefResolver``, the
+    relationship registers that list the entity in ``relatedObjects``, as
+    IFC-SPF imports publish them. The ids of related registers that were
+    read are kept in ``reads``.
+    """
+
+    def __init__(self, entity: Any, lookup: Callable[[UUID], Any], resolver: Optional[RefResolver] = None,
+                 entity_id: Optional[UUID] = None):
+        self.entity_type = entity.entity_type
+        self.data = entity.data
+        self._entity = entity
+        self._lookup = lookup
+        self._resolver = resolver
+        self._entity_id = entity_id
+        self._related: Optional[List[Any]] = None
+        self._properties: Optional[Dict[Tuple[str, str], Any]] = None
+        self._classifications: Optional[List[Tuple[Optional[str], Optional[str]]]] = None
+        self.reads: Set[UUID] = set()
+
+    @property
+    def related(self) -> List[Any]:
+        """Data of the entities this entity has relationships to."""
+        if self._related is None:
+            self._related = []
+            for targets in self._entity.relationships.values():
+                for target_id in targets:
+                    target_id = UUID(target_id)
+                    self.reads.add(target_id)
+                    target = self._lookup(target_id)
+                    if target is not None:
+                        self._related.append({"type": target.entity_type, **target.data})
+            if self._resolver is not None and self._entity_id is not None:
+                objects, reads = self._resolver.related_via_relationships(self._entity_id)
+                self._related.extend(objects)
+                self.reads |= reads
+        return self._related
+
+    def _deref(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Resolve a ``{"ref": ...}`` to its entity, recording the read; other objects are returned as they are."""
+        return item if self._resolver is None else self._resolver.deref(item, self.reads)
+
+    @property
+    def properties(self) -> Dict[Tuple[str, str], Any]:
+        if self._properties is None:
+            self._properties = {}
+            definitions = [rel.get("relatingPropertyDefinition") for rel in object_items(self.data.get("isDefinedBy"))]
+            for definition in definitions + self.related:
+                for pset in object_items(definition):
+                    pset = self._deref(pset)
+                    if pset is not None:
+                        self._add_property_set(pset)
+        return self._properties
+
+    def _add_property_set(self, pset: Dict[str, Any]) -> None:
+        pset_name = pset.get("name")
+        for prop in object_items(pset.get("hasProperties")):
+            value = prop.get("nominalValue")
+            self._properties[(pset_name, prop.get("name"))] = value.get("value") if isinstance(value, dict) else value
+        for quantity in object_items(pset.get("quantities")):
+            value = next((quantity[key] for key in QUANTITY_VALUES if key in quantity), None)
+            self._properties[(pset_name, quantity.get("name"))] = value
+
+    @property
+    def classifications(self) -> List[Tuple[Optional[str], Optional[str]]]:
+        if self._classifications is None:
+            references = [rel.get("relatingClassification") for rel in object_items(self.data.get("hasAssociations"))]
+            references += [r for r in self.related if r.get("type") == "IfcClassificationReference"]
+            self._classifications = []
+            for reference in references:
+                for ref in object_items(reference):
+                    ref = self._deref(ref)
+                    if ref is None:
+                        continue
+                    source = ref.get("referencedSource")
+                    system = source.get("name") if isinstance(source, dict) else None
+                    self._classifications.append((system, ref.get("identification")))
+        return self._classifications
+
+    @property
+    def materials(self) -> List[str]:
+        names = []
+        for value in [self.data.get("material"), self.data.get("materialLayers")] + [
+            r for r in self.related if str(r.get("type", "")).startswith("IfcMaterial")
+        ]:
+            _collect_material_names(value, names)
+        return names
+
+
+def _collect_material_names(value: Any, names: List[str]) -> None:
+    if isinstance(value, str):
+        names.append(value)
+    for item in object_items(value):
+        if item.get("type") in ("IfcMaterial", None) and "name" in item:
+            names.append(item["name"])
+        for key in ("material", "materialLayers", "forLayerSet"):
+            _collect_material_names(item.get(key), names)
+
+
+@dataclass
+class SpecificationReport:
+    """Compliance counts of one specification."""
+    name: str
+    applicable: int = 0
+    failed: int = 0
+    min_occurs: int = 0
+
+    @property
+    def passed(self) -> int:
+        return self.applicable - self.failed
+
+    @property
+    def ok(self) -> bool:
+        return self.failed == 0 and self.applicable >= self.min_occurs
+
+
+class ComplianceChecker:
+    """Keeps an IDS compliance table up to date from the bus change stream.
+
+    Specifications are indexed by the entity type, classification system or
+    property of their applicability, so each changed entity is only tested
+    against candidate specifications. Only entities touched by a change are
+    re-evaluated, plus entities that read a touched entity as a related
+    property set, classification or material. With a ``RefResolver``,
+    relationship registers that point at an entity through refs count as
+    related, and a changed relationship re-evaluates the entities it refers to.
+    """
+
+    def __init__(self, ids: Ids, lookup: Optional[Callable[[UUID], Any]] = None,
+                 resolver: Optional[RefResolver] = None):
+        self.ids = ids
+        self._lookup = lookup or (lambda entity_id: None)
+        self._resolver = resolver
+        self._by_type: Dict[str, List[int]] = {}
+        self._by_system: Dict[str, List[int]] = {}
+        self._by_property: Dict[Tuple[str, str], List[int]] = {}
+        self._unindexed: List[int] = []
+        for idx, spec in enumerate(ids.specifications):
+            self._index(idx, spec)
+
+        # entity id -> spec index -> failures of applicable specifications
+        self._table: Dict[UUID, Dict[int, List[str]]] = {}
+        self._reports = [SpecificationReport(s.name, min_occurs=s.min_occurs) for s in ids.specifications]
+        self._reads: Dict[UUID, Set[UUID]] = {}
+        self._readers: Dict[UUID, Set[UUID]] = {}
+
+    def _index(self, idx: int, spec: Specification) -> None:
+        """Register a specification under its most selective applicability facet."""
+        facets = spec.applicability
+        for facet in facets:
+            if facet.kind == "entity" and facet.name.simple:
+                for name in facet.name.simple:
+                    self._by_type.setdefault(name.upper(), []).append(idx)
+                return
+        for facet in facets:
+            if facet.kind == "classification" and facet.system is not None and facet.system.simple:
+                for system in facet.system.simple:
+                    self._by_system.setdefault(system, []).append(idx)
+                return
+        for facet in facets:
+            if facet.kind == "property" and facet.property_set is not None and facet.property_set.simple \
+                    and facet.name.simple:
+                for pset in facet.property_set.simple:
+                    for name in facet.name.simple:
+                        self._by_property.setdefault((pset, name), []).append(idx)
+                return
+        self._unindexed.append(idx)
+
+    def attach(self, bus) -> "ComplianceChecker":
+        """Check every entity on a bus and follow its changes from now on."""
+        self._lookup = bus.get_entity
+        if self._resolver is None:
+            # Registered first so its index is current when the checker runs
+            self._resolver = RefResolver(bus)
+        bus.on_change(self.update)
+        self.update(bus.entity_ids())
+        return self
+
+    def candidates(self, view: EntityView) -> List[int]:
+        """Indexes of the specifications that may apply to an entity."""
+        found = set(self._by_type.get(view.entity_type.upper(), ()))
+        found.update(self._unindexed)
+        if self._by_system:
+            for system, _ in view.classifications:
+                found.update(self._by_system.get(system, ()))
+        if self._by_property:
+            for key in view.properties:
+                found.update(self._by_property.get(key, ()))
+        return sorted(found)
+
+    def update(self, entity_ids: Iterable[UUID]) -> None:
+        """Re-evaluate changed entities and the entities that read them."""
+        touched = set(entity_ids)
+        for entity_id in list(touched):
+            touched |= self._readers.get(entity_id, set())
+            if self._resolver is not None:
+                touched |= self._resolver.refs(entity_id)
+        for entity_id in touched:
+            self._evaluate(entity_id)
+
+    def _evaluate(self, entity_id: UUID) -> None:
+        self._forget(entity_id)
+        entity = self._lookup(entity_id)
+        if entity is None:
+            return
+        view = EntityView(entity, self._lookup, self._resolver, entity_id)
+        row = {}
+        for idx in self.candidates(view):
+            spec = self.ids.specifications[idx]
+            if spec.applies_to(view):
+                row[idx] = spec.failures(view)
+                self._reports[idx].applicable += 1
+                self._reports[idx].failed += bool(row[idx])
+        self._table[entity_id] = row
+        self._reads[entity_id] = view.reads
+        for read in view.reads:
+            self._readers.setdefault(read, set()).add(entity_id)
+
+    def _forget(self, entity_id: UUID) -> None:
+        """Remove an entity's previous results from the table and counts."""
+        for idx, failures in self._table.pop(entity_id, {}).items():
+            self._reports[idx].applicable -= 1
+            self._reports[idx].failed -= bool(failures)
+        for read in self._reads.pop(entity_id, ()):
+            readers = self._readers.get(read)
+            if readers is not None:
+                readers.discard(entity_id)
+                if not readers:
+                    del self._readers[read]
+
+    def report(self) -> List[SpecificationReport]:
+        """Current counts per specification."""
+        return list(self._reports)
+
+    def failures(self, entity_id: Optional[UUID] = None) -> Dict[UUID, Dict[str, List[str]]]:
+        """Failures by entity and specification name, for one or all entities."""
+        rows = {entity_id: self._table.get(entity_id, {})} if entity_id is not None else self._table
+        names = [spec.name for spec in self.ids.specifications]
+        return {
+            eid: {names[idx]: failures for idx, failures in row.items() if failures}
+            for eid, row in rows.items() if any(row.values())
+        }
+
+    def is_compliant(self) -> bool:
+        return all(report.ok for report in self._reports)
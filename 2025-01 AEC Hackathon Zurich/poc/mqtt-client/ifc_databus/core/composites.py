@@ -0,0 +1,154 @@
+"""Streaming ingest of Archicad composite dumps onto the bus.
+
+The Archicad add-on dumps its composites (multi-layer structures) as text:
+
+    Number of composites: 2
+    Composite 1: Double Brick - 270
+      Layer 1: Thickness = 0.11
+        Material Masonry - Brick - Brown: Density = 1800
+
+``iter_composites`` parses the dump line by line and yields one composite
+at a time. ``import_composites`` publishes every distinct material once as
+an ``IfcMaterial`` and every composite as an ``IfcMaterialLayerSet`` whose
+layers reference those materials, in batches while the dump is read.
+Register ids are derived from the names, so re-importing an updated dump
+updates the same registers.
+
+Usage: python -m ifc_databus.core.composites composites.txt [--mqtt HOST[:PORT]]
+"""
+import argparse
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Union
+from uuid import UUID, uuid5
+
+from .bus import IfcBus
+from .ingest import ImportReport, Register, publish_registers
+
+# Namespace of the ids derived from material and composite names
+COMPOSITE_NAMESPACE = UUID("3c1e5a52-6d0e-4a4b-9d0b-4f1b8c2f7a10")
+
+_COMPOSITE = re.compile(r"Composite\b[^:]*: (.*)")
+_LAYER = re.compile(r"Layer\b.*Thickness = ([\d.]+)")
+_MATERIAL = re.compile(r"Material (.*): Density = (\d+)")
+
+
+def material_id(name: str) -> UUID:
+    """Register id of the material with this name."""
+    return uuid5(COMPOSITE_NAMESPACE, f"IfcMaterial/{name}")
+
+
+def layer_set_id(name: str) -> UUID:
+    """Register id of the layer set of the composite with this name."""
+    return uuid5(COMPOSITE_NAMESPACE, f"IfcMaterialLayerSet/{name}")
+
+
+def iter_composites(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Yield ``{"name", "layers": [{"thickness", "material", "density"}]}`` per composite.
+
+    Only the composite being parsed is held in memory. Lines that do not
+    match the dump format are skipped.
+    """
+    composite = None
+    thickness = None
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("Number of composites:"):
+            continue
+        match = _COMPOSITE.match(line)
+        if match:
+            if composite:
+                yield composite
+            composite = {"name": match.group(1), "layers": []}
+            continue
+        match = _LAYER.match(line)
+        if match:
+            thickness = float(match.group(1))
+            continue
+        match = _MATERIAL.match(line)
+        if match and composite is not None and thickness is not None:
+            composite["layers"].append({
+                "thickness": thickness,
+                "material": match.group(1),
+                "density": int(match.group(2)),
+            })
+    if composite:
+        yield composite
+
+
+def composite_registers(composites: Iterable[Dict[str, Any]]) -> Iterator[Register]:
+    """Turn composites into registers, each material before its first use.
+
+    Materials are deduplicated by name across all composites.
+    """
+    materials: Dict[str, UUID] = {}
+    for composite in composites:
+        layers = []
+        for layer in composite["layers"]:
+            name = layer["material"]
+            material = None
+            if name:
+                id = materials.get(name)
+                if id is None:
+                    id = materials[name] = material_id(name)
+                    yield id, "IfcMaterial", {"type": "IfcMaterial", "name": name}
+                # The name stays inline for readers that do not resolve refs
+                material = {"type": "IfcMaterial", "name": name, "ref": str(id)}
+            layers.append({
+                "type": "IfcMaterialLayer",
+                "material": material,
+                "layerThickness": layer["thickness"],
+                "isVentilated": False,
+                "name": f"Layer of {name}",
+            })
+        yield layer_set_id(composite["name"]), "IfcMaterialLayerSet", {
+            "type": "IfcMaterialLayerSet",
+            "materialLayers": layers,
+            "layerSetName": composite["name"],
+        }
+
+
+def import_composites(
+    bus,
+    source: Union[str, Path, IO[str]],
+    batch_size: int = 1000,
+    on_batch: Optional[Callable[[List[UUID]], None]] = None,
+    max_errors: int = 100,
+) -> ImportReport:
+    """Publish the composites of a dump while it is being read."""
+    if isinstance(source, (str, Path)):
+        with open(source, encoding="utf-8") as f:
+            return import_composites(bus, f, batch_size, on_batch, max_errors)
+    return publish_registers(bus, composite_registers(iter_composites(source)), batch_size, on_batch, max_errors)
+
+
+def main(argv: Optional[List[str]] = None) -> ImportReport:
+    """Import a composite dump from the command line."""
+    parser = argparse.ArgumentParser(description="Publish an Archicad composite dump onto the IFC data bus.")
+    parser.add_argument("path", help="composite dump (.txt) written by the Archicad add-on")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--replica-id", default=None)
+    parser.add_argument("--mqtt", metavar="HOST[:PORT]", help="publish over MQTT instead of in memory")
+    args = parser.parse_args(argv)
+
+    if args.mqtt:
+        from compas_eve import set_default_transport
+        from compas_eve.mqtt import MqttTransport
+
+        host, _, port = args.mqtt.partition(":")
+        set_default_transport(MqttTransport(host, int(port or 1883)))
+
+    bus = IfcBus(args.replica_id)
+    bus.connect()
+    try:
+        report = import_composites(bus, args.path, batch_size=args.batch_size)
+    finally:
+        bus.disconnect()
+    for error in report.errors:
+        print(f"Rejected {error}")
+    print(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
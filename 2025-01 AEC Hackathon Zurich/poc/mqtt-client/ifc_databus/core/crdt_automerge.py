@@ -1,8 +1,159 @@
 """CRDT implementations for IFC data using automerge-py."""
-from typing import Any, Dict, Optional, Set
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from uuid import UUID, uuid4
 import time
-from automerge.core import Document, ROOT, ObjType, ScalarType
+from automerge.core import Document, Message, ROOT, ObjType, ScalarType, SyncState
+from .fragment import FragmentOp, as_ops, list_index, parse_pointer
+from .keydict import KeyDictionary, get_key_dictionary
+
+# Range of automerge's signed 64 bit Int scalar
+_INT_MIN, _INT_MAX = -(2 ** 63), 2 ** 63 - 1
+
+# Type byte of an automerge sync message
+_SYNC_MESSAGE = 0x42
+
+
+def _uleb(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, value = value & 0x7F, value >> 7
+        if not value:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def _read_uleb(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def split_changes(changes: bytes) -> List[bytes]:
+    """Split concatenated change chunks (magic, checksum, type, length, body)."""
+    chunks = []
+    pos = 0
+    while pos < len(changes):
+        length, body = _read_uleb(changes, pos + 9)
+        end = body + length
+        if end > len(changes):
+            raise ValueError("Truncated change chunk")
+        chunks.append(changes[pos:end])
+        pos = end
+    return chunks
+
+
+def sync_message(changes: bytes) -> Message:
+    """Wrap change chunks in a sync message: no heads, needs or haves, only changes."""
+    chunks = split_changes(changes)
+    return Message.decode(
+        bytes([_SYNC_MESSAGE]) + _uleb(0) + _uleb(0) + _uleb(0) + _uleb(len(chunks))
+        + b"".join(_uleb(len(chunk)) + chunk for chunk in chunks)
+    )
+
+
+def _scalar(value: Any) -> Tuple[ScalarType, Any]:
+    """Map a Python scalar onto a typed automerge scalar."""
+    if value is None:
+        return ScalarType.Null, None
+    if isinstance(value, bool):
+        return ScalarType.Boolean, value
+    if isinstance(value, int):
+        if _INT_MIN <= value <= _INT_MAX:
+            return ScalarType.Int, value
+        return ScalarType.F64, float(value)
+    if isinstance(value, float):
+        return ScalarType.F64, value
+    if isinstance(value, str):
+        return ScalarType.Str, value
+    return ScalarType.Str, str(value)
+
+
+def _put_value(tx, obj: bytes, prop, value: Any) -> None:
+    """Write a value into a map key or list slot, mapping dicts and lists recursively."""
+    if isinstance(value, dict):
+        child = tx.put_object(obj, prop, ObjType.Map)
+        for key, item in value.items():
+            _put_value(tx, child, str(key), item)
+    elif isinstance(value, (list, tuple)):
+        child = tx.put_object(obj, prop, ObjType.List)
+        for idx, item in enumerate(value):
+            _insert_value(tx, child, idx, item)
+    else:
+        tx.put(obj, prop, *_scalar(value))
+
+
+def _insert_value(tx, obj: bytes, idx: int, value: Any) -> None:
+    """Insert a value into a list, mapping dicts and lists recursively."""
+    if isinstance(value, dict):
+        child = tx.insert_object(obj, idx, ObjType.Map)
+        for key, item in value.items():
+            _put_value(tx, child, str(key), item)
+    elif isinstance(value, (list, tuple)):
+        child = tx.insert_object(obj, idx, ObjType.List)
+        for pos, item in enumerate(value):
+            _insert_value(tx, child, pos, item)
+    else:
+        tx.insert(obj, idx, *_scalar(value))
+
+
+def _read_value(doc, entry) -> Any:
+    """Convert an automerge value as returned by ``get`` into plain Python."""
+    value, obj = entry
+    if value == ObjType.Map:
+        return {key: _read_value(doc, doc.get(obj, key)) for key in doc.keys(obj)}
+    if value == ObjType.List:
+        return [_read_value(doc, item) for item in doc.values(obj)]
+    if value == ObjType.Text:
+        return doc.text(obj)
+    return value[1]  # (ScalarType, value)
+
+
+def _same_scalar(entry, value: Any) -> bool:
+    """Check whether a stored scalar already holds the given value."""
+    current = entry[0]
+    if isinstance(current, ObjType):
+        return False
+    return current == _scalar(value)
+
+
+def _update_value(tx, obj: bytes, prop, value: Any) -> None:
+    """Write a value, touching only the nested fields that actually differ."""
+    entry = tx.get(obj, prop)
+    if entry is None:
+        _put_value(tx, obj, prop, value)
+    elif isinstance(value, dict) and entry[0] == ObjType.Map:
+        _update_map(tx, entry[1], value)
+    elif isinstance(value, (list, tuple)) and entry[0] == ObjType.List:
+        _update_list(tx, entry[1], value)
+    elif not _same_scalar(entry, value):
+        _put_value(tx, obj, prop, value)
+
+
+def _update_map(tx, obj: bytes, value: Dict[str, Any]) -> None:
+    """Make a map equal to ``value`` with key-level changes."""
+    for key in tx.keys(obj):
+        if key not in value:
+            tx.delete(obj, key)
+    for key, item in value.items():
+        _update_value(tx, obj, str(key), item)
+
+
+def _update_list(tx, obj: bytes, value) -> None:
+    """Make a list equal to ``value`` with element-level changes."""
+    length = tx.length(obj)
+    for idx in range(length - 1, len(value) - 1, -1):
+        tx.delete(obj, idx)
+    for idx, item in enumerate(value):
+        if idx < length:
+            _update_value(tx, obj, idx, item)
+        else:
+            _insert_value(tx, obj, idx, item)
 
 
 class IfcRegister:
@@ -14,22 +165,45 @@ class IfcRegister:
         entity_type: str,
         replica_id: str,
         doc: Optional[Document] = None,
+        key_dictionary: Optional[KeyDictionary] = None,
+        actor_id: Optional[bytes] = None,
     ):
         self.id = id
         if doc is None:
-            self.doc = Document()
+            self.doc = Document(actor_id) if actor_id else Document()
+            self._keys = key_dictionary
             with self.doc.transaction() as tx:
                 self._data = tx.put_object(ROOT, "data", ObjType.Map)
                 self._rels = tx.put_object(ROOT, "relationships", ObjType.Map)
                 tx.put(ROOT, "entity_type", ScalarType.Str, entity_type)
                 tx.put(ROOT, "replica_id", ScalarType.Str, replica_id)
                 tx.put(ROOT, "timestamp", ScalarType.F64, time.time())
+                if key_dictionary is not None:
+                    tx.put(ROOT, "key_dict_version", ScalarType.Int, key_dictionary.version)
         else:
             self.doc = doc
             data_obj = self.doc.get(ROOT, "data")
             rels_obj = self.doc.get(ROOT, "relationships")
             self._data = data_obj[1] if isinstance(data_obj, tuple) else data_obj
             self._rels = rels_obj[1] if isinstance(rels_obj, tuple) else rels_obj
+            self._keys = get_key_dictionary(self.key_dict_version)
+            if actor_id:
+                self.doc.set_actor(actor_id)
+    
+    @property
+    def key_dict_version(self) -> Optional[int]:
+        """Version of the key dictionary used for field names, if any."""
+        entry = self.doc.get(ROOT, "key_dict_version")
+        return entry[0][1] if entry else None
+    
+    def _encode(self, value: Any) -> Any:
+        return self._keys.encode(value) if self._keys else value
+    
+    def _encode_key(self, key: str) -> str:
+        return self._keys.encode_key(key) if self._keys else key
+    
+    def _decode(self, value: Any) -> Any:
+        return self._keys.decode(value) if self._keys else value
     
     @property
     def entity_type(self) -> str:
@@ -41,11 +215,7 @@ class IfcRegister:
     
     @property
     def data(self) -> Dict[str, Any]:
-        result = {}
-        for key in self.doc.keys(self._data):
-            value_tuple = self.doc.get(self._data, key)
-            result[key] = value_tuple[0][1]  # ((ScalarType, value), bytes)
-        return result
+        return self._decode(_read_value(self.doc, (ObjType.Map, self._data)))
     
     @property
     def relationships(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
@@ -57,10 +227,7 @@ class IfcRegister:
             for target_id in self.doc.keys(rel_map):
                 rel_data_obj = self.doc.get(rel_map, target_id)
                 rel_data = rel_data_obj[1] if isinstance(rel_data_obj, tuple) else rel_data_obj
-                result[rel_type][target_id] = {
-                    k: self.doc.get(rel_data, k)[0][1]  # Get the actual value
-                    for k in self.doc.keys(rel_data)
-                }
+                result[rel_type][target_id] = self._decode(_read_value(self.doc, (ObjType.Map, rel_data)))
         return result
     
     @property
@@ -68,45 +235,65 @@ class IfcRegister:
         return self.doc.get(ROOT, "timestamp")[0][1]
     
     @classmethod
-    def create(cls, entity_type: str, replica_id: str, data: Dict[str, Any]) -> "IfcRegister":
+    def create(
+        cls,
+        entity_type: str,
+        replica_id: str,
+        data: Dict[str, Any],
+        key_dictionary: Optional[KeyDictionary] = None,
+        actor_id: Optional[bytes] = None,
+    ) -> "IfcRegister":
         """Create a new IFC entity register with a random UUID."""
-        return cls.create_with_id(uuid4(), entity_type, replica_id, data)
+        return cls.create_with_id(
+            uuid4(), entity_type, replica_id, data, key_dictionary=key_dictionary, actor_id=actor_id
+        )
     
     @classmethod
-    def create_with_id(cls, id: UUID, entity_type: str, replica_id: str, data: Dict[str, Any]) -> "IfcRegister":
+    def create_with_id(
+        cls,
+        id: UUID,
+        entity_type: str,
+        replica_id: str,
+        data: Dict[str, Any],
+        key_dictionary: Optional[KeyDictionary] = None,
+        actor_id: Optional[bytes] = None,
+    ) -> "IfcRegister":
         """Create a new IFC entity register with a specific UUID.
         
         This is useful when you want to preserve IDs from an existing IFC file.
+        With a key dictionary, field names are stored as small integer ids.
+        Without an actor id, the document gets a random automerge actor.
         """
         register = cls(
             id=id,
             entity_type=entity_type,
             replica_id=replica_id,
+            key_dictionary=key_dictionary,
+            actor_id=actor_id,
         )
         with register.doc.transaction() as tx:
-            for key, value in data.items():
-                if isinstance(value, (int, float)):
-                    scalar_type = ScalarType.F64
-                elif isinstance(value, bool):
-                    scalar_type = ScalarType.Boolean
-                else:
-                    scalar_type = ScalarType.Str
-                    value = str(value)
-                tx.put(register._data, key, scalar_type, value)
+            for key, value in register._encode(data).items():
+                _put_value(tx, register._data, key, value)
         return register
     
     def update(self, new_data: Dict[str, Any]) -> None:
-        """Update entity data."""
+        """Update entity data.
+        
+        Top-level keys are replaced by the new values, but nested dicts and
+        lists are diffed so that only the fields that changed are written.
+        """
         with self.doc.transaction() as tx:
-            for key, value in new_data.items():
-                if isinstance(value, (int, float)):
-                    scalar_type = ScalarType.F64
-                elif isinstance(value, bool):
-                    scalar_type = ScalarType.Boolean
-                else:
-                    scalar_type = ScalarType.Str
-                    value = str(value)
-                tx.put(self._data, key, scalar_type, value)
+            for key, value in self._encode(new_data).items():
+                _update_value(tx, self._data, key, value)
+            tx.put(ROOT, "timestamp", ScalarType.F64, time.time())
+    
+    def replace(self, new_data: Dict[str, Any]) -> None:
+        """Replace the entity data; keys missing from ``new_data`` are deleted.
+        
+        Like ``update``, only the fields that differ are written.
+        """
+        with self.doc.transaction() as tx:
+            _update_map(tx, self._data, self._encode(new_data))
             tx.put(ROOT, "timestamp", ScalarType.F64, time.time())
     
     def add_relationship(
@@ -126,16 +313,8 @@ class IfcRegister:
             
             # Add relationship data if provided
             if rel_data:
-                for key, value in rel_data.items():
-                    if isinstance(value, (int, float)):
-                        scalar_type = ScalarType.F64
-                        value = float(value)
-                    elif isinstance(value, bool):
-                        scalar_type = ScalarType.Boolean
-                    else:
-                        scalar_type = ScalarType.Str
-                        value = str(value)
-                    tx.put(target_map, key, scalar_type, value)
+                for key, value in self._encode(rel_data).items():
+                    _put_value(tx, target_map, key, value)
             
             tx.put(ROOT, "timestamp", ScalarType.F64, time.time())
     
@@ -157,59 +336,133 @@ class IfcRegister:
         if other.id != self.id:
             raise ValueError("Cannot merge registers with different IDs")
         
+        # Remember which containers each side wrote into
+        own_maps = (self._data, self._rels)
+        other_maps = (other._data, other._rels)
+        versions = [v for v in (self.key_dict_version, other.key_dict_version) if v is not None]
+        
         # Merge the documents
         self.doc.merge(other.doc)
         
-        # Merge all fields from both documents
-        merged_data = {**self.data, **other.data}
-        merged_rels = {**self.relationships, **other.relationships}
-        
-        # Update the merged data
+        # Registers created independently for the same id hold separate
+        # "data"/"relationships" maps; automerge keeps only one of each
+        # under ROOT, so fold the losing map's keys into the winner
+        self._data = self.doc.get(ROOT, "data")[1]
+        self._rels = self.doc.get(ROOT, "relationships")[1]
         with self.doc.transaction() as tx:
-            # Update all data fields
-            for key, value in merged_data.items():
-                if isinstance(value, (int, float)):
-                    scalar_type = ScalarType.F64
-                elif isinstance(value, bool):
-                    scalar_type = ScalarType.Boolean
-                else:
-                    scalar_type = ScalarType.Str
-                    value = str(value)
-                tx.put(self._data, key, scalar_type, value)
+            for winner, candidates in ((self._data, (own_maps[0], other_maps[0])),
+                                       (self._rels, (own_maps[1], other_maps[1]))):
+                for loser in candidates:
+                    if loser == winner:
+                        continue
+                    for key in tx.keys(loser):
+                        if tx.get(winner, key) is None:
+                            _put_value(tx, winner, key, _read_value(tx, tx.get(loser, key)))
             
-            # Update all relationships
-            for rel_type, targets in merged_rels.items():
-                for target_id, rel_data in targets.items():
-                    if rel_type not in self.doc.keys(self._rels):
-                        rel_map = tx.put_object(self._rels, rel_type, ObjType.Map)
-                    else:
-                        rel_map_obj = self.doc.get(self._rels, rel_type)
-                        rel_map = rel_map_obj[1] if isinstance(rel_map_obj, tuple) else rel_map_obj
-                    
-                    target_map = tx.put_object(rel_map, target_id, ObjType.Map)
-                    for key, value in rel_data.items():
-                        if isinstance(value, (int, float)):
-                            scalar_type = ScalarType.F64
-                        elif isinstance(value, bool):
-                            scalar_type = ScalarType.Boolean
-                        else:
-                            scalar_type = ScalarType.Str
-                        tx.put(target_map, key, scalar_type, value)
+            # Dictionaries only append, so the newest version decodes both sides
+            if versions and self.key_dict_version != max(versions):
+                tx.put(ROOT, "key_dict_version", ScalarType.Int, max(versions))
             
             # Update timestamp to be the max of both timestamps
             tx.put(ROOT, "timestamp", ScalarType.F64, max(self.timestamp, other.timestamp))
+        self._keys = get_key_dictionary(self.key_dict_version)
+    
+    def apply_fragment(self, ops: Iterable[FragmentOp]) -> None:
+        """Apply path-level operations to the entity data in one transaction."""
+        ops = as_ops(ops)
+        with self.doc.transaction() as tx:
+            for op in ops:
+                self._apply_op(tx, op)
+            tx.put(ROOT, "timestamp", ScalarType.F64, time.time())
+    
+    def _apply_op(self, tx, op: FragmentOp) -> None:
+        """Resolve an operation's path and apply it to the automerge document."""
+        tokens = parse_pointer(op.path)
+        value = self._encode(op.value)
+        parent = self._data
+        for token in tokens[:-1]:
+            if tx.object_type(parent) == ObjType.List:
+                entry = tx.get(parent, list_index(token, tx.length(parent)))
+            else:
+                entry = tx.get(parent, self._encode_key(token))
+            if entry is None or not isinstance(entry[0], ObjType):
+                raise ValueError(f"Path not found: {op.path}")
+            parent = entry[1]
+        last = tokens[-1]
+        
+        if tx.object_type(parent) == ObjType.List:
+            if op.op == "insert":
+                _insert_value(tx, parent, list_index(last, tx.length(parent), allow_end=True), value)
+                return
+            prop = list_index(last, tx.length(parent))
+        else:
+            prop = self._encode_key(last)
+            if op.op in ("set", "insert"):
+                _update_value(tx, parent, prop, value)
+                return
+            if tx.get(parent, prop) is None:
+                raise ValueError(f"Path not found: {op.path}")
+        
+        if op.op == "set":
+            _update_value(tx, parent, prop, value)
+        elif op.op == "delete":
+            tx.delete(parent, prop)
+        else:
+            # automerge-py cannot create counters, so increment the scalar in place
+            current = _read_value(tx, tx.get(parent, prop))
+            if isinstance(current, bool) or not isinstance(current, (int, float)):
+                raise ValueError(f"Cannot increment non-numeric value at {op.path}")
+            tx.put(parent, prop, *_scalar(current + op.value))
+    
+    @property
+    def heads(self) -> List[bytes]:
+        """Hashes of the latest changes in the document."""
+        return self.doc.get_heads()
+    
+    def history(self) -> List[bytes]:
+        """Hashes of all changes in the document."""
+        return [change.hash for change in self.doc.get_changes([])]
+    
+    def has_heads(self, heads: List[bytes]) -> bool:
+        """Check whether the document history contains the given heads."""
+        return not heads or bool(self.doc.keys(ROOT, heads=heads))
+    
+    def changes_since(self, heads: List[bytes]) -> bytes:
+        """Encode the changes made after the given heads for transmission."""
+        return b"".join(change.bytes for change in self.doc.get_changes(heads))
+    
+    def apply_changes(self, changes: bytes) -> None:
+        """Apply changes received from another replica.
+        
+        Only the incoming changes are decoded, so the cost follows the size
+        of the change rather than of the document. Changes whose
+        dependencies are unknown are held back by automerge until those
+        arrive, so callers should check ``has_heads`` afterwards.
+        """
+        self.doc.receive_sync_message(SyncState(), sync_message(changes))
     
     def to_binary(self) -> bytes:
         """Convert the register to binary format for transmission."""
         return self.doc.save()
     
     @classmethod
-    def from_binary(cls, binary: bytes, replica_id: str, id: Optional[UUID] = None) -> "IfcRegister":
-        """Create a register from binary data."""
+    def from_binary(
+        cls,
+        binary: bytes,
+        replica_id: str,
+        id: Optional[UUID] = None,
+        actor_id: Optional[bytes] = None,
+    ) -> "IfcRegister":
+        """Create a register from binary data.
+        
+        The key dictionary is picked from the version stored in the document.
+        Local edits are attributed to ``actor_id`` when given.
+        """
         doc = Document.load(binary)
         return cls(
             id=id or uuid4(),
             entity_type=doc.get(ROOT, "entity_type")[0][1],
             replica_id=replica_id,
-            doc=doc
+            doc=doc,
+            actor_id=actor_id,
         )
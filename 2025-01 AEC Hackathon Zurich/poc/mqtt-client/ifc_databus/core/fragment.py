@@ -0,0 +1,150 @@
+"""Path-level fragment update operations for IFC entities."""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Union
+import copy
+
+# Supported operations
+OPERATIONS = {"set", "insert", "delete", "increment"}
+
+
+@dataclass
+class FragmentOp:
+    """A single JSON-pointer style edit inside an entity's data.
+
+    The path is relative to the entity data, e.g.
+    ``/hasProperties/0/nominalValue/value``. For ``insert`` the last token
+    may be ``-`` to append to a list.
+    """
+    op: str
+    path: str
+    value: Any = None
+
+    def __post_init__(self):
+        if self.op not in OPERATIONS:
+            raise ValueError(f"Invalid fragment operation: {self.op}")
+        if self.op == "increment" and self.value is None:
+            self.value = 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the operation to a dictionary for MQTT."""
+        result = {"op": self.op, "path": self.path}
+        if self.op != "delete":
+            result["value"] = self.value
+        return result
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FragmentOp":
+        """Create an operation from its dictionary form."""
+        return cls(op=data["op"], path=data["path"], value=data.get("value"))
+
+
+def parse_pointer(path: str) -> List[str]:
+    """Split a JSON pointer into its unescaped reference tokens."""
+    if path in ("", "/"):
+        raise ValueError("Fragment path must point inside the entity data")
+    if not path.startswith("/"):
+        raise ValueError(f"Invalid fragment path: {path}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def format_pointer(tokens: Iterable[Union[str, int]]) -> str:
+    """Join reference tokens into an escaped JSON pointer."""
+    return "".join(f"/{_escape(token)}" for token in tokens)
+
+
+def list_index(token: str, length: int, allow_end: bool = False) -> int:
+    """Convert a pointer token into a list index."""
+    if allow_end and token == "-":
+        return length
+    if not token.isdigit():
+        raise ValueError(f"Invalid list index: {token}")
+    idx = int(token)
+    if idx > length or (idx == length and not allow_end):
+        raise ValueError(f"List index out of range: {token}")
+    return idx
+
+
+def as_ops(ops: Iterable[Union[FragmentOp, Dict[str, Any]]]) -> List[FragmentOp]:
+    """Accept operations as FragmentOp instances or plain dictionaries."""
+    return [op if isinstance(op, FragmentOp) else FragmentOp.from_dict(op) for op in ops]
+
+
+def apply_ops(data: Dict[str, Any], ops: Iterable[FragmentOp]) -> Dict[str, Any]:
+    """Apply operations to a copy of plain entity data and return it."""
+    result = copy.deepcopy(data)
+    for op in as_ops(ops):
+        tokens = parse_pointer(op.path)
+        parent = result
+        for token in tokens[:-1]:
+            if isinstance(parent, list):
+                parent = parent[list_index(token, len(parent))]
+            elif isinstance(parent, dict) and token in parent:
+                parent = parent[token]
+            else:
+                raise ValueError(f"Path not found: {op.path}")
+        last = tokens[-1]
+
+        if isinstance(parent, list):
+            if op.op == "insert":
+                parent.insert(list_index(last, len(parent), allow_end=True), copy.deepcopy(op.value))
+                continue
+            idx = list_index(last, len(parent))
+            if op.op == "set":
+                parent[idx] = copy.deepcopy(op.value)
+            elif op.op == "delete":
+                del parent[idx]
+            else:
+                parent[idx] = _incremented(parent[idx], op)
+        elif isinstance(parent, dict):
+            if op.op in ("set", "insert"):
+                parent[last] = copy.deepcopy(op.value)
+            elif last not in parent:
+                raise ValueError(f"Path not found: {op.path}")
+            elif op.op == "delete":
+                del parent[last]
+            else:
+                parent[last] = _incremented(parent[last], op)
+        else:
+            raise ValueError(f"Path not found: {op.path}")
+    return result
+
+
+def _incremented(current: Any, op: FragmentOp) -> Any:
+    """Add the operation's amount to a numeric value."""
+    if isinstance(current, bool) or not isinstance(current, (int, float)):
+        raise ValueError(f"Cannot increment non-numeric value at {op.path}")
+    return current + op.value
+
+
+def _escape(token: Union[str, int]) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def diff_ops(old: Any, new: Any, path: str = "") -> List[FragmentOp]:
+    """Compute the fragment operations that turn ``old`` into ``new``.
+
+    Useful to turn a full fragment payload, such as an updated
+    ``IfcPropertySet``, into the few path operations that changed.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [FragmentOp("delete", f"{path}/{_escape(key)}") for key in old if key not in new]
+        for key, value in new.items():
+            key_path = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append(FragmentOp("set", key_path, value))
+            else:
+                ops.extend(diff_ops(old[key], value, key_path))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        ops = [FragmentOp("delete", f"{path}/{idx}") for idx in range(len(old) - 1, len(new) - 1, -1)]
+        for idx, value in enumerate(new):
+            if idx < len(old):
+                ops.extend(diff_ops(old[idx], value, f"{path}/{idx}"))
+            else:
+                ops.append(FragmentOp("insert", f"{path}/-", value))
+        return ops
+    if type(old) is type(new) and old == new:
+        return []
+    if not path:
+        raise ValueError("Entity data must be a dictionary")
+    return [FragmentOp("set", path, new)]
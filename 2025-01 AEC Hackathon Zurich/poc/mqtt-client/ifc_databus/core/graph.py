@@ -0,0 +1,215 @@
+"""Bidirectional relationship index and graph traversal."""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Union
+from uuid import UUID
+
+# Traversal directions
+OUT = "out"
+IN = "in"
+BOTH = "both"
+DIRECTIONS = {OUT, IN, BOTH}
+
+RelTypes = Optional[Union[str, Iterable[str]]]
+
+
+def _as_uuid(value: Union[str, UUID]) -> UUID:
+    return value if isinstance(value, UUID) else UUID(value)
+
+
+def _rel_filter(rel_types: RelTypes) -> Optional[Set[str]]:
+    if rel_types is None:
+        return None
+    return {rel_types} if isinstance(rel_types, str) else set(rel_types)
+
+
+class RelationshipIndex:
+    """Adjacency index of the relationships between registers, in both directions.
+
+    Relationships are stored in the source register's ``relationships`` map.
+    The index mirrors them as ``source -> rel_type -> targets`` and
+    ``target -> rel_type -> sources``, so reverse questions such as "which
+    walls host this window?" are a dictionary lookup instead of a scan
+    over every register.
+    """
+
+    def __init__(self):
+        self._out: Dict[UUID, Dict[str, Set[UUID]]] = {}
+        self._in: Dict[UUID, Dict[str, Set[UUID]]] = {}
+        self._edges = 0
+
+    def __len__(self) -> int:
+        """Number of edges."""
+        return self._edges
+
+    def add(self, source: UUID, rel_type: str, target: UUID) -> None:
+        """Add an edge."""
+        targets = self._out.setdefault(source, {}).setdefault(rel_type, set())
+        if target in targets:
+            return
+        targets.add(target)
+        self._in.setdefault(target, {}).setdefault(rel_type, set()).add(source)
+        self._edges += 1
+
+    def remove(self, source: UUID, rel_type: str, target: UUID) -> None:
+        """Remove an edge if it exists."""
+        if not _discard(self._out, source, rel_type, target):
+            return
+        _discard(self._in, target, rel_type, source)
+        self._edges -= 1
+
+    def set_relationships(self, source: UUID, relationships: Mapping[str, Iterable[Union[str, UUID]]]) -> None:
+        """Replace the outgoing edges of a source, e.g. after a merge.
+
+        ``relationships`` has the shape of ``IfcRegister.relationships``:
+        relationship type to target ids (as keys of a mapping or a list).
+        """
+        wanted = {(rel_type, _as_uuid(t)) for rel_type, targets in relationships.items() for t in targets}
+        current = {(rel_type, t) for rel_type, targets in self._out.get(source, {}).items() for t in targets}
+        for rel_type, target in current - wanted:
+            self.remove(source, rel_type, target)
+        for rel_type, target in wanted - current:
+            self.add(source, rel_type, target)
+
+    def remove_entity(self, entity_id: UUID) -> None:
+        """Remove the outgoing edges of an entity.
+
+        Incoming edges belong to the relationships of other registers, which
+        still declare them, so they stay as dangling targets and are current
+        again as soon as the entity is re-published.
+        """
+        for rel_type, targets in list(self._out.get(entity_id, {}).items()):
+            for target in list(targets):
+                self.remove(entity_id, rel_type, target)
+
+    def outgoing(self, entity_id: UUID, rel_types: RelTypes = None) -> Set[UUID]:
+        """Targets of an entity's relationships."""
+        return _lookup(self._out, entity_id, _rel_filter(rel_types))
+
+    def incoming(self, entity_id: UUID, rel_types: RelTypes = None) -> Set[UUID]:
+        """Sources of relationships that point at an entity."""
+        return _lookup(self._in, entity_id, _rel_filter(rel_types))
+
+    def edges(self, entity_id: UUID, direction: str = OUT) -> Iterator[tuple]:
+        """Iterate ``(source, rel_type, target)`` edges of an entity."""
+        if direction in (OUT, BOTH):
+            for rel_type, targets in self._out.get(entity_id, {}).items():
+                for target in targets:
+                    yield entity_id, rel_type, target
+        if direction in (IN, BOTH):
+            for rel_type, sources in self._in.get(entity_id, {}).items():
+                for source in sources:
+                    yield source, rel_type, entity_id
+
+    def neighbours(self, entity_id: UUID, rel_types: RelTypes = None, direction: str = OUT) -> Set[UUID]:
+        """Entities one relationship away."""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Invalid direction: {direction}")
+        allowed = _rel_filter(rel_types)
+        result = set()
+        if direction in (OUT, BOTH):
+            result |= _lookup(self._out, entity_id, allowed)
+        if direction in (IN, BOTH):
+            result |= _lookup(self._in, entity_id, allowed)
+        return result
+
+    def closure(
+        self, entity_id: UUID, rel_types: RelTypes = None, direction: str = OUT, max_depth: Optional[int] = None
+    ) -> Dict[UUID, int]:
+        """Entities reachable from an entity, with their depth (breadth first)."""
+        allowed = _rel_filter(rel_types)
+        depths = {entity_id: 0}
+        queue = deque([entity_id])
+        while queue:
+            node = queue.popleft()
+            depth = depths[node]
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for neighbour in self.neighbours(node, allowed, direction):
+                if neighbour not in depths:
+                    depths[neighbour] = depth + 1
+                    queue.append(neighbour)
+        del depths[entity_id]
+        return depths
+
+    def paths(
+        self,
+        source: UUID,
+        target: UUID,
+        rel_types: RelTypes = None,
+        direction: str = OUT,
+        max_depth: int = 6,
+        limit: Optional[int] = None,
+    ) -> List[List[UUID]]:
+        """Simple paths from source to target of at most ``max_depth`` edges."""
+        allowed = _rel_filter(rel_types)
+        found: List[List[UUID]] = []
+        path = [source]
+        on_path = {source}
+
+        def visit(node: UUID) -> bool:
+            if node == target and len(path) > 1:
+                found.append(list(path))
+                return limit is not None and len(found) >= limit
+            if len(path) > max_depth:
+                return False
+            for neighbour in self.neighbours(node, allowed, direction):
+                if neighbour in on_path:
+                    continue
+                path.append(neighbour)
+                on_path.add(neighbour)
+                done = visit(neighbour)
+                path.pop()
+                on_path.discard(neighbour)
+                if done:
+                    return True
+            return False
+
+        visit(source)
+        return found
+
+    def shortest_path(
+        self, source: UUID, target: UUID, rel_types: RelTypes = None, direction: str = OUT,
+        max_depth: Optional[int] = None,
+    ) -> Optional[List[UUID]]:
+        """A shortest path from source to target, or None."""
+        allowed = _rel_filter(rel_types)
+        parents: Dict[UUID, Optional[UUID]] = {source: None}
+        queue = deque([(source, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            if node == target:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parents[node]
+                return path[::-1]
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for neighbour in self.neighbours(node, allowed, direction):
+                if neighbour not in parents:
+                    parents[neighbour] = node
+                    queue.append((neighbour, depth + 1))
+        return None
+
+
+def _lookup(adjacency: Dict[UUID, Dict[str, Set[UUID]]], entity_id: UUID, allowed: Optional[Set[str]]) -> Set[UUID]:
+    by_type = adjacency.get(entity_id)
+    if not by_type:
+        return set()
+    if allowed is None:
+        if len(by_type) == 1:
+            return set(next(iter(by_type.values())))
+        return set().union(*by_type.values())
+    return set().union(*(ids for rel_type, ids in by_type.items() if rel_type in allowed))
+
+
+def _discard(adjacency: Dict[UUID, Dict[str, Set[UUID]]], key: UUID, rel_type: str, value: UUID) -> bool:
+    by_type = adjacency.get(key)
+    if not by_type or value not in by_type.get(rel_type, ()):
+        return False
+    by_type[rel_type].discard(value)
+    if not by_type[rel_type]:
+        del by_type[rel_type]
+        if not by_type:
+            del adjacency[key]
+    return True
@@ -0,0 +1,48 @@
+"""Conversion between IFC GlobalIds and register UUIDs."""
+import hashlib
+from uuid import UUID
+
+# Alphabet of the 22 character compressed GlobalId (base 64, 6 bits per char)
+IFC_GUID_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_$"
+_CHAR_VALUES = {char: value for value, char in enumerate(IFC_GUID_CHARS)}
+
+
+def is_ifc_guid(global_id: str) -> bool:
+    """Whether a string is a compressed 22 character IFC GlobalId."""
+    return (
+        len(global_id) == 22
+        and global_id[0] in "0123"
+        and all(char in _CHAR_VALUES for char in global_id)
+    )
+
+
+def expand_guid(global_id: str) -> UUID:
+    """Expand a compressed IFC GlobalId to the UUID it encodes."""
+    if not is_ifc_guid(global_id):
+        raise ValueError(f"Not an IFC GlobalId: {global_id!r}")
+    value = 0
+    for char in global_id:
+        value = (value << 6) | _CHAR_VALUES[char]
+    return UUID(int=value)
+
+
+def compress_guid(id: UUID) -> str:
+    """Compress a UUID to a 22 character IFC GlobalId."""
+    value = UUID(str(id)).int
+    return "".join(IFC_GUID_CHARS[(value >> shift) & 63] for shift in range(126, -1, -6))
+
+
+def global_id_to_uuid(global_id: str) -> UUID:
+    """Convert an ifcJSON or IFC globalId to a UUID.
+
+    UUIDs are used as they are and compressed IFC GlobalIds are expanded,
+    so an entity keeps the same id whichever form it arrives in. Anything
+    else (hand-written ids such as ``"prop_set_1"``) is hashed.
+    """
+    try:
+        return UUID(global_id)
+    except ValueError:
+        pass
+    if is_ifc_guid(global_id):
+        return expand_guid(global_id)
+    return UUID(hashlib.md5(global_id.encode()).hexdigest())
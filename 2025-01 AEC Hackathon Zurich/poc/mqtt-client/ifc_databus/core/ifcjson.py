@@ -0,0 +1,266 @@
+"""Streaming reader and writer for ifcJSON files.
+
+``json.load`` holds a whole model in memory before the first entity can
+be published. ``IfcJsonReader`` instead decodes the entities of the
+top-level ``data`` array one at a time from a bounded read buffer, so
+memory depends on the largest entity rather than on the file.
+``IfcJsonWriter`` does the same for output: it writes the envelope and
+then encodes the entities one by one as they are produced.
+"""
+import gzip
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Union
+from uuid import UUID, uuid4
+
+from .crdt_automerge import IfcRegister
+from .guid import global_id_to_uuid
+from .ingest import ImportReport, Register, publish_registers
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Envelope members written before the entities, unless given otherwise
+IFCJSON_HEADER = {"type": "ifcJSON", "version": "0.0.1", "schemaIdentifier": "IFC4"}
+
+
+class IfcJsonReader:
+    """Yield the entities of an ifcJSON file one at a time.
+
+    ``source`` is a path (``.gz`` files are decompressed) or a text file
+    object. The other top-level members, such as ``schemaIdentifier`` or
+    ``relationships``, are collected in ``header`` as the reader passes
+    them; members that follow ``data`` are there once iteration finished.
+    """
+
+    def __init__(self, source: Union[str, Path, IO[str]], chunk_size: int = 1 << 16):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.source = source
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._file: Optional[IO[str]] = None
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if isinstance(self.source, (str, Path)):
+            path = Path(self.source)
+            opener = gzip.open if path.suffix == ".gz" else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                yield from self._members(f)
+        else:
+            yield from self._members(self.source)
+
+    def _members(self, f: IO[str]) -> Iterator[Dict[str, Any]]:
+        self._file, self._buffer, self._pos, self._eof = f, "", 0, False
+        self.header = {}
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "data" and self._peek() == "[":
+                yield from self._entities()
+            else:
+                self.header[key] = self._value()
+            if self._expect(",}") == "}":
+                return
+
+    def _entities(self) -> Iterator[Dict[str, Any]]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
+
+    def _fill(self, size: int) -> bool:
+        """Read more input, dropping what was already decoded."""
+        if self._eof:
+            return False
+        chunk = self._file.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> Optional[str]:
+        """The next character after whitespace, None at the end of input."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill(self.chunk_size):
+                return None
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char is None or char not in chars:
+            raise ValueError(f"Invalid ifcJSON: expected one of {chars!r}, found {char!r}")
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        """Decode the next JSON value, reading on until it is complete."""
+        if self._peek() is None:
+            raise ValueError("Invalid ifcJSON: unexpected end of input")
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise ValueError(f"Invalid ifcJSON: {e}") from e
+            # Grow geometrically, so a large entity is decoded in few attempts
+            self._fill(max(self.chunk_size, len(self._buffer) - self._pos))
+
+
+class IfcJsonWriter:
+    """Write an ifcJSON file entity by entity.
+
+    ``target`` is a path (``.gz`` files are compressed) or a text file
+    object. ``indent=None`` writes compact output; with an indent the
+    output is the same as ``json.dump(document, f, indent=indent)``.
+    The ``header`` members are written before the ``data`` array.
+
+    Usage:
+        with IfcJsonWriter("model.json.gz") as writer:
+            writer.write_all(entities)
+    """
+
+    def __init__(
+        self,
+        target: Union[str, Path, IO[str]],
+        header: Optional[Dict[str, Any]] = None,
+        indent: Optional[int] = None,
+        compresslevel: int = 6,
+    ):
+        self.target = target
+        self.header = IFCJSON_HEADER if header is None else header
+        self.indent = indent
+        self.compresslevel = compresslevel
+        self.count = 0
+        if indent is None:
+            self._encoder = json.JSONEncoder(separators=(",", ":"))
+            self._newline, self._item_newline, self._colon = "", "", ":"
+            self._end = "}"
+        else:
+            self._encoder = json.JSONEncoder(indent=indent)
+            self._newline = "\n" + " " * indent
+            self._item_newline = self._newline + " " * indent
+            self._colon = ": "
+            self._end = "\n}"
+        self._file: Optional[IO[str]] = None
+        self._owned = False
+
+    def __enter__(self) -> "IfcJsonWriter":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        """Open the target and write the envelope up to the ``data`` array."""
+        if isinstance(self.target, (str, Path)):
+            path = Path(self.target)
+            if path.suffix == ".gz":
+                self._file = gzip.open(path, "wt", encoding="utf-8", compresslevel=self.compresslevel)
+            else:
+                self._file = open(path, "w", encoding="utf-8", buffering=1 << 20)
+            self._owned = True
+        else:
+            self._file = self.target
+        self._file.write("{")
+        for key, value in self.header.items():
+            if key != "data":
+                self._member(key, value)
+                self._file.write(",")
+        self._file.write(f"{self._newline}\"data\"{self._colon}[")
+
+    def write(self, entity: Dict[str, Any]):
+        """Write one entity to the ``data`` array."""
+        if self._file is None:
+            raise ValueError("IfcJsonWriter is not open")
+        text = self._encoder.encode(entity)
+        if self.indent is not None:
+            # Strings never contain raw newlines, so this only shifts the lines
+            text = text.replace("\n", self._item_newline)
+        self._file.write(("," if self.count else "") + self._item_newline + text)
+        self.count += 1
+
+    def write_all(self, entities: Iterable[Dict[str, Any]]) -> int:
+        """Write entities as they are produced; returns the number written."""
+        start = self.count
+        for entity in entities:
+            self.write(entity)
+        return self.count - start
+
+    def close(self):
+        """Close the ``data`` array and the envelope."""
+        if self._file is None:
+            return
+        self._file.write((self._newline if self.count else "") + "]" + self._end)
+        if self._owned:
+            self._file.close()
+        self._file = None
+
+    def _member(self, key: str, value: Any):
+        text = self._encoder.encode(value)
+        if self.indent is not None:
+            text = text.replace("\n", self._newline)
+        self._file.write(f"{self._newline}{json.dumps(key)}{self._colon}{text}")
+
+
+def iter_ifcjson(source: Union[str, Path, IO[str]], chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Yield the entities of an ifcJSON file one at a time."""
+    return iter(IfcJsonReader(source, chunk_size))
+
+
+def ifcjson_registers(entities: Iterable[Dict[str, Any]]) -> Iterator[Register]:
+    """Turn ifcJSON entities into registers, keyed by their ``globalId``."""
+    for entity in entities:
+        global_id = entity.get("globalId")
+        id = global_id_to_uuid(global_id) if global_id else uuid4()
+        yield id, entity["type"], entity
+
+
+def import_ifcjson(
+    bus,
+    source: Union[str, Path, IO[str]],
+    batch_size: int = 1000,
+    on_batch: Optional[Callable[[List[UUID]], None]] = None,
+    max_errors: int = 100,
+) -> ImportReport:
+    """Publish the entities of an ifcJSON file while it is being read."""
+    return publish_registers(bus, ifcjson_registers(iter_ifcjson(source)), batch_size, on_batch, max_errors)
+
+
+def register_entities(bus) -> Iterator[Dict[str, Any]]:
+    """Yield the registers of a bus as ifcJSON entities, one at a time."""
+    for entity_id in bus.entity_ids():
+        register: Optional[IfcRegister] = bus.get_entity(entity_id)
+        if register is not None:
+            yield {"type": register.entity_type, "globalId": str(entity_id), **register.data}
+
+
+def export_ifcjson(
+    bus,
+    target: Union[str, Path, IO[str]],
+    header: Optional[Dict[str, Any]] = None,
+    indent: Optional[int] = None,
+) -> int:
+    """Write the registers of a bus to an ifcJSON file; returns the number of entities."""
+    with IfcJsonWriter(target, header, indent) as writer:
+        return writer.write_all(register_entities(bus))
@@ -0,0 +1,97 @@
+"""Publishing streams of converted entities onto the bus in batches."""
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from .validator import CompiledValidator
+
+# (id, entity type, ifcJSON data) of one register to publish
+Register = Tuple[UUID, str, Dict[str, Any]]
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Split an iterable into lists of at most ``size`` items."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes, 0 where it cannot be read (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class ImportReport:
+    """Counts and timings of one import."""
+    entities: int = 0
+    rejected: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    first_publish: Optional[float] = None
+    peak_rss: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rate(self) -> float:
+        """Imported entities per second."""
+        return self.entities / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.entities} entities in {self.seconds:.2f} s ({self.rate:,.0f} entities/s), "
+            f"{self.rejected} rejected, {self.batches} batches, peak RSS {self.peak_rss / 2**20:.0f} MB"
+        )
+
+
+def publish_registers(
+    bus,
+    registers: Iterable[Register],
+    batch_size: int = 1000,
+    on_batch: Optional[Callable[[List[UUID]], None]] = None,
+    max_errors: int = 100,
+    validator: Optional[CompiledValidator] = None,
+) -> ImportReport:
+    """Publish a stream of registers with ``publish_entity_with_id`` semantics.
+
+    The stream is consumed one batch at a time and the bus is flushed
+    after each batch, so at most ``batch_size`` converted entities and
+    their queued messages are held at once. Entities that fail validation,
+    by ``validator`` or else the bus's default, are counted and skipped.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    report = ImportReport()
+    start = time.perf_counter()
+    for batch in batched(registers, batch_size):
+        published = []
+        for id, entity_type, data in batch:
+            try:
+                published.append(bus.publish_entity_with_id(id, entity_type, data, validator=validator))
+            except ValueError as e:
+                report.rejected += 1
+                if len(report.errors) < max_errors:
+                    report.errors.append(f"{entity_type} {id}: {e}")
+            else:
+                if report.first_publish is None:
+                    report.first_publish = time.perf_counter() - start
+        bus.flush()
+        report.entities += len(published)
+        report.batches += 1
+        if on_batch:
+            on_batch(published)
+    report.seconds = time.perf_counter() - start
+    report.peak_rss = peak_rss()
+    return report
@@ -0,0 +1,192 @@
+"""Versioned key dictionary encoding for compact ifcJSON payloads."""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .fragment import FragmentOp, apply_ops, as_ops, format_pointer, parse_pointer
+
+# Field names of IFC_RULES in validation.py plus the ifcJSON keys used by
+# the example messages. Ids are positions in this tuple, so it must never
+# be reordered or shrunk; new keys go into a new dictionary version.
+KEYS_V1: Tuple[str, ...] = (
+    # validation.IFC_RULES
+    "Area", "Description", "Height", "Name", "PnIndex", "Position", "Thickness", "Volume",
+    "Width", "associatedTo", "axis", "closed", "coordIndex", "coordList", "coordinates",
+    "data", "description", "directionRatios", "globalId", "hasProperties", "height",
+    "identification", "isVentilated", "items", "layerSetName", "layerThickness", "location",
+    "material", "materialLayers", "name", "nominalValue", "objectPlacement", "placementRelTo",
+    "ref", "refDirection", "relatedObjects", "relatingClassification", "relatingMaterial",
+    "relatingPropertyDefinition", "relativePlacement", "representation",
+    "representationIdentifier", "representationType", "representations", "schemaIdentifier",
+    "thermal_resistance", "type", "value", "version", "width",
+    # ifcJSON keys of the example messages
+    "depth", "extrudedDirection", "position", "profileType", "referencedSource",
+    "sweptArea", "xDim", "yDim",
+)
+
+# Prefix that marks a literal key which would otherwise look like an id
+ESCAPE = "~"
+
+
+def ifcjson_name(attribute: str) -> str:
+    """Convert an EXPRESS attribute name to its ifcJSON key (lower camel case)."""
+    return attribute[:1].lower() + attribute[1:]
+
+
+@dataclass(frozen=True)
+class KeyDictionary:
+    """Append-only mapping between ifcJSON field names and small integer ids.
+
+    Encoded keys are the decimal string of the id, since JSON objects and
+    automerge maps need string keys. Keys that are not in the dictionary
+    are kept as they are, escaped with ``~`` if they could be mistaken for
+    an id. Because versions only ever append, a newer dictionary decodes
+    everything an older one encoded.
+    """
+    version: int
+    keys: Tuple[str, ...]
+    _ids: Dict[str, str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if len(set(self.keys)) != len(self.keys):
+            raise ValueError("Key dictionary contains duplicate keys")
+        object.__setattr__(self, "_ids", {key: str(i) for i, key in enumerate(self.keys)})
+
+    def encode_key(self, key: str) -> str:
+        """Encode a single field name."""
+        encoded = self._ids.get(key)
+        if encoded is not None:
+            return encoded
+        if key[:1].isdigit() or key.startswith(ESCAPE):
+            return ESCAPE + key
+        return key
+
+    def decode_key(self, key: str) -> str:
+        """Decode a single field name."""
+        if key.startswith(ESCAPE):
+            return key[1:]
+        if key.isdigit():
+            idx = int(key)
+            if idx >= len(self.keys):
+                raise ValueError(f"Unknown key id {key} for key dictionary version {self.version}")
+            return self.keys[idx]
+        return key
+
+    def encode(self, value: Any) -> Any:
+        """Encode the field names of a nested ifcJSON value."""
+        if isinstance(value, dict):
+            return {self.encode_key(str(k)): self.encode(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.encode(v) for v in value]
+        return value
+
+    def decode(self, value: Any) -> Any:
+        """Restore the field names of an encoded nested value."""
+        if isinstance(value, dict):
+            return {self.decode_key(k): self.decode(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.decode(v) for v in value]
+        return value
+
+    def encode_ops(self, ops: Iterable[FragmentOp], data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Encode the path segments and values of fragment operations on ``data``.
+
+        Tokens that index into a list stay as they are, so the paths are
+        resolved against ``data``, the plain entity before the operations.
+        """
+        return self._translate_ops(ops, data, encoding=True)
+
+    def decode_ops(self, ops: Iterable[Dict[str, Any]], data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Restore the field names of encoded fragment operations on ``data``."""
+        return self._translate_ops(ops, data, encoding=False)
+
+    def _translate_ops(self, ops, data: Dict[str, Any], encoding: bool) -> List[Dict[str, Any]]:
+        result = []
+        for op in as_ops(ops):
+            parent: Any = data
+            plain_tokens, tokens = [], []
+            for token in parse_pointer(op.path):
+                if isinstance(parent, list):
+                    plain = token
+                    parent = parent[int(token)] if token.isdigit() and int(token) < len(parent) else None
+                else:
+                    plain = token if encoding else self.decode_key(token)
+                    token = self.encode_key(token) if encoding else plain
+                    parent = parent.get(plain) if isinstance(parent, dict) else None
+                plain_tokens.append(plain)
+                tokens.append(token)
+            value = self.encode(op.value) if encoding else self.decode(op.value)
+            plain_op = FragmentOp(op.op, format_pointer(plain_tokens), op.value if encoding else value)
+            result.append(FragmentOp(op.op, format_pointer(tokens), value).to_dict())
+            # Later operations resolve against the data as this one left it
+            data = apply_ops(data, [plain_op])
+        return result
+
+    def encode_relationships(self, relationships: Mapping[str, Mapping[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Encode relationship types and relationship data; target ids stay as they are."""
+        return {self.encode_key(rel_type): {target: self.encode(rel_data) for target, rel_data in targets.items()}
+                for rel_type, targets in relationships.items()}
+
+    def decode_relationships(self, relationships: Mapping[str, Mapping[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Restore the relationship types and data of encoded relationships."""
+        return {self.decode_key(rel_type): {target: self.decode(rel_data) for target, rel_data in targets.items()}
+                for rel_type, targets in relationships.items()}
+
+    def extend(self, keys: Iterable[str]) -> "KeyDictionary":
+        """Create the next version with the given keys appended."""
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._ids]
+        return KeyDictionary(self.version + 1, self.keys + tuple(new_keys))
+
+    def extend_from_schema(self, schema: str = "IFC4") -> "KeyDictionary":
+        """Create the next version with every attribute name of an IFC schema."""
+        import ifcopenshell.ifcopenshell_wrapper as wrapper
+
+        names = set()
+        for declaration in wrapper.schema_by_name(schema).entities():
+            names.update(ifcjson_name(attr.name()) for attr in declaration.attributes())
+            names.update(ifcjson_name(attr.name()) for attr in declaration.all_inverse_attributes())
+        return self.extend(sorted(names))
+
+
+DEFAULT_KEY_DICTIONARY = KeyDictionary(1, KEYS_V1)
+
+# Known dictionaries by version, used to decode incoming data
+KEY_DICTIONARIES: Dict[int, KeyDictionary] = {DEFAULT_KEY_DICTIONARY.version: DEFAULT_KEY_DICTIONARY}
+
+
+def register_key_dictionary(dictionary: KeyDictionary) -> KeyDictionary:
+    """Make a dictionary version available for decoding."""
+    known = KEY_DICTIONARIES.get(dictionary.version)
+    if known is not None and known.keys != dictionary.keys:
+        raise ValueError(f"Conflicting key dictionary for version {dictionary.version}")
+    KEY_DICTIONARIES[dictionary.version] = dictionary
+    return dictionary
+
+
+def get_key_dictionary(version: Optional[int]) -> Optional[KeyDictionary]:
+    """Look up a dictionary by version; ``None`` means plain field names."""
+    if version is None:
+        return None
+    if version not in KEY_DICTIONARIES:
+        raise ValueError(f"Unknown key dictionary version: {version}")
+    return KEY_DICTIONARIES[version]
+
+
+def decode_payload_data(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the plain ``data`` of a bus message, honouring its dictionary header."""
+    dictionary = get_key_dictionary(payload.get("key_dict_version"))
+    data = payload.get("data", {})
+    return dictionary.decode(data) if dictionary else data
+
+
+def decode_payload_ops(payload: Dict[str, Any], data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the plain fragment ``ops`` of a bus message, resolved against the entity ``data``."""
+    dictionary = get_key_dictionary(payload.get("key_dict_version"))
+    ops = payload.get("ops", [])
+    return dictionary.decode_ops(ops, data) if dictionary else ops
+
+
+def decode_payload_relationships(payload: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Return the plain ``relationships`` of a bus message, honouring its dictionary header."""
+    dictionary = get_key_dictionary(payload.get("key_dict_version"))
+    relationships = payload.get("relationships", {})
+    return dictionary.decode_relationships(relationships) if dictionary else relationships
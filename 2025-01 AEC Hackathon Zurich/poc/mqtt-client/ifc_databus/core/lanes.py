@@ -0,0 +1,225 @@
+"""Priority lanes for outbound IFC messages."""
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, Optional
+import threading
+import time
+
+
+class Priority(str, Enum):
+    """Traffic classes, each with its own topic suffix and outbound queue."""
+    CONTROL = "control"
+    SEMANTIC = "semantic"
+    BULK = "bulk"
+
+    @property
+    def topic_suffix(self) -> str:
+        return self.value
+
+
+# Drain order of the lanes within one scheduler round
+LANE_ORDER = (Priority.CONTROL, Priority.SEMANTIC, Priority.BULK)
+
+# Relative share of the link each lane gets while several lanes are busy
+DEFAULT_WEIGHTS: Dict[Priority, int] = {
+    Priority.CONTROL: 16,
+    Priority.SEMANTIC: 8,
+    Priority.BULK: 1,
+}
+
+# Bytes credited per weight unit and scheduler round
+DEFAULT_QUANTUM = 16 * 1024
+
+# Operations that carry no entity payload of their own
+CONTROL_OPERATIONS = {"add_relationship", "remove_relationship", "delete"}
+
+# Entity types and fields that carry tessellated geometry
+GEOMETRY_TYPES = {
+    "IfcTriangulatedFaceSet",
+    "IfcCartesianPointList3D",
+    "IfcShapeRepresentation",
+    "IfcProductDefinitionShape",
+}
+GEOMETRY_FIELDS = {"representation", "representations", "coordinates", "coordList", "coordIndex", "items"}
+
+
+def classify(operation_type: str, entity_type: str, data: Dict[str, Any]) -> Priority:
+    """Pick the lane for a message when the caller did not choose one."""
+    if operation_type in CONTROL_OPERATIONS:
+        return Priority.CONTROL
+    if entity_type in GEOMETRY_TYPES or GEOMETRY_FIELDS.intersection(data):
+        return Priority.BULK
+    return Priority.SEMANTIC
+
+
+@dataclass
+class _Lane:
+    weight: int
+    queue: Deque = field(default_factory=deque)
+    deficit: int = 0
+
+
+class LaneScheduler:
+    """Weighted deficit round-robin scheduler draining one queue per priority.
+
+    Every round each busy lane is credited ``weight * quantum`` bytes and may
+    send queued messages while its credit covers them. A large geometry
+    message therefore waits for its credit to build up while small semantic
+    and control messages keep flowing past it.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, Dict[str, Any]], None],
+        weights: Optional[Dict[Priority, int]] = None,
+        quantum: int = DEFAULT_QUANTUM,
+    ):
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self._send = send
+        self._quantum = quantum
+        self._lanes = {priority: _Lane(weights[priority]) for priority in LANE_ORDER}
+        # Queued message count per key (entity id) and lane
+        self._queued: Dict[Hashable, Dict[Priority, int]] = {}
+        self._cursor = 0
+        self._fresh_visit = True
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._sending = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def pending(self, priority: Optional[Priority] = None) -> int:
+        """Number of queued messages, for one lane or for all of them."""
+        with self._cond:
+            if priority is not None:
+                return len(self._lanes[Priority(priority)].queue)
+            return sum(len(lane.queue) for lane in self._lanes.values())
+
+    def queued_lane(self, key: Hashable) -> Optional[Priority]:
+        """Least urgent lane that still holds a message queued under ``key``."""
+        with self._cond:
+            lanes = self._queued.get(key)
+            return max(lanes, key=LANE_ORDER.index) if lanes else None
+
+    def enqueue(
+        self,
+        priority: Priority,
+        topic_name: str,
+        msg_dict: Dict[str, Any],
+        size: int,
+        keys: Iterable[Hashable] = (),
+    ) -> None:
+        """Queue a message on the lane of the given priority.
+
+        ``keys`` (entity ids) are counted while the message is queued, see
+        ``queued_lane``.
+        """
+        priority = Priority(priority)
+        keys = tuple(keys)
+        with self._cond:
+            for key in keys:
+                lanes = self._queued.setdefault(key, {})
+                lanes[priority] = lanes.get(priority, 0) + 1
+            self._lanes[priority].queue.append((topic_name, msg_dict, max(int(size), 1), keys))
+            self._cond.notify_all()
+
+    def _dequeued(self, priority: Priority, keys) -> None:
+        for key in keys:
+            lanes = self._queued[key]
+            lanes[priority] -= 1
+            if not lanes[priority]:
+                del lanes[priority]
+                if not lanes:
+                    del self._queued[key]
+
+    def _select(self):
+        """Pop the next message according to the deficit round-robin state."""
+        if not any(lane.queue for lane in self._lanes.values()):
+            return None
+        while True:
+            priority = LANE_ORDER[self._cursor]
+            lane = self._lanes[priority]
+            if lane.queue:
+                # Credit the lane once per visit, then let it send while the credit lasts
+                if self._fresh_visit:
+                    lane.deficit += lane.weight * self._quantum
+                    self._fresh_visit = False
+                if lane.queue[0][2] <= lane.deficit:
+                    topic_name, msg_dict, size, keys = lane.queue.popleft()
+                    self._dequeued(priority, keys)
+                    lane.deficit -= size
+                    if not lane.queue:
+                        lane.deficit = 0
+                    return topic_name, msg_dict
+            else:
+                lane.deficit = 0
+            self._cursor = (self._cursor + 1) % len(LANE_ORDER)
+            self._fresh_visit = True
+
+    def drain(self, max_messages: Optional[int] = None) -> int:
+        """Send queued messages in scheduler order on the calling thread."""
+        sent = 0
+        while max_messages is None or sent < max_messages:
+            with self._cond:
+                item = self._select()
+                if item is None:
+                    break
+                self._sending = True
+            try:
+                self._send(*item)
+            finally:
+                with self._cond:
+                    self._sending = False
+                    self._cond.notify_all()
+            sent += 1
+        return sent
+
+    def start(self) -> None:
+        """Drain the queues continuously from a background sender thread."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="ifc-bus-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True) -> None:
+        """Stop the sender thread, optionally sending what is still queued."""
+        if flush:
+            self.flush()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued message has been sent."""
+        if not self._running:
+            self.drain()
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._sending or any(lane.queue for lane in self._lanes.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and not any(lane.queue for lane in self._lanes.values()):
+                    self._cond.wait()
+                if not self._running:
+                    return
+            try:
+                self.drain(max_messages=1)
+            except Exception as e:
+                print(f"Error sending message: {e}")
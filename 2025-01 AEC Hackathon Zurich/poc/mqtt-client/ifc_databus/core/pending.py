@@ -0,0 +1,198 @@
+"""Operations parked until the entities they depend on arrive.
+
+Entities, relationships, references and change deltas reach a replica
+in any order: messages on different lanes overtake each other, and
+parallel imports publish in whatever order their workers finish. An
+operation that needs entities this replica does not have yet is parked
+here, indexed by each missing id, and applied as soon as the last of them
+arrives. A delta whose earlier changes are missing waits on its own
+entity and is retried whenever that entity changes.
+
+Parked operations expire after ``ttl`` seconds, and at most
+``max_items`` are kept; the oldest are dropped first.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set
+from uuid import UUID
+
+from .guid import global_id_to_uuid
+
+
+@dataclass
+class PendingItem:
+    """An operation waiting for entities."""
+    key: Hashable
+    missing: Set[UUID]
+    apply: Callable[[], Any]
+    parked: float
+    expires: float
+
+
+@dataclass
+class PendingReport:
+    """Depth and outcome counts of the pending buffer."""
+    depth: int = 0
+    missing: int = 0
+    oldest: float = 0.0
+    applied: int = 0
+    failed: int = 0
+    expired: int = 0
+    dropped: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.depth} pending on {self.missing} missing entities (oldest {self.oldest:.1f} s), "
+            f"{self.applied} applied, {self.failed} failed, {self.expired} expired, {self.dropped} dropped"
+        )
+
+
+class PendingDependencies:
+    """Park operations by the ids they wait for and apply them on arrival.
+
+    An operation parked again under the same key replaces the earlier one
+    and its expiry starts over.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        max_items: int = 100_000,
+        max_errors: int = 100,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_items < 1:
+            raise ValueError("max_items must be at least 1")
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_errors = max_errors
+        self.clock = clock
+        # In expiry order, since every item lives for the same ttl
+        self._items: "OrderedDict[Hashable, PendingItem]" = OrderedDict()
+        self._waiting: Dict[UUID, Dict[Hashable, PendingItem]] = {}
+        self._report = PendingReport()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def waiting_on(self, entity_id: UUID) -> int:
+        """Number of operations waiting for an entity."""
+        return len(self._waiting.get(entity_id, ()))
+
+    def park(self, key: Hashable, missing: Iterable[UUID], apply: Callable[[], Any]) -> PendingItem:
+        """Park an operation until all ``missing`` entities have arrived."""
+        now = self.clock()
+        self.expire(now)
+        if key in self._items:
+            self._discard(self._items.pop(key))
+        elif len(self._items) >= self.max_items:
+            _, oldest = self._items.popitem(last=False)
+            self._discard(oldest)
+            self._report.dropped += 1
+        item = PendingItem(key, set(missing), apply, now, now + self.ttl)
+        self._items[key] = item
+        for entity_id in item.missing:
+            self._waiting.setdefault(entity_id, {})[key] = item
+        return item
+
+    def cancel(self, key: Hashable) -> bool:
+        """Drop a parked operation; returns whether it was pending."""
+        item = self._items.pop(key, None)
+        if item is None:
+            return False
+        self._discard(item)
+        return True
+
+    def resolve(self, entity_id: UUID, exists: Callable[[UUID], bool]) -> int:
+        """Apply the operations that were waiting only for ``entity_id``.
+
+        ``exists`` re-checks their other dependencies. Returns the number
+        of operations applied.
+        """
+        self.expire()
+        waiting = self._waiting.pop(entity_id, None)
+        if not waiting:
+            return 0
+        applied = 0
+        for key, item in waiting.items():
+            if self._items.get(key) is not item:
+                # Replaced or expired by an operation applied before it
+                continue
+            item.missing.discard(entity_id)
+            arrived = {other for other in item.missing if exists(other)}
+            if arrived:
+                self._discard(item, arrived)
+                item.missing -= arrived
+            if item.missing:
+                continue
+            del self._items[key]
+            try:
+                item.apply()
+            except ValueError as e:
+                self._report.failed += 1
+                if len(self._report.errors) < self.max_errors:
+                    self._report.errors.append(f"{key}: {e}")
+            else:
+                applied += 1
+        self._report.applied += applied
+        return applied
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop the operations whose time ran out; returns how many."""
+        now = self.clock() if now is None else now
+        expired = 0
+        while self._items:
+            key, item = next(iter(self._items.items()))
+            if item.expires > now:
+                break
+            del self._items[key]
+            self._discard(item)
+            expired += 1
+        self._report.expired += expired
+        return expired
+
+    def report(self) -> PendingReport:
+        """Current depth and the counts since the buffer was created."""
+        self.expire()
+        report = PendingReport(**{**self._report.__dict__, "errors": list(self._report.errors)})
+        report.depth = len(self._items)
+        report.missing = len(self._waiting)
+        if self._items:
+            report.oldest = self.clock() - next(iter(self._items.values())).parked
+        return report
+
+    def _discard(self, item: PendingItem, entity_ids: Optional[Iterable[UUID]] = None):
+        """Remove an item from the index of the given ids, by default all it waits for."""
+        for entity_id in item.missing if entity_ids is None else entity_ids:
+            waiting = self._waiting.get(entity_id)
+            if waiting is not None and waiting.get(item.key) is item:
+                del waiting[item.key]
+                if not waiting:
+                    del self._waiting[entity_id]
+
+
+def data_refs(data: Any, skip: Iterable[str] = ("objectPlacement",)) -> Set[UUID]:
+    """Ids of the entities referenced as ``{"ref": ...}`` anywhere in entity data.
+
+    Top-level fields in ``skip`` are not searched; placement refs name
+    shared placements rather than entities.
+    """
+    refs: Set[UUID] = set()
+    skip = set(skip)
+    stack = [value for key, value in data.items() if key not in skip] if isinstance(data, dict) else [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            ref = value.get("ref")
+            if ref is not None:
+                refs.add(ref if isinstance(ref, UUID) else global_id_to_uuid(str(ref)))
+            stack.extend(value.values())
+        elif isinstance(value, list) and value and isinstance(value[0], (dict, list)):
+            # Lists of numbers, such as coordinates, cannot hold refs
+            stack.extend(value)
+    return refs
@@ -0,0 +1,240 @@
+"""Placement matrices and a cached resolver for the placement tree."""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# Longest inline placementRelTo chain that is followed
+MAX_INLINE_DEPTH = 64
+
+
+def unit_vector(values: Optional[Sequence[float]], default: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(values if values is not None else default, dtype=float)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else np.asarray(default, dtype=float)
+
+
+def axis2_placement_matrix(placement: Optional[Dict[str, Any]]) -> np.ndarray:
+    """4x4 matrix of an ``IfcAxis2Placement3D`` (or 2D) in ifcJSON."""
+    matrix = np.eye(4)
+    if not isinstance(placement, dict):
+        return matrix
+    location = (placement.get("location") or {}).get("coordinates", [0.0, 0.0, 0.0])
+    axis = (placement.get("axis") or {}).get("directionRatios")
+    ref = (placement.get("refDirection") or {}).get("directionRatios")
+    z = unit_vector(axis, (0.0, 0.0, 1.0))
+    x = unit_vector(list(ref) + [0.0] * (3 - len(ref)) if ref else None, (1.0, 0.0, 0.0))
+    x = x - np.dot(x, z) * z
+    x = unit_vector(x, (1.0, 0.0, 0.0) if abs(z[0]) < 0.9 else (0.0, 1.0, 0.0))
+    matrix[:3, 0] = x
+    matrix[:3, 1] = np.cross(z, x)
+    matrix[:3, 2] = z
+    matrix[:len(location), 3] = location
+    return matrix
+
+
+def split_placement(placement: Optional[Dict[str, Any]]) -> Tuple[np.ndarray, Optional[str]]:
+    """Fold the inline part of an ``IfcLocalPlacement`` chain.
+
+    Returns the matrix relative to the first ``{"ref": ...}`` parent and
+    that parent's id, or None if the chain ends at the world origin.
+    """
+    matrix = np.eye(4)
+    depth = 0
+    while isinstance(placement, dict) and depth < MAX_INLINE_DEPTH:
+        if "ref" in placement:
+            return matrix, placement["ref"]
+        matrix = axis2_placement_matrix(placement.get("relativePlacement")) @ matrix
+        placement = placement.get("placementRelTo")
+        depth += 1
+    return matrix, None
+
+
+def placement_ref(placement: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Id of the first ``{"ref": ...}`` parent of an inline placement chain."""
+    depth = 0
+    while isinstance(placement, dict) and depth < MAX_INLINE_DEPTH:
+        if "ref" in placement:
+            return placement["ref"]
+        placement = placement.get("placementRelTo")
+        depth += 1
+    return None
+
+
+def local_placement_matrix(placement: Optional[Dict[str, Any]], resolve_ref=None) -> np.ndarray:
+    """World matrix of an ``IfcLocalPlacement``, following inline ``placementRelTo`` parents.
+
+    Parents given as ``{"ref": ...}`` are looked up with ``resolve_ref``
+    (e.g. ``PlacementResolver.world``); without a resolver, or for unknown
+    refs, they count as the world origin.
+    """
+    matrix, ref = split_placement(placement)
+    if ref is None or resolve_ref is None:
+        return matrix
+    parent = resolve_ref(ref)
+    return matrix if parent is None else parent @ matrix
+
+
+class PlacementResolver:
+    """World matrices of a placement tree, cached and resolved in batches.
+
+    Every placement has a local 4x4 matrix and an optional parent id. Local
+    and world matrices live in stacked NumPy arrays; invalid world matrices
+    are recomputed one tree level at a time with a single batched matrix
+    product per level. Changing a placement invalidates only its subtree.
+    A parent that is not known yet counts as the world origin until it is
+    set.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._local = np.zeros((capacity, 4, 4))
+        self._world = np.zeros((capacity, 4, 4))
+        self._parent = np.full(capacity, -1, dtype=np.int64)
+        self._valid = np.ones(capacity, dtype=bool)
+        self._parent_ids: Dict[str, Optional[str]] = {}
+        self._children: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, placement_id: object) -> bool:
+        return placement_id in self._slots
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._parent)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        extra = capacity - len(self._parent)
+        self._local = np.concatenate([self._local, np.zeros((extra, 4, 4))])
+        self._world = np.concatenate([self._world, np.zeros((extra, 4, 4))])
+        self._parent = np.concatenate([self._parent, np.full(extra, -1, dtype=np.int64)])
+        self._valid = np.concatenate([self._valid, np.ones(extra, dtype=bool)])
+
+    def _slot(self, placement_id: str) -> int:
+        slot = self._slots.get(placement_id)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = placement_id
+        else:
+            slot = len(self._ids)
+            self._grow(slot + 1)
+            self._ids.append(placement_id)
+        self._slots[placement_id] = slot
+        # Children that were set before this parent now hang below it
+        for child in self._children.get(placement_id, ()):
+            self._parent[self._slots[child]] = slot
+        return slot
+
+    def _link(self, placement_id: str, parent_id: Optional[str]) -> None:
+        old = self._parent_ids.get(placement_id)
+        if old is not None and old != parent_id:
+            children = self._children.get(old)
+            if children is not None:
+                children.discard(placement_id)
+                if not children:
+                    del self._children[old]
+        self._parent_ids[placement_id] = parent_id
+        if parent_id is not None:
+            self._children.setdefault(parent_id, set()).add(placement_id)
+
+    def set(self, placement_id: str, matrix: Any, parent_id: Optional[str] = None) -> None:
+        """Set the local matrix and parent of a placement."""
+        slot = self._slot(placement_id)
+        self._link(placement_id, parent_id)
+        self._local[slot] = matrix
+        self._parent[slot] = self._slots.get(parent_id, -1) if parent_id is not None else -1
+        self.invalidate(placement_id)
+
+    def set_placement(self, placement_id: str, placement: Dict[str, Any]) -> None:
+        """Set a placement from an ifcJSON ``IfcLocalPlacement``."""
+        matrix, parent_id = split_placement(placement)
+        self.set(placement_id, matrix, parent_id)
+
+    def load(self, ids: Sequence[str], parent_ids: Sequence[Optional[str]], matrices: Any) -> None:
+        """Set many placements at once, e.g. a whole model."""
+        matrices = np.asarray(matrices, dtype=float).reshape(-1, 4, 4)
+        slots = np.fromiter((self._slot(i) for i in ids), dtype=np.int64, count=len(ids))
+        for placement_id, parent_id in zip(ids, parent_ids):
+            self._link(placement_id, parent_id)
+        self._local[slots] = matrices
+        self._parent[slots] = [self._slots.get(p, -1) if p is not None else -1 for p in parent_ids]
+        self._valid[slots] = False
+        for placement_id in ids:
+            if placement_id in self._children:
+                self.invalidate(placement_id)
+
+    def remove(self, placement_id: str) -> None:
+        """Remove a placement; its children then count as roots."""
+        slot = self._slots.get(placement_id)
+        if slot is None:
+            return
+        self.invalidate(placement_id)
+        self._link(placement_id, None)
+        del self._parent_ids[placement_id]
+        for child in self._children.get(placement_id, ()):
+            self._parent[self._slots[child]] = -1
+        del self._slots[placement_id]
+        self._ids[slot] = None
+        self._parent[slot] = -1
+        self._valid[slot] = True
+        self._free.append(slot)
+
+    def descendants(self, placement_id: str) -> Set[str]:
+        """Ids of every placement below a placement."""
+        found: Set[str] = set()
+        stack = [placement_id]
+        children = self._children
+        while stack:
+            for child in children.get(stack.pop(), ()):
+                if child not in found:
+                    found.add(child)
+                    stack.append(child)
+        return found
+
+    def invalidate(self, placement_id: str) -> int:
+        """Drop the cached world matrices of a placement and its subtree."""
+        subtree = self.descendants(placement_id)
+        subtree.add(placement_id)
+        slots = [self._slots[i] for i in subtree if i in self._slots]
+        self._valid[slots] = False
+        return len(slots)
+
+    def resolve(self) -> int:
+        """Recompute every invalid world matrix; returns how many were computed."""
+        pending = np.nonzero(~self._valid[:len(self._ids)])[0]
+        computed = len(pending)
+        while len(pending):
+            parents = self._parent[pending]
+            ready = (parents < 0) | self._valid[np.maximum(parents, 0)]
+            if not ready.any():
+                print(f"Placement cycle through {self._ids[pending[0]]}, resolving it from the origin")
+                ready[0] = True
+                parents[0] = -1
+            slots, parents = pending[ready], parents[ready]
+            nested = parents >= 0
+            self._world[slots[~nested]] = self._local[slots[~nested]]
+            self._world[slots[nested]] = self._world[parents[nested]] @ self._local[slots[nested]]
+            self._valid[slots] = True
+            pending = pending[~ready]
+        return computed
+
+    def world(self, placement_id: str) -> Optional[np.ndarray]:
+        """World matrix of a placement, or None if it is unknown."""
+        slot = self._slots.get(placement_id)
+        if slot is None:
+            return None
+        if not self._valid[slot]:
+            self.resolve()
+        return self._world[slot].copy()
+
+    def world_many(self, placement_ids: Iterable[str]) -> np.ndarray:
+        """World matrices of many placements as an ``(n, 4, 4)`` array."""
+        slots = np.fromiter((self._slots[i] for i in placement_ids), dtype=np.int64)
+        if not self._valid[slots].all():
+            self.resolve()
+        return self._world[slots]
@@ -0,0 +1,345 @@
+"""Incremental quantity take-off with materialized aggregate views."""
+from dataclasses import dataclass, field
+from types import MappingProxyType
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Set, Tuple
+from uuid import UUID
+
+from .refs import RefResolver, object_items
+
+# Entity types that carry material layers
+LAYER_SET_TYPES = {"IfcMaterialLayerSet", "IfcMaterialLayerSetUsage"}
+
+# Names of IfcElementQuantity members read as wall dimensions
+QUANTITY_NAMES = {
+    "Length": "length",
+    "Height": "height",
+    "Width": "thickness",
+    "NetSideArea": "area",
+    "GrossSideArea": "area",
+    "NetVolume": "volume",
+    "GrossVolume": "volume",
+}
+
+# (material name, layer thickness)
+Layer = Tuple[Optional[str], float]
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, dict):
+        value = value.get("value")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def layer_items(material: Any) -> Optional[List[Dict[str, Any]]]:
+    """``IfcMaterialLayer`` objects of a layer set or layer set usage, or None."""
+    if not isinstance(material, dict):
+        return None
+    if material.get("type") == "IfcMaterialLayerSetUsage" or "forLayerSet" in material:
+        return layer_items(material.get("forLayerSet"))
+    if "materialLayers" not in material:
+        return None
+    layers = object_items(material.get("materialLayers"))
+    return [layer for layer in layers if _number(layer.get("layerThickness")) is not None]
+
+
+def layer_material(layer: Dict[str, Any]) -> Optional[str]:
+    """Material name of an ``IfcMaterialLayer``."""
+    material = layer.get("material")
+    return material.get("name") if isinstance(material, dict) else None
+
+
+def layers_of(material: Any) -> Optional[List[Layer]]:
+    """Layers of an ``IfcMaterialLayerSet`` or ``IfcMaterialLayerSetUsage``, or None."""
+    items = layer_items(material)
+    if items is None:
+        return None
+    return [(layer_material(layer), _number(layer.get("layerThickness"))) for layer in items]
+
+
+def resolve_layer_items(data: Dict[str, Any], related: Iterable[Dict[str, Any]] = ()) -> List[Dict[str, Any]]:
+    """``IfcMaterialLayer`` objects of an element.
+
+    Layers are read from inline ``materialLayers``, from the relating
+    material of inline ``hasAssociations``, and then from related
+    ``IfcRelAssociatesMaterial`` entities (``associatedTo``) and layer
+    sets, whichever comes first.
+    """
+    related = list(related)
+    associations = object_items(data.get("hasAssociations"))
+    associations += [r for r in related if r.get("type") == "IfcRelAssociatesMaterial"]
+    candidates = [data]
+    candidates += [rel.get("relatingMaterial") for rel in associations]
+    candidates += [r for r in related if r.get("type") in LAYER_SET_TYPES]
+    for candidate in candidates:
+        items = layer_items(candidate)
+        if items:
+            return items
+    return []
+
+
+def resolve_layers(data: Dict[str, Any], related: Iterable[Dict[str, Any]] = ()) -> List[Layer]:
+    """Material layers of an element as ``(material name, thickness)`` pairs."""
+    return [(layer_material(layer), _number(layer.get("layerThickness")))
+            for layer in resolve_layer_items(data, related)]
+
+
+def related_entities(
+    entity: Any,
+    lookup: Callable[[UUID], Any],
+    resolver: Optional[RefResolver] = None,
+    entity_id: Optional[UUID] = None,
+) -> Tuple[List[Dict[str, Any]], Set[UUID]]:
+    """Data of the registers an entity has relationships to, and their ids.
+
+    Given a ``RefResolver``, this includes the materials and property
+    definitions that relationship registers listing the entity in
+    ``relatedObjects`` relate it to (e.g. the ``IfcRelAssociatesMaterial``
+    of an IFC-SPF import), see ``RefResolver.related_via_relationships``.
+    """
+    related, reads = [], set()
+    for targets in entity.relationships.values():
+        for target_id in targets:
+            target_id = UUID(target_id) if not isinstance(target_id, UUID) else target_id
+            reads.add(target_id)
+            target = lookup(target_id)
+            if target is not None:
+                related.append({"type": target.entity_type, **target.data})
+    if resolver is not None and entity_id is not None:
+        objects, rel_reads = resolver.related_via_relationships(entity_id)
+        related.extend(objects)
+        reads |= rel_reads
+    return related, reads
+
+
+@dataclass
+class TakeOff:
+    """Dimensions and material layers of one element.
+
+    Lengths are in model units; ``area`` is the side area and ``volume``
+    the gross volume, both derived from the dimensions when not given.
+    """
+    entity_type: str
+    object_type: Optional[str] = None
+    length: Optional[float] = None
+    height: Optional[float] = None
+    thickness: Optional[float] = None
+    area: Optional[float] = None
+    volume: Optional[float] = None
+    layers: List[Layer] = field(default_factory=list)
+
+    @classmethod
+    def of(cls, entity_type: str, data: Dict[str, Any], related: Iterable[Dict[str, Any]] = ()) -> "TakeOff":
+        """Take off an element from its ifcJSON data and related entities."""
+        related = list(related)
+        take_off = cls(entity_type, object_type=data.get("objectType") or data.get("predefinedType"))
+        for name in ("length", "height", "thickness", "area", "volume"):
+            setattr(take_off, name, _number(data.get(name)))
+        if take_off.thickness is None:
+            take_off.thickness = _number(data.get("width"))
+        take_off._read_quantities(data, related)
+        take_off._read_extrusion(data)
+        take_off.layers = resolve_layers(data, related)
+        if take_off.thickness is None and take_off.layers:
+            take_off.thickness = sum(thickness for _, thickness in take_off.layers)
+        if take_off.area is None and take_off.length is not None and take_off.height is not None:
+            take_off.area = take_off.length * take_off.height
+        if take_off.volume is None and take_off.area is not None and take_off.thickness is not None:
+            take_off.volume = take_off.area * take_off.thickness
+        return take_off
+
+    def _read_quantities(self, data: Dict[str, Any], related: List[Dict[str, Any]]) -> None:
+        definitions = [rel.get("relatingPropertyDefinition") for rel in object_items(data.get("isDefinedBy"))]
+        for definition in definitions + related:
+            for quantity_set in object_items(definition):
+                for quantity in object_items(quantity_set.get("quantities")):
+                    name = QUANTITY_NAMES.get(quantity.get("name"))
+                    if name is None or getattr(self, name) is not None:
+                        continue
+                    value = next((quantity[k] for k in ("lengthValue", "areaValue", "volumeValue") if k in quantity),
+                                 None)
+                    setattr(self, name, _number(value))
+
+    def _read_extrusion(self, data: Dict[str, Any]) -> None:
+        representation = data.get("representation")
+        if not isinstance(representation, dict):
+            return
+        for shape in object_items(representation.get("representations")):
+            for item in object_items(shape.get("items")):
+                profile = item.get("sweptArea")
+                if item.get("type") != "IfcExtrudedAreaSolid" or not isinstance(profile, dict):
+                    continue
+                if profile.get("type") == "IfcRectangleProfileDef":
+                    self.length = self.length if self.length is not None else _number(profile.get("xDim"))
+                    self.thickness = self.thickness if self.thickness is not None else _number(profile.get("yDim"))
+                    self.height = self.height if self.height is not None else _number(item.get("depth"))
+                    return
+
+
+def volume_by_material(take_off: TakeOff) -> Iterable[Tuple[Hashable, float]]:
+    """Layer volumes (side area times layer thickness) per material name."""
+    if take_off.area is None:
+        return ()
+    return [(name, take_off.area * thickness) for name, thickness in take_off.layers if name is not None]
+
+
+def area_by_type(take_off: TakeOff) -> Iterable[Tuple[Hashable, float]]:
+    """Side area per object type, or per entity type for untyped elements."""
+    if take_off.area is None:
+        return ()
+    return [(take_off.object_type or take_off.entity_type, take_off.area)]
+
+
+# Views every QuantityTakeOff starts with
+DEFAULT_VIEWS: Dict[str, Callable[[TakeOff], Iterable[Tuple[Hashable, float]]]] = {
+    "volume_by_material": volume_by_material,
+    "area_by_type": area_by_type,
+}
+
+
+class MaterializedView:
+    """Totals of one quantity per group, kept current by applying deltas.
+
+    Each entity's contributions are remembered, so a change subtracts the
+    old contributions and adds the new ones instead of re-aggregating.
+    ``snapshot()`` returns a read-only mapping in constant time; the next
+    write copies the totals first (copy on write), so a snapshot never
+    changes while it is being read. Snapshots and writes may come from
+    different threads; a lock makes the copy decision and the write atomic.
+    """
+
+    def __init__(self, name: str, contributions: Callable[[TakeOff], Iterable[Tuple[Hashable, float]]]):
+        self.name = name
+        self.contributions = contributions
+        self.version = 0
+        self._totals: Dict[Hashable, float] = {}
+        self._counts: Dict[Hashable, int] = {}
+        self._by_entity: Dict[UUID, Dict[Hashable, float]] = {}
+        self._shared = False
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: Hashable) -> float:
+        return self._totals[key]
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    def get(self, key: Hashable, default: float = 0.0) -> float:
+        return self._totals.get(key, default)
+
+    def snapshot(self) -> Mapping[Hashable, float]:
+        """Current totals, unaffected by later changes."""
+        with self._lock:
+            self._shared = True
+            return MappingProxyType(self._totals)
+
+    def apply(self, entity_id: UUID, take_off: Optional[TakeOff]) -> bool:
+        """Replace an entity's contributions; returns whether any total changed."""
+        new: Dict[Hashable, float] = {}
+        if take_off is not None:
+            for key, amount in self.contributions(take_off):
+                new[key] = new.get(key, 0.0) + amount
+        with self._lock:
+            old = self._by_entity.get(entity_id, {})
+            if new == old:
+                return False
+            if self._shared:
+                self._totals = dict(self._totals)
+                self._shared = False
+            for key, amount in old.items():
+                self._add(key, -amount, -1)
+            for key, amount in new.items():
+                self._add(key, amount, 1)
+            if new:
+                self._by_entity[entity_id] = new
+            else:
+                self._by_entity.pop(entity_id, None)
+            self.version += 1
+        return True
+
+    def _add(self, key: Hashable, amount: float, count: int) -> None:
+        remaining = self._counts.get(key, 0) + count
+        if remaining:
+            self._counts[key] = remaining
+            self._totals[key] = self._totals.get(key, 0.0) + amount
+        else:
+            # Drop empty groups, which also drops accumulated rounding errors
+            self._counts.pop(key, None)
+            self._totals.pop(key, None)
+
+
+class QuantityTakeOff:
+    """Materialized quantity views over the entities of a bus.
+
+    Changed entities are taken off once and their contributions applied to
+    every view. Entities that read a changed entity as a related layer set
+    or quantity set are taken off again too, and with a ``RefResolver`` so
+    are the entities a changed relationship register refers to.
+    """
+
+    def __init__(self, lookup: Optional[Callable[[UUID], Any]] = None, views: Optional[Dict[str, Callable]] = None,
+                 resolver: Optional[RefResolver] = None):
+        self._lookup = lookup or (lambda entity_id: None)
+        self._resolver = resolver
+        self._reads: Dict[UUID, Set[UUID]] = {}
+        self._readers: Dict[UUID, Set[UUID]] = {}
+        self._entities: Set[UUID] = set()
+        self.views: Dict[str, MaterializedView] = {}
+        for name, contributions in (DEFAULT_VIEWS if views is None else views).items():
+            self.add_view(name, contributions)
+
+    def __getitem__(self, name: str) -> MaterializedView:
+        return self.views[name]
+
+    def add_view(self, name: str, contributions: Callable[[TakeOff], Iterable[Tuple[Hashable, float]]]) -> MaterializedView:
+        """Add a view and fill it from the entities seen so far."""
+        view = self.views[name] = MaterializedView(name, contributions)
+        for entity_id in self._entities:
+            view.apply(entity_id, self._take_off(entity_id))
+        return view
+
+    def attach(self, bus) -> "QuantityTakeOff":
+        """Take off every entity on a bus and follow its changes from now on."""
+        self._lookup = bus.get_entity
+        if self._resolver is None:
+            # Registered first so its index is current when the take-off runs
+            self._resolver = RefResolver(bus)
+        bus.on_change(self.update)
+        self.update(bus.entity_ids())
+        return self
+
+    def update(self, entity_ids: Iterable[UUID]) -> None:
+        """Apply the deltas of changed entities and the entities that read them."""
+        touched = set(entity_ids)
+        for entity_id in list(touched):
+            touched |= self._readers.get(entity_id, set())
+            if self._resolver is not None:
+                touched |= self._resolver.refs(entity_id)
+        for entity_id in touched:
+            take_off = self._take_off(entity_id)
+            for view in self.views.values():
+                view.apply(entity_id, take_off)
+
+    def _take_off(self, entity_id: UUID) -> Optional[TakeOff]:
+        self._forget(entity_id)
+        entity = self._lookup(entity_id)
+        if entity is None:
+            self._entities.discard(entity_id)
+            return None
+        self._entities.add(entity_id)
+        related, reads = related_entities(entity, self._lookup, self._resolver, entity_id)
+        if reads:
+            self._reads[entity_id] = reads
+            for target_id in reads:
+                self._readers.setdefault(target_id, set()).add(entity_id)
+        return TakeOff.of(entity.entity_type, entity.data, related)
+
+    def _forget(self, entity_id: UUID) -> None:
+        for target_id in self._reads.pop(entity_id, ()):
+            readers = self._readers.get(target_id)
+            if readers is not None:
+                readers.discard(entity_id)
+                if not readers:
+                    del self._readers[target_id]
@@ -0,0 +1,472 @@
+"""Secondary indexes and queries over the register store."""
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from uuid import UUID
+
+from .fragment import list_index, parse_pointer
+from .spatial import SPATIAL, SpatialIndex, box_in_frustum, box_intersects
+
+# Supported condition operators
+OPERATORS = {"==", "!=", "<", "<=", ">", ">=", "between", "in", "exists", "intersects", "in_frustum"}
+RANGE_OPERATORS = {"<", "<=", ">", ">=", "between"}
+SPATIAL_OPERATORS = {"intersects", "in_frustum"}
+
+# Index kinds
+HASH = "hash"
+SORTED = "sorted"
+INDEX_KINDS = (HASH, SORTED, SPATIAL)
+
+# Computes the indexed value of a derived field from entity data
+Extractor = Callable[[Dict[str, Any]], Any]
+
+# Marker for a field an entity does not have
+MISSING = object()
+
+
+def field_value(data: Dict[str, Any], name: str) -> Any:
+    """Read a top-level key, or a JSON pointer starting with ``/``."""
+    if not name.startswith("/"):
+        return data.get(name, MISSING)
+    value: Any = data
+    for token in parse_pointer(name):
+        if isinstance(value, dict) and token in value:
+            value = value[token]
+        elif isinstance(value, list):
+            try:
+                value = value[list_index(token, len(value))]
+            except ValueError:
+                return MISSING
+        else:
+            return MISSING
+    return value
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+@dataclass(frozen=True)
+class Condition:
+    """A condition on one data field, e.g. ``thermal_resistance < 0.5``."""
+    field: str
+    op: str
+    value: Any = None
+
+    def __post_init__(self):
+        if self.op not in OPERATORS:
+            raise ValueError(f"Invalid query operator: {self.op}")
+        if self.op == "between" and (not isinstance(self.value, (tuple, list)) or len(self.value) != 2):
+            raise ValueError("between needs a (low, high) pair")
+        if self.op == "in":
+            object.__setattr__(self, "value", tuple(self.value))
+        if self.op == "intersects":
+            if not isinstance(self.value, (tuple, list)) or len(self.value) != 2:
+                raise ValueError("intersects needs a (min, max) box")
+            object.__setattr__(self, "value", (tuple(self.value[0]), tuple(self.value[1])))
+        if self.op == "in_frustum":
+            if any(len(plane) != 4 for plane in self.value):
+                raise ValueError("in_frustum needs (a, b, c, d) planes")
+            object.__setattr__(self, "value", tuple(tuple(plane) for plane in self.value))
+
+    def matches(self, value: Any) -> bool:
+        if value is MISSING:
+            return False
+        if self.op == "exists":
+            return True
+        try:
+            if self.op == "==":
+                return value == self.value
+            if self.op == "!=":
+                return value != self.value
+            if self.op == "in":
+                return value in self.value
+            if self.op == "between":
+                return self.value[0] <= value <= self.value[1]
+            if self.op == "intersects":
+                return box_intersects(value, self.value)
+            if self.op == "in_frustum":
+                return box_in_frustum(value, self.value)
+            if self.op == "<":
+                return value < self.value
+            if self.op == "<=":
+                return value <= self.value
+            if self.op == ">":
+                return value > self.value
+            return value >= self.value
+        except (TypeError, ValueError, IndexError):
+            return False
+
+    def __str__(self) -> str:
+        if self.op == "exists":
+            return f"{self.field} exists"
+        return f"{self.field} {self.op} {self.value!r}"
+
+
+class HashIndex:
+    """Equality index of one field: value -> entity ids."""
+    kind = HASH
+
+    def __init__(self, name: str):
+        self.field = name
+        self._buckets: Dict[Any, Set[UUID]] = {}
+
+    def add(self, entity_id: UUID, value: Any) -> None:
+        try:
+            self._buckets.setdefault(value, set()).add(entity_id)
+        except TypeError:
+            pass  # lists and objects are not indexed
+
+    def remove(self, entity_id: UUID, value: Any) -> None:
+        try:
+            bucket = self._buckets.get(value)
+        except TypeError:
+            return
+        if bucket is not None:
+            bucket.discard(entity_id)
+            if not bucket:
+                del self._buckets[value]
+
+    def supports(self, condition: Condition) -> bool:
+        return condition.op in ("==", "in")
+
+    def estimate(self, condition: Condition) -> int:
+        return sum(len(self._buckets.get(v, ())) for v in self._values(condition))
+
+    def lookup(self, condition: Condition) -> Iterable[UUID]:
+        buckets = [self._buckets[v] for v in self._values(condition) if v in self._buckets]
+        return buckets[0] if len(buckets) == 1 else set().union(*buckets)
+
+    @staticmethod
+    def _values(condition: Condition) -> Tuple[Any, ...]:
+        values = condition.value if condition.op == "in" else (condition.value,)
+        hashable = []
+        for value in values:
+            try:
+                hash(value)
+            except TypeError:
+                continue
+            hashable.append(value)
+        return tuple(hashable)
+
+
+class SortedIndex:
+    """Range index of the numeric values of one field."""
+    kind = SORTED
+
+    def __init__(self, name: str):
+        self.field = name
+        self._keys: List[float] = []
+        self._ids: List[UUID] = []
+
+    def add(self, entity_id: UUID, value: Any) -> None:
+        if not _is_number(value):
+            return
+        pos = bisect_right(self._keys, value)
+        self._keys.insert(pos, value)
+        self._ids.insert(pos, entity_id)
+
+    def load(self, items: Iterable[Tuple[UUID, Any]]) -> None:
+        """Add many values at once with a single sort."""
+        pairs = sorted(
+            [*zip(self._keys, self._ids), *((v, i) for i, v in items if _is_number(v))], key=lambda p: p[0]
+        )
+        self._keys = [v for v, _ in pairs]
+        self._ids = [i for _, i in pairs]
+
+    def remove(self, entity_id: UUID, value: Any) -> None:
+        if not _is_number(value):
+            return
+        lo, hi = bisect_left(self._keys, value), bisect_right(self._keys, value)
+        for pos in range(lo, hi):
+            if self._ids[pos] == entity_id:
+                del self._keys[pos]
+                del self._ids[pos]
+                return
+
+    def supports(self, condition: Condition) -> bool:
+        if condition.op == "between":
+            return all(_is_number(v) for v in condition.value)
+        return condition.op in RANGE_OPERATORS | {"=="} and _is_number(condition.value)
+
+    def _range(self, condition: Condition) -> Tuple[int, int]:
+        op, value, keys = condition.op, condition.value, self._keys
+        if op == "between":
+            return bisect_left(keys, value[0]), bisect_right(keys, value[1])
+        if op == "==":
+            return bisect_left(keys, value), bisect_right(keys, value)
+        if op == "<":
+            return 0, bisect_left(keys, value)
+        if op == "<=":
+            return 0, bisect_right(keys, value)
+        if op == ">":
+            return bisect_right(keys, value), len(keys)
+        return bisect_left(keys, value), len(keys)
+
+    def estimate(self, condition: Condition) -> int:
+        lo, hi = self._range(condition)
+        return max(hi - lo, 0)
+
+    def lookup(self, condition: Condition) -> Iterable[UUID]:
+        lo, hi = self._range(condition)
+        return self._ids[lo:hi]
+
+
+@dataclass
+class QueryPlan:
+    """How a query is answered: the index that drives it and the filters applied after."""
+    entity_type: Optional[str]
+    driver: str
+    estimated: int
+    filters: List[str] = field(default_factory=list)
+    _condition: Optional[Condition] = field(default=None, repr=False)
+
+    def __str__(self) -> str:
+        lines = [f"{self.driver} (~{self.estimated} candidates)"]
+        lines += [f"  filter {f}" for f in self.filters]
+        return "\n".join(lines)
+
+
+class QueryIndex:
+    """Entity type index plus hash, sorted and spatial indexes over selected data fields.
+
+    The index keeps the indexed values of every entity, so it can be
+    updated incrementally: ``update`` removes an entity's old values from
+    every index and adds the new ones. A field can be derived from the
+    data by an extractor instead of read from it, e.g. a bounding box.
+    """
+
+    def __init__(self):
+        self._by_type: Dict[str, Set[UUID]] = {}
+        self._types: Dict[UUID, str] = {}
+        self._indexes: Dict[str, Union[HashIndex, SortedIndex, SpatialIndex]] = {}
+        self._extractors: Dict[str, Extractor] = {}
+        self._values: Dict[UUID, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    @property
+    def indexed_fields(self) -> List[str]:
+        return list(self._indexes)
+
+    def create_index(
+        self,
+        name: str,
+        kind: str = HASH,
+        entities: Iterable[Tuple[UUID, str, Dict[str, Any]]] = (),
+        extractor: Optional[Extractor] = None,
+    ) -> None:
+        """Index a field and fill it from ``(id, entity_type, data)`` tuples.
+
+        With an ``extractor`` the field is derived from the data; a result
+        of None means the entity has no value.
+        """
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Invalid index kind: {kind}")
+        if name in self._indexes:
+            if self._indexes[name].kind != kind:
+                raise ValueError(f"Field {name} already has a {self._indexes[name].kind} index")
+            return
+        if kind == HASH:
+            index = HashIndex(name)
+        elif kind == SORTED:
+            index = SortedIndex(name)
+        else:
+            index = SpatialIndex(name)
+        self._indexes[name] = index
+        if extractor is not None:
+            self._extractors[name] = extractor
+        loaded = []
+        for entity_id, entity_type, data in entities:
+            self._set_type(entity_id, entity_type)
+            value = self._field(data, name)
+            if value is not MISSING:
+                self._values.setdefault(entity_id, {})[name] = value
+                loaded.append((entity_id, value))
+        if kind in (SORTED, SPATIAL):
+            index.load(loaded)
+        else:
+            for entity_id, value in loaded:
+                index.add(entity_id, value)
+
+    def update(self, entity_id: UUID, entity_type: str, data: Dict[str, Any]) -> None:
+        """Reindex an entity after a change."""
+        self._set_type(entity_id, entity_type)
+        if not self._indexes:
+            return
+        old = self._values.get(entity_id, {})
+        new = {}
+        for name in self._indexes:
+            value = self._field(data, name)
+            if value is not MISSING:
+                new[name] = value
+        for name, index in self._indexes.items():
+            before, after = old.get(name, MISSING), new.get(name, MISSING)
+            if before is after or (type(before) is type(after) and before == after):
+                continue
+            if before is not MISSING:
+                index.remove(entity_id, before)
+            if after is not MISSING:
+                index.add(entity_id, after)
+        if new:
+            self._values[entity_id] = new
+        else:
+            self._values.pop(entity_id, None)
+
+    def remove(self, entity_id: UUID) -> None:
+        """Drop an entity from every index."""
+        entity_type = self._types.pop(entity_id, None)
+        if entity_type is not None:
+            self._by_type[entity_type].discard(entity_id)
+        for name, value in self._values.pop(entity_id, {}).items():
+            self._indexes[name].remove(entity_id, value)
+
+    def _field(self, data: Dict[str, Any], name: str) -> Any:
+        extractor = self._extractors.get(name)
+        if extractor is None:
+            return field_value(data, name)
+        value = extractor(data)
+        return MISSING if value is None else value
+
+    def entity_type(self, entity_id: UUID) -> Optional[str]:
+        """Indexed entity type of an entity, or None if it is not indexed."""
+        return self._types.get(entity_id)
+
+    def values(self, entity_id: UUID) -> Dict[str, Any]:
+        """Indexed field values of an entity."""
+        return self._values.get(entity_id, {})
+
+    def matches(
+        self,
+        entity_id: UUID,
+        entity_type: Optional[str],
+        conditions: Iterable[Condition],
+        data: Callable[[], Optional[Dict[str, Any]]],
+    ) -> bool:
+        """Check one entity against a query; ``data`` is only called for unindexed fields."""
+        current_type = self._types.get(entity_id)
+        if current_type is None or (entity_type is not None and current_type != entity_type):
+            return False
+        values = self._values.get(entity_id, {})
+        loaded = None
+        for condition in conditions:
+            if condition.field in self._indexes:
+                value = values.get(condition.field, MISSING)
+            else:
+                if loaded is None:
+                    loaded = data()
+                    if loaded is None:
+                        return False
+                value = field_value(loaded, condition.field)
+            if not condition.matches(value):
+                return False
+        return True
+
+    def _set_type(self, entity_id: UUID, entity_type: str) -> None:
+        current = self._types.get(entity_id)
+        if current == entity_type:
+            return
+        if current is not None:
+            self._by_type[current].discard(entity_id)
+        self._types[entity_id] = entity_type
+        self._by_type.setdefault(entity_type, set()).add(entity_id)
+
+    def plan(self, entity_type: Optional[str], conditions: Iterable[Condition]) -> QueryPlan:
+        """Pick the index with the fewest candidates to drive a query."""
+        conditions = list(conditions)
+        if entity_type is not None:
+            best = QueryPlan(entity_type, f"type index {entity_type}", len(self._by_type.get(entity_type, ())))
+        else:
+            best = QueryPlan(None, "full scan", len(self._types))
+        for condition in conditions:
+            index = self._indexes.get(condition.field)
+            if index is not None and index.supports(condition):
+                estimated = index.estimate(condition)
+                if estimated < best.estimated:
+                    best = QueryPlan(entity_type, f"{index.kind} index {condition}", estimated, _condition=condition)
+        if best._condition is not None and entity_type is not None:
+            best.filters.append(f"entity_type == {entity_type!r} (type index)")
+        for condition in conditions:
+            if condition is best._condition:
+                continue
+            source = f"{self._indexes[condition.field].kind} index values" if condition.field in self._indexes else "data"
+            best.filters.append(f"{condition} ({source})")
+        return best
+
+    def execute(
+        self, entity_type: Optional[str], conditions: Iterable[Condition], lookup: Callable[[UUID], Any]
+    ) -> List[UUID]:
+        """Run a query; unindexed conditions read entity data through ``lookup``."""
+        conditions = list(conditions)
+        plan = self.plan(entity_type, conditions)
+        if plan._condition is not None:
+            candidates = self._indexes[plan._condition.field].lookup(plan._condition)
+        elif entity_type is not None:
+            candidates = self._by_type.get(entity_type, ())
+        else:
+            candidates = self._types
+        if plan._condition is not None and entity_type is not None:
+            of_type = self._by_type.get(entity_type, set())
+            candidates = [entity_id for entity_id in candidates if entity_id in of_type]
+        for condition in conditions:
+            if condition is plan._condition or condition.field not in self._indexes:
+                continue
+            values, name, matches = self._values, condition.field, condition.matches
+            candidates = [entity_id for entity_id in candidates
+                          if entity_id in values and matches(values[entity_id].get(name, MISSING))]
+        unindexed = [c for c in conditions if c.field not in self._indexes]
+        if not unindexed:
+            return list(candidates)
+        result = []
+        for entity_id in candidates:
+            entity = lookup(entity_id)
+            if entity is None:
+                continue
+            data = entity.data
+            if all(c.matches(field_value(data, c.field)) for c in unindexed):
+                result.append(entity_id)
+        return result
+
+
+class Query:
+    """A query over the entities of a bus, built with ``where`` calls."""
+
+    def __init__(
+        self,
+        index: QueryIndex,
+        lookup: Callable[[UUID], Any],
+        entity_type: Optional[str] = None,
+        conditions: Tuple[Condition, ...] = (),
+    ):
+        self._index = index
+        self._lookup = lookup
+        self.entity_type = entity_type
+        self.conditions = conditions
+
+    def where(self, name: str, op: str, value: Any = None) -> "Query":
+        """Add a condition, e.g. ``where("height", "between", (2, 3))``."""
+        return Query(self._index, self._lookup, self.entity_type, self.conditions + (Condition(name, op, value),))
+
+    def explain(self) -> QueryPlan:
+        return self._index.plan(self.entity_type, self.conditions)
+
+    def ids(self) -> List[UUID]:
+        return self._index.execute(self.entity_type, self.conditions, self._lookup)
+
+    def entities(self) -> List[Any]:
+        return [self._lookup(entity_id) for entity_id in self.ids()]
+
+    def matches(self, entity_id: UUID, data: Optional[Callable[[], Optional[Dict[str, Any]]]] = None) -> bool:
+        """Check whether a single entity is in the result."""
+        if data is None:
+            def data():
+                entity = self._lookup(entity_id)
+                return entity.data if entity is not None else None
+        return self._index.matches(entity_id, self.entity_type, self.conditions, data)
+
+    def count(self) -> int:
+        return len(self.ids())
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.entities())
@@ -0,0 +1,321 @@
+"""Resolving ifcJSON ``{"ref": ...}`` links between registers.
+
+ifcJSON entities link to each other with ``{"type": ..., "ref": "<id>"}``,
+for example in ``relatedObjects`` and ``relatingPropertyDefinition``. A
+``RefResolver`` keeps two indexes over the registers of a bus, current
+through its change callbacks:
+
+* globalId to register id, for registers whose id is not derived from the
+  ``globalId`` in their data, so any ref resolves with one lookup;
+* target to referrers, so the relationships pointing at an entity (such as
+  the ``IfcRelDefinesByProperties`` that give it its property sets) are
+  found without scanning every register.
+
+A ``RefView`` expands refs into inline entities up to a depth, on demand.
+Expansions are cached per view and dropped when any entity they include
+changes. ``collapse_refs`` goes the other way and turns inline entities
+back into refs for export.
+"""
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from uuid import UUID
+
+from .crdt_automerge import IfcRegister
+from .guid import global_id_to_uuid
+from .pending import data_refs
+
+# A ref as found in data: a UUID, a UUID string or an IFC GlobalId
+Ref = Union[UUID, str]
+
+# Top-level fields that are not followed; placement refs name shared
+# placements rather than entities
+SKIP_FIELDS = ("objectPlacement",)
+
+# Attributes of relationship registers that relate their relatedObjects to
+# property sets, classifications and materials
+RELATING_FIELDS = ("relatingPropertyDefinition", "relatingClassification", "relatingMaterial")
+
+
+def _ref_key(ref: Ref) -> UUID:
+    return ref if isinstance(ref, UUID) else global_id_to_uuid(str(ref))
+
+
+def object_items(value: Any) -> List[Dict[str, Any]]:
+    """Normalise an optional object or list of objects to a list of dicts."""
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    return []
+
+
+class RefResolver:
+    """Indexes the refs between the registers of a bus."""
+
+    def __init__(self, bus):
+        self._bus = bus
+        # Key of a data globalId -> register id, where the two differ
+        self._aliases: Dict[UUID, UUID] = {}
+        self._alias_of: Dict[UUID, UUID] = {}
+        # Ref targets of every register and the registers referring to each target
+        self._targets: Dict[UUID, Set[UUID]] = {}
+        self._referrers: Dict[UUID, Set[UUID]] = {}
+        self._views: Set["RefView"] = set()
+        self.update(bus.entity_ids())
+        bus.on_change(self.update)
+
+    def id_of(self, ref: Ref) -> UUID:
+        """Register id a ref points to, whether or not the register exists yet."""
+        key = _ref_key(ref)
+        return self._aliases.get(key, key)
+
+    def resolve(self, ref: Ref) -> Optional[IfcRegister]:
+        """Register a ref points to, if the bus has it."""
+        return self._bus.get_entity(self.id_of(ref))
+
+    def entity(self, ref: Ref) -> Optional[Dict[str, Any]]:
+        """The entity a ref points to as an ifcJSON object, refs left as they are."""
+        entity_id = self.id_of(ref)
+        register = self._bus.get_entity(entity_id)
+        if register is None:
+            return None
+        return {"type": register.entity_type, "globalId": str(entity_id), **register.data}
+
+    def refs(self, entity_id: UUID) -> Set[UUID]:
+        """Ids of the registers an entity refers to."""
+        return {self.id_of(target) for target in self._targets.get(entity_id, ())}
+
+    def referrers(self, entity_id: UUID) -> Set[UUID]:
+        """Ids of the registers that refer to an entity."""
+        referrers = set(self._referrers.get(entity_id, ()))
+        alias = self._alias_of.get(entity_id)
+        if alias is not None:
+            referrers.update(self._referrers.get(alias, ()))
+        return referrers
+
+    def deref(self, obj: Dict[str, Any], reads: Optional[Set[UUID]] = None) -> Optional[Dict[str, Any]]:
+        """An object as it is, or for a ``{"ref": ...}`` the entity it points to.
+
+        The id a ref points to is added to ``reads``; refs to registers that
+        have not arrived give None.
+        """
+        if "ref" not in obj:
+            return obj
+        if reads is not None:
+            reads.add(self.id_of(obj["ref"]))
+        return self.entity(obj["ref"])
+
+    def related_via_relationships(
+        self, entity_id: UUID, fields: Iterable[str] = RELATING_FIELDS
+    ) -> Tuple[List[Dict[str, Any]], Set[UUID]]:
+        """Objects that relationship registers relate an entity to, and the ids read.
+
+        The relationships are the registers that list the entity in
+        ``relatedObjects``, found through the referrer index; the objects
+        are the values of their ``fields``, refs resolved. The ids of the
+        relationships and of the resolved registers are returned so callers
+        can re-read the entity when any of them changes.
+        """
+        objects: List[Dict[str, Any]] = []
+        reads: Set[UUID] = set()
+        for rel_id in self.referrers(entity_id):
+            reads.add(rel_id)
+            rel = self._bus.get_entity(rel_id)
+            if rel is None or not any("ref" in obj and self.id_of(obj["ref"]) == entity_id
+                                      for obj in object_items(rel.data.get("relatedObjects"))):
+                continue
+            for name in fields:
+                for obj in object_items(rel.data.get(name)):
+                    obj = self.deref(obj, reads)
+                    if obj is not None:
+                        objects.append(obj)
+        return objects, reads
+
+    def property_sets(self, entity_id: UUID) -> List[Dict[str, Any]]:
+        """Property and quantity sets of an entity.
+
+        They come from its inline ``isDefinedBy`` and from the
+        ``IfcRelDefinesByProperties`` registers that list it in
+        ``relatedObjects``, found through the referrer index. Refs to set
+        registers are resolved; sets that have not arrived are left out.
+        """
+        register = self._bus.get_entity(entity_id)
+        if register is None:
+            return []
+        psets = [self.deref(definition) for rel in object_items(register.data.get("isDefinedBy"))
+                 for definition in object_items(rel.get("relatingPropertyDefinition"))]
+        psets += self.related_via_relationships(entity_id, ("relatingPropertyDefinition",))[0]
+        return [pset for pset in psets if pset is not None]
+
+    def view(self, depth: int = 1) -> "RefView":
+        """A cached view that expands refs up to ``depth`` levels."""
+        view = RefView(self, depth)
+        self._views.add(view)
+        return view
+
+    def update(self, entity_ids: Iterable[UUID]) -> None:
+        """Reindex changed registers and invalidate the views that include them."""
+        changed = set()
+        for entity_id in entity_ids:
+            changed.add(entity_id)
+            for target in self._targets.pop(entity_id, ()):
+                referrers = self._referrers.get(target)
+                if referrers is not None:
+                    referrers.discard(entity_id)
+                    if not referrers:
+                        del self._referrers[target]
+            alias = self._alias_of.pop(entity_id, None)
+            if alias is not None:
+                changed.add(alias)
+                if self._aliases.get(alias) == entity_id:
+                    del self._aliases[alias]
+            register = self._bus.get_entity(entity_id)
+            if register is None:
+                continue
+            global_id = register.data.get("globalId")
+            if isinstance(global_id, str) and global_id:
+                alias = global_id_to_uuid(global_id)
+                if alias != entity_id:
+                    self._aliases[alias] = entity_id
+                    self._alias_of[entity_id] = alias
+                    changed.add(alias)
+            targets = data_refs(register.data, SKIP_FIELDS)
+            targets.discard(entity_id)
+            if targets:
+                self._targets[entity_id] = targets
+                for target in targets:
+                    self._referrers.setdefault(target, set()).add(entity_id)
+        for view in self._views:
+            view.invalidate(changed)
+
+
+class RefView:
+    """Entities with their refs expanded up to a depth, cached until they change.
+
+    Expanded entities share unchanged parts with the registers and with
+    each other; treat them as read-only. Refs beyond the depth, to entities
+    that have not arrived, and in ``objectPlacement`` stay as they are.
+    """
+
+    def __init__(self, resolver: RefResolver, depth: int = 1):
+        if depth < 0:
+            raise ValueError("depth must not be negative")
+        self.resolver = resolver
+        self.depth = depth
+        # (entity id, remaining depth) -> expanded entity
+        self._cache: Dict[Tuple[UUID, int], Dict[str, Any]] = {}
+        # Register id or ref key -> cache entries whose expansion includes it
+        self._dependents: Dict[UUID, Set[Tuple[UUID, int]]] = {}
+        self._reached: Dict[Tuple[UUID, int], Set[UUID]] = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, ref: Ref) -> Optional[Dict[str, Any]]:
+        """An entity as an ifcJSON object with its refs expanded."""
+        return self._get(self.resolver.id_of(ref), self.depth)
+
+    def entities(self, entity_ids: Optional[Iterable[UUID]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield expanded entities, by default all of the bus, e.g. for ``IfcJsonWriter.write_all``."""
+        for entity_id in self.resolver._bus.entity_ids() if entity_ids is None else entity_ids:
+            entity = self._get(entity_id, self.depth)
+            if entity is not None:
+                yield entity
+
+    def invalidate(self, entity_ids: Iterable[Hashable]) -> int:
+        """Drop the cached expansions that include any of the entities; returns how many."""
+        dropped = 0
+        for entity_id in entity_ids:
+            for key in self._dependents.pop(entity_id, ()):
+                if self._cache.pop(key, None) is None:
+                    continue
+                dropped += 1
+                for reached in self._reached.pop(key, ()):
+                    dependents = self._dependents.get(reached)
+                    if reached != entity_id and dependents is not None:
+                        dependents.discard(key)
+                        if not dependents:
+                            del self._dependents[reached]
+        return dropped
+
+    def close(self) -> None:
+        """Stop keeping this view current and drop its cache."""
+        self.resolver._views.discard(self)
+        self._cache.clear()
+        self._dependents.clear()
+        self._reached.clear()
+
+    def _get(self, entity_id: UUID, depth: int) -> Optional[Dict[str, Any]]:
+        key = (entity_id, depth)
+        entity = self._cache.get(key)
+        if entity is not None:
+            return entity
+        register = self.resolver._bus.get_entity(entity_id)
+        if register is None:
+            return None
+        reached = {entity_id}
+        data = register.data
+        if depth:
+            data = {
+                field: value if field in SKIP_FIELDS else self._expand(value, depth, reached)
+                for field, value in data.items()
+            }
+        entity = {"type": register.entity_type, "globalId": str(entity_id), **data}
+        self._cache[key] = entity
+        self._reached[key] = reached
+        for reached_id in reached:
+            self._dependents.setdefault(reached_id, set()).add(key)
+        return entity
+
+    def _expand(self, value: Any, depth: int, reached: Set[UUID]) -> Any:
+        """Replace the refs in a value by their entities; unchanged values are returned as they are."""
+        if isinstance(value, dict):
+            ref = value.get("ref")
+            if ref is not None:
+                key = _ref_key(ref)
+                target_id = self.resolver.id_of(key)
+                reached.update((key, target_id))
+                target = self._get(target_id, depth - 1)
+                if target is None:
+                    return value
+                reached.update(self._reached[(target_id, depth - 1)])
+                return target
+            expanded = {k: self._expand(v, depth, reached) for k, v in value.items()}
+            return value if all(expanded[k] is v for k, v in value.items()) else expanded
+        if isinstance(value, list) and value and isinstance(value[0], (dict, list)):
+            expanded = [self._expand(item, depth, reached) for item in value]
+            return value if all(e is v for e, v in zip(expanded, value)) else expanded
+        return value
+
+
+def collapse_refs(entity: Dict[str, Any], depth: int = 0) -> List[Dict[str, Any]]:
+    """Turn the inline entities below ``depth`` into refs.
+
+    Any nested object with a ``type`` and a ``globalId`` counts as an
+    entity; ``depth`` counts entities nested in entities, so with the
+    default every inline entity becomes a ref. Returns the collapsed entity
+    followed by the entities taken out of it, themselves collapsed, each
+    once by ``globalId``.
+    """
+    out = [entity]
+    seen = {entity.get("globalId")}
+
+    def collapse(value: Any, level: int) -> Any:
+        if isinstance(value, dict):
+            if "type" in value and value.get("globalId"):
+                level += 1
+                if level > depth:
+                    global_id = value["globalId"]
+                    if global_id not in seen:
+                        seen.add(global_id)
+                        out.append(value)
+                        index = len(out) - 1
+                        # Everything inside an extracted entity is beyond the depth
+                        out[index] = {k: collapse(v, depth) for k, v in value.items()}
+                    return {"type": value["type"], "ref": global_id}
+            return {k: collapse(v, level) for k, v in value.items()}
+        if isinstance(value, list):
+            return [collapse(item, level) for item in value]
+        return value
+
+    out[0] = {k: collapse(v, 0) for k, v in entity.items()}
+    return out
@@ -0,0 +1,204 @@
+"""Validation rules derived lazily from the IFC EXPRESS schema."""
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set
+import dbm
+import os
+import shelve
+
+from .keydict import ifcjson_name
+
+# Bump when the derivation changes, so stale cache files are not read
+RULES_FORMAT = 1
+
+# Attributes the bus carries outside an entity's data
+IMPLICIT_FIELDS = {"globalId"}
+
+# Attributes of IfcRoot, which never point at the related entities
+ROOT_ATTRIBUTES = {"GlobalId", "OwnerHistory", "Name", "Description"}
+
+# Cached in place of rule fields for names that are not entities of the schema
+NOT_AN_ENTITY: Dict[str, Any] = {}
+
+
+def default_cache_dir() -> Path:
+    """Directory of the rule cache files, from ``IFC_DATABUS_CACHE``."""
+    return Path(os.environ.get("IFC_DATABUS_CACHE", Path.home() / ".cache" / "ifc_databus"))
+
+
+class SchemaRules(Mapping):
+    """Entity rules of an IFC schema, derived per type on first use.
+
+    Required fields are the non-optional explicit attributes, including
+    inherited ones; allowed fields add the optional and inverse attributes,
+    all as ifcJSON names. Allowed relationships map each inverse attribute
+    to the entity types on the other side of its objectified relationship.
+
+    Derived rules are kept in memory and in a shelve file per schema and
+    ifcopenshell version, so later processes neither load nor walk the
+    schema for types they have seen before. Names that are not entities of
+    the schema are cached as misses the same way. ``precompile()`` fills the
+    file for every entity of the schema.
+    """
+
+    def __init__(self, schema: str = "IFC4", cache_dir: Optional[Path] = None):
+        self.schema_name = schema
+        self._cache_dir = cache_dir
+        # Entity type -> rule, or None for names that are not entities
+        self._rules: Dict[str, Any] = {}
+        self._schema = None
+
+    @property
+    def schema(self):
+        """The ifcopenshell schema definition, loaded on first use."""
+        if self._schema is None:
+            import ifcopenshell.ifcopenshell_wrapper as wrapper
+
+            self._schema = wrapper.schema_by_name(self.schema_name)
+        return self._schema
+
+    @property
+    def cache_path(self) -> Path:
+        import ifcopenshell
+
+        directory = Path(self._cache_dir) if self._cache_dir is not None else default_cache_dir()
+        return directory / f"rules_{self.schema_name}_{ifcopenshell.version}_v{RULES_FORMAT}"
+
+    def __getitem__(self, entity_type: str):
+        try:
+            rule = self._rules[entity_type]
+        except KeyError:
+            fields = self._read_cache(entity_type)
+            if fields is None:
+                try:
+                    fields = self._derive(entity_type)
+                except KeyError:
+                    fields = NOT_AN_ENTITY
+                self._write_cache({entity_type: fields})
+            rule = self._rules[entity_type] = self._build(fields) if fields else None
+        if rule is None:
+            raise KeyError(entity_type)
+        return rule
+
+    def __contains__(self, entity_type: object) -> bool:
+        if not isinstance(entity_type, str):
+            return False
+        try:
+            self[entity_type]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        return (entity.name() for entity in self.schema.entities())
+
+    def __len__(self) -> int:
+        return len(self.schema.entities())
+
+    def precompile(self) -> int:
+        """Derive and cache the rules of every entity in the schema."""
+        fields = {entity.name(): self._derive(entity.name()) for entity in self.schema.entities()}
+        self._write_cache(fields)
+        return len(fields)
+
+    def _build(self, fields: Dict[str, Any]):
+        from .validation import EntityRule
+
+        return EntityRule(
+            required_fields=set(fields["required_fields"]),
+            allowed_fields=set(fields["allowed_fields"]),
+            allowed_relationships={name: set(targets) for name, targets in fields["allowed_relationships"].items()},
+        )
+
+    def _read_cache(self, entity_type: str) -> Optional[Dict[str, Any]]:
+        try:
+            with shelve.open(str(self.cache_path), flag="r") as cache:
+                return cache.get(entity_type)
+        except (dbm.error[0], OSError):
+            return None
+
+    def _write_cache(self, fields: Dict[str, Dict[str, Any]]) -> None:
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with shelve.open(str(self.cache_path)) as cache:
+                cache.update(fields)
+        except (dbm.error[0], OSError) as e:
+            print(f"Could not write schema rule cache {self.cache_path}: {e}")
+
+    def _entity(self, name: str):
+        """Look up an entity declaration by its exact name."""
+        try:
+            entity = self.schema.declaration_by_name(name).as_entity()
+        except RuntimeError:
+            return None
+        return entity if entity is not None and entity.name() == name else None
+
+    def _derive(self, entity_type: str) -> Dict[str, Any]:
+        """Derive the plain rule fields of an entity from the schema."""
+        entity = self._entity(entity_type)
+        if entity is None:
+            raise KeyError(entity_type)
+        required: List[str] = []
+        allowed: List[str] = []
+        for attr, derived in zip(entity.all_attributes(), entity.derived()):
+            if derived:
+                continue
+            name = ifcjson_name(attr.name())
+            allowed.append(name)
+            if not attr.optional() and name not in IMPLICIT_FIELDS:
+                required.append(name)
+        relationships: Dict[str, List[str]] = {}
+        for inverse in entity.all_inverse_attributes():
+            allowed.append(ifcjson_name(inverse.name()))
+            relationships[inverse.name()] = sorted(self._related_types(inverse))
+        return {"required_fields": required, "allowed_fields": allowed, "allowed_relationships": relationships}
+
+    def _related_types(self, inverse) -> Set[str]:
+        """Entity types an inverse attribute leads to."""
+        relation = inverse.entity_reference()
+        if not _is_subtype(relation, "IfcRelationship"):
+            return _with_subtypes(relation)
+        targets: Set[str] = set()
+        for attr in relation.all_attributes():
+            if attr.name() in ROOT_ATTRIBUTES or attr.name() == inverse.attribute_reference().name():
+                continue
+            for target in _entities_of(attr.type_of_attribute()):
+                targets |= _with_subtypes(target)
+        return targets
+
+
+def _is_subtype(entity, name: str) -> bool:
+    while entity is not None:
+        if entity.name() == name:
+            return True
+        entity = entity.supertype()
+    return False
+
+
+def _with_subtypes(entity) -> Set[str]:
+    names = {entity.name()}
+    for subtype in entity.subtypes():
+        names |= _with_subtypes(subtype)
+    return names
+
+
+def _entities_of(parameter_type) -> List[Any]:
+    """Entity declarations referenced by an attribute type."""
+    aggregation = parameter_type.as_aggregation_type()
+    if aggregation is not None:
+        return _entities_of(aggregation.type_of_element())
+    named = parameter_type.as_named_type()
+    return _declaration_entities(named.declared_type()) if named is not None else []
+
+
+def _declaration_entities(declaration) -> List[Any]:
+    entity = declaration.as_entity()
+    if entity is not None:
+        return [entity]
+    select = declaration.as_select_type()
+    if select is not None:
+        return [e for item in select.select_list() for e in _declaration_entities(item)]
+    return []
+
+
+# Rules of the IFC4 schema, used for types without a hand-written rule
+SCHEMA_RULES = SchemaRules("IFC4")
@@ -0,0 +1,239 @@
+"""Bounding boxes of entity geometry and a packed R-tree over them."""
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .placement import axis2_placement_matrix, local_placement_matrix, unit_vector
+
+# Index kind used by QueryIndex for spatial indexes
+SPATIAL = "spatial"
+
+# A box as ((min x, min y, min z), (max x, max y, max z))
+Box = Tuple[Tuple[float, float, float], Tuple[float, float, float]]
+
+# Resolves a ``{"ref": ...}`` placement to its 4x4 world matrix
+RefResolver = Callable[[str], Optional[np.ndarray]]
+
+
+def _representation_items(representation: Any) -> Iterable[Dict[str, Any]]:
+    if not isinstance(representation, dict):
+        return []
+    return [item for rep in representation.get("representations", []) if isinstance(rep, dict)
+            for item in rep.get("items", []) if isinstance(item, dict)]
+
+
+def geometry_points(representation: Any) -> Optional[np.ndarray]:
+    """Points that bound an entity's geometry, in object coordinates.
+
+    Supports ``IfcTriangulatedFaceSet`` meshes and ``IfcExtrudedAreaSolid``
+    with an ``IfcRectangleProfileDef``.
+    """
+    chunks = []
+    for item in _representation_items(representation):
+        if item.get("type") == "IfcTriangulatedFaceSet":
+            coords = (item.get("coordinates") or {}).get("coordList")
+            if coords:
+                chunks.append(np.asarray(coords, dtype=float).reshape(-1, 3))
+        elif item.get("type") == "IfcExtrudedAreaSolid":
+            corners = _extrusion_corners(item)
+            if corners is not None:
+                chunks.append(corners)
+    return np.concatenate(chunks) if chunks else None
+
+
+def _extrusion_corners(item: Dict[str, Any]) -> Optional[np.ndarray]:
+    profile = item.get("sweptArea") or {}
+    if profile.get("type") != "IfcRectangleProfileDef":
+        return None
+    half_x, half_y = float(profile.get("xDim", 0)) / 2, float(profile.get("yDim", 0)) / 2
+    rect = np.array([[-half_x, -half_y, 0], [half_x, -half_y, 0], [half_x, half_y, 0], [-half_x, half_y, 0], ],
+                    dtype=float)
+    rect = _transform(rect, axis2_placement_matrix(profile.get("position")))
+    direction = unit_vector((item.get("extrudedDirection") or {}).get("directionRatios"), (0.0, 0.0, 1.0))
+    corners = np.concatenate([rect, rect + direction * float(item.get("depth", 0))])
+    return _transform(corners, axis2_placement_matrix(item.get("position")))
+
+
+def _transform(points: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def entity_bounds(data: Dict[str, Any], resolve_ref: Optional[RefResolver] = None) -> Optional[Box]:
+    """World axis-aligned bounding box of an entity, or None without geometry."""
+    points = geometry_points(data.get("representation"))
+    if points is None or not len(points):
+        return None
+    points = _transform(points, local_placement_matrix(data.get("objectPlacement"), resolve_ref))
+    return tuple(points.min(axis=0).tolist()), tuple(points.max(axis=0).tolist())
+
+
+def box_intersects(box: Box, query: Box) -> bool:
+    (lo, hi), (qlo, qhi) = box, query
+    return all(lo[i] <= qhi[i] and hi[i] >= qlo[i] for i in range(3))
+
+
+def box_in_frustum(box: Box, planes: Sequence[Sequence[float]]) -> bool:
+    """Whether a box is at least partly inside planes ``(a, b, c, d)`` with ``ax+by+cz+d >= 0`` inside."""
+    lo, hi = box
+    for a, b, c, d in planes:
+        # The corner furthest along the plane normal
+        px, py, pz = (hi[0] if a >= 0 else lo[0]), (hi[1] if b >= 0 else lo[1]), (hi[2] if c >= 0 else lo[2])
+        if a * px + b * py + c * pz + d < 0:
+            return False
+    return True
+
+
+def _boxes_intersect(mins: np.ndarray, maxs: np.ndarray, query: Box) -> np.ndarray:
+    qlo, qhi = np.asarray(query[0]), np.asarray(query[1])
+    return np.all(mins <= qhi, axis=1) & np.all(maxs >= qlo, axis=1)
+
+
+def _boxes_in_frustum(mins: np.ndarray, maxs: np.ndarray, planes: Sequence[Sequence[float]]) -> np.ndarray:
+    inside = np.ones(len(mins), dtype=bool)
+    for a, b, c, d in planes:
+        normal = np.array([a, b, c])
+        corners = np.where(normal >= 0, maxs, mins)
+        inside &= corners @ normal + d >= 0
+    return inside
+
+
+class PackedRTree:
+    """Static R-tree bulk loaded with 3D Sort-Tile-Recursive packing.
+
+    Every level is a pair of NumPy arrays, so a query tests all candidate
+    nodes of a level in one vectorized step.
+    """
+
+    def __init__(self, ids: Sequence[Hashable], mins: np.ndarray, maxs: np.ndarray, node_size: int = 16):
+        self.node_size = node_size
+        order = self._str_order(mins, maxs)
+        self.ids = [ids[i] for i in order]
+        self.levels: List[Tuple[np.ndarray, np.ndarray]] = [(mins[order], maxs[order])]
+        while len(self.levels[-1][0]) > node_size:
+            lower_mins, lower_maxs = self.levels[-1]
+            starts = np.arange(0, len(lower_mins), node_size)
+            self.levels.append((np.minimum.reduceat(lower_mins, starts), np.maximum.reduceat(lower_maxs, starts)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _str_order(self, mins: np.ndarray, maxs: np.ndarray) -> np.ndarray:
+        """Leaf order: slabs along x, split into runs along y, sorted along z."""
+        count = len(mins)
+        if not count:
+            return np.arange(0)
+        centers = (mins + maxs) / 2
+        leaves = -(-count // self.node_size)
+        slices = max(int(np.ceil(leaves ** (1 / 3))), 1)
+        run = slices * self.node_size
+        slab = slices * run
+        order = np.argsort(centers[:, 0], kind="stable")
+        parts = []
+        for start in range(0, count, slab):
+            part = order[start:start + slab]
+            part = part[np.argsort(centers[part, 1], kind="stable")]
+            for run_start in range(0, len(part), run):
+                cell = part[run_start:run_start + run]
+                parts.append(cell[np.argsort(centers[cell, 2], kind="stable")])
+        return np.concatenate(parts)
+
+    def search(self, test: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> List[Hashable]:
+        """Ids of the boxes for which the vectorized ``test(mins, maxs)`` holds."""
+        if not self.ids:
+            return []
+        top_mins, top_maxs = self.levels[-1]
+        nodes = np.nonzero(test(top_mins, top_maxs))[0]
+        for mins, maxs in reversed(self.levels[:-1]):
+            if not len(nodes):
+                return []
+            children = (nodes[:, None] * self.node_size + np.arange(self.node_size)).ravel()
+            children = children[children < len(mins)]
+            nodes = children[test(mins[children], maxs[children])]
+        return [self.ids[i] for i in nodes]
+
+
+class SpatialIndex:
+    """Spatial index of entity bounding boxes with incremental updates.
+
+    Boxes live in a packed R-tree plus a small overlay of boxes changed
+    since it was built. Changed or removed entities are masked out of the
+    tree until the overlay reaches ``rebuild_threshold`` and the tree is
+    rebuilt. Implements the index interface of ``QueryIndex`` for the
+    ``intersects`` and ``in_frustum`` operators.
+    """
+    kind = SPATIAL
+
+    def __init__(self, name: str = "bbox", rebuild_threshold: int = 4096):
+        self.field = name
+        self.rebuild_threshold = rebuild_threshold
+        self._boxes: Dict[Hashable, Box] = {}
+        self._tree = PackedRTree([], np.zeros((0, 3)), np.zeros((0, 3)))
+        self._stale: set = set()
+        self._overlay: Dict[Hashable, Box] = {}
+        # Last lookup, so planning and executing a query search only once
+        self._last: Optional[Tuple[Any, List[Hashable]]] = None
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def add(self, entity_id: Hashable, box: Optional[Box]) -> None:
+        if box is None:
+            return
+        self._boxes[entity_id] = box
+        self._stale.add(entity_id)
+        self._overlay[entity_id] = box
+        self._last = None
+        if len(self._overlay) > self.rebuild_threshold:
+            self.rebuild()
+
+    def remove(self, entity_id: Hashable, box: Optional[Box] = None) -> None:
+        if self._boxes.pop(entity_id, None) is not None:
+            self._stale.add(entity_id)
+            self._overlay.pop(entity_id, None)
+            self._last = None
+
+    def load(self, items: Iterable[Tuple[Hashable, Optional[Box]]]) -> None:
+        """Add many boxes and rebuild the tree once."""
+        for entity_id, box in items:
+            if box is not None:
+                self._boxes[entity_id] = box
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Pack every current box into a new tree and clear the overlay."""
+        ids = list(self._boxes)
+        boxes = np.asarray([self._boxes[i] for i in ids], dtype=float).reshape(-1, 2, 3)
+        self._tree = PackedRTree(ids, boxes[:, 0], boxes[:, 1])
+        self._stale = set()
+        self._overlay = {}
+        self._last = None
+
+    def _search(self, test, scalar_test) -> List[Hashable]:
+        found = [i for i in self._tree.search(test) if i not in self._stale]
+        found += [i for i, box in self._overlay.items() if scalar_test(box)]
+        return found
+
+    def intersecting(self, box: Box) -> List[Hashable]:
+        """Ids of entities whose box intersects a query box."""
+        return self._search(lambda mins, maxs: _boxes_intersect(mins, maxs, box), lambda b: box_intersects(b, box))
+
+    def in_frustum(self, planes: Sequence[Sequence[float]]) -> List[Hashable]:
+        """Ids of entities whose box is at least partly inside a frustum."""
+        return self._search(lambda mins, maxs: _boxes_in_frustum(mins, maxs, planes),
+                            lambda b: box_in_frustum(b, planes))
+
+    def supports(self, condition) -> bool:
+        return condition.op in ("intersects", "in_frustum")
+
+    def estimate(self, condition) -> int:
+        return len(self.lookup(condition))
+
+    def lookup(self, condition) -> List[Hashable]:
+        if self._last is not None and self._last[0] == condition:
+            return self._last[1]
+        if condition.op == "intersects":
+            found = self.intersecting(condition.value)
+        else:
+            found = self.in_frustum(condition.value)
+        self._last = (condition, found)
+        return found
@@ -0,0 +1,202 @@
+"""Streaming import of IFC-SPF (STEP) files onto the bus.
+
+Every rooted IFC entity (anything with a GlobalId) becomes one register,
+keyed by the UUID its GlobalId encodes. The register holds the entity as
+an ifcJSON object: attribute names in lower camel case, non-rooted
+entities (placements, representations, properties, ...) nested inline
+and rooted entities linked as ``{"type": ..., "ref": "<uuid>"}``.
+
+Usage: python -m ifc_databus.core.spf_import model.ifc [--batch-size N] [--processes N] [--mqtt HOST[:PORT]]
+"""
+import argparse
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from uuid import UUID
+
+import ifcopenshell
+
+from .bus import IfcBus
+from .guid import expand_guid
+from .ingest import ImportReport, Register, publish_registers
+from .keydict import ifcjson_name
+from .tessellation import Tessellator
+from .validator import SCHEMA_VALIDATOR
+
+# Rooted entities are published by rank: property definitions are referenced
+# by type objects, and relationships reference both
+DEPENDENCY_ORDER = ("IfcPropertyDefinition", "IfcObjectDefinition", "IfcRelationship")
+
+# Attributes not copied into the register: the GlobalId becomes the register
+# id, and the bus keeps its own author and timestamp per change
+SKIPPED_ATTRIBUTES = frozenset({"GlobalId", "OwnerHistory"})
+
+
+class SpfConverter:
+    """Convert ifcopenshell entity instances to ifcJSON register data."""
+
+    def __init__(self):
+        self._rooted: Dict[str, bool] = {}
+        self._fields: Dict[str, List[Tuple[int, str]]] = {}
+
+    def is_rooted(self, instance) -> bool:
+        """Whether an instance has a GlobalId and so gets its own register."""
+        entity_type = instance.is_a()
+        rooted = self._rooted.get(entity_type)
+        if rooted is None:
+            rooted = self._rooted[entity_type] = instance.is_a("IfcRoot")
+        return rooted
+
+    def register(self, instance, representation: Optional[Dict[str, Any]] = None) -> Register:
+        """Convert a rooted instance to ``(id, entity_type, data)``.
+
+        A given ``representation`` (e.g. a tessellated mesh) replaces the
+        instance's own one.
+        """
+        id = expand_guid(instance.GlobalId)
+        data = self.object(instance)
+        data["globalId"] = str(id)
+        if representation is not None:
+            data["representation"] = representation
+        return id, instance.is_a(), data
+
+    def fields(self, instance) -> List[Tuple[int, str]]:
+        """Attribute indices and ifcJSON names copied for an instance's type."""
+        entity_type = instance.is_a()
+        fields = self._fields.get(entity_type)
+        if fields is None:
+            fields = self._fields[entity_type] = [
+                (i, ifcjson_name(name))
+                for i, name in enumerate(instance.get_attribute_names())
+                if name not in SKIPPED_ATTRIBUTES
+            ]
+        return fields
+
+    def object(self, instance) -> Dict[str, Any]:
+        """Convert an instance with its non-rooted attributes nested inline."""
+        data = {"type": instance.is_a()}
+        for i, name in self.fields(instance):
+            value = instance.get_argument(i)
+            if value is not None:
+                data[name] = self.value(value)
+        return data
+
+    def value(self, value: Any) -> Any:
+        """Convert an attribute value."""
+        if isinstance(value, ifcopenshell.entity_instance):
+            if value.id() == 0:
+                # A defined type selected in a SELECT, e.g. IfcLabel('Brick')
+                return {"type": value.is_a(), "value": self.value(value.wrappedValue)}
+            if self.is_rooted(value):
+                return {"type": value.is_a(), "ref": str(expand_guid(value.GlobalId))}
+            return self.object(value)
+        if isinstance(value, tuple):
+            return [self.value(item) for item in value]
+        return value
+
+
+def open_spf(path: str):
+    """Open an IFC-SPF file, parsing instances only as they are read."""
+    return ifcopenshell.open(str(path), lazy=True)
+
+
+def read_spf(
+    model: Union[str, Any],
+    order: Iterable[str] = DEPENDENCY_ORDER,
+    processes: int = 0,
+    chunk_size: int = 64,
+) -> Iterator[Register]:
+    """Yield the rooted entities of a model, or a path to one, in dependency order.
+
+    With ``processes``, product geometry is tessellated on that many worker
+    processes (see ``Tessellator``) and products carry their mesh as
+    representation. Products are then yielded as their meshes arrive, at
+    the end of their rank; the rest of the rank is yielded meanwhile.
+    """
+    path = None
+    if not isinstance(model, ifcopenshell.file):
+        path, model = str(model), open_spf(model)
+    converter = SpfConverter()
+    deferred = set()
+    meshes = None
+    if processes:
+        if path is None:
+            raise ValueError("Tessellating in worker processes needs the path of the model")
+        deferred = {product.id() for product in model.by_type("IfcProduct") if product.Representation}
+        meshes = iter(Tessellator(path, processes, chunk_size).start(sorted(deferred)))
+
+    seen = set()
+    ranks = [model.by_type(rank) for rank in order]
+    # Rooted entities outside the known ranks, published last
+    ranks.append(instance for instance in model.by_type("IfcRoot") if instance.id() not in seen)
+    try:
+        for instances in ranks:
+            waiting = False
+            for instance in instances:
+                seen.add(instance.id())
+                if instance.id() in deferred:
+                    waiting = True
+                    continue
+                yield converter.register(instance)
+            if waiting:
+                for mesh in meshes:
+                    deferred.discard(mesh.id)
+                    yield converter.register(model.by_id(mesh.id), mesh.representation())
+                # Products the geometry iterator skipped keep their own representation
+                for id in sorted(deferred):
+                    yield converter.register(model.by_id(id))
+                deferred.clear()
+    finally:
+        if meshes is not None:
+            meshes.close()
+
+
+def import_spf(
+    bus,
+    model: Union[str, Any],
+    batch_size: int = 1000,
+    on_batch: Optional[Callable[[List[UUID]], None]] = None,
+    max_errors: int = 100,
+    processes: int = 0,
+) -> ImportReport:
+    """Publish the rooted entities of an IFC-SPF model onto a bus.
+
+    Entities are converted while they are published, see
+    ``publish_registers``, and validated against the IFC schema rules
+    only. ``processes`` tessellates product geometry in parallel, see
+    ``read_spf``.
+    """
+    return publish_registers(bus, read_spf(model, processes=processes), batch_size, on_batch, max_errors,
+                             validator=SCHEMA_VALIDATOR)
+
+
+def main(argv: Optional[List[str]] = None) -> ImportReport:
+    """Import an IFC-SPF file from the command line."""
+    parser = argparse.ArgumentParser(description="Publish an IFC-SPF file onto the IFC data bus.")
+    parser.add_argument("path", help="IFC-SPF (.ifc) file")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=0,
+                        help="tessellate geometry on this many processes (0 keeps the source representations)")
+    parser.add_argument("--replica-id", default=None)
+    parser.add_argument("--mqtt", metavar="HOST[:PORT]", help="publish over MQTT instead of in memory")
+    args = parser.parse_args(argv)
+
+    if args.mqtt:
+        from compas_eve import set_default_transport
+        from compas_eve.mqtt import MqttTransport
+
+        host, _, port = args.mqtt.partition(":")
+        set_default_transport(MqttTransport(host, int(port or 1883)))
+
+    bus = IfcBus(args.replica_id)
+    bus.connect()
+    try:
+        report = import_spf(bus, args.path, batch_size=args.batch_size, processes=args.processes)
+    finally:
+        bus.disconnect()
+    for error in report.errors:
+        print(f"Rejected {error}")
+    print(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Parallel tessellation of IFC product geometry into triangle meshes.
+
+Worker processes each open the model once and tessellate chunks of
+products with ifcopenshell's geometry iterator. The vertex and index
+buffers of a chunk are packed into one shared memory block; only the
+block name and the per-product sizes are pickled back, and the parent
+copies the arrays out and frees the block. Block names are chosen by the
+parent, so blocks of chunks that were never read are freed on close.
+"""
+import multiprocessing
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from uuid import uuid4
+
+import numpy as np
+
+import ifcopenshell
+import ifcopenshell.geom
+
+# (step id, vertex buffer bytes, index buffer bytes) per tessellated product
+ChunkEntry = Tuple[int, int, int]
+
+VERTEX_DTYPE = np.float64
+INDEX_DTYPE = np.int32
+
+# Per-worker state, set by _init_worker
+_model = None
+_settings = None
+
+
+def geometry_settings():
+    """Geometry iterator settings: local coordinates in file units, no normals."""
+    settings = ifcopenshell.geom.settings()
+    # Keep the file's length unit, like every other value in the register
+    settings.set("convert-back-units", True)
+    settings.set("no-normals", True)
+    return settings
+
+
+@dataclass
+class Mesh:
+    """Triangle mesh of one product, in its object coordinates."""
+    id: int
+    vertices: np.ndarray
+    faces: np.ndarray
+
+    def representation(self) -> Dict[str, Any]:
+        """The mesh as an ifcJSON ``IfcProductDefinitionShape``.
+
+        ``coordIndex`` is zero-based, as in ``message/example_message_wall_mesh.json``.
+        """
+        return {
+            "type": "IfcProductDefinitionShape",
+            "representations": [{
+                "type": "IfcShapeRepresentation",
+                "representationIdentifier": "Body",
+                "representationType": "Tessellation",
+                "items": [{
+                    "type": "IfcTriangulatedFaceSet",
+                    "coordinates": {"type": "IfcCartesianPointList3D", "coordList": self.vertices.tolist()},
+                    "coordIndex": self.faces.tolist(),
+                }],
+            }],
+        }
+
+
+def _init_worker(path: str):
+    global _model, _settings
+    _model = ifcopenshell.open(path)
+    _settings = geometry_settings()
+
+
+def _tessellate_chunk(task: Tuple[str, List[int]]) -> Tuple[str, List[ChunkEntry]]:
+    """Tessellate products in a worker and pack their buffers into the named shared memory block."""
+    name, ids = task
+    iterator = ifcopenshell.geom.iterator(_settings, _model, 1, include=[_model.by_id(id) for id in ids])
+    buffers, entries = [], []
+    if iterator.initialize():
+        while True:
+            shape = iterator.get()
+            vertices, faces = shape.geometry.verts_buffer, shape.geometry.faces_buffer
+            buffers.extend((vertices, faces))
+            entries.append((shape.id, len(vertices), len(faces)))
+            if not iterator.next():
+                break
+    if not entries:
+        return name, entries
+    block = SharedMemory(name=name, create=True, size=sum(len(buffer) for buffer in buffers))
+    offset = 0
+    for buffer in buffers:
+        block.buf[offset:offset + len(buffer)] = buffer
+        offset += len(buffer)
+    block.close()
+    return block.name, entries
+
+
+def unpack_chunk(name: str, entries: List[ChunkEntry]) -> List[Mesh]:
+    """Copy the meshes of a chunk out of its shared memory block and free it."""
+    block = SharedMemory(name=name)
+    meshes = []
+    try:
+        offset = 0
+        for id, vertex_bytes, index_bytes in entries:
+            vertices = np.frombuffer(block.buf, VERTEX_DTYPE, vertex_bytes // 8, offset).reshape(-1, 3).copy()
+            offset += vertex_bytes
+            faces = np.frombuffer(block.buf, INDEX_DTYPE, index_bytes // 4, offset).reshape(-1, 3).copy()
+            offset += index_bytes
+            meshes.append(Mesh(id, vertices, faces))
+    finally:
+        block.close()
+        block.unlink()
+    return meshes
+
+
+class Tessellator:
+    """Tessellate the products of an IFC-SPF file on a pool of processes.
+
+    ``start`` submits every chunk at once; iterating yields meshes in the
+    order chunks finish, so the caller can publish while workers are still
+    tessellating. Stopping early, or ``close``, stops the workers and frees
+    the blocks of chunks that were not read.
+    """
+
+    def __init__(self, path: str, processes: Optional[int] = None, chunk_size: int = 64):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.path = str(path)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._results = None
+        # Shared memory block names of the chunks not unpacked yet
+        self._blocks: Set[str] = set()
+
+    def start(self, ids: Iterable[int]) -> "Tessellator":
+        """Start tessellating the products with the given step ids."""
+        ids = list(ids)
+        chunks = [ids[i:i + self.chunk_size] for i in range(0, len(ids), self.chunk_size)]
+        prefix = f"ifc_{uuid4().hex[:12]}"
+        tasks = [(f"{prefix}_{i}", chunk) for i, chunk in enumerate(chunks)]
+        self._blocks.update(name for name, _ in tasks)
+        # Spawned rather than forked: the bus may already run a sender thread
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(self.processes, initializer=_init_worker, initargs=(self.path,))
+        self._results = self._pool.imap_unordered(_tessellate_chunk, tasks)
+        return self
+
+    def __iter__(self) -> Iterator[Mesh]:
+        if self._results is None:
+            raise ValueError("Tessellator has not been started")
+        try:
+            for name, entries in self._results:
+                self._blocks.discard(name)
+                if entries:
+                    yield from unpack_chunk(name, entries)
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop the worker processes and free the blocks of chunks that were not read."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        for name in self._blocks:
+            try:
+                block = SharedMemory(name=name)
+            except FileNotFoundError:
+                # Not tessellated yet, or the chunk had no geometry
+                continue
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+
+
+def tessellate(path: str, ids: Iterable[int], processes: Optional[int] = None,
+               chunk_size: int = 64) -> Iterator[Mesh]:
+    """Yield the meshes of the given products as worker processes finish them."""
+    return iter(Tessellator(path, processes, chunk_size).start(ids))
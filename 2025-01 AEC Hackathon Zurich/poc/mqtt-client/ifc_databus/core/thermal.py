@@ -0,0 +1,361 @@
+"""Vectorized U-value computation for layered building elements."""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+import math
+
+import numpy as np
+
+from .qto import related_entities, resolve_layer_items
+from .refs import RefResolver
+
+# Surface resistances in m2K/W for horizontal heat flow (ISO 6946)
+R_SI = 0.13
+R_SE = 0.04
+
+# Property that holds a material's conductivity in W/(mK)
+CONDUCTIVITY_PROPERTY = "ThermalConductivity"
+
+# Registers that can carry materials, conductivities or their links
+MATERIAL_TYPES = {"IfcMaterial", "IfcPropertySet", "IfcMaterialProperties", "IfcRelAssociates",
+                  "IfcRelDefinesByProperties"}
+
+# Material slot used to pad rows: infinite conductivity, zero thickness
+PAD = 0
+
+# isVentilated values of ventilated layers
+VENTILATED = {True, "true", "TRUE", ".T."}
+
+
+def _walk(value: Any) -> Iterable[Dict[str, Any]]:
+    """Every ifcJSON object in a nested value."""
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            yield item
+            stack.extend(v for v in item.values() if isinstance(v, (dict, list)))
+        elif isinstance(item, list):
+            stack.extend(item)
+
+
+def _refs(value: Any) -> List[str]:
+    """Ids referenced by a ``{"ref": ...}`` object or a list of them."""
+    items = value if isinstance(value, list) else [value]
+    return [item["ref"] if "ref" in item else item.get("globalId")
+            for item in items if isinstance(item, dict) and ("ref" in item or "globalId" in item)]
+
+
+def _conductivity(pset: Dict[str, Any]) -> Optional[float]:
+    for prop in pset.get("hasProperties") or pset.get("properties") or []:
+        if isinstance(prop, dict) and prop.get("name") == CONDUCTIVITY_PROPERTY:
+            value = prop.get("nominalValue")
+            value = value.get("value") if isinstance(value, dict) else value
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return float(value)
+    return None
+
+
+class UValueEngine:
+    """U-values of layered elements, computed for many elements at once.
+
+    Each element is a row of material slots and layer thicknesses in
+    padded NumPy arrays, and each material slot has a conductivity. A
+    change of an element's layers or of a material's conductivity marks
+    only the affected rows dirty; ``compute()`` recomputes all dirty rows
+    in one vectorized pass::
+
+        U = 1 / (Rsi + Rse + sum(thickness / conductivity))
+
+    Layers are matched to conductivities by material name, or by layer
+    name for layers without a material (e.g. an air gap). Ventilated
+    layers are skipped. Elements with a layer of unknown conductivity
+    get a U-value of NaN until it is known. ``length_unit`` converts layer
+    thicknesses to metres (default: millimetres).
+    """
+
+    def __init__(
+        self,
+        lookup: Optional[Callable[[UUID], Any]] = None,
+        length_unit: float = 0.001,
+        r_si: float = R_SI,
+        r_se: float = R_SE,
+        capacity: int = 1024,
+        resolver: Optional[RefResolver] = None,
+    ):
+        self._lookup = lookup or (lambda entity_id: None)
+        self._resolver = resolver
+        self.length_unit = length_unit
+        self.r_si = r_si
+        self.r_se = r_se
+        self._rows: Dict[UUID, int] = {}
+        self._row_ids: List[Optional[UUID]] = []
+        self._free: List[int] = []
+        self._layers: Dict[int, Tuple[Tuple[int, ...], Tuple[float, ...]]] = {}
+        self._materials: Dict[str, int] = {}
+        self._conductivity = np.array([np.inf])
+        self._slots = np.zeros((capacity, 1), dtype=np.int64)
+        self._thickness = np.zeros((capacity, 1))
+        self._u = np.full(capacity, np.nan)
+        self._dirty: Set[int] = set()
+        self._unpublished: Set[UUID] = set()
+        self._reads: Dict[UUID, Set[UUID]] = {}
+        self._readers: Dict[UUID, Set[UUID]] = {}
+
+        # Material, property set and association data seen so far, by globalId
+        self._material_names: Dict[str, str] = {}
+        self._pset_values: Dict[str, float] = {}
+        self._pset_materials: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _material(self, name: str) -> int:
+        slot = self._materials.get(name)
+        if slot is None:
+            slot = self._materials[name] = len(self._conductivity)
+            self._conductivity = np.append(self._conductivity, np.nan)
+        return slot
+
+    def conductivity(self, name: str) -> Optional[float]:
+        slot = self._materials.get(name)
+        value = self._conductivity[slot] if slot is not None else math.nan
+        return None if math.isnan(value) else float(value)
+
+    def set_conductivity(self, name: str, value: Optional[float]) -> None:
+        """Set the conductivity of a material (or layer) name in W/(mK)."""
+        slot = self._material(name)
+        value = math.nan if value is None else float(value)
+        current = self._conductivity[slot]
+        if current == value or (math.isnan(current) and math.isnan(value)):
+            return
+        self._conductivity[slot] = value
+        used = np.nonzero((self._slots[:len(self._row_ids)] == slot).any(axis=1))[0]
+        self._dirty.update(used.tolist())
+
+    def load_ifcjson(self, objects: Any) -> None:
+        """Read conductivities from ifcJSON objects, in any order and across calls.
+
+        Materials are linked to property sets with a ``ThermalConductivity``
+        by ``IfcRelAssociates`` / ``IfcRelDefinesByProperties``
+        (``relatedObjects`` and ``relatingPropertyDefinition``), as in
+        ``example_operation.json``, or by ``IfcMaterialProperties``.
+        """
+        touched: Set[str] = set()
+        for obj in _walk(objects):
+            kind, global_id = obj.get("type"), obj.get("globalId")
+            if kind == "IfcMaterial" and global_id and obj.get("name"):
+                self._material_names[global_id] = obj["name"]
+                touched.update(p for p, materials in self._pset_materials.items() if global_id in materials)
+            elif kind in ("IfcPropertySet", "IfcMaterialProperties"):
+                value = _conductivity(obj)
+                if value is None:
+                    continue
+                pset_id = global_id or f"_pset{id(obj)}"
+                self._pset_values[pset_id] = value
+                self._pset_materials.setdefault(pset_id, set()).update(_refs(obj.get("material")))
+                touched.add(pset_id)
+            elif kind in ("IfcRelAssociates", "IfcRelDefinesByProperties"):
+                for pset_id in _refs(obj.get("relatingPropertyDefinition")):
+                    self._pset_materials.setdefault(pset_id, set()).update(_refs(obj.get("relatedObjects")))
+                    touched.add(pset_id)
+        for pset_id in touched:
+            value = self._pset_values.get(pset_id)
+            if value is None:
+                continue
+            for material_id in self._pset_materials.get(pset_id, ()):
+                name = self._material_names.get(material_id, material_id)
+                self.set_conductivity(name, value)
+
+    def set_layers(self, entity_id: UUID, layers: Iterable[Dict[str, Any]]) -> None:
+        """Set the ``IfcMaterialLayer`` objects of an element."""
+        self.set_layers_many([(entity_id, layers)])
+
+    def set_layers_many(self, items: Iterable[Tuple[UUID, Iterable[Dict[str, Any]]]]) -> None:
+        """Set the layers of many elements, writing the arrays once."""
+        rows, cols, slots, thicknesses = [], [], [], []
+        width = self._slots.shape[1]
+        materials, known = self._material, self._materials
+        for entity_id, layers in items:
+            row_slots, row_thicknesses = [], []
+            for layer in layers:
+                if layer.get("isVentilated") in VENTILATED:
+                    continue
+                material = layer.get("material")
+                name = material.get("name") if isinstance(material, dict) else None
+                name = name or layer.get("name")
+                thickness = layer.get("layerThickness")
+                if name is None or not isinstance(thickness, (int, float)):
+                    continue
+                slot = known.get(name)
+                row_slots.append(materials(name) if slot is None else slot)
+                row_thicknesses.append(float(thickness))
+            if not row_slots:
+                self.remove(entity_id)
+                continue
+            row_layers = (tuple(row_slots), tuple(row_thicknesses))
+            row = self._rows.get(entity_id)
+            if row is None:
+                row = self._row(entity_id)
+            elif self._layers[row] == row_layers:
+                continue
+            self._layers[row] = row_layers
+            count = len(row_slots)
+            rows.extend([row] * count)
+            cols.extend(range(count))
+            slots.extend(row_slots)
+            thicknesses.extend(row_thicknesses)
+            width = max(width, count)
+            self._dirty.add(row)
+        if not rows:
+            return
+        if width > self._slots.shape[1]:
+            extra = width - self._slots.shape[1]
+            self._slots = np.pad(self._slots, ((0, 0), (0, extra)), constant_values=PAD)
+            self._thickness = np.pad(self._thickness, ((0, 0), (0, extra)))
+        changed = np.unique(rows)
+        self._slots[changed] = PAD
+        self._thickness[changed] = 0.0
+        self._slots[rows, cols] = slots
+        self._thickness[rows, cols] = thicknesses
+
+    def _row(self, entity_id: UUID) -> int:
+        if self._free:
+            row = self._free.pop()
+            self._row_ids[row] = entity_id
+        else:
+            row = len(self._row_ids)
+            self._row_ids.append(entity_id)
+            if row >= len(self._u):
+                grow = len(self._u)
+                self._slots = np.concatenate([self._slots, np.zeros((grow, self._slots.shape[1]), dtype=np.int64)])
+                self._thickness = np.concatenate([self._thickness, np.zeros((grow, self._thickness.shape[1]))])
+                self._u = np.concatenate([self._u, np.full(grow, np.nan)])
+        self._rows[entity_id] = row
+        return row
+
+    def remove(self, entity_id: UUID) -> None:
+        row = self._rows.pop(entity_id, None)
+        if row is None:
+            return
+        del self._layers[row]
+        self._slots[row] = PAD
+        self._thickness[row] = 0.0
+        self._u[row] = np.nan
+        self._row_ids[row] = None
+        self._dirty.discard(row)
+        self._unpublished.discard(entity_id)
+        self._free.append(row)
+
+    def compute(self) -> List[UUID]:
+        """Recompute the U-values of dirty elements; returns the ids whose value changed."""
+        if not self._dirty:
+            return []
+        rows = np.fromiter(self._dirty, dtype=np.int64, count=len(self._dirty))
+        self._dirty = set()
+        conductivity = self._conductivity[self._slots[rows]]
+        resistance = self.r_si + self.r_se + (self._thickness[rows] * self.length_unit / conductivity).sum(axis=1)
+        u = 1.0 / resistance
+        before = self._u[rows]
+        changed = ~((u == before) | (np.isnan(u) & np.isnan(before)))
+        self._u[rows] = u
+        ids = [self._row_ids[row] for row in rows[changed]]
+        self._unpublished.update(ids)
+        return ids
+
+    def u_value(self, entity_id: UUID) -> Optional[float]:
+        """U-value of an element in W/(m2K), or None if unknown."""
+        row = self._rows.get(entity_id)
+        if row is None:
+            return None
+        if self._dirty:
+            self.compute()
+        value = self._u[row]
+        return None if math.isnan(value) else float(value)
+
+    def u_values(self) -> Dict[UUID, float]:
+        """Known U-values of every element."""
+        if self._dirty:
+            self.compute()
+        return {entity_id: float(self._u[row]) for entity_id, row in self._rows.items() if not math.isnan(self._u[row])}
+
+    def attach(self, bus, publish: bool = False) -> "UValueEngine":
+        """Follow the elements and materials on a bus.
+
+        With ``publish=True`` changed U-values are written back to the
+        elements as derived properties right away (see ``publish``).
+        """
+        self._lookup = bus.get_entity
+        if self._resolver is None:
+            self._resolver = RefResolver(bus)
+
+        def follow(entity_ids: List[UUID]) -> None:
+            self.update(entity_ids)
+            if publish:
+                self.publish(bus)
+
+        bus.on_change(follow)
+        follow(bus.entity_ids())
+        return self
+
+    def update(self, entity_ids: Iterable[UUID]) -> List[UUID]:
+        """Re-read changed registers and recompute; returns the ids whose U-value changed."""
+        touched = set(entity_ids)
+        for entity_id in list(touched):
+            touched |= self._readers.get(entity_id, set())
+            if self._resolver is not None:
+                touched |= self._resolver.refs(entity_id)
+        materials = []
+        for entity_id in touched:
+            entity = self._lookup(entity_id)
+            if entity is not None and entity.entity_type in MATERIAL_TYPES:
+                materials.append({"type": entity.entity_type, "globalId": str(entity_id), **entity.data})
+        self.load_ifcjson(materials)
+        elements = [(entity_id, self._read_element(entity_id)) for entity_id in touched]
+        self.set_layers_many((entity_id, layers) for entity_id, layers in elements if layers is not None)
+        return self.compute()
+
+    def _read_element(self, entity_id: UUID) -> Optional[List[Dict[str, Any]]]:
+        """Layers of an element register, or None after removing a non-element."""
+        for target_id in self._reads.pop(entity_id, ()):
+            readers = self._readers.get(target_id)
+            if readers is not None:
+                readers.discard(entity_id)
+                if not readers:
+                    del self._readers[target_id]
+        entity = self._lookup(entity_id)
+        if entity is None or entity.entity_type in MATERIAL_TYPES:
+            self.remove(entity_id)
+            return None
+        related, reads = related_entities(entity, self._lookup, self._resolver, entity_id)
+        if reads:
+            self._reads[entity_id] = reads
+            for target_id in reads:
+                self._readers.setdefault(target_id, set()).add(entity_id)
+        return resolve_layer_items(entity.data, related)
+
+    def publish(self, bus, entity_ids: Optional[Iterable[UUID]] = None) -> int:
+        """Write U-values back as ``thermal_transmittance`` (W/(m2K)) and
+        ``thermal_resistance`` (m2K/W, including surface resistances).
+
+        Without ``entity_ids`` every element whose U-value changed since
+        the last publish is written, as fragment operations on the changed
+        fields only. Returns the number of updates.
+        """
+        if self._dirty:
+            self.compute()
+        pending = set(entity_ids) if entity_ids is not None else self._unpublished
+        self._unpublished = self._unpublished - pending
+        published = 0
+        for entity_id in pending:
+            u = self.u_value(entity_id)
+            if u is None or not bus.has_entity(entity_id):
+                continue
+            data = bus.get_entity(entity_id).data
+            derived = {"thermal_transmittance": round(u, 6), "thermal_resistance": round(1.0 / u, 6)}
+            ops = [{"op": "set", "path": f"/{key}", "value": value}
+                   for key, value in derived.items() if data.get(key) != value]
+            if not ops:
+                continue
+            bus.update_fragment(entity_id, ops)
+            published += 1
+        return published
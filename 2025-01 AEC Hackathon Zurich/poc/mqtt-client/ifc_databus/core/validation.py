@@ -1,7 +1,16 @@
-"""Validation rules for IFC entities and relationships."""
-from typing import Dict, Any, Optional, Set
+"""Validation rules for IFC entities and relationships.
+
+Rules come from two places. The IFC4 schema (``SCHEMA_RULES``) decides
+which fields an entity requires, so any schema-valid ifcJSON passes. The
+hand-written ``IFC_RULES`` only add the demo clients' extra allowed fields
+and relationships on top of the schema rule of the same type, and give
+the full rule of names the schema does not define (e.g. ``IfcWall_data``).
+"""
+from typing import Dict, Any, Iterator, Mapping, Optional, Set
 from dataclasses import dataclass, field
 
+from .schema_rules import SCHEMA_RULES
+
 
 @dataclass
 class EntityRule:
@@ -37,47 +46,37 @@ class EntityRule:
         return None
 
 
-# Define validation rules for common IFC entities
+# Extra fields and relationships the demo clients use, and rules of non-schema names
 IFC_RULES: Dict[str, EntityRule] = {
     # Mesh-related entities
     "IfcTriangulatedFaceSet": EntityRule(
-        required_fields={"coordinates", "coordIndex"},
         allowed_fields={"type", "coordinates", "coordIndex", "closed", "PnIndex"}
     ),
     "IfcCartesianPointList3D": EntityRule(
-        required_fields={"coordList"},
         allowed_fields={"type", "coordList"}
     ),
     "IfcShapeRepresentation": EntityRule(
-        required_fields={"representationIdentifier", "representationType", "items"},
         allowed_fields={"type", "representationIdentifier", "representationType", "items"}
     ),
     "IfcProductDefinitionShape": EntityRule(
-        required_fields={"representations"},
         allowed_fields={"type", "representations"}
     ),
     "IfcLocalPlacement": EntityRule(
-        required_fields={"relativePlacement"},
         allowed_fields={"type", "placementRelTo", "relativePlacement"}
     ),
     "IfcAxis2Placement3D": EntityRule(
-        required_fields={"location"},
         allowed_fields={"type", "location", "axis", "refDirection"}
     ),
     "IfcCartesianPoint": EntityRule(
-        required_fields={"coordinates"},
         allowed_fields={"type", "coordinates"}
     ),
     "IfcDirection": EntityRule(
-        required_fields={"directionRatios"},
         allowed_fields={"type", "directionRatios"}
     ),
     "IfcPropertySet": EntityRule(
-        required_fields={"name", "hasProperties"},
         allowed_fields={"type", "globalId", "name", "description", "hasProperties"}
     ),
     "IfcPropertySingleValue": EntityRule(
-        required_fields={"name", "nominalValue"},
         allowed_fields={"type", "name", "description", "nominalValue"}
     ),
     "IfcText": EntityRule(
@@ -85,19 +84,15 @@ IFC_RULES: Dict[str, EntityRule] = {
         allowed_fields={"type", "value"}
     ),
     "IfcRelAssociates": EntityRule(
-        required_fields={"relatedObjects", "relatingPropertyDefinition"},
         allowed_fields={"type", "globalId", "name", "relatedObjects", "relatingPropertyDefinition"}
     ),
     "IfcClassificationReference": EntityRule(
-        required_fields={"identification", "name"},
         allowed_fields={"type", "globalId", "identification", "name", "description", "location"}
     ),
     "IfcRelAssociatesClassification": EntityRule(
-        required_fields={"type", "relatedObjects"},
         allowed_fields={"type", "globalId", "name", "description", "relatedObjects", "relatingClassification"}
     ),
     "IfcWall": EntityRule(
-        required_fields={},
         allowed_fields={
             "globalId", "data",
             "name", "height", "width", "materialLayers", "layerSetName",
@@ -116,27 +111,21 @@ IFC_RULES: Dict[str, EntityRule] = {
         allowed_fields={"type", "version", "schemaIdentifier", "data"}
     ),
     "IfcMaterialLayerSet": EntityRule(
-        required_fields={"associatedTo", "materialLayers", "layerSetName"},
         allowed_fields={"associatedTo", "materialLayers", "layerSetName"}
     ),
     "IfcRelAssociatesMaterial": EntityRule(
-        required_fields={"type", "relatedObjects"},
         allowed_fields={"type", "globalId", "name", "description", "relatedObjects", "relatingMaterial"}
     ),
     "IfcWallType": EntityRule(
-        required_fields={"type", "ref"},
         allowed_fields={"type", "ref"}
     ),
     "IfcMaterialLayer": EntityRule(
-        required_fields={"type", "layerThickness", "isVentilated", "name"},
         allowed_fields={"type", "layerThickness", "isVentilated", "name", "material"}
     ),
     "IfcMaterial": EntityRule(
-        required_fields={"type", "name"},
         allowed_fields={"type", "name"}
     ),
     "IfcWindow": EntityRule(
-        required_fields={"name", "height", "width"},
         allowed_fields={"name", "height", "width", "material"},
         allowed_relationships={
             "fills": {"IfcWall"},
@@ -144,7 +133,6 @@ IFC_RULES: Dict[str, EntityRule] = {
         }
     ),
     "IfcSpace": EntityRule(
-        required_fields={"Area"},
         allowed_fields={"Name", "Description", "Area", "Height", "Volume"},
         allowed_relationships={
             "bounded_by": {"IfcWall"},
@@ -152,7 +140,6 @@ IFC_RULES: Dict[str, EntityRule] = {
         }
     ),
     "IfcDoor": EntityRule(
-        required_fields={"Width", "Height"},
         allowed_fields={"Name", "Description", "Width", "Height", "Thickness", "Position"},
         allowed_relationships={
             "fills": {"IfcWall"},
@@ -162,17 +149,72 @@ IFC_RULES: Dict[str, EntityRule] = {
 }
 
 
+class MergedRules(Mapping):
+    """Schema rules extended by hand-written ones, merged per type on first use.
+
+    A type the schema defines keeps the schema's required fields; the
+    hand-written rule only widens its allowed fields and relationships.
+    """
+
+    def __init__(self, extra: Mapping[str, EntityRule], schema: Mapping[str, EntityRule]):
+        self._extra = extra
+        self._schema = schema
+        # Entity type -> merged rule, or None for unknown names
+        self._merged: Dict[str, Optional[EntityRule]] = {}
+
+    def __getitem__(self, entity_type: str) -> EntityRule:
+        try:
+            rule = self._merged[entity_type]
+        except KeyError:
+            rule = self._merged[entity_type] = self._merge(entity_type)
+        if rule is None:
+            raise KeyError(entity_type)
+        return rule
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._schema
+        yield from (name for name in self._extra if name not in self._schema)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def _merge(self, entity_type: str) -> Optional[EntityRule]:
+        schema = self._schema.get(entity_type)
+        extra = self._extra.get(entity_type)
+        if schema is None or extra is None:
+            return schema or extra
+        relationships = {name: set(targets) for name, targets in schema.allowed_relationships.items()}
+        for name, targets in extra.allowed_relationships.items():
+            relationships.setdefault(name, set()).update(targets)
+        return EntityRule(
+            required_fields=set(schema.required_fields),
+            allowed_fields=schema.allowed_fields | extra.allowed_fields,
+            allowed_relationships=relationships,
+        )
+
+
+# Schema rules decide required fields, hand-written rules extend them
+RULES: Mapping[str, EntityRule] = MergedRules(IFC_RULES, SCHEMA_RULES)
+
+
+def get_rule(entity_type: str) -> Optional[EntityRule]:
+    """Look up the rule of an entity type, see ``RULES``."""
+    return RULES.get(entity_type)
+
+
 def validate_entity(entity_type: str, data: Dict[str, Any]) -> Optional[str]:
     """Validate an IFC entity's data."""
-    if entity_type not in IFC_RULES:
+    rule = get_rule(entity_type)
+    if rule is None:
         return f"Unknown entity type: {entity_type}"
     
-    return IFC_RULES[entity_type].validate_data(data)
+    return rule.validate_data(data)
 
 
 def validate_relationship(source_type: str, rel_type: str, target_type: str) -> Optional[str]:
     """Validate a relationship between two IFC entities."""
-    if source_type not in IFC_RULES:
+    rule = get_rule(source_type)
+    if rule is None:
         return f"Unknown source entity type: {source_type}"
     
-    return IFC_RULES[source_type].validate_relationship(rel_type, target_type)
+    return rule.validate_relationship(rel_type, target_type)
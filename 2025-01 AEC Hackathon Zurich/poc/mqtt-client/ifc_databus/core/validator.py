@@ -0,0 +1,147 @@
+"""Compiled, batched validation of IFC entities."""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple, Union
+
+from .schema_rules import SCHEMA_RULES
+from .validation import RULES, EntityRule
+
+# check(data, path, index, errors) appends ValidationErrors for one object
+Check = Callable[[Dict[str, Any], str, int, list], None]
+
+
+@dataclass(frozen=True)
+class ValidationError:
+    """A validation failure of one entity in a batch."""
+    index: int
+    entity_type: str
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        location = f" at {self.path}" if self.path else ""
+        return f"{self.entity_type}[{self.index}]{location}: {self.message}"
+
+
+class CompiledValidator:
+    """Validator that compiles entity rules into per-type closures.
+
+    Each type is compiled once, on first use, into a closure over frozen
+    lookup tables. Unless ``nested`` is off, nested ifcJSON objects that
+    carry a ``type`` with known rules are validated recursively;
+    ``{"ref": ...}`` links are skipped. In strict mode fields outside
+    ``allowed_fields`` are reported too.
+    """
+
+    def __init__(self, rules: Mapping[str, EntityRule] = RULES, strict: bool = False, nested: bool = True):
+        self._rules = rules
+        self.strict = strict
+        self.nested = nested
+        self._compiled: Dict[str, Optional[Check]] = {}
+        self._required: Dict[str, FrozenSet[str]] = {}
+
+    def _check_for(self, entity_type: str) -> Optional[Check]:
+        """Return the compiled check of a type, or None for unknown types."""
+        try:
+            return self._compiled[entity_type]
+        except KeyError:
+            rule = self._rules.get(entity_type)
+            check = self._compile(entity_type, rule) if rule is not None else None
+            self._compiled[entity_type] = check
+            return check
+
+    def _compile(self, entity_type: str, rule: EntityRule) -> Check:
+        required = frozenset(rule.required_fields)
+        self._required[entity_type] = required
+        ordered: Tuple[str, ...] = tuple(sorted(required))
+        allowed = frozenset(rule.allowed_fields)
+        strict = self.strict
+        nested = self._check_nested if self.nested else None
+        containers = (dict, list)
+
+        def check(data: Dict[str, Any], path: str, index: int, errors: list) -> None:
+            if not required.issubset(data):
+                for name in ordered:
+                    if name not in data:
+                        errors.append(ValidationError(index, entity_type, path, f"Missing required field: {name}"))
+            if strict and not data.keys() <= allowed:
+                for name in sorted(data.keys() - allowed):
+                    errors.append(ValidationError(index, entity_type, f"{path}/{name}", f"Unexpected field: {name}"))
+            if nested is not None:
+                for name, value in data.items():
+                    if type(value) in containers:
+                        nested(value, f"{path}/{name}", index, errors)
+
+        return check
+
+    def _check_nested(self, value: Any, path: str, index: int, errors: list) -> None:
+        """Validate the typed objects inside a nested value."""
+        if type(value) is list:
+            for i, item in enumerate(value):
+                if type(item) in (dict, list):
+                    self._check_nested(item, f"{path}/{i}", index, errors)
+            return
+        if "ref" in value:
+            return
+        check = self._check_for(value.get("type"))
+        if check is not None:
+            check(value, path, index, errors)
+        else:
+            for name, item in value.items():
+                if type(item) in (dict, list):
+                    self._check_nested(item, f"{path}/{name}", index, errors)
+
+    def validate(self, entity_type: str, data: Dict[str, Any], index: int = 0) -> List[ValidationError]:
+        """Validate one entity and return all of its errors."""
+        errors: List[ValidationError] = []
+        check = self._check_for(entity_type)
+        if check is None:
+            errors.append(ValidationError(index, entity_type, "", f"Unknown entity type: {entity_type}"))
+        else:
+            check(data, "", index, errors)
+        return errors
+
+    def validate_many(
+        self, entities: Iterable[Union[Dict[str, Any], Tuple[str, Dict[str, Any]]]]
+    ) -> List[ValidationError]:
+        """Validate a batch of entities and return every error with its path.
+
+        Entities are ifcJSON objects with a ``type`` key or
+        ``(entity_type, data)`` pairs.
+        """
+        errors: List[ValidationError] = []
+        compiled = self._compiled
+        # Without strict or nested checks an entity only needs its required
+        # fields, which is tested inline before calling the compiled check
+        shallow = self._required if not (self.strict or self.nested) else None
+        for index, entity in enumerate(entities):
+            if type(entity) is tuple:
+                entity_type, data = entity
+            else:
+                entity_type, data = entity.get("type"), entity
+            if shallow is not None:
+                required = shallow.get(entity_type)
+                if required is not None and required.issubset(data):
+                    continue
+            check = compiled[entity_type] if entity_type in compiled else self._check_for(entity_type)
+            if check is None:
+                errors.append(ValidationError(index, entity_type, "", f"Unknown entity type: {entity_type}"))
+            else:
+                check(data, "", index, errors)
+        return errors
+
+    def first_error(self, entity_type: str, data: Dict[str, Any]) -> Optional[str]:
+        """Return the first error as a message, like ``validate_entity``."""
+        errors = self.validate(entity_type, data)
+        if not errors:
+            return None
+        error = errors[0]
+        return f"{error.message} at {error.path}" if error.path else error.message
+
+
+# Shared validator used by the bus; like validate_entity it checks the top
+# level only, since clients publish partial nested objects
+DEFAULT_VALIDATOR = CompiledValidator(nested=False)
+
+# Validator for entities converted from IFC files, which follow the schema
+# rather than the hand-written rules of the demo clients
+SCHEMA_VALIDATOR = CompiledValidator(SCHEMA_RULES, nested=False)
@@ -0,0 +1,159 @@
+"""Live query subscriptions with incremental result deltas."""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from .query import MISSING, Query, QueryIndex
+
+
+@dataclass
+class WatchDelta:
+    """Entities that entered, changed inside, or left a watched query result."""
+    entered: List[UUID] = field(default_factory=list)
+    updated: List[UUID] = field(default_factory=list)
+    left: List[UUID] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.entered or self.updated or self.left)
+
+
+class Watch:
+    """A query kept current by its registry; ``ids`` is the current result."""
+
+    def __init__(self, registry: "WatchRegistry", query: Query, callback: Callable[[WatchDelta], None]):
+        self.query = query
+        self.callback = callback
+        self.ids: Set[UUID] = set()
+        self.group: Tuple[Optional[str], Optional[str], Any] = (query.entity_type, None, None)
+        self._registry = registry
+
+    def cancel(self) -> None:
+        """Stop receiving deltas."""
+        self._registry.remove(self)
+
+
+class WatchRegistry:
+    """Routes entity changes to the watches they can affect.
+
+    Watches are grouped by the entity type of their query and, if the
+    query has an equality condition on an indexed field, by that value
+    too. A change is only checked against the watches in its groups and
+    the watches whose result already contains the entity.
+    """
+
+    def __init__(self, index: QueryIndex, lookup: Callable[[UUID], Any]):
+        self._index = index
+        self._lookup = lookup
+        self._groups: Dict[Tuple[Optional[str], Optional[str], Any], Set[Watch]] = {}
+        self._routed_fields: Dict[str, int] = {}
+        self._members: Dict[UUID, Set[Watch]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(watches) for watches in self._groups.values())
+
+    def _group(self, watch: Watch) -> Tuple[Optional[str], Optional[str], Any]:
+        """Routing key of a watch: entity type plus an optional field value."""
+        for condition in watch.query.conditions:
+            if condition.op == "==" and condition.field in self._index.indexed_fields:
+                try:
+                    hash(condition.value)
+                except TypeError:
+                    continue
+                return watch.query.entity_type, condition.field, condition.value
+        return watch.query.entity_type, None, None
+
+    def add(self, query: Query, callback: Callable[[WatchDelta], None]) -> Watch:
+        """Evaluate a query once and push its result as the first delta."""
+        watch = Watch(self, query, callback)
+        watch.group = self._group(watch)
+        self._groups.setdefault(watch.group, set()).add(watch)
+        if watch.group[1] is not None:
+            self._routed_fields[watch.group[1]] = self._routed_fields.get(watch.group[1], 0) + 1
+        ids = query.ids()
+        for entity_id in ids:
+            self._enter(watch, entity_id)
+        if ids:
+            self._deliver(watch, WatchDelta(entered=ids))
+        return watch
+
+    def remove(self, watch: Watch) -> None:
+        group = self._groups.get(watch.group)
+        if group is None or watch not in group:
+            return
+        group.discard(watch)
+        if not group:
+            del self._groups[watch.group]
+        if watch.group[1] is not None:
+            self._routed_fields[watch.group[1]] -= 1
+            if not self._routed_fields[watch.group[1]]:
+                del self._routed_fields[watch.group[1]]
+        for entity_id in watch.ids:
+            self._members.get(entity_id, set()).discard(watch)
+        watch.ids = set()
+
+    def update(self, entity_ids: Iterable[UUID]) -> None:
+        """Re-check changed entities and push the resulting deltas."""
+        deltas: Dict[Watch, WatchDelta] = {}
+        for entity_id in entity_ids:
+            data_cache: List[Optional[Dict[str, Any]]] = []
+
+            def data(entity_id=entity_id, cache=data_cache):
+                if not cache:
+                    entity = self._lookup(entity_id)
+                    cache.append(entity.data if entity is not None else None)
+                return cache[0]
+
+            for watch in self._candidates(entity_id):
+                query = watch.query
+                now = self._index.matches(entity_id, query.entity_type, query.conditions, data)
+                was = entity_id in watch.ids
+                if not (now or was):
+                    continue
+                delta = deltas.setdefault(watch, WatchDelta())
+                if now and was:
+                    delta.updated.append(entity_id)
+                elif now:
+                    self._enter(watch, entity_id)
+                    delta.entered.append(entity_id)
+                else:
+                    self._leave(watch, entity_id)
+                    delta.left.append(entity_id)
+        for watch, delta in deltas.items():
+            self._deliver(watch, delta)
+
+    def _candidates(self, entity_id: UUID) -> Set[Watch]:
+        """Watches a change of an entity can affect."""
+        groups = self._groups
+        candidates = set(self._members.get(entity_id, ()))
+        entity_type = self._index.entity_type(entity_id)
+        if entity_type is None:
+            return candidates
+        values = self._index.values(entity_id)
+        for watch_type in (entity_type, None):
+            candidates.update(groups.get((watch_type, None, None), ()))
+            for name in self._routed_fields:
+                value = values.get(name, MISSING)
+                if value is not MISSING:
+                    try:
+                        candidates.update(groups.get((watch_type, name, value), ()))
+                    except TypeError:
+                        pass
+        return candidates
+
+    def _enter(self, watch: Watch, entity_id: UUID) -> None:
+        watch.ids.add(entity_id)
+        self._members.setdefault(entity_id, set()).add(watch)
+
+    def _leave(self, watch: Watch, entity_id: UUID) -> None:
+        watch.ids.discard(entity_id)
+        members = self._members.get(entity_id)
+        if members is not None:
+            members.discard(watch)
+            if not members:
+                del self._members[entity_id]
+
+    def _deliver(self, watch: Watch, delta: WatchDelta) -> None:
+        try:
+            watch.callback(delta)
+        except Exception as e:
+            print(f"Error in watch callback: {e}")
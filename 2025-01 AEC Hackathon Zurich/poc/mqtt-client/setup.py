@@ -10,6 +10,7 @@ setup(
         "automerge==1.0.0rc1",
         "python-dotenv>=1.0.0",
         "ifcopenshell>=0.8.0",
+        "numpy",
     ],
     author="Your Name",
     author_email="your.email@example.com",
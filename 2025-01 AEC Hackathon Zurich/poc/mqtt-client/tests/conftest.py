@@ -0,0 +1,12 @@
+"""Shared pytest fixtures."""
+import pytest
+from compas_eve import InMemoryTransport, set_default_transport
+
+
+@pytest.fixture(autouse=True)
+def in_memory_bus(tmp_path, monkeypatch):
+    """Give every test its own in-memory transport, log and cache directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("IFC_DATABUS_CACHE", str(tmp_path / "cache"))
+    set_default_transport(InMemoryTransport())
+    yield
@@ -0,0 +1,91 @@
+"""Test actor ids bound to replicas."""
+from uuid import uuid4
+
+import pytest
+
+from ifc_databus.core.actors import actor_id_for, document_actors, journal_actor_report
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.crdt_automerge import IfcRegister
+
+
+def test_actor_derivation():
+    """Test that actor ids are stable per replica and session."""
+    assert actor_id_for("replica1", "s1") == actor_id_for("replica1", "s1")
+    assert actor_id_for("replica1", "s1") != actor_id_for("replica1", "s2")
+    assert actor_id_for("replica1", "s1") != actor_id_for("replica2", "s1")
+    assert len(actor_id_for("replica1", "s1")) == 16
+
+
+def test_loaded_register_keeps_bound_actor():
+    """Test that edits after from_binary use the given actor."""
+    actor = actor_id_for("replica2", "s1")
+    register = IfcRegister.create("IfcWall", "replica1", {"name": "Wall1"})
+    loaded = IfcRegister.from_binary(register.to_binary(), "replica2", register.id, actor_id=actor)
+    loaded.update({"name": "Wall 1"})
+    assert actor in document_actors(loaded.doc)
+
+
+def test_bus_uses_one_actor():
+    """Test that every register touched by a replica shares its actor."""
+    bus_a = IfcBus("replica_a", session="s1")
+    bus_b = IfcBus("replica_b", session="s1")
+
+    wall_ids = [bus_a.publish_entity("IfcWall", {"name": f"Wall{i}"}) for i in range(3)]
+    for wall_id in wall_ids:
+        bus_b.update_entity(wall_id, {"height": 3.0})
+        bus_a.update_entity(wall_id, {"width": 0.3})
+
+    for wall_id in wall_ids:
+        assert document_actors(bus_a._registers[wall_id].doc) == {bus_a.actor_id, bus_b.actor_id}
+
+
+def test_republish_keeps_history():
+    """Test that publishing an existing id updates it instead of forking it."""
+    bus = IfcBus("replica_a")
+    wall_id = uuid4()
+    bus.publish_entity_with_id(wall_id, "IfcWall", {"name": "Wall1"})
+    register = bus._registers[wall_id]
+    bus.publish_entity_with_id(wall_id, "IfcWall", {"name": "Wall2"})
+    assert bus._registers[wall_id] is register
+    assert register.data == {"name": "Wall2"}
+
+    # The new data replaces the old; a different type is rejected
+    bus.publish_entity_with_id(wall_id, "IfcWall", {"name": "Wall3", "height": 3.0, "width": 0.3})
+    bus.publish_entity_with_id(wall_id, "IfcWall", {"name": "Wall4"})
+    assert register.data == {"name": "Wall4"}
+    with pytest.raises(ValueError):
+        bus.publish_entity_with_id(wall_id, "IfcWindow", {"name": "Window", "height": 1.0, "width": 1.0})
+    assert bus._registers[wall_id].entity_type == "IfcWall" and register.data == {"name": "Wall4"}
+
+
+def test_journal_report():
+    """Test the actor report on a bus log."""
+    bus = IfcBus("replica_a")
+    wall_id = bus.publish_entity("IfcWall", {"name": "Wall1"})
+    for i in range(5):
+        # Simulate the old behaviour: every edit from a freshly loaded document
+        register = IfcRegister.from_binary(bus._registers[wall_id].to_binary(), "replica_a", wall_id)
+        register.update({"height": float(i)})
+        bus._registers[wall_id] = register
+        bus._publish_message("update", register)
+
+    report = journal_actor_report(bus.log_file)
+    assert report.messages == 6
+    assert report.entities == 1
+    assert report.actors == 6
+    assert report.bound_actors == 1
+    assert report.bound_bytes < report.bytes
+
+
+def test_journal_report_with_changesets_and_deletes():
+    """Test that changeset frames are expanded and deletes skipped."""
+    bus = IfcBus("replica_a")
+    with bus.changeset():
+        wall_id = bus.publish_entity("IfcWall", {"name": "Wall1"})
+        window_id = bus.publish_entity("IfcWindow", {"name": "Window1", "height": 1.0, "width": 1.0})
+    bus.update_fragment(wall_id, [{"op": "set", "path": "/name", "value": "Wall 1"}])
+    bus.delete_entity(window_id)
+
+    report = journal_actor_report(bus.log_file)
+    assert (report.messages, report.entities) == (3, 2)
+    assert report.actors == report.bound_actors == 2
@@ -0,0 +1,90 @@
+"""Test change detection between reads and its diff-based republish."""
+import copy
+import json
+from uuid import uuid4
+
+from compas_eve import Message
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.changes import ChangeDetector, apply_changes
+
+WALL = {
+    "type": "IfcWall",
+    "name": "Wall",
+    "hasProperties": [{"type": "IfcPropertySingleValue", "name": "IsExternal",
+                       "nominalValue": {"type": "IfcBoolean", "value": True}}],
+}
+
+
+def test_detector_reports_only_what_changed():
+    """Test adds, changed and removed fields, deletes and type changes."""
+    ids = [uuid4() for _ in range(4)]
+    detector = ChangeDetector()
+    first = [(id, "IfcWall", dict(copy.deepcopy(WALL), description="d")) for id in ids]
+    changes = detector.diff(first)
+    assert [r[0] for r in changes.added] == ids and not changes.updated and not changes.deleted
+    assert not detector.diff(copy.deepcopy(first))
+
+    edited = copy.deepcopy(first)
+    edited[0][2]["hasProperties"][0]["nominalValue"]["value"] = False
+    del edited[1][2]["description"]
+    edited[2] = (ids[2], "IfcSlab", edited[2][2])
+    changes = detector.diff(edited[:3])
+    assert [(d.id, list(d.changed), d.removed) for d in changes.updated] == [
+        (ids[0], ["hasProperties"], []), (ids[1], [], ["description"]),
+    ]
+    assert changes.deleted == [(ids[2], "IfcWall"), (ids[3], "IfcWall")]
+    assert changes.added == [(ids[2], "IfcSlab", edited[2][2])]
+    assert str(changes) == "1 added, 2 updated, 2 deleted" and len(detector) == 3
+
+
+def test_apply_changes_sends_deltas_and_deletes():
+    """Test that an edit is one fragment update on the existing register."""
+    bus_a = IfcBus(replica_id="changes_a")
+    bus_b = IfcBus(replica_id="changes_b")
+    ids = [uuid4() for _ in range(3)]
+    walls = [(id, "IfcWall", copy.deepcopy(WALL)) for id in ids]
+    detector = ChangeDetector()
+    assert apply_changes(bus_a, detector.diff(walls)) == []
+    heads = bus_a.get_entity(ids[0]).heads
+    with open(bus_a.log_file) as f:
+        sent = len(f.readlines())
+
+    walls[0][2]["hasProperties"][0]["nominalValue"]["value"] = False
+    del walls[0][2]["name"]
+    assert apply_changes(bus_a, detector.diff(walls[:2])) == []
+    with open(bus_a.log_file) as f:
+        messages = f.readlines()[sent:]
+    assert len(messages) == 2 and '"delete"' in messages[0] and '"update_fragment"' in messages[1]
+    assert '"path": "/hasProperties/0/nominalValue/value"' in messages[1]
+    wall = bus_a.get_entity(ids[0])
+    assert wall.has_heads(heads) and "name" not in wall.data
+    assert bus_b.get_entity(ids[0]).data["hasProperties"][0]["nominalValue"]["value"] is False
+    assert not bus_a.has_entity(ids[2]) and not bus_b.has_entity(ids[2])
+
+
+def test_deleted_entity_stays_deleted():
+    """Test a delete queued behind the create, late copies and reviving the id."""
+    bus_a = IfcBus(replica_id="changes_c")
+    bus_b = IfcBus(replica_id="changes_d")
+    bus_a._scheduler._running = True
+    wall = bus_a.publish_entity("IfcWall", {"name": "W", "representation": {"items": list(range(1000))}})
+    bus_a.update_entity(wall, {"name": "W1"})
+    bus_a.delete_entity(wall)
+    bus_a._scheduler._running = False
+    bus_a.flush()
+    assert not bus_a.has_entity(wall) and not bus_b.has_entity(wall)
+
+    # A late full copy from any replica does not bring it back
+    with open(bus_a.log_file) as f:
+        create, update, delete = [m for m in map(json.loads, f) if m["replica_id"] == "changes_c"]
+    bus_b._handle_message(Message(dict(update, replica_id="changes_e")))
+    assert not bus_b.has_entity(wall)
+    bus_c = IfcBus(replica_id="changes_f")
+    for payload in (delete, create):
+        bus_c._handle_message(Message(payload))
+    assert not bus_c.has_entity(wall)
+
+    # Publishing the id again creates a new entity everywhere
+    bus_a.publish_entity_with_id(wall, "IfcWall", {"name": "W2"})
+    assert bus_b.get_entity(wall).data == {"name": "W2"} and bus_c.get_entity(wall).data == {"name": "W2"}
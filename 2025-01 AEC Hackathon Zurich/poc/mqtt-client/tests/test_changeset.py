@@ -0,0 +1,78 @@
+"""Test atomic multi-entity changesets."""
+import json
+
+import pytest
+from compas_eve import Message
+
+from ifc_databus.core.bus import IfcBus
+
+WINDOW = {"name": "Window", "height": 1.2, "width": 0.8}
+
+
+def sent(bus):
+    with open(bus.log_file) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_changeset_is_one_frame_and_one_notification():
+    """Test framing, the parent chain and applying on the receiver at once."""
+    bus_a = IfcBus(replica_id="changeset_a")
+    bus_b = IfcBus(replica_id="changeset_b")
+    notified_a, notified_b = [], []
+    bus_a.on_change(notified_a.append)
+    bus_b.on_change(notified_b.append)
+
+    with bus_a.changeset() as first:
+        wall = bus_a.publish_entity("IfcWall", {"name": "Wall"})
+        window = bus_a.publish_entity("IfcWindow", WINDOW)
+        bus_a.add_relationship(wall, "HasOpenings", window)
+        bus_a.update_entity(window, {"name": "Window 1"})
+        assert notified_a == [] and bus_a.pending_messages() == 0
+    assert notified_a == [[wall, window]] and notified_b == [[wall, window]]
+    assert bus_b.get_entity(window).data["name"] == "Window 1" and bus_b.graph.outgoing(wall) == {window}
+
+    with bus_a.changeset():
+        with bus_a.changeset():
+            bus_a.update_fragment(wall, [{"op": "set", "path": "/name", "value": "Wall 1"}])
+    frames = sent(bus_a)
+    assert [frame["operation_type"] for frame in frames] == ["changeset", "changeset"]
+    # Later full registers of the wall and the window supersede their create messages
+    assert [m["operation_type"] for m in frames[0]["messages"]] == ["add_relationship", "update"]
+    assert frames[0]["parent_id"] is None and frames[1]["parent_id"] == str(first.id)
+    assert bus_b.get_entity(wall).data["name"] == "Wall 1"
+
+
+def test_failed_changeset_is_rolled_back():
+    """Test that a raising block restores registers and sends nothing."""
+    bus = IfcBus(replica_id="changeset_c")
+    wall = bus.publish_entity("IfcWall", {"name": "Wall"})
+    count = len(sent(bus))
+    with pytest.raises(ValueError):
+        with bus.changeset():
+            bus.update_entity(wall, {"name": "Renamed"})
+            window = bus.publish_entity("IfcWindow", WINDOW)
+            bus.publish_entity("IfcPropertySet", {"name": "No properties"})
+    assert bus.get_entity(wall).data["name"] == "Wall" and not bus.has_entity(window)
+    assert len(sent(bus)) == count
+
+
+def test_receiver_applies_all_or_nothing():
+    """Test rejecting a frame with a bad member and parking one with unknown entities."""
+    bus_a = IfcBus(replica_id="changeset_d")
+    with bus_a.changeset():
+        wall = bus_a.publish_entity("IfcWall", {"name": "Wall"})
+        window = bus_a.publish_entity("IfcWindow", WINDOW)
+    frame = sent(bus_a)[0]
+
+    bus_b = IfcBus(replica_id="changeset_e")
+    broken = dict(frame, changeset_id="broken", messages=frame["messages"] + [dict(frame["messages"][0], crdt_data="AAAA")])
+    bus_b._handle_message(Message(broken))
+    assert not bus_b.has_entity(wall) and not bus_b.has_entity(window)
+
+    bus_c = IfcBus(replica_id="changeset_f")
+    with bus_a.changeset():
+        bus_a.update_fragment(wall, [{"op": "set", "path": "/name", "value": "Wall 1"}])
+    bus_c._handle_message(Message(sent(bus_a)[1]))
+    assert bus_c.pending.waiting_on(wall) == 1
+    bus_c._handle_message(Message(frame))
+    assert bus_c.get_entity(wall).data["name"] == "Wall 1" and bus_c.has_entity(window)
@@ -0,0 +1,151 @@
+"""Test incremental IDS compliance checking."""
+from types import SimpleNamespace
+from uuid import uuid4
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.compliance import ComplianceChecker, Ids
+from ifc_databus.core.spf_import import import_spf
+from tests.test_spf_import import small_model
+
+IDS = """<?xml version="1.0" encoding="UTF-8"?>
+<ids xmlns="http://standards.buildingsmart.org/IDS" xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <info><title>Walls</title></info>
+  <specifications>
+    <specification name="Walls are named and insulated" ifcVersion="IFC4">
+      <applicability minOccurs="1" maxOccurs="unbounded">
+        <entity><name><simpleValue>IFCWALL</simpleValue></name></entity>
+      </applicability>
+      <requirements>
+        <attribute cardinality="required"><name><simpleValue>Name</simpleValue></name></attribute>
+        <property cardinality="required">
+          <propertySet><simpleValue>Pset_WallCommon</simpleValue></propertySet>
+          <baseName><simpleValue>ThermalTransmittance</simpleValue></baseName>
+          <value><xs:restriction base="xs:double"><xs:maxInclusive value="0.25"/></xs:restriction></value>
+        </property>
+      </requirements>
+    </specification>
+    <specification name="eBKB-H walls are external" ifcVersion="IFC4">
+      <applicability minOccurs="0" maxOccurs="unbounded">
+        <classification><system><simpleValue>eBKB-H</simpleValue></system></classification>
+      </applicability>
+      <requirements>
+        <property cardinality="required">
+          <propertySet><simpleValue>Pset_WallCommon</simpleValue></propertySet>
+          <baseName><simpleValue>IsExternal</simpleValue></baseName>
+          <value><simpleValue>TRUE</simpleValue></value>
+        </property>
+      </requirements>
+    </specification>
+  </specifications>
+</ids>
+"""
+
+
+def wall(name=None, u_value=0.2, classified=False):
+    data = {
+        "isDefinedBy": [{
+            "type": "IfcRelDefinesByProperties",
+            "relatingPropertyDefinition": {"type": "IfcPropertySet", "name": "Pset_WallCommon", "hasProperties": [
+                {"type": "IfcPropertySingleValue", "name": "ThermalTransmittance",
+                 "nominalValue": {"type": "IfcThermalTransmittanceMeasure", "value": u_value}},
+                {"type": "IfcPropertySingleValue", "name": "IsExternal",
+                 "nominalValue": {"type": "IfcBoolean", "value": False}},
+            ]},
+        }],
+    }
+    if name:
+        data["name"] = name
+    if classified:
+        data["hasAssociations"] = [{"type": "IfcRelAssociatesClassification", "relatingClassification": {
+            "type": "IfcClassificationReference", "identification": "C02.01",
+            "referencedSource": {"type": "IfcClassification", "name": "eBKB-H"}}}]
+    return data
+
+
+def test_parse_and_index():
+    """Test that specifications are parsed and indexed by applicability."""
+    checker = ComplianceChecker(Ids.from_string(IDS))
+    assert checker.ids.title == "Walls"
+    assert checker._by_type == {"IFCWALL": [0]}
+    assert checker._by_system == {"eBKB-H": [1]}
+    assert checker.report()[0].min_occurs == 1
+
+
+def test_live_compliance_table():
+    """Test that the table follows local changes on the bus."""
+    bus = IfcBus(replica_id="ids")
+    good = bus.publish_entity("IfcWall", wall("Exterior Wall"))
+    checker = ComplianceChecker(Ids.from_string(IDS)).attach(bus)
+    bad = bus.publish_entity("IfcWall", wall(u_value=0.4, classified=True))
+
+    walls, external = checker.report()
+    assert (walls.applicable, walls.failed, external.applicable, external.failed) == (2, 1, 1, 1)
+    assert set(checker.failures()) == {bad}
+    assert len(checker.failures(bad)[bad][walls.name]) == 2
+    assert not checker.is_compliant()
+
+    bus.update_entity(bad, {"name": "Fixed"})
+    bus.update_fragment(bad, [
+        {"op": "set", "path": "/isDefinedBy/0/relatingPropertyDefinition/hasProperties/0/nominalValue/value",
+         "value": 0.18},
+        {"op": "set", "path": "/isDefinedBy/0/relatingPropertyDefinition/hasProperties/1/nominalValue/value",
+         "value": True},
+    ])
+    assert checker.failures() == {}
+    assert checker.is_compliant()
+    assert checker.failures(good) == {}
+
+
+def test_related_property_set_change():
+    """Test that entities reading a related property set are re-evaluated."""
+    wall_id, pset_id = uuid4(), uuid4()
+    pset = wall()["isDefinedBy"][0]["relatingPropertyDefinition"]
+    entities = {
+        wall_id: SimpleNamespace(entity_type="IfcWall", data={"name": "W"},
+                                 relationships={"IsDefinedBy": {str(pset_id): {}}}),
+        pset_id: SimpleNamespace(entity_type="IfcPropertySet", data=pset, relationships={}),
+    }
+    checker = ComplianceChecker(Ids.from_string(IDS), entities.get)
+    checker.update(entities)
+    assert checker.failures() == {}
+
+    pset["hasProperties"][0]["nominalValue"]["value"] = 0.5
+    checker.update([pset_id])
+    assert list(checker.failures()) == [wall_id]
+
+    # Readers of entities no longer read are dropped
+    del entities[wall_id]
+    checker.update([wall_id])
+    assert checker._readers == {} and checker.failures() == {}
+
+
+def test_imported_relationship_registers():
+    """Test property sets and classifications of an IFC-SPF import, related through refs."""
+    bus = IfcBus(replica_id="ids_spf")
+    import_spf(bus, small_model(walls=2))
+    checker = ComplianceChecker(Ids.from_string(IDS)).attach(bus)
+    walls, external = checker.report()
+    # The imported sets are found, with a ThermalTransmittance of 0.3
+    assert (walls.applicable, walls.failed, external.applicable) == (2, 2, 0)
+    failures = checker.failures()
+    assert all(f == {walls.name: ["Required property set=Pset_WallCommon name=ThermalTransmittance "
+                                  "is missing or invalid"]} for f in failures.values())
+
+    wall_id = next(iter(failures))
+    rel_id = next(rel_id for rel_id in checker._resolver.referrers(wall_id)
+                  if bus.get_entity(rel_id).entity_type == "IfcRelDefinesByProperties")
+    pset_id = checker._resolver.id_of(bus.get_entity(rel_id).data["relatingPropertyDefinition"]["ref"])
+    data = bus.get_entity(pset_id).data
+    bus.update_entity(pset_id, {**data, "hasProperties": [
+        {**prop, "nominalValue": {**prop["nominalValue"], "value": 0.2}}
+        if prop["name"] == "ThermalTransmittance" else prop for prop in data["hasProperties"]
+    ]})
+    assert set(checker.failures()) == set(failures) - {wall_id}
+
+    # A classification relationship arriving later makes the wall applicable
+    bus.publish_entity("IfcRelAssociatesClassification", {
+        "type": "IfcRelAssociatesClassification", "relatedObjects": [{"type": "IfcWall", "ref": str(wall_id)}],
+        "relatingClassification": {"type": "IfcClassificationReference", "identification": "C02.01",
+                                   "referencedSource": {"type": "IfcClassification", "name": "eBKB-H"}},
+    })
+    assert external.applicable == 1 and external.failed == 0
@@ -0,0 +1,50 @@
+"""Test the streaming ingest of Archicad composite dumps."""
+import io
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.composites import import_composites, iter_composites, layer_set_id, material_id
+
+DUMP = """Number of composites: 3
+Composite 1: Double Brick - 270
+  Layer 1: Thickness = 0.11
+    Material Masonry - Brick - Brown: Density = 1800
+  Layer 2: Thickness = 0.05
+    Material Insulation: Density = 30
+  Layer 3: Thickness = 0.11
+    Material Masonry - Brick - Brown: Density = 1800
+
+Composite 2: Insulated Concrete
+  Layer 1: Thickness = 0.2
+    Material Concrete: Density = 2400
+  Layer 2: Thickness = 0.12
+    Material Insulation: Density = 30
+Composite 3: Empty
+"""
+
+
+def test_parse_composites_line_by_line():
+    """Test parsing the indented dump format one composite at a time."""
+    composites = iter_composites(io.StringIO(DUMP))
+    first = next(composites)
+    assert first["name"] == "Double Brick - 270"
+    assert first["layers"][1] == {"thickness": 0.05, "material": "Insulation", "density": 30}
+    assert [(c["name"], len(c["layers"])) for c in composites] == [("Insulated Concrete", 2), ("Empty", 0)]
+
+
+def test_import_deduplicates_materials():
+    """Test publishing each material once and referencing it from the layers."""
+    bus = IfcBus(replica_id="composites_a")
+    report = import_composites(bus, io.StringIO(DUMP), batch_size=2)
+    assert (report.entities, report.rejected, report.batches) == (6, 0, 3)
+    names = ["Masonry - Brick - Brown", "Insulation", "Concrete"]
+    assert [bus.get_entity(material_id(name)).data["name"] for name in names] == names
+    layer_set = bus.get_entity(layer_set_id("Insulated Concrete")).data
+    # Not associated to any element yet, so no empty relationship is sent
+    assert "associatedTo" not in layer_set
+    assert [layer["material"]["ref"] for layer in layer_set["materialLayers"]] == [
+        str(material_id("Concrete")), str(material_id("Insulation")),
+    ]
+
+    # Importing again updates the same registers
+    import_composites(bus, io.StringIO(DUMP))
+    assert len(bus.entity_ids()) == 6
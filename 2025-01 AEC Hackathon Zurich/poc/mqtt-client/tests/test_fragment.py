@@ -0,0 +1,99 @@
+"""Test path-level fragment updates."""
+import json
+from pathlib import Path
+
+import pytest
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.crdt_automerge import IfcRegister
+from ifc_databus.core.fragment import FragmentOp, apply_ops, diff_ops
+
+MESSAGE_DIR = Path(__file__).parent.parent.parent / "message"
+
+PROPERTY_SET = {
+    "name": "CustomProperties",
+    "hasProperties": [
+        {"type": "IfcPropertySingleValue", "name": "Manufacturer",
+         "nominalValue": {"type": "IfcText", "value": "ABC Bricks Inc."}},
+        {"type": "IfcPropertySingleValue", "name": "Density",
+         "nominalValue": {"type": "IfcMassDensityMeasure", "value": 1800}},
+    ],
+}
+
+OPS = [
+    FragmentOp("set", "/hasProperties/0/nominalValue/value", "XYZ Bricks"),
+    FragmentOp("increment", "/hasProperties/1/nominalValue/value", 50),
+    FragmentOp("insert", "/hasProperties/-", {"type": "IfcPropertySingleValue", "name": "Color"}),
+    FragmentOp("delete", "/hasProperties/0/type"),
+]
+
+
+def test_register_matches_plain_application():
+    """Test that the CRDT and the plain-dict application agree."""
+    register = IfcRegister.create("IfcPropertySet", "replica1", PROPERTY_SET)
+    register.apply_fragment(OPS)
+    expected = apply_ops(PROPERTY_SET, OPS)
+    assert register.data == expected
+    assert expected["hasProperties"][1]["nominalValue"]["value"] == 1850
+    assert expected["hasProperties"][2]["name"] == "Color"
+
+
+def test_invalid_paths():
+    """Test that bad paths are rejected."""
+    register = IfcRegister.create("IfcPropertySet", "replica1", PROPERTY_SET)
+    with pytest.raises(ValueError):
+        register.apply_fragment([FragmentOp("set", "/hasProperties/5/name", "x")])
+    with pytest.raises(ValueError):
+        apply_ops(PROPERTY_SET, [FragmentOp("increment", "/name")])
+    with pytest.raises(ValueError):
+        FragmentOp("move", "/name")
+
+
+def test_apply_changes_out_of_order():
+    """Test that changes arriving before their dependencies are held back, not lost."""
+    register = IfcRegister.create("IfcPropertySet", "replica1", PROPERTY_SET)
+    copy = IfcRegister.from_binary(register.to_binary(), "replica2", register.id)
+    start = register.heads
+    register.apply_fragment([FragmentOp("set", "/name", "First")])
+    middle = register.heads
+    register.apply_fragment([FragmentOp("set", "/description", "Second")])
+
+    copy.apply_changes(register.changes_since(middle))
+    assert not copy.has_heads(register.heads) and copy.data["name"] == "CustomProperties"
+    copy.apply_changes(register.changes_since(start))
+    assert copy.data == register.data and copy.has_heads(register.heads)
+
+
+def test_diff_ops_for_example_fragment():
+    """Test turning the example fragment payload into path operations."""
+    with open(MESSAGE_DIR / "example_operation_update_fragment.json") as f:
+        fragment = json.load(f)["payload"]
+    old = dict(fragment, description="Old description")
+    ops = diff_ops(old, fragment)
+    assert [op.to_dict() for op in ops] == [
+        {"op": "set", "path": "/description", "value": fragment["description"]}
+    ]
+    assert apply_ops(old, ops) == fragment
+
+
+def test_bus_transmits_only_changes():
+    """Test that a fragment update is sent as CRDT changes and applied remotely."""
+    bus_a = IfcBus("replica_a")
+    bus_b = IfcBus("replica_b")
+    sent = []
+    send = bus_a._send_message
+    bus_a._scheduler._send = lambda topic, msg: (sent.append(msg), send(topic, msg))
+
+    layers = [{"type": "IfcMaterialLayer", "layerThickness": 110.0 + i, "name": f"L{i}"} for i in range(50)]
+    wall_id = bus_a.publish_entity("IfcWall", {"name": "Wall1", "materialLayers": layers})
+    bus_a.update_fragment(wall_id, [
+        {"op": "set", "path": "/materialLayers/3/layerThickness", "value": 90.0},
+        {"op": "set", "path": "/name", "value": "Wall 1"},
+    ])
+
+    create, update = sent
+    assert "crdt_data" not in update
+    assert len(update["crdt_changes"]) * 5 < len(create["crdt_data"])
+    wall_b = bus_b._registers[wall_id].data
+    assert wall_b["materialLayers"][3]["layerThickness"] == 90.0
+    assert wall_b["name"] == "Wall 1"
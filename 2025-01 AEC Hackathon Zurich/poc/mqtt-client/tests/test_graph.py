@@ -0,0 +1,65 @@
+"""Test the relationship index and graph traversal."""
+from uuid import uuid4
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.graph import BOTH, IN, RelationshipIndex
+
+WINDOW = {"name": "Window", "height": 1.2, "width": 0.8}
+
+
+def test_index_and_traversal():
+    """Test reverse lookups, closure and paths with depth limits."""
+    a, b, c, d = (uuid4() for _ in range(4))
+    graph = RelationshipIndex()
+    graph.add(a, "connects", b)
+    graph.add(b, "connects", c)
+    graph.add(c, "HasOpenings", d)
+    graph.add(a, "connects", b)
+    assert len(graph) == 3
+
+    assert graph.incoming(d) == {c}
+    assert graph.incoming(b, "HasOpenings") == set()
+    assert graph.neighbours(b, direction=BOTH) == {a, c}
+    assert graph.closure(a) == {b: 1, c: 2, d: 3}
+    assert graph.closure(a, "connects") == {b: 1, c: 2}
+    assert graph.closure(d, direction=IN, max_depth=2) == {c: 1, b: 2}
+    assert graph.paths(a, d) == [[a, b, c, d]]
+    assert graph.paths(a, d, max_depth=2) == []
+    assert graph.shortest_path(d, a, direction=IN) == [d, c, b, a]
+
+    graph.set_relationships(c, {"HasOpenings": [str(a)]})
+    assert graph.incoming(d) == set() and graph.incoming(a) == {c}
+    graph.remove_entity(b)
+    assert len(graph) == 2
+    assert graph.outgoing(b) == set() and graph.incoming(b) == {a}
+
+
+def test_bus_maintains_index():
+    """Test that local writes and merges on a peer keep the index current."""
+    bus_a = IfcBus(replica_id="graph_a")
+    bus_b = IfcBus(replica_id="graph_b")
+    wall = bus_a.publish_entity("IfcWall", {"name": "Wall"})
+    window = bus_a.publish_entity("IfcWindow", WINDOW)
+
+    bus_a.add_relationship(wall, "HasOpenings", window)
+    assert bus_a.graph.incoming(window, "HasOpenings") == {wall}
+    assert bus_b.graph.incoming(window, "HasOpenings") == {wall}
+
+    bus_a.remove_relationship(wall, "HasOpenings", window)
+    assert bus_a.graph.incoming(window) == set()
+    assert bus_b.graph.incoming(window) == set()
+
+
+def test_delete_and_re_add_keeps_incoming_edges():
+    """Test that edges declared by live registers survive a delete and re-publish of their target."""
+    bus = IfcBus(replica_id="graph_readd")
+    wall = bus.publish_entity("IfcWall", {"name": "Wall"})
+    window = bus.publish_entity("IfcWindow", WINDOW)
+    bus.add_relationship(wall, "HasOpenings", window)
+
+    bus.delete_entity(window)
+    assert bus.graph.incoming(window, "HasOpenings") == {wall}
+
+    bus.publish_entity_with_id(window, "IfcWindow", WINDOW)
+    assert bus.graph.incoming(window, "HasOpenings") == {wall}
+    assert bus.graph.outgoing(wall, "HasOpenings") == {window}
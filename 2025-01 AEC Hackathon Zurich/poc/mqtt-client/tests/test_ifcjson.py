@@ -0,0 +1,90 @@
+"""Test the streaming ifcJSON reader."""
+import gzip
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.guid import global_id_to_uuid
+from ifc_databus.core.ifcjson import IfcJsonReader, IfcJsonWriter, export_ifcjson, import_ifcjson
+from ifc_databus.core.ingest import peak_rss
+
+MESSAGES = Path(__file__).parents[2] / "message"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_reader_matches_json_load(chunk_size):
+    """Test entities and header against json.load, whatever the chunk size."""
+    path = MESSAGES / "example_message_wall_mesh.json"
+    expected = json.loads(path.read_text())
+    reader = IfcJsonReader(path, chunk_size=chunk_size)
+    assert list(reader) == expected["data"]
+    assert reader.header == {key: value for key, value in expected.items() if key != "data"}
+
+
+def test_reader_streams_and_reads_members_after_data(tmp_path):
+    """Test gzip input, members after data, numbers across chunks and errors."""
+    document = {"type": "ifcJSON", "data": [{"type": "IfcWall", "globalId": "w", "height": 123456.789}] * 3,
+                "relationships": [{"source": "w", "target": "w", "type": "connects"}]}
+    path = tmp_path / "model.json.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(document, f)
+    reader = IfcJsonReader(path, chunk_size=5)
+    entities = iter(reader)
+    assert next(entities)["height"] == 123456.789
+    assert "relationships" not in reader.header
+    assert len(list(entities)) == 2 and reader.header["relationships"] == document["relationships"]
+
+    assert list(IfcJsonReader(io.StringIO('{"data": []}'))) == []
+    with pytest.raises(ValueError):
+        list(IfcJsonReader(io.StringIO('{"data": [{"type": "IfcWall"}, {"type"')))
+
+
+def test_import_publishes_while_reading():
+    """Test publishing the example file through the reader."""
+    bus = IfcBus(replica_id="ifcjson_a")
+    report = import_ifcjson(bus, MESSAGES / "example_message_wall_mesh.json", batch_size=2)
+    assert report.entities == 7 and report.batches == 4 and report.first_publish <= report.seconds
+    wall = bus.get_entity(global_id_to_uuid("909e31f1-aec1-4242-8f2c-e2425a98a449"))
+    assert wall.entity_type == "IfcWall" and wall.data["name"] == "Exterior Wall"
+
+
+@pytest.mark.parametrize("indent", [None, 4])
+def test_writer_matches_json_dump(tmp_path, indent):
+    """Test compact and pretty output against json.dumps, and gzip output."""
+    document = json.loads((MESSAGES / "example_message_wall_mesh.json").read_text())
+    header = {key: value for key, value in document.items() if key != "data"}
+    target = io.StringIO()
+    with IfcJsonWriter(target, header, indent=indent) as writer:
+        assert writer.write_all(iter(document["data"])) == len(document["data"])
+    ordered = dict(header, data=document["data"])
+    separators = (",", ":") if indent is None else None
+    assert target.getvalue() == json.dumps(ordered, indent=indent, separators=separators)
+
+    with IfcJsonWriter(tmp_path / "model.json.gz", header, indent=indent) as writer:
+        writer.write_all(document["data"])
+    reader = IfcJsonReader(tmp_path / "model.json.gz")
+    assert list(reader) == document["data"] and reader.header == header
+
+
+def test_export_round_trip():
+    """Test exporting a bus and importing the file into another bus."""
+    bus = IfcBus(replica_id="ifcjson_b")
+    import_ifcjson(bus, MESSAGES / "example_message_wall_mesh.json")
+    target = io.StringIO()
+    assert export_ifcjson(bus, target) == 7
+    other = IfcBus(replica_id="ifcjson_c")
+    import_ifcjson(other, io.StringIO(target.getvalue()))
+    assert other.entity_ids() == bus.entity_ids()
+    assert all(other.get_entity(id).data == bus.get_entity(id).data for id in bus.entity_ids())
+
+
+def test_import_without_resource_module(monkeypatch):
+    """Test that imports still report on platforms without ``resource`` (Windows)."""
+    monkeypatch.setitem(sys.modules, "resource", None)
+    assert peak_rss() == 0
+    report = import_ifcjson(IfcBus(replica_id="ifcjson_nores"), io.StringIO(json.dumps({"data": []})))
+    assert report.entities == 0 and report.peak_rss == 0
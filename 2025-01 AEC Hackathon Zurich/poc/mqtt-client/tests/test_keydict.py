@@ -0,0 +1,118 @@
+"""Test the key dictionary encoding."""
+import pytest
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.crdt_automerge import IfcRegister
+from ifc_databus.core.keydict import (
+    DEFAULT_KEY_DICTIONARY,
+    KeyDictionary,
+    decode_payload_data,
+    decode_payload_ops,
+    decode_payload_relationships,
+    get_key_dictionary,
+    register_key_dictionary,
+)
+from ifc_databus.core.validation import IFC_RULES
+
+DATA = {
+    "layerSetName": "Double Brick - 270",
+    "materialLayers": [{"type": "IfcMaterialLayer", "layerThickness": 110.0, "customKey": 1, "42": "x"}],
+}
+
+
+def test_version_1_covers_rules():
+    """Test that every field of IFC_RULES has an id in version 1."""
+    for rule in IFC_RULES.values():
+        for name in set(rule.required_fields) | rule.allowed_fields:
+            assert DEFAULT_KEY_DICTIONARY.encode_key(name).isdigit(), name
+
+
+def test_roundtrip_and_escaping():
+    """Test that encoding is reversible, including unknown and numeric keys."""
+    encoded = DEFAULT_KEY_DICTIONARY.encode(DATA)
+    layer = encoded[DEFAULT_KEY_DICTIONARY.encode_key("materialLayers")][0]
+    assert "customKey" in layer and "~42" in layer
+    assert DEFAULT_KEY_DICTIONARY.decode(encoded) == DATA
+
+
+def test_extension_keeps_ids():
+    """Test that a newer version decodes what an older one encoded."""
+    extended = DEFAULT_KEY_DICTIONARY.extend(["customKey", "name"])
+    assert extended.version == 2
+    assert extended.keys[: len(DEFAULT_KEY_DICTIONARY.keys)] == DEFAULT_KEY_DICTIONARY.keys
+    assert extended.decode(DEFAULT_KEY_DICTIONARY.encode(DATA)) == DATA
+    with pytest.raises(ValueError):
+        register_key_dictionary(KeyDictionary(1, ("other",)))
+    with pytest.raises(ValueError):
+        get_key_dictionary(999)
+
+
+def test_register_snapshot_uses_ids():
+    """Test that persisted snapshots carry ids and the version header."""
+    register = IfcRegister.create("IfcMaterialLayerSet", "replica1", DATA, key_dictionary=DEFAULT_KEY_DICTIONARY)
+    plain = IfcRegister.create("IfcMaterialLayerSet", "replica1", DATA)
+    assert len(register.to_binary()) < len(plain.to_binary())
+
+    loaded = IfcRegister.from_binary(register.to_binary(), "replica2", register.id)
+    assert loaded.key_dict_version == 1
+    assert loaded.data == DATA
+    loaded.update({"layerSetName": "Single Brick"})
+    loaded.apply_fragment([{"op": "set", "path": "/materialLayers/0/layerThickness", "value": 90.0}])
+    assert loaded.data["materialLayers"][0]["layerThickness"] == 90.0
+    assert "layerThickness" not in str(loaded.doc.save())
+
+
+def test_bus_wire_format():
+    """Test that bus messages carry encoded data and the dictionary version."""
+    sent = []
+    bus_a = IfcBus("replica_a", key_dictionary=DEFAULT_KEY_DICTIONARY)
+    bus_b = IfcBus("replica_b")
+    send = bus_a._send_message
+    bus_a._scheduler._send = lambda topic, msg: (sent.append(msg), send(topic, msg))
+
+    wall_id = bus_a.publish_entity("IfcWall", {"name": "Wall1", "height": 3.0})
+    assert sent[0]["key_dict_version"] == 1
+    assert "name" not in sent[0]["data"]
+    assert decode_payload_data(sent[0]) == {"name": "Wall1", "height": 3.0}
+    assert bus_b._registers[wall_id].data == {"name": "Wall1", "height": 3.0}
+
+
+def test_fragment_ops_roundtrip():
+    """Test that fragment op paths and values are encoded, keeping list indices and numeric keys apart."""
+    ops = [
+        {"op": "set", "path": "/materialLayers/0/layerThickness", "value": 90.0},
+        {"op": "set", "path": "/materialLayers/0/42", "value": "y"},
+        {"op": "insert", "path": "/materialLayers/-", "value": {"type": "IfcMaterialLayer", "layerThickness": 50.0}},
+        {"op": "increment", "path": "/materialLayers/1/layerThickness", "value": 10.0},
+    ]
+    encoded = DEFAULT_KEY_DICTIONARY.encode_ops(ops, DATA)
+    layers, thickness = (DEFAULT_KEY_DICTIONARY.encode_key(key) for key in ("materialLayers", "layerThickness"))
+    assert [op["path"] for op in encoded] == [
+        f"/{layers}/0/{thickness}", f"/{layers}/0/~042", f"/{layers}/-", f"/{layers}/1/{thickness}"
+    ]
+    assert "layerThickness" not in str(encoded)
+    assert DEFAULT_KEY_DICTIONARY.decode_ops(encoded, DATA) == ops
+
+
+def test_bus_encodes_fragments_and_relationships():
+    """Test that fragment and relationship messages carry encoded keys and decode to the plain form."""
+    dictionary = register_key_dictionary(DEFAULT_KEY_DICTIONARY.extend(["HasOpenings"]))
+    sent = []
+    bus = IfcBus("replica_a", key_dictionary=dictionary)
+    send = bus._send_message
+    bus._scheduler._send = lambda topic, msg: (sent.append(msg), send(topic, msg))
+
+    wall_id = bus.publish_entity("IfcWall", {"name": "Wall1", "height": 3.0})
+    window_id = bus.publish_entity("IfcWindow", {"name": "Window", "height": 1.2, "width": 0.8})
+    bus.add_relationship(wall_id, "HasOpenings", window_id)
+    bus.update_fragment(wall_id, [{"op": "set", "path": "/height", "value": 2.8}])
+
+    relate = next(msg for msg in sent if msg["operation_type"] == "add_relationship")
+    assert "HasOpenings" not in relate["relationships"]
+    assert decode_payload_relationships(relate) == {"HasOpenings": {str(window_id): {}}}
+    fragment = next(msg for msg in sent if msg["operation_type"] == "update_fragment")
+    assert fragment["key_dict_version"] == dictionary.version
+    assert fragment["ops"] == [{"op": "set", "path": f"/{dictionary.encode_key('height')}", "value": 2.8}]
+    assert decode_payload_ops(fragment, {"name": "Wall1", "height": 3.0}) == [
+        {"op": "set", "path": "/height", "value": 2.8}
+    ]
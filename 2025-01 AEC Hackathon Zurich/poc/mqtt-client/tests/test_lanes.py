@@ -0,0 +1,81 @@
+"""Test the priority lanes of the bus."""
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.lanes import LaneScheduler, Priority, classify
+
+
+def test_classify():
+    """Test the default lane selection."""
+    assert classify("add_relationship", "IfcWall", {}) == Priority.CONTROL
+    assert classify("update", "IfcWall", {"thermal_resistance": 0.5}) == Priority.SEMANTIC
+    assert classify("create", "IfcWall", {"representation": {}}) == Priority.BULK
+    assert classify("create", "IfcTriangulatedFaceSet", {}) == Priority.BULK
+
+
+def test_small_messages_overtake_bulk():
+    """Test that semantic messages are not stuck behind large geometry."""
+    sent = []
+    scheduler = LaneScheduler(lambda topic, msg: sent.append(msg["name"]), quantum=1000)
+    for i in range(3):
+        scheduler.enqueue(Priority.BULK, "ifc/IfcWall/bulk", {"name": f"mesh{i}"}, 50_000)
+    for i in range(3):
+        scheduler.enqueue(Priority.SEMANTIC, "ifc/IfcWall/semantic", {"name": f"prop{i}"}, 200)
+    scheduler.enqueue(Priority.CONTROL, "ifc/IfcWall/control", {"name": "rel"}, 100)
+
+    assert scheduler.drain() == 7
+    assert sent[:4] == ["rel", "prop0", "prop1", "prop2"]
+    assert sent[4:] == ["mesh0", "mesh1", "mesh2"]
+
+
+def test_background_sender():
+    """Test draining the lanes from the sender thread."""
+    sent = []
+    scheduler = LaneScheduler(lambda topic, msg: sent.append(topic))
+    scheduler.start()
+    for i in range(20):
+        scheduler.enqueue(Priority.SEMANTIC, "ifc/IfcWall/semantic", {}, 10)
+    assert scheduler.flush(timeout=5)
+    scheduler.stop()
+    assert len(sent) == 20
+    assert scheduler.pending() == 0
+
+
+def test_bus_publishes_on_lane_topics():
+    """Test that replicas exchange entities over the lane topics."""
+    bus_a = IfcBus("replica_a")
+    bus_b = IfcBus("replica_b")
+
+    wall_id = bus_a.publish_entity("IfcWall", {"name": "Wall1", "height": 3.0})
+    assert bus_b.has_entity(wall_id)
+    assert "ifc/IfcWall/semantic" in bus_a._publishers
+
+    bus_a.update_entity(wall_id, {"representation": "mesh"})
+    assert "ifc/IfcWall/bulk" in bus_a._publishers
+    assert bus_b._registers[wall_id].data["representation"] == "mesh"
+    assert bus_a.pending_messages() == 0
+
+
+def test_update_lane_follows_full_register():
+    """Test that a name edit on a meshed wall is not sent on the semantic lane."""
+    bus = IfcBus("replica_a")
+    wall_id = bus.publish_entity("IfcWall", {"name": "Wall1", "representation": "mesh"})
+    bus._scheduler._running = True
+    bus.update_entity(wall_id, {"name": "Wall 1"})
+    assert bus.pending_messages(Priority.BULK) == 1 and bus.pending_messages(Priority.SEMANTIC) == 0
+    bus._scheduler._running = False
+    bus.flush()
+
+
+def test_delta_does_not_overtake_queued_snapshot():
+    """Test that a fragment delta waits behind the entity's queued bulk snapshot."""
+    bus_a = IfcBus("replica_a")
+    bus_b = IfcBus("replica_b")
+    bus_a._scheduler._running = True
+    wall_id = bus_a.publish_entity("IfcWall", {"name": "W", "representation": {"items": list(range(1000))}})
+    bus_a.update_fragment(wall_id, [{"op": "set", "path": "/name", "value": "Wall 1"}])
+    assert bus_a._scheduler.queued_lane(str(wall_id)) == Priority.BULK
+    assert bus_a.pending_messages(Priority.BULK) == 2
+
+    bus_a._scheduler._running = False
+    bus_a.flush()
+    assert bus_b.get_entity(wall_id).data["name"] == "Wall 1"
+    assert bus_a._scheduler.queued_lane(str(wall_id)) is None
@@ -0,0 +1,65 @@
+"""Test the nested ifcJSON mapping of IfcRegister."""
+from uuid import uuid4
+from ifc_databus.core.crdt_automerge import IfcRegister
+
+LAYER_SET = {
+    "layerSetName": "Double Brick - 270",
+    "materialLayers": [
+        {"type": "IfcMaterialLayer", "layerThickness": 110.0, "isVentilated": False, "name": "Finish",
+         "material": {"type": "IfcMaterial", "name": "Masonry - Brick - Brown"}},
+        {"type": "IfcMaterialLayer", "layerThickness": 50.0, "isVentilated": True, "name": "Air"},
+        {"type": "IfcMaterialLayer", "layerThickness": 110.0, "isVentilated": False, "name": "Core"},
+    ],
+    "density": 1800,
+    "PnIndex": None,
+}
+
+
+def test_nested_roundtrip():
+    """Test that nested structures and typed scalars survive a binary roundtrip."""
+    register = IfcRegister.create("IfcMaterialLayerSet", "replica1", LAYER_SET)
+    loaded = IfcRegister.from_binary(register.to_binary(), "replica2", register.id)
+    assert loaded.data == LAYER_SET
+    assert isinstance(loaded.data["density"], int)
+    assert loaded.data["materialLayers"][1]["isVentilated"] is True
+
+
+def test_single_field_edit_is_minimal():
+    """Test that editing one layer only writes that layer's field."""
+    register = IfcRegister.create("IfcMaterialLayerSet", "replica1", LAYER_SET)
+    layers = register.data["materialLayers"]
+    layers[1]["layerThickness"] = 60.0
+
+    heads = register.doc.get_heads()
+    register.update({"materialLayers": layers})
+    changes = register.doc.get_changes(heads)
+    # One put for the thickness and one for the timestamp
+    assert sum(len(c) for c in changes) == 2
+    assert register.data["materialLayers"][1]["layerThickness"] == 60.0
+
+
+def test_concurrent_sibling_layer_edits():
+    """Test that edits to different layers on two replicas both survive."""
+    replica1 = IfcRegister.create("IfcMaterialLayerSet", "replica1", LAYER_SET)
+    replica2 = IfcRegister.from_binary(replica1.to_binary(), "replica2", replica1.id)
+
+    layers1 = replica1.data["materialLayers"]
+    layers1[0]["layerThickness"] = 120.0
+    replica1.update({"materialLayers": layers1})
+    layers2 = replica2.data["materialLayers"]
+    layers2[2]["name"] = "Structure"
+    replica2.update({"materialLayers": layers2})
+
+    replica1.merge(replica2)
+    merged = replica1.data["materialLayers"]
+    assert merged[0]["layerThickness"] == 120.0
+    assert merged[2]["name"] == "Structure"
+
+
+def test_merge_independently_created_registers():
+    """Test that fields of registers created separately for one id are kept."""
+    wall_id = uuid4()
+    replica1 = IfcRegister.create_with_id(wall_id, "IfcWall", "replica1", {"Length": 5.0})
+    replica2 = IfcRegister.create_with_id(wall_id, "IfcWall", "replica2", {"Height": 3.0})
+    replica1.merge(replica2)
+    assert replica1.data == {"Length": 5.0, "Height": 3.0}
@@ -0,0 +1,98 @@
+"""Test parking operations until the entities they depend on arrive."""
+import json
+from uuid import uuid4
+
+from compas_eve import Message
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.pending import PendingDependencies, data_refs
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_buffer_waits_for_all_dependencies_and_expires():
+    """Test applying on the last arrival, replacing, expiry and the size bound."""
+    clock = Clock()
+    pending = PendingDependencies(ttl=10, max_items=3, clock=clock)
+    a, b, c = uuid4(), uuid4(), uuid4()
+    present, applied = set(), []
+    pending.park("ab", [a, b], lambda: applied.append("ab"))
+    pending.park("a", [a], lambda: applied.append("first"))
+    pending.park("a", [a], lambda: applied.append("a"))
+    assert len(pending) == 2 and pending.waiting_on(a) == 2
+
+    present.add(a)
+    assert pending.resolve(a, present.__contains__) == 1 and applied == ["a"]
+    present.add(b)
+    assert pending.resolve(b, present.__contains__) == 1 and applied == ["a", "ab"]
+
+    clock.now = 5
+    pending.park("c1", [c], lambda: applied.append("c1"))
+    for key in ("c2", "c3", "c4"):
+        pending.park(key, [c], lambda: None)
+    clock.now = 16
+    report = pending.report()
+    assert (report.depth, report.missing, report.dropped, report.expired, report.applied) == (0, 0, 1, 3, 2)
+    assert pending.resolve(c, lambda id: True) == 0 and "c1" not in applied
+
+
+def test_out_of_order_relationships_and_refs():
+    """Test relationships and refs that arrive before their entities."""
+    bus = IfcBus(replica_id="pending_a")
+    wall, window, pset = uuid4(), uuid4(), uuid4()
+    changed = []
+    bus.on_change(changed.extend)
+
+    assert bus.add_relationship(wall, "HasOpenings", window) is False
+    rel = bus.publish_entity("IfcRelDefinesByProperties", {
+        "type": "IfcRelDefinesByProperties",
+        "relatedObjects": [{"type": "IfcWall", "ref": str(wall)}],
+        "relatingPropertyDefinition": {"type": "IfcPropertySet", "ref": str(pset)},
+    })
+    assert data_refs(bus.get_entity(rel).data) == {wall, pset}
+    assert bus.pending.report().depth == 3
+
+    bus.publish_entity_with_id(wall, "IfcWall", {"name": "Wall"})
+    assert not bus.graph.outgoing(wall) and changed.count(rel) == 2
+    bus.publish_entity_with_id(window, "IfcWindow", {"name": "Window", "height": 1.0, "width": 1.0})
+    assert bus.graph.outgoing(wall) == {window}
+    assert bus.pending.report().depth == 1 and bus.pending.waiting_on(pset) == 1
+
+    # A relationship that is still pending can be withdrawn
+    host = uuid4()
+    bus.add_relationship(window, "fills", host)
+    assert bus.pending.waiting_on(host) == 1
+    bus.remove_relationship(window, "fills", host)
+    assert bus.pending.report().depth == 1
+
+
+def test_out_of_order_change_deltas():
+    """Test deltas that arrive before their entity or before the deltas they build on."""
+    bus_a = IfcBus(replica_id="pending_b")
+    wall = bus_a.publish_entity("IfcWall", {"name": "W"})
+    bus_a.update_fragment(wall, [{"op": "set", "path": "/name", "value": "W1"}])
+    bus_a.update_fragment(wall, [{"op": "set", "path": "/height", "value": 3.0}])
+    with open(bus_a.log_file) as f:
+        create, first, second = [json.loads(line) for line in f]
+
+    bus_b = IfcBus(replica_id="pending_c")
+    for payload in (second, first):
+        bus_b._handle_message(Message(payload))
+    assert bus_b.pending.waiting_on(wall) == 2
+    bus_b._handle_message(Message(create))
+    assert bus_b.get_entity(wall).data == {"name": "W1", "height": 3.0}
+    assert len(bus_b.pending) == 0
+
+    # The create arrives first, then the deltas swapped
+    bus_c = IfcBus(replica_id="pending_d")
+    for payload in (create, second):
+        bus_c._handle_message(Message(payload))
+    assert bus_c.get_entity(wall).data == {"name": "W"} and bus_c.pending.waiting_on(wall) == 1
+    bus_c._handle_message(Message(first))
+    assert bus_c.get_entity(wall).data == {"name": "W1", "height": 3.0}
+    assert len(bus_c.pending) == 0
@@ -0,0 +1,78 @@
+"""Test placement matrices and the placement resolver."""
+import numpy as np
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.placement import PlacementResolver, local_placement_matrix
+from tests.test_spatial import mesh_wall
+
+
+def storey(z, parent="building"):
+    return {
+        "type": "IfcLocalPlacement",
+        "placementRelTo": {"ref": parent} if parent else None,
+        "relativePlacement": {
+            "type": "IfcAxis2Placement3D",
+            "location": {"type": "IfcCartesianPoint", "coordinates": [0.0, 0.0, z]},
+        },
+    }
+
+
+def translation(x, y, z):
+    matrix = np.eye(4)
+    matrix[:3, 3] = (x, y, z)
+    return matrix
+
+
+def test_resolver_matches_walking_the_chain():
+    """Test cached world matrices against walking every chain."""
+    resolver = PlacementResolver(capacity=4)
+    # A child set before its parent hangs below it once the parent arrives
+    resolver.set("element", translation(1, 2, 0), "storey")
+    resolver.set("building", translation(100, 0, 0))
+    resolver.set_placement("storey", storey(3.0))
+    walked = local_placement_matrix(storey(3.0), resolver.world) @ translation(1, 2, 0)
+    assert np.allclose(resolver.world("element"), walked)
+    assert np.allclose(resolver.world("element")[:3, 3], (101, 2, 3))
+    assert resolver.world("missing") is None
+
+
+def test_resolver_invalidates_only_the_subtree():
+    """Test that moving a storey recomputes only the placements below it."""
+    resolver = PlacementResolver()
+    resolver.set("site", np.eye(4))
+    ids, parents = [], []
+    for level in range(3):
+        resolver.set(f"storey{level}", translation(0, 0, 3 * level), "site")
+        for i in range(100):
+            ids.append(f"element{level}_{i}")
+            parents.append(f"storey{level}")
+    resolver.load(ids, parents, [translation(i, 0, 0) for i in range(len(ids))])
+    assert resolver.resolve() == 304
+
+    resolver.set("storey1", translation(0, 0, 4), "site")
+    assert resolver.resolve() == 101
+    assert np.allclose(resolver.world_many(["element1_5", "element2_5"])[:, 2, 3], (4, 6))
+
+    resolver.remove("storey1")
+    assert np.allclose(resolver.world("element1_5")[:3, 3], (105, 0, 0))
+    assert len(resolver) == 303
+
+
+def test_bus_reindexes_entities_after_placement_change():
+    """Test that moving a shared storey placement moves its walls in region queries."""
+    bus = IfcBus(replica_id="placement_bus")
+    bus.create_index("bbox", "spatial")
+    bus.set_placement("building", storey(0.0, parent=None))
+    bus.set_placement("storey1", storey(3.0))
+    wall = mesh_wall(0, 0)
+    wall["objectPlacement"]["placementRelTo"] = {"ref": "storey1"}
+    wall_id = bus.publish_entity("IfcWall", wall)
+
+    deltas = []
+    upper = ((-10.0, -10.0, 10.0), (10.0, 10.0, 20.0))
+    bus.watch(bus.query("IfcWall").where("bbox", "intersects", upper), deltas.append)
+    assert deltas == []
+
+    assert bus.set_placement("building", storey(10.0, parent=None)) == [wall_id]
+    assert deltas[0].entered == [wall_id]
+    assert bus.index.values(wall_id)["bbox"] == ((0.0, 0.0, 13.0), (4.0, 0.2, 16.0))
@@ -0,0 +1,145 @@
+"""Test the quantity take-off views."""
+from uuid import uuid4
+import sys
+import threading
+
+import ifcopenshell.api as api
+import pytest
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.qto import MaterializedView, QuantityTakeOff, TakeOff
+from ifc_databus.core.spf_import import import_spf
+from tests.test_spf_import import small_model
+
+
+def layers(*spec):
+    return [{"type": "IfcMaterialLayer", "material": {"type": "IfcMaterial", "name": name},
+             "layerThickness": thickness, "isVentilated": False, "name": name} for name, thickness in spec]
+
+
+def layer_set(*spec):
+    return {"type": "IfcMaterialLayerSet", "materialLayers": layers(*spec)}
+
+
+def layered_model(walls=2):
+    """A small model whose walls have a brick and insulation layer set and a side area quantity."""
+    model = small_model(walls=walls)
+    layer_set = api.run("material.add_material_set", model, name="Exterior", set_type="IfcMaterialLayerSet")
+    for name, thickness in (("Brick", 120.0), ("Insulation", 160.0)):
+        material = api.run("material.add_material", model, name=name)
+        api.run("material.add_layer", model, layer_set=layer_set, material=material).LayerThickness = thickness
+    for wall in model.by_type("IfcWall"):
+        api.run("material.assign_material", model, products=[wall], type="IfcMaterialLayerSetUsage",
+                material=layer_set)
+        quantities = api.run("pset.add_qto", model, product=wall, name="Qto_WallBaseQuantities")
+        api.run("pset.edit_qto", model, qto=quantities, properties={"NetSideArea": 15.0})
+    return model
+
+
+def test_take_off_reads_dimensions_and_layers():
+    """Test dimensions from fields, extrusions and quantity sets."""
+    extruded = {
+        "name": "Wall",
+        "representation": {"representations": [{"items": [{
+            "type": "IfcExtrudedAreaSolid", "depth": 3.0,
+            "sweptArea": {"type": "IfcRectangleProfileDef", "xDim": 5.0, "yDim": 0.27},
+        }]}]},
+        "hasAssociations": [{"type": "IfcRelAssociatesMaterial", "relatingMaterial": {
+            "type": "IfcMaterialLayerSetUsage",
+            "forLayerSet": layer_set(("Brick", 0.11), ("Air", 0.05)),
+        }}],
+    }
+    take_off = TakeOff.of("IfcWall", extruded)
+    assert (take_off.length, take_off.height, take_off.thickness) == (5.0, 3.0, 0.27)
+    assert take_off.area == 15.0 and take_off.volume == pytest.approx(4.05)
+    assert take_off.layers == [("Brick", 0.11), ("Air", 0.05)]
+
+    quantities = {"isDefinedBy": [{"relatingPropertyDefinition": {"type": "IfcElementQuantity", "quantities": [
+        {"type": "IfcQuantityArea", "name": "NetSideArea", "areaValue": 12.5},
+    ]}}]}
+    assert TakeOff.of("IfcWall", quantities).area == 12.5
+
+
+def test_views_apply_deltas():
+    """Test incremental totals from publishes, updates and related layer sets."""
+    bus = IfcBus(replica_id="qto_a")
+    qto = QuantityTakeOff().attach(bus)
+    volumes, areas = qto["volume_by_material"], qto["area_by_type"]
+    first = bus.publish_entity("IfcWall", {"name": "A", "length": 4.0, "height": 3.0, "objectType": "Exterior",
+                                           "materialLayers": layers(("Brick", 0.1), ("Insulation", 0.2))})
+    bus.publish_entity("IfcWall", {"name": "B", "length": 2.0, "height": 3.0,
+                                   "materialLayers": layers(("Brick", 0.1))})
+    assert volumes.get("Brick") == pytest.approx(1.8)
+    assert volumes.get("Insulation") == pytest.approx(2.4)
+    assert dict(areas.snapshot()) == {"Exterior": 12.0, "IfcWall": 6.0}
+
+    before = volumes.snapshot()
+    bus.update_entity(first, {"length": 5.0})
+    assert before["Brick"] == pytest.approx(1.8)
+    assert volumes.get("Brick") == pytest.approx(2.1)
+    assert areas["Exterior"] == 15.0
+
+    # A wall associated to its material through a separate register
+    association = bus.publish_entity("IfcRelAssociatesMaterial", {
+        "type": "IfcRelAssociatesMaterial", "relatedObjects": [], "relatingMaterial": layer_set(("Timber", 0.3)),
+    })
+    third = bus.publish_entity("IfcWall", {"name": "C", "length": 1.0, "height": 2.0})
+    bus.add_relationship(third, "associatedTo", association)
+    assert volumes.get("Timber") == pytest.approx(0.6)
+    bus.update_entity(association, {"relatingMaterial": layer_set(("Timber", 0.3), ("Gypsum", 0.05))})
+    assert volumes.get("Gypsum") == pytest.approx(0.1)
+
+    version = volumes.version
+    bus.update_entity(first, {"name": "Renamed"})
+    assert volumes.version == version
+
+
+def test_imported_relationship_registers():
+    """Test layers and quantities of an IFC-SPF import, related through refs."""
+    bus = IfcBus(replica_id="qto_spf")
+    import_spf(bus, layered_model())
+    qto = QuantityTakeOff().attach(bus)
+    volumes = qto["volume_by_material"]
+    assert dict(volumes.snapshot()) == {"Brick": 3600.0, "Insulation": 4800.0}
+    assert dict(qto["area_by_type"].snapshot()) == {"IfcWall": 30.0}
+
+    association = next(entity_id for entity_id in bus.entity_ids()
+                       if bus.get_entity(entity_id).entity_type == "IfcRelAssociatesMaterial")
+    wall = qto._resolver.id_of(bus.get_entity(association).data["relatedObjects"][0]["ref"])
+    quantities = next(target for rel_id in qto._resolver.referrers(wall) for target in qto._resolver.refs(rel_id)
+                      if bus.get_entity(target).entity_type == "IfcElementQuantity")
+    data = bus.get_entity(quantities).data
+    bus.update_entity(quantities, {**data, "quantities": [{**q, "areaValue": 10.0} for q in data["quantities"]]})
+    assert dict(volumes.snapshot()) == {"Brick": 3000.0, "Insulation": 4000.0}
+    bus.delete_entity(association)
+    assert dict(volumes.snapshot()) == {"Brick": 1800.0, "Insulation": 2400.0}
+
+
+def test_snapshots_from_another_thread():
+    """Test that a snapshot taken while another thread writes never changes."""
+    # Each wall counts once in each of many groups, so every write is long
+    view = MaterializedView("count", lambda take_off: [((take_off.object_type, i), 1.0) for i in range(200)])
+    walls = [uuid4() for _ in range(10)]
+    for wall in walls:
+        view.apply(wall, TakeOff("IfcWall", object_type="A"))
+    done, changed = threading.Event(), []
+
+    def write():
+        for i in range(500):
+            view.apply(walls[i % len(walls)], TakeOff("IfcWall", object_type="B" if i // len(walls) % 2 else "A"))
+        done.set()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    writer = threading.Thread(target=write)
+    try:
+        writer.start()
+        while not done.is_set():
+            snapshot = view.snapshot()
+            total = sum(snapshot.values())
+            if total != 200 * len(walls) or sum(snapshot.values()) != total:
+                changed.append(total)
+    finally:
+        writer.join()
+        sys.setswitchinterval(interval)
+    assert changed == []
@@ -0,0 +1,48 @@
+"""Test secondary indexes and the query API."""
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.query import Condition, QueryIndex
+
+
+def test_index_maintenance_and_plans():
+    """Test hash and sorted indexes, incremental updates and plan selection."""
+    index = QueryIndex()
+    index.create_index("name")
+    index.create_index("height", "sorted")
+    ids = list(range(6))
+    for i in ids:
+        index.update(i, "IfcWall" if i % 2 else "IfcWindow", {"name": f"n{i % 3}", "height": float(i)})
+
+    between = Condition("height", "between", (2, 4))
+    assert sorted(index.execute(None, [between], {}.get)) == [2, 3, 4]
+    assert sorted(index.execute("IfcWall", [between], {}.get)) == [3]
+    assert index.execute(None, [Condition("name", "==", "n1"), Condition("height", "<", 3)], {}.get) == [1]
+
+    index.update(3, "IfcWall", {"name": "n1", "height": 10.0})
+    assert sorted(index.execute(None, [between], {}.get)) == [2, 4]
+    assert sorted(index.execute(None, [Condition("name", "==", "n1")], {}.get)) == [1, 3, 4]
+    index.remove(4)
+    assert sorted(index.execute(None, [Condition("name", "in", ["n1", "n2"])], {}.get)) == [1, 2, 3, 5]
+
+    plan = index.plan("IfcWall", [Condition("height", ">", 9), Condition("name", "==", "n1")])
+    assert plan.driver == "sorted index height > 9"
+    assert plan.estimated == 1
+    assert plan.filters == ["entity_type == 'IfcWall' (type index)", "name == 'n1' (hash index values)"]
+
+
+def test_bus_query():
+    """Test queries over a bus, including unindexed fields."""
+    bus = IfcBus(replica_id="query")
+    bus.create_index("thermal_resistance", "sorted")
+    walls = [bus.publish_entity("IfcWall", {"name": f"Wall {i}", "thermal_resistance": i / 10, "height": 2 + i / 4})
+             for i in range(8)]
+    bus.publish_entity("IfcWindow", {"name": "Window", "height": 1.2, "width": 0.8})
+
+    query = bus.query("IfcWall").where("thermal_resistance", "<", 0.5).where("height", "between", (2.5, 3))
+    assert query.ids() == walls[2:5]
+    assert str(query.explain()).splitlines()[0] == "sorted index thermal_resistance < 0.5 (~5 candidates)"
+    assert bus.query().where("height", "<", 2).count() == 1
+
+    bus.update_entity(walls[7], {"thermal_resistance": 0.1})
+    assert walls[7] in bus.query("IfcWall").where("thermal_resistance", "<", 0.5).ids()
+    assert [e.data["name"] for e in bus.query("IfcWindow")] == ["Window"]
+    assert bus.query("IfcWall").explain().driver == "type index IfcWall"
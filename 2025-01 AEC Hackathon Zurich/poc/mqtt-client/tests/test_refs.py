@@ -0,0 +1,128 @@
+"""Test resolving, expanding and collapsing ifcJSON refs."""
+from uuid import uuid4
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.guid import compress_guid, global_id_to_uuid
+from ifc_databus.core.refs import RefResolver, collapse_refs
+
+PSET = {
+    "type": "IfcPropertySet", "name": "Pset_SlabCommon",
+    "hasProperties": [{"type": "IfcPropertySingleValue", "name": "IsExternal", "nominalValue": True}],
+}
+
+
+def test_property_sets_through_the_referrer_index():
+    """Test finding property sets of inline and separate relationships, by any id form."""
+    bus = IfcBus(replica_id="refs_a")
+    resolver = RefResolver(bus)
+    slab, pset, rel = uuid4(), uuid4(), uuid4()
+    bus.publish_entity_with_id(slab, "IfcSlab", {"name": "Slab"})
+    # The set arrives after the relationship that points at it, by its IFC GlobalId
+    bus.publish_entity_with_id(rel, "IfcRelDefinesByProperties", {
+        "relatedObjects": [{"type": "IfcSlab", "ref": str(slab)}],
+        "relatingPropertyDefinition": {"type": "IfcPropertySet", "ref": compress_guid(pset)},
+    })
+    assert resolver.referrers(slab) == {rel} and resolver.property_sets(slab) == []
+    bus.publish_entity_with_id(pset, "IfcPropertySet", PSET)
+    assert [p["name"] for p in resolver.property_sets(slab)] == ["Pset_SlabCommon"]
+    assert resolver.refs(rel) == {slab, pset}
+
+    # A register whose id is not derived from the globalId in its data
+    other = bus.publish_entity("IfcPropertySet", {
+        "type": "IfcPropertySet", "globalId": "pset_2", "name": "Qto_SlabBaseQuantities", "hasProperties": [],
+    })
+    assert resolver.id_of("pset_2") == other and resolver.resolve("pset_2").data["name"] == "Qto_SlabBaseQuantities"
+    bus.update_entity(slab, {"name": "Slab", "isDefinedBy": [{
+        "type": "IfcRelDefinesByProperties", "relatingPropertyDefinition": {"type": "IfcPropertySet", "ref": "pset_2"},
+    }]})
+    assert sorted(p["name"] for p in resolver.property_sets(slab)) == ["Pset_SlabCommon", "Qto_SlabBaseQuantities"]
+
+    bus.delete_entity(rel)
+    assert resolver.referrers(slab) == set() and resolver.referrers(other) == {slab}
+
+
+def test_related_via_relationships():
+    """Test collecting the relating objects of relationship registers, with the ids read."""
+    bus = IfcBus(replica_id="refs_c")
+    resolver = RefResolver(bus)
+    slab, other, pset, missing = uuid4(), uuid4(), uuid4(), uuid4()
+    bus.publish_entity_with_id(pset, "IfcPropertySet", PSET)
+    rels = [bus.publish_entity("IfcRelDefinesByProperties", {
+        "type": "IfcRelDefinesByProperties", "relatedObjects": [{"type": "IfcSlab", "ref": str(slab)}],
+        "relatingPropertyDefinition": {"type": "IfcPropertySet", "ref": str(target)},
+    }) for target in (pset, missing)]
+    material = bus.publish_entity("IfcRelAssociatesMaterial", {
+        "type": "IfcRelAssociatesMaterial", "relatedObjects": [{"type": "IfcSlab", "ref": str(slab)}],
+        "relatingMaterial": {"type": "IfcMaterial", "name": "Concrete"},
+    })
+    # Refers to the slab, but not through relatedObjects
+    bus.publish_entity("IfcRelAssociatesMaterial", {
+        "type": "IfcRelAssociatesMaterial", "relatedObjects": [{"type": "IfcSlab", "ref": str(other)}],
+        "relatingMaterial": {"type": "IfcMaterial", "name": "Steel", "host": {"type": "IfcSlab", "ref": str(slab)}},
+    })
+
+    objects, reads = resolver.related_via_relationships(slab)
+    assert sorted(o["name"] for o in objects) == ["Concrete", "Pset_SlabCommon"]
+    assert {*rels, material, pset, missing} <= reads
+    objects, _ = resolver.related_via_relationships(slab, ("relatingPropertyDefinition",))
+    assert [o["name"] for o in objects] == ["Pset_SlabCommon"]
+
+
+def test_view_expands_lazily_and_invalidates_on_change():
+    """Test expansion to a depth, the shared cache and invalidation through nested refs."""
+    bus = IfcBus(replica_id="refs_b")
+    resolver = RefResolver(bus)
+    material = bus.publish_entity("IfcMaterial", {"type": "IfcMaterial", "name": "Brick"})
+    layer_set = bus.publish_entity("IfcMaterialLayerSet", {
+        "associatedTo": [], "layerSetName": "Brick",
+        "materialLayers": [{"type": "IfcMaterialLayer", "layerThickness": 0.1, "isVentilated": False, "name": "Brick",
+                            "material": {"type": "IfcMaterial", "ref": str(material)}}],
+    })
+    coverings = [bus.publish_entity("IfcCovering", {
+        "name": f"Covering {i}", "hasAssociations": [{"type": "IfcMaterialLayerSet", "ref": str(layer_set)}],
+    }) for i in range(3)]
+    missing = uuid4()
+    bus.update_entity(coverings[2], {"name": "Covering 2", "host": {"type": "IfcSlab", "ref": str(missing)}})
+
+    shallow, deep = resolver.view(depth=1), resolver.view(depth=2)
+    assert shallow.get(coverings[0])["hasAssociations"][0]["materialLayers"][0]["material"] == {
+        "type": "IfcMaterial", "ref": str(material)}
+    layers = deep.get(coverings[0])["hasAssociations"][0]["materialLayers"]
+    assert layers[0]["material"]["name"] == "Brick"
+    assert deep.get(coverings[1])["hasAssociations"][0] is deep.get(coverings[0])["hasAssociations"][0]
+    assert deep.get(coverings[2])["host"] == {"type": "IfcSlab", "ref": str(missing)}
+    # Unchanged data is shared with the register
+    assert deep.get(material)["name"] == "Brick" and len(deep) == 6
+
+    bus.update_entity(material, {"type": "IfcMaterial", "name": "Clinker"})
+    # Only the expansions that reach the material are dropped
+    assert len(deep) == 0 and len(shallow) == 2
+    assert deep.get(coverings[0])["hasAssociations"][0]["materialLayers"][0]["material"]["name"] == "Clinker"
+    deep.get(coverings[2])
+    assert len(deep) == 4
+    bus.publish_entity_with_id(missing, "IfcSlab", {"name": "Slab"})
+    assert len(deep) == 3 and deep.get(coverings[2])["host"]["name"] == "Slab"
+
+    shallow.close()
+    bus.update_entity(coverings[0], {"name": "Covering 0"})
+    assert len(shallow) == 0 and len(resolver._views) == 1
+
+
+def test_collapse_to_depth():
+    """Test turning nested inline entities into refs, keeping each once."""
+    wall_id, layer_set_id = str(uuid4()), str(uuid4())
+    material = {"type": "IfcMaterial", "globalId": "brick", "name": "Brick"}
+    wall = {"type": "IfcWall", "globalId": wall_id, "hasAssociations": [{
+        "type": "IfcMaterialLayerSet", "globalId": layer_set_id,
+        "materialLayers": [{"type": "IfcMaterialLayer", "material": material},
+                           {"type": "IfcMaterialLayer", "material": material}],
+    }]}
+    out = collapse_refs(wall)
+    assert [e["globalId"] for e in out] == [wall_id, layer_set_id, "brick"]
+    assert out[0]["hasAssociations"] == [{"type": "IfcMaterialLayerSet", "ref": layer_set_id}]
+    assert out[1]["materialLayers"][1]["material"] == {"type": "IfcMaterial", "ref": "brick"}
+
+    out = collapse_refs(wall, depth=1)
+    assert [e["globalId"] for e in out] == [wall_id, "brick"]
+    assert out[0]["hasAssociations"][0]["materialLayers"][0]["material"] == {"type": "IfcMaterial", "ref": "brick"}
+    assert global_id_to_uuid(out[0]["globalId"]) == global_id_to_uuid(wall_id)
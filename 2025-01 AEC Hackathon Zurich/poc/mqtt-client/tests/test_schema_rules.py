@@ -0,0 +1,67 @@
+"""Test rules derived from the IFC schema."""
+import pytest
+
+from ifc_databus.core.schema_rules import SchemaRules
+from ifc_databus.core.validation import validate_entity, validate_relationship
+
+
+def test_derived_rule(tmp_path):
+    """Test attribute names, optionality, inheritance and inverses."""
+    rules = SchemaRules("IFC4", cache_dir=tmp_path)
+    wall = rules["IfcWall"]
+    assert wall.required_fields == set()
+    assert {"name", "objectPlacement", "predefinedType", "hasOpenings"} <= wall.allowed_fields
+    assert "IfcOpeningElement" in wall.allowed_relationships["HasOpenings"]
+    assert wall.allowed_relationships["FillsVoids"] == {"IfcOpeningElement", "IfcOpeningStandardCase"}
+
+    layer = rules["IfcMaterialLayer"]
+    assert layer.required_fields == {"layerThickness"}
+    assert "IfcMaterialLayerSet" in layer.allowed_relationships["ToMaterialLayerSet"]
+    assert "IfcFoo" not in rules and "ifcwall" not in rules
+
+
+def test_rules_are_cached(tmp_path):
+    """Test that a second instance reads rules without loading the schema."""
+    SchemaRules("IFC4", cache_dir=tmp_path)["IfcSlab"]
+    cached = SchemaRules("IFC4", cache_dir=tmp_path)
+    assert cached["IfcSlab"].allowed_fields == SchemaRules("IFC4")["IfcSlab"].allowed_fields
+    assert cached._schema is None
+
+
+def test_misses_are_cached(tmp_path, monkeypatch):
+    """Test that names that are not entities are looked up in the schema once."""
+    rules = SchemaRules("IFC4", cache_dir=tmp_path)
+    derived = []
+    derive = rules._derive
+    monkeypatch.setattr(rules, "_derive", lambda entity_type: derived.append(entity_type) or derive(entity_type))
+    for _ in range(3):
+        assert rules.get("IfcFoo") is None and rules.get("IfcLabel") is None
+    assert derived == ["IfcFoo", "IfcLabel"]
+    assert "IfcFoo" not in rules
+
+    cached = SchemaRules("IFC4", cache_dir=tmp_path)
+    with pytest.raises(KeyError):
+        cached["IfcFoo"]
+    assert "IfcLabel" not in cached and cached._schema is None
+
+
+def test_validation_falls_back_to_schema():
+    """Test that types without hand-written rules are validated from the schema."""
+    assert validate_entity("IfcSlab", {"name": "Slab"}) is None
+    assert validate_entity("IfcCartesianPointList2D", {}) == "Missing required field: coordList"
+    assert validate_entity("IfcFoo", {}) == "Unknown entity type: IfcFoo"
+    assert validate_relationship("IfcSlab", "HasOpenings", "IfcOpeningElement") is None
+    assert validate_relationship("IfcSlab", "HasOpenings", "IfcWall") is not None
+
+
+def test_schema_decides_required_fields():
+    """Test that hand-written rules widen schema rules without adding required fields."""
+    for entity_type in ("IfcDoor", "IfcWindow", "IfcSpace"):
+        assert validate_entity(entity_type, {"name": "Element"}) is None
+    assert validate_entity("IfcMaterialLayerSet", {"materialLayers": []}) is None
+    assert validate_entity("IfcMaterialLayer", {"name": "Air"}) == "Missing required field: layerThickness"
+    assert validate_entity("IfcWall_data", {}) is not None
+    # Relationships of both
+    assert validate_relationship("IfcWall", "connects", "IfcWall") is None
+    assert validate_relationship("IfcWall", "HasOpenings", "IfcDoor") is None
+    assert validate_relationship("IfcWall", "HasOpenings", "IfcOpeningElement") is None
@@ -0,0 +1,103 @@
+"""Test bounding boxes, the spatial index and region subscriptions."""
+import random
+
+import pytest
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.query import Condition
+from ifc_databus.core.spatial import SpatialIndex, box_in_frustum, box_intersects, entity_bounds
+
+
+def mesh_wall(x, y, z=0.0, length=4.0, rotate=False):
+    """A wall with a triangulated box mesh, placed on a storey placement."""
+    return {
+        "name": "Wall",
+        "objectPlacement": {
+            "type": "IfcLocalPlacement",
+            "placementRelTo": {
+                "type": "IfcLocalPlacement",
+                "relativePlacement": {
+                    "type": "IfcAxis2Placement3D",
+                    "location": {"type": "IfcCartesianPoint", "coordinates": [0.0, 0.0, z]},
+                },
+            },
+            "relativePlacement": {
+                "type": "IfcAxis2Placement3D",
+                "location": {"type": "IfcCartesianPoint", "coordinates": [x, y, 0.0]},
+                "refDirection": {"type": "IfcDirection", "directionRatios": [0.0, 1.0, 0.0] if rotate else [1.0, 0.0, 0.0]},
+            },
+        },
+        "representation": {
+            "type": "IfcProductDefinitionShape",
+            "representations": [{
+                "type": "IfcShapeRepresentation",
+                "items": [{
+                    "type": "IfcTriangulatedFaceSet",
+                    "coordinates": {
+                        "type": "IfcCartesianPointList3D",
+                        "coordList": [[0, 0, 0], [length, 0, 0], [length, 0.2, 0], [0, 0.2, 0],
+                                      [0, 0, 3], [length, 0, 3], [length, 0.2, 3], [0, 0.2, 3]],
+                    },
+                    "coordIndex": [[1, 2, 3], [1, 3, 4]],
+                }],
+            }],
+        },
+    }
+
+
+def test_entity_bounds_follow_placements():
+    """Test boxes of meshes placed through nested and rotated placements."""
+    assert entity_bounds(mesh_wall(10, 5, z=3)) == ((10.0, 5.0, 3.0), (14.0, 5.2, 6.0))
+    (lo, hi) = entity_bounds(mesh_wall(0, 0, rotate=True))
+    assert lo == pytest.approx((-0.2, 0.0, 0.0)) and hi == pytest.approx((0.0, 4.0, 3.0))
+    assert entity_bounds({"name": "No geometry"}) is None
+
+
+def test_spatial_index_matches_brute_force():
+    """Test box and frustum lookups against a linear scan, across updates."""
+    rng = random.Random(7)
+    boxes = {}
+    for i in range(500):
+        x, y, z = rng.uniform(0, 100), rng.uniform(0, 100), rng.uniform(0, 30)
+        boxes[i] = ((x, y, z), (x + rng.uniform(0, 5), y + rng.uniform(0, 5), z + 3))
+    index = SpatialIndex("bbox", rebuild_threshold=50)
+    index.load(boxes.items())
+    for i in range(0, 200, 2):
+        index.remove(i)
+        del boxes[i]
+    for i in range(1, 200, 4):
+        x = rng.uniform(0, 100)
+        boxes[i] = ((x, 0.0, 0.0), (x + 1, 1.0, 3.0))
+        index.add(i, boxes[i])
+
+    region = ((20.0, 0.0, 0.0), (50.0, 40.0, 10.0))
+    found = index.lookup(Condition("bbox", "intersects", region))
+    assert sorted(found) == sorted(i for i, b in boxes.items() if box_intersects(b, region))
+
+    # Everything in front of x = 60 and below z = 12
+    planes = [(-1.0, 0.0, 0.0, 60.0), (0.0, 0.0, -1.0, 12.0)]
+    found = index.lookup(Condition("bbox", "in_frustum", planes))
+    assert sorted(found) == sorted(i for i, b in boxes.items() if box_in_frustum(b, planes))
+
+
+def test_region_subscription():
+    """Test that a watch on one storey only sees walls inside it."""
+    bus_a = IfcBus(replica_id="spatial_a")
+    bus_b = IfcBus(replica_id="spatial_b")
+    bus_b.create_index("bbox", "spatial")
+    ground = bus_a.publish_entity("IfcWall", mesh_wall(0, 0, z=0))
+    first = bus_a.publish_entity("IfcWall", mesh_wall(0, 0, z=3.5))
+
+    deltas = []
+    storey = ((-100.0, -100.0, 3.2), (100.0, 100.0, 6.4))
+    watch = bus_b.watch(bus_b.query("IfcWall").where("bbox", "intersects", storey), deltas.append)
+    assert deltas.pop().entered == [first]
+    assert bus_b.query("IfcWall").where("bbox", "intersects", storey).explain().driver.startswith("spatial")
+
+    bus_a.update_entity(ground, mesh_wall(1, 0, z=0))
+    assert deltas == []
+    bus_a.update_entity(ground, mesh_wall(1, 0, z=3.5))
+    bus_a.update_entity(first, mesh_wall(0, 0, z=7.0))
+    assert [d.entered for d in deltas] == [[ground], []]
+    assert deltas[1].left == [first]
+    assert watch.ids == {ground}
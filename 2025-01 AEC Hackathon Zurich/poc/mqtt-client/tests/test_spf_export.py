@@ -0,0 +1,82 @@
+"""Test the incremental IFC-SPF exporter."""
+from uuid import uuid4
+
+import ifcopenshell
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.guid import compress_guid
+from ifc_databus.core.spf_export import SpfExporter
+from ifc_databus.core.spf_import import import_spf
+from tests.test_spf_import import small_model
+
+
+def test_round_trip(tmp_path):
+    """Test exporting an imported model back to IFC-SPF."""
+    model = small_model(walls=2)
+    bus = IfcBus(replica_id="export_a")
+    import_spf(bus, model)
+    report = SpfExporter(bus).export(tmp_path / "out.ifc")
+    assert report.converted == len(model.by_type("IfcRoot")) and not report.errors
+
+    exported = ifcopenshell.open(str(tmp_path / "out.ifc"))
+    assert {e.GlobalId for e in exported.by_type("IfcRoot")} == {e.GlobalId for e in model.by_type("IfcRoot")}
+    for rel in exported.by_type("IfcRelDefinesByProperties"):
+        source = model.by_guid(rel.GlobalId)
+        assert rel.RelatedObjects[0].GlobalId == source.RelatedObjects[0].GlobalId
+        assert rel.RelatingPropertyDefinition.HasProperties[0].NominalValue.wrappedValue is True
+    solid = exported.by_type("IfcWall")[0].Representation.Representations[0].Items[0]
+    assert solid.is_a("IfcExtrudedAreaSolid") and solid.Depth == 3000.0
+
+
+def test_reexport_converts_only_changed_registers(tmp_path):
+    """Test copying unchanged runs and rewriting edited or completed ones."""
+    model = small_model(walls=3)
+    bus = IfcBus(replica_id="export_b")
+    import_spf(bus, model)
+    exporter = SpfExporter(bus)
+    path = tmp_path / "out.ifc"
+    exporter.export(path)
+    before = path.read_text()
+
+    wall = model.by_type("IfcWall")[1]
+    bus.update_entity(next(id for id in bus.entity_ids() if bus.get_entity(id).data.get("name") == wall.Name),
+                      {"name": "Edited"})
+    report = exporter.export(path)
+    assert (report.converted, report.copied) == (1, len(model.by_type("IfcRoot")) - 1)
+    after = path.read_text()
+    assert f"'{wall.Name}'" in before and f"'{wall.Name}'" not in after and "'Edited'" in after
+    assert ifcopenshell.open(str(path)).by_guid(wall.GlobalId).Name == "Edited"
+
+    # A reference to a register that does not exist yet is unset until it arrives
+    storey = uuid4()
+    rel = bus.publish_entity("IfcRelAggregates", {
+        "type": "IfcRelAggregates", "relatingObject": {"type": "IfcBuilding", "ref": str(storey)}, "relatedObjects": [],
+    })
+    assert exporter.export(path).converted == 1
+    bus.publish_entity_with_id(storey, "IfcBuilding", {"type": "IfcBuilding", "name": "Building"})
+    assert exporter.export(path).converted == 2
+    exported = ifcopenshell.open(str(path))
+    assert exported.by_guid(compress_guid(rel)).RelatingObject.Name == "Building"
+
+
+def test_reexport_drops_references_to_deleted_registers(tmp_path):
+    """Test that an unchanged referrer is rewritten when its target is deleted."""
+    bus = IfcBus(replica_id="export_c")
+    wall = bus.publish_entity("IfcWall", {"name": "Wall"})
+    storey = bus.publish_entity("IfcBuildingStorey", {"type": "IfcBuildingStorey", "name": "Storey"})
+    rel = bus.publish_entity("IfcRelContainedInSpatialStructure", {
+        "type": "IfcRelContainedInSpatialStructure",
+        "relatedElements": [{"type": "IfcWall", "ref": str(wall)}],
+        "relatingStructure": {"type": "IfcBuildingStorey", "ref": str(storey)},
+    })
+    exporter = SpfExporter(bus)
+    path = tmp_path / "out.ifc"
+    exporter.export(path)
+    wall_step = exporter.step_id(wall)
+    assert f"(#{wall_step})" in path.read_text()
+
+    bus.delete_entity(wall)
+    report = exporter.export(path)
+    assert (report.converted, report.copied) == (1, 1)
+    assert f"#{wall_step}" not in path.read_text()
+    assert ifcopenshell.open(str(path)).by_guid(compress_guid(rel)).RelatingStructure.Name == "Storey"
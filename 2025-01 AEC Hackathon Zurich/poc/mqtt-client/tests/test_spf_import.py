@@ -0,0 +1,103 @@
+"""Test the IFC-SPF importer and GlobalId conversion."""
+from uuid import UUID, uuid4
+
+import ifcopenshell
+import ifcopenshell.api as api
+import ifcopenshell.guid
+import pytest
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.guid import compress_guid, expand_guid, global_id_to_uuid
+from ifc_databus.core.spf_import import import_spf, read_spf
+
+
+def small_model(walls=3):
+    model = api.run("project.create_file", version="IFC4")
+    project = api.run("root.create_entity", model, ifc_class="IfcProject", name="Project")
+    api.run("unit.assign_unit", model)
+    context = api.run("context.add_context", model, context_type="Model")
+    body = api.run("context.add_context", model, context_type="Model", context_identifier="Body",
+                   target_view="MODEL_VIEW", parent=context)
+    storey = api.run("root.create_entity", model, ifc_class="IfcBuildingStorey", name="Storey")
+    api.run("aggregate.assign_object", model, relating_object=project, products=[storey])
+    for i in range(walls):
+        wall = api.run("root.create_entity", model, ifc_class="IfcWall", name=f"Wall {i}")
+        representation = api.run("geometry.add_wall_representation", model, context=body,
+                                 length=5, height=3, thickness=0.2)
+        api.run("geometry.assign_representation", model, product=wall, representation=representation)
+        api.run("spatial.assign_container", model, relating_structure=storey, products=[wall])
+        pset = api.run("pset.add_pset", model, product=wall, name="Pset_WallCommon")
+        api.run("pset.edit_pset", model, pset=pset, properties={"IsExternal": True, "ThermalTransmittance": 0.3})
+    return model
+
+
+def test_global_ids():
+    """Test GlobalId expansion, compression and the hash fallback."""
+    id = uuid4()
+    assert compress_guid(id) == ifcopenshell.guid.compress(id.hex)
+    assert expand_guid(compress_guid(id)) == id
+    assert global_id_to_uuid(compress_guid(id)) == global_id_to_uuid(str(id)) == id
+    assert global_id_to_uuid("prop_set_1") == global_id_to_uuid("prop_set_1") != id
+    with pytest.raises(ValueError):
+        expand_guid("prop_set_1")
+
+
+def test_read_spf_converts_to_ifcjson(tmp_path):
+    """Test ifcJSON conversion, GlobalId ids, refs and dependency order."""
+    path = tmp_path / "model.ifc"
+    small_model().write(str(path))
+    registers = list(read_spf(str(path)))
+    types = [entity_type for _, entity_type, _ in registers]
+    assert types.index("IfcRelDefinesByProperties") > types.index("IfcPropertySet")
+    assert types.index("IfcRelContainedInSpatialStructure") > types.index("IfcWall")
+
+    model = ifcopenshell.open(str(path))
+    wall = model.by_type("IfcWall")[0]
+    id, _, data = next(register for register in registers if register[1] == "IfcWall")
+    assert id == UUID(ifcopenshell.guid.expand(wall.GlobalId)) and data["globalId"] == str(id)
+    assert data["type"] == "IfcWall" and "ownerHistory" not in data
+    item = data["representation"]["representations"][0]["items"][0]
+    assert item["type"] == "IfcExtrudedAreaSolid" and item["depth"] == 3000.0
+
+    rel = next(data for _, entity_type, data in registers if entity_type == "IfcRelDefinesByProperties")
+    assert rel["relatingPropertyDefinition"]["type"] == "IfcPropertySet"
+    assert UUID(rel["relatedObjects"][0]["ref"]) in {id for id, _, _ in registers}
+    pset = next(data for _, entity_type, data in registers if entity_type == "IfcPropertySet")
+    values = {p["name"]: p["nominalValue"] for p in pset["hasProperties"]}
+    assert values["IsExternal"] == {"type": "IfcBoolean", "value": True}
+
+
+def test_import_publishes_in_batches():
+    """Test publishing a model onto the bus batch by batch."""
+    model = small_model(walls=4)
+    bus = IfcBus(replica_id="spf_a")
+    batches = []
+    report = import_spf(bus, model, batch_size=5, on_batch=batches.append)
+    rooted = model.by_type("IfcRoot")
+    assert report.entities == len(rooted) and report.rejected == 0
+    assert report.batches == len(batches) and max(len(batch) for batch in batches) == 5
+    wall = model.by_type("IfcWall")[0]
+    register = bus.get_entity(expand_guid(wall.GlobalId))
+    assert register.entity_type == "IfcWall" and register.data["name"] == wall.Name
+    assert bus.pending_messages() == 0 and report.peak_rss > 0
+
+
+def test_import_validates_against_the_schema():
+    """Test that doors, windows, spaces and types with hand-written rules are imported."""
+    model = small_model(walls=1)
+    storey = model.by_type("IfcBuildingStorey")[0]
+    for ifc_class in ("IfcDoor", "IfcWindow"):
+        product = api.run("root.create_entity", model, ifc_class=ifc_class, name=ifc_class)
+        api.run("spatial.assign_container", model, relating_structure=storey, products=[product])
+    space = api.run("root.create_entity", model, ifc_class="IfcSpace", name="Room")
+    api.run("aggregate.assign_object", model, relating_object=storey, products=[space])
+    wall_type = api.run("root.create_entity", model, ifc_class="IfcWallType", name="Type", predefined_type="SOLIDWALL")
+    api.run("type.assign_type", model, related_objects=model.by_type("IfcWall"), relating_type=wall_type)
+
+    bus = IfcBus(replica_id="spf_b")
+    report = import_spf(bus, model)
+    assert report.rejected == 0 and report.errors == []
+    assert report.entities == len(model.by_type("IfcRoot"))
+    for ifc_class in ("IfcDoor", "IfcWindow", "IfcSpace", "IfcWallType"):
+        entity = model.by_type(ifc_class)[0]
+        assert bus.get_entity(expand_guid(entity.GlobalId)).entity_type == ifc_class
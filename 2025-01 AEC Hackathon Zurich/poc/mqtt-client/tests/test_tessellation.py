@@ -0,0 +1,83 @@
+"""Test parallel tessellation of imported geometry."""
+from multiprocessing.shared_memory import SharedMemory
+import time
+
+import ifcopenshell.geom
+import numpy as np
+import pytest
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.guid import expand_guid
+from ifc_databus.core.spf_import import import_spf
+from ifc_databus.core import tessellation
+from ifc_databus.core.tessellation import Tessellator, geometry_settings
+from tests.test_spf_import import small_model
+
+
+def test_meshes_match_in_process_tessellation(tmp_path):
+    """Test meshes returned through shared memory by worker processes."""
+    path = tmp_path / "model.ifc"
+    model = small_model(walls=5)
+    model.write(str(path))
+    walls = model.by_type("IfcWall")
+    tessellator = Tessellator(str(path), processes=2, chunk_size=2).start(wall.id() for wall in walls)
+    meshes = {mesh.id: mesh for mesh in tessellator}
+    assert sorted(meshes) == sorted(wall.id() for wall in walls)
+
+    shape = ifcopenshell.geom.create_shape(geometry_settings(), walls[0])
+    mesh = meshes[walls[0].id()]
+    assert np.array_equal(mesh.vertices.ravel(), shape.geometry.verts)
+    assert np.array_equal(mesh.faces.ravel(), shape.geometry.faces)
+    assert mesh.vertices[:, 2].max() == pytest.approx(3000.0)
+
+
+def test_unpacked_blocks_are_freed(tmp_path, monkeypatch):
+    """Test that the parent frees each shared memory block it unpacked."""
+    path = tmp_path / "model.ifc"
+    model = small_model(walls=1)
+    model.write(str(path))
+    names = []
+    unpack = tessellation.unpack_chunk
+    monkeypatch.setattr(tessellation, "unpack_chunk", lambda name, entries: names.append(name) or unpack(name, entries))
+    assert len(list(Tessellator(str(path), processes=1).start([model.by_type("IfcWall")[0].id()]))) == 1
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=names[0])
+
+
+def test_import_publishes_meshes(tmp_path):
+    """Test importing with tessellation on worker processes."""
+    path = tmp_path / "model.ifc"
+    model = small_model(walls=3)
+    model.write(str(path))
+    bus = IfcBus(replica_id="tessellate_a")
+    report = import_spf(bus, str(path), processes=2)
+    assert report.entities == len(model.by_type("IfcRoot")) and report.rejected == 0
+    wall = bus.get_entity(expand_guid(model.by_type("IfcWall")[0].GlobalId))
+    item = wall.data["representation"]["representations"][0]["items"][0]
+    assert item["type"] == "IfcTriangulatedFaceSet" and len(item["coordIndex"]) == 12
+
+
+def _exists(name):
+    try:
+        SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def test_unread_blocks_are_freed_on_early_stop(tmp_path, monkeypatch):
+    """Test that stopping early frees the blocks of finished chunks that were not read."""
+    path = tmp_path / "model.ifc"
+    model = small_model(walls=4)
+    model.write(str(path))
+    tessellator = Tessellator(str(path), processes=2, chunk_size=1).start(wall.id() for wall in model.by_type("IfcWall"))
+    names = set(tessellator._blocks)
+    meshes = iter(tessellator)
+    next(meshes)
+    # Let the other chunks finish before stopping
+    deadline = time.monotonic() + 30
+    while sum(map(_exists, names)) < len(names) - 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    meshes.close()
+    assert tessellator._blocks == set()
+    assert not any(map(_exists, names))
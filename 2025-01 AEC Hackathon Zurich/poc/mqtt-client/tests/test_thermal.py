@@ -0,0 +1,82 @@
+"""Test the U-value engine."""
+import json
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+from ifc_databus.core.bus import IfcBus
+from ifc_databus.core.spf_import import import_spf
+from ifc_databus.core.thermal import R_SE, R_SI, UValueEngine
+from tests.test_qto import layered_model
+
+EXAMPLE_OPERATION = Path(__file__).parents[2] / "message" / "example_operation.json"
+
+
+def layer(material, thickness, ventilated=False):
+    return {"type": "IfcMaterialLayer", "material": {"type": "IfcMaterial", "name": material},
+            "layerThickness": thickness, "isVentilated": ventilated, "name": material}
+
+
+def test_conductivities_from_example_operation():
+    """Test reading conductivities linked through IfcRelAssociates."""
+    engine = UValueEngine()
+    engine.load_ifcjson(json.loads(EXAMPLE_OPERATION.read_text())["data"]["data"])
+    assert engine.conductivity("Masonry - Brick - Brown") == 0.6
+    assert engine.conductivity("Masonry") is None
+
+
+def test_u_values_recompute_only_affected_walls():
+    """Test vectorized U-values after layer and conductivity changes."""
+    engine = UValueEngine()
+    engine.set_conductivity("Brick", 0.6)
+    engine.set_conductivity("Insulation", 0.035)
+    brick, insulated, unknown = uuid4(), uuid4(), uuid4()
+    engine.set_layers(brick, [layer("Brick", 120.0), layer("Air", 40.0, ventilated=True)])
+    engine.set_layers(insulated, [layer("Brick", 120.0), layer("Insulation", 160.0)])
+    engine.set_layers(unknown, [layer("Brick", 120.0), layer("Clay", 50.0)])
+    assert sorted(engine.compute()) == sorted([brick, insulated])
+    assert engine.u_value(brick) == pytest.approx(1 / (R_SI + R_SE + 0.12 / 0.6))
+    assert engine.u_value(insulated) == pytest.approx(1 / (R_SI + R_SE + 0.12 / 0.6 + 0.16 / 0.035))
+    assert engine.u_value(unknown) is None
+
+    engine.set_conductivity("Clay", 0.5)
+    assert engine.compute() == [unknown]
+    engine.set_conductivity("Insulation", 0.032)
+    assert engine.compute() == [insulated]
+    engine.set_layers(brick, [layer("Brick", 120.0), layer("Air", 40.0, ventilated=True)])
+    assert engine.compute() == []
+
+
+def test_publishes_derived_properties():
+    """Test U-values written back to walls and kept current."""
+    bus = IfcBus(replica_id="thermal_a")
+    engine = UValueEngine()
+    engine.set_conductivity("Brick", 0.6)
+    engine.set_conductivity("Insulation", 0.04)
+    wall = bus.publish_entity("IfcWall", {"name": "Wall", "materialLayers": [layer("Brick", 150.0)]})
+    engine.attach(bus, publish=True)
+    assert bus.get_entity(wall).data["thermal_transmittance"] == pytest.approx(1 / (R_SI + R_SE + 0.25))
+
+    sent = []
+    send = bus._send_message
+    bus._scheduler._send = lambda topic, msg: (sent.append(msg), send(topic, msg))
+    bus.update_entity(wall, {"materialLayers": [layer("Brick", 150.0), layer("Insulation", 200.0)]})
+    data = bus.get_entity(wall).data
+    assert data["thermal_transmittance"] == pytest.approx(1 / (R_SI + R_SE + 0.25 + 5.0), abs=1e-6)
+    assert data["thermal_resistance"] == pytest.approx(R_SI + R_SE + 5.25, abs=1e-4)
+    derived = [msg for msg in sent if msg["operation_type"] == "update_fragment"]
+    assert len(derived) == 1 and "crdt_data" not in derived[0]
+    assert {op["path"] for op in derived[0]["ops"]} == {"/thermal_transmittance", "/thermal_resistance"}
+
+
+def test_imported_material_associations():
+    """Test layers of an IFC-SPF import, associated through IfcRelAssociatesMaterial registers."""
+    bus = IfcBus(replica_id="thermal_spf")
+    import_spf(bus, layered_model())
+    engine = UValueEngine()
+    engine.set_conductivity("Brick", 0.6)
+    engine.set_conductivity("Insulation", 0.04)
+    engine.attach(bus)
+    walls = [entity_id for entity_id in bus.entity_ids() if bus.get_entity(entity_id).entity_type == "IfcWall"]
+    assert engine.u_values() == {wall: pytest.approx(1 / (R_SI + R_SE + 0.12 / 0.6 + 0.16 / 0.04)) for wall in walls}
@@ -0,0 +1,52 @@
+"""Test the compiled batch validator."""
+from ifc_databus.core.validation import validate_entity
+from ifc_databus.core.validator import CompiledValidator
+
+WALL = {
+    "name": "Wall",
+    "materialLayers": [
+        {"type": "IfcMaterialLayer", "layerThickness": 110.0, "isVentilated": "false", "name": "Brick",
+         "material": {"type": "IfcMaterial", "name": "Brick"}},
+        {"type": "IfcMaterialLayer", "name": "Air"},
+    ],
+    "associatedTo": [{"type": "IfcWallType", "ref": "3cb2e79a"}],
+}
+
+
+def test_matches_validate_entity():
+    """Test that flat entities give the same result as validate_entity."""
+    validator = CompiledValidator()
+    for entity_type, data in [("IfcWindow", {"name": "W", "height": 1, "width": 1}),
+                              ("IfcWindow", {"name": "W"}), ("IfcUnknown", {})]:
+        expected = validate_entity(entity_type, data)
+        assert (validator.first_error(entity_type, data) is None) == (expected is None)
+
+
+def test_nested_errors_have_paths():
+    """Test that nested objects are validated and references skipped."""
+    errors = CompiledValidator().validate("IfcWall", WALL)
+    assert [(e.path, e.message) for e in errors] == [
+        ("/materialLayers/1", "Missing required field: layerThickness"),
+    ]
+
+
+def test_strict_allowed_fields():
+    """Test that strict mode reports fields outside allowed_fields."""
+    data = {"name": "W", "height": 1, "width": 1, "colour": "red"}
+    assert CompiledValidator().validate("IfcWindow", data) == []
+    errors = CompiledValidator(strict=True).validate("IfcWindow", data)
+    assert [(e.path, e.message) for e in errors] == [("/colour", "Unexpected field: colour")]
+
+
+def test_validate_many():
+    """Test that a batch returns every error with its entity index."""
+    errors = CompiledValidator().validate_many([
+        ("IfcWindow", {"name": "W", "height": 1, "width": 1}),
+        {"type": "IfcPropertySet", "name": "Pset"},
+        ("IfcWall", WALL),
+        {"type": "IfcBeamish"},
+    ])
+    assert [(e.index, e.entity_type, e.path) for e in errors] == [
+        (1, "IfcPropertySet", ""), (2, "IfcMaterialLayer", "/materialLayers/1"), (3, "IfcBeamish", ""),
+    ]
+    assert str(errors[0]) == "IfcPropertySet[1]: Missing required field: hasProperties"
@@ -0,0 +1,34 @@
+"""Test live query subscriptions."""
+from ifc_databus.core.bus import IfcBus
+
+
+def window(width, storey="2"):
+    return {"name": "Window", "height": 1.2, "width": width, "storey": storey}
+
+
+def test_watch_deltas_from_merges_and_local_writes():
+    """Test enter, update and leave deltas on a remote replica."""
+    bus_a = IfcBus(replica_id="watch_a")
+    bus_b = IfcBus(replica_id="watch_b")
+    bus_b.create_index("width", "sorted")
+    first = bus_a.publish_entity("IfcWindow", window(1.4))
+
+    deltas = []
+    query = bus_b.query("IfcWindow").where("storey", "==", "2").where("width", ">", 1.0)
+    watch = bus_b.watch(query, deltas.append)
+    assert deltas.pop().entered == [first]
+
+    second = bus_a.publish_entity("IfcWindow", window(1.2))
+    bus_a.publish_entity("IfcWindow", window(0.6))
+    bus_a.publish_entity("IfcWall", {"name": "Wall"})
+    assert [d.entered for d in deltas] == [[second]]
+
+    bus_a.update_entity(first, {"name": "Renamed"})
+    bus_b.update_entity(second, {"width": 0.8})
+    assert deltas[1].updated == [first]
+    assert deltas[2].left == [second]
+    assert watch.ids == {first}
+
+    watch.cancel()
+    bus_a.update_entity(first, {"width": 0.5})
+    assert len(deltas) == 3